@@ -0,0 +1,142 @@
+"""
+Money stored as integer minor units (cents).
+
+``MoneyField`` is a BigIntegerField holding an amount times
+``10 ** exponent``, so sums and comparisons in the database are exact integer
+arithmetic and never drift. In Python the field's value is a ``Money``: a
+float subclass built from the stored integer, so 1999 cents read back as
+exactly ``19.99``. Money values mix with plain numbers, are written by
+``json.dumps`` as numbers and keep the API's decimal representation.
+
+Any number or numeric string assigned to the field is rounded half up to the
+nearest minor unit when it is set, so float arithmetic done in Python (e.g.
+``account.total -= transaction.total``) cannot accumulate sub-cent errors.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Optional
+
+from django.core import exceptions
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+# Minor units per major unit as a power of ten (2 for cents)
+DEFAULT_CURRENCY_EXPONENT = 2
+
+
+def to_minor_units(value, exponent: int = DEFAULT_CURRENCY_EXPONENT) -> Optional[int]:
+    """
+    Convert an amount to integer minor units, rounding half up.
+
+    Args:
+        value: Money, int, float, Decimal or numeric string (None stays None)
+        exponent: Currency exponent
+
+    Raises:
+        ValueError: When the value is not a number
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, Money) and value.exponent == exponent:
+        return value.minor_units
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"'{value}' is not a valid amount")
+    if not amount.is_finite():
+        raise ValueError(f"'{value}' is not a valid amount")
+    return int(amount.scaleb(exponent).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+class Money(float):
+    """
+    Amount read from a MoneyField.
+
+    Behaves like the float of its decimal value and also keeps the exact
+    integer ``minor_units`` and the currency ``exponent``.
+    """
+
+    def __new__(cls, minor_units: int, exponent: int = DEFAULT_CURRENCY_EXPONENT):
+        value = super().__new__(cls, minor_units / 10 ** exponent)
+        value.minor_units = int(minor_units)
+        value.exponent = exponent
+        return value
+
+    @classmethod
+    def from_amount(cls, value, exponent: int = DEFAULT_CURRENCY_EXPONENT) -> 'Money':
+        """Money for an amount in major units (e.g. 19.99), rounded to the nearest minor unit."""
+        return cls(to_minor_units(value, exponent), exponent)
+
+    @property
+    def decimal(self) -> Decimal:
+        """Exact decimal value, e.g. Decimal('19.99')."""
+        return Decimal(self.minor_units).scaleb(-self.exponent)
+
+    def __repr__(self):
+        return float.__repr__(self)
+
+    def __reduce__(self):
+        return (Money, (self.minor_units, self.exponent))
+
+
+class MoneyAttribute(DeferredAttribute):
+    """Field descriptor that turns every assigned amount into Money."""
+
+    def __set__(self, instance, value):
+        if value is not None and not hasattr(value, 'resolve_expression'):
+            value = self.field.to_python(value)
+        instance.__dict__[self.field.attname] = value
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    Amount stored as integer minor units.
+
+    Args:
+        exponent: Currency exponent (2: stored in hundredths)
+    """
+
+    descriptor_class = MoneyAttribute
+    description = "Amount stored as integer minor units"
+    default_error_messages = {
+        'invalid': "'%(value)s' value must be an amount.",
+    }
+
+    def __init__(self, *args, exponent: int = DEFAULT_CURRENCY_EXPONENT, **kwargs):
+        self.exponent = exponent
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.exponent != DEFAULT_CURRENCY_EXPONENT:
+            kwargs['exponent'] = self.exponent
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return Money(value, self.exponent)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Money) and value.exponent == self.exponent:
+            return value
+        try:
+            minor_units = to_minor_units(value, self.exponent)
+        except (TypeError, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value}
+            )
+        return None if minor_units is None else Money(minor_units, self.exponent)
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return to_minor_units(value, self.exponent)
+
+    def formfield(self, **kwargs):
+        from django import forms
+
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'decimal_places': self.exponent,
+            **kwargs,
+        })
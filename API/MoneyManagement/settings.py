@@ -189,12 +189,101 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads larger than this are spooled to a temporary file instead of memory,
+# so bank statement PDFs (up to 10MB) are read from disk when decrypting.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1 * 1024 * 1024  # 1MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
 # Google AI Studio (Gemini API) Configuration
 GOOGLE_AI_API_KEY = os.getenv('GOOGLE_AI_API_KEY', None)
 
+# Local bank statement parsing (pypdf text layer + per-bank templates).
+# The AI is only called when no template matches with at least this confidence.
+BANK_STATEMENT_LOCAL_PARSERS_ENABLED = os.getenv('BANK_STATEMENT_LOCAL_PARSERS_ENABLED', 'true').lower() == 'true'
+BANK_STATEMENT_LOCAL_PARSER_MIN_CONFIDENCE = float(os.getenv('BANK_STATEMENT_LOCAL_PARSER_MIN_CONFIDENCE', '0.95'))
+
+# How statements are sent to Gemini: 'text' sends the compacted PDF text layer,
+# 'file' uploads the raw PDF. Text mode falls back to file mode for scanned PDFs.
+BANK_STATEMENT_AI_INPUT_MODE = os.getenv('BANK_STATEMENT_AI_INPUT_MODE', 'text')
+BANK_STATEMENT_AI_MIN_TEXT_LENGTH = int(os.getenv('BANK_STATEMENT_AI_MIN_TEXT_LENGTH', '200'))
+
+# Statements longer than this many pages are split into page chunks that are
+# extracted concurrently on a pool of at most BANK_STATEMENT_AI_MAX_WORKERS threads.
+BANK_STATEMENT_AI_CHUNK_PAGES = int(os.getenv('BANK_STATEMENT_AI_CHUNK_PAGES', '8'))
+BANK_STATEMENT_AI_MAX_WORKERS = int(os.getenv('BANK_STATEMENT_AI_MAX_WORKERS', '4'))
+
+# Gemini call resilience: every statement gets an overall deadline (each request is also
+# capped at BANK_STATEMENT_AI_REQUEST_TIMEOUT), and after GEMINI_CIRCUIT_FAILURE_THRESHOLD
+# consecutive transient failures calls fail fast for GEMINI_CIRCUIT_RESET_SECONDS.
+BANK_STATEMENT_AI_DEADLINE_SECONDS = int(os.getenv('BANK_STATEMENT_AI_DEADLINE_SECONDS', '180'))
+BANK_STATEMENT_AI_REQUEST_TIMEOUT = int(os.getenv('BANK_STATEMENT_AI_REQUEST_TIMEOUT', '120'))
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('GEMINI_CIRCUIT_FAILURE_THRESHOLD', '5'))
+GEMINI_CIRCUIT_RESET_SECONDS = int(os.getenv('GEMINI_CIRCUIT_RESET_SECONDS', '30'))
+
+# Statements processed in the background stream the model's answer, so transactions are
+# staged (and sent to clients of the statement's event stream) as soon as they are generated.
+# The event stream checks for new rows every BANK_STATEMENT_STREAM_POLL_SECONDS.
+BANK_STATEMENT_AI_STREAM = os.getenv('BANK_STATEMENT_AI_STREAM', 'true').lower() == 'true'
+BANK_STATEMENT_STREAM_POLL_SECONDS = float(os.getenv('BANK_STATEMENT_STREAM_POLL_SECONDS', '0.5'))
+
+# Batch uploads: statements are processed on a background pool of this many threads
+BANK_STATEMENT_WORKERS = int(os.getenv('BANK_STATEMENT_WORKERS', '2'))
+BANK_STATEMENT_BATCH_MAX_FILES = int(os.getenv('BANK_STATEMENT_BATCH_MAX_FILES', '24'))
+
+# Fair share between users: a user has at most this many statements processing at once, and
+# users are served round-robin, weighted by BANK_STATEMENT_USER_WEIGHTS ("alice:2,bob:0.5", default 1)
+BANK_STATEMENT_USER_MAX_CONCURRENT = int(os.getenv('BANK_STATEMENT_USER_MAX_CONCURRENT', '1'))
+BANK_STATEMENT_USER_WEIGHTS = os.getenv('BANK_STATEMENT_USER_WEIGHTS', '')
+
+# Bulk reprocessing (admin action / reprocess_statements) hands at most this many statements
+# per minute to the extraction backend, smallest files first. 0 disables the limit.
+BANK_STATEMENT_REPROCESS_RATE_PER_MINUTE = float(os.getenv('BANK_STATEMENT_REPROCESS_RATE_PER_MINUTE', '10'))
+
+# When the server starts, queue the statements a previous run left pending
+BANK_STATEMENT_RECOVER_PENDING = os.getenv('BANK_STATEMENT_RECOVER_PENDING', 'true').lower() == 'true'
+
+# Statements whose period was already imported into the same account are not extracted again;
+# partly covered statements only send the pages with new dates (bankstatements/coverage.py)
+BANK_STATEMENT_SKIP_COVERED_PERIODS = os.getenv('BANK_STATEMENT_SKIP_COVERED_PERIODS', 'true').lower() == 'true'
+
+# Uploaded PDFs are stored once per content hash (bankstatements/storage.py), optionally
+# gzip-compressed. Unreferenced blobs are deleted by sweep_statement_blobs after the grace period.
+BANK_STATEMENT_BLOB_COMPRESSION = os.getenv('BANK_STATEMENT_BLOB_COMPRESSION', 'false').lower() == 'true'
+BANK_STATEMENT_BLOB_GRACE_MINUTES = int(os.getenv('BANK_STATEMENT_BLOB_GRACE_MINUTES', '60'))
+
+# Retention (python manage.py apply_statement_retention): delete the PDFs of completed
+# statements and whole failed statements after this many days. 0 disables a policy.
+BANK_STATEMENT_RETENTION_PDF_DAYS = int(os.getenv('BANK_STATEMENT_RETENTION_PDF_DAYS', '0'))
+BANK_STATEMENT_RETENTION_FAILED_DAYS = int(os.getenv('BANK_STATEMENT_RETENTION_FAILED_DAYS', '0'))
+
+# Extraction backend used when local parsing is not confident enough:
+# 'gemini', 'local', 'record' or 'replay' (see bankstatements/backends.py).
+BANK_STATEMENT_EXTRACTION_BACKEND = os.getenv('BANK_STATEMENT_EXTRACTION_BACKEND', 'gemini')
+BANK_STATEMENT_RECORDINGS_DIR = os.getenv('BANK_STATEMENT_RECORDINGS_DIR', str(BASE_DIR / 'recordings'))
+
+# Learned merchant categories (transaction/merchants.py) are only used when at least
+# this share of the user's transactions for that merchant have the same category
+MERCHANT_INDEX_MIN_SHARE = float(os.getenv('MERCHANT_INDEX_MIN_SHARE', '0.6'))
+
+# Imported transactions that match a stored one (same owner, account, amount and title, dated at
+# most this many days apart) are duplicates (transaction/fingerprints.py). They are stored and
+# reported ("flag") or not stored ("skip") unless the request passes on_duplicate.
+TRANSACTION_DUPLICATE_WINDOW_DAYS = int(os.getenv('TRANSACTION_DUPLICATE_WINDOW_DAYS', '2'))
+TRANSACTION_DUPLICATE_POLICY = os.getenv('TRANSACTION_DUPLICATE_POLICY', 'flag')
+
+# When on, imported expenses and incomes of the same amount in two of the user's accounts, dated
+# at most this many days apart and with a transfer title or category, are merged into one
+# Transfer (transaction/transfers.py; python manage.py pair_transfers --undo splits one again)
+TRANSFER_PAIRING_ON_IMPORT = os.getenv('TRANSFER_PAIRING_ON_IMPORT', 'false').lower() == 'true'
+TRANSFER_PAIRING_WINDOW_DAYS = int(os.getenv('TRANSFER_PAIRING_WINDOW_DAYS', '3'))
+
+# Upcoming instances of recurring rules are stored this many days ahead for the projection
+# endpoint (python manage.py materialize_recurring_transactions, transaction/scheduling.py)
+RECURRING_PROJECTION_HORIZON_DAYS = int(os.getenv('RECURRING_PROJECTION_HORIZON_DAYS', '90'))
+
+# When set, Gemini requests go to a local fake server (python manage.py run_fake_gemini)
+FAKE_GEMINI_URL = os.getenv('FAKE_GEMINI_URL', None)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,45 @@
+"""
+Test helpers shared by the apps' test suites.
+"""
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTestCase(TransactionTestCase):
+    """
+    Run data migrations against rows created with the historical models.
+
+    ``setUp`` migrates the database back to ``migrate_from``; the test creates
+    rows with ``self.old_apps`` and calls ``self.migrate()`` to apply the
+    migrations up to ``migrate_to``. The database is migrated forward again
+    after the test.
+
+    ``self.old_apps`` only holds the apps the targets depend on, so list a
+    target for every other app the test creates rows in.
+
+    Attributes:
+        migrate_from: (app_label, migration_name) targets before the migration under test
+        migrate_to: (app_label, migration_name) targets after it
+    """
+
+    migrate_from = []
+    migrate_to = []
+
+    def setUp(self):
+        super().setUp()
+        executor = MigrationExecutor(connection)
+        self.latest = executor.loader.graph.leaf_nodes()
+        executor.migrate(self.migrate_from)
+        self.old_apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.latest)
+        super().tearDown()
+
+    def migrate(self):
+        """Apply the migrations under test and return the models' state after them."""
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        return executor.loader.project_state(self.migrate_to).apps
@@ -13,3 +13,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MoneyManagement.settings')
 
 application = get_wsgi_application()
+
+# Statement processing queues live in memory: queue what the previous run left pending
+from bankstatements.workers import schedule_pending_recovery  # noqa: E402
+
+schedule_pending_recovery()
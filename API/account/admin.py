@@ -4,15 +4,15 @@ from .models import Account
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
-    list_display = ('id', 'account_name', 'account_type', 'bank', 'total', 'owner')
-    list_filter = ('account_type', 'bank', 'owner')
+    list_display = ('id', 'account_name', 'account_type', 'kind', 'bank', 'total', 'owner')
+    list_filter = ('kind', 'account_type', 'bank', 'owner')
     search_fields = ('account_name', 'owner', 'bank')
     ordering = ('owner', 'account_name')
-    readonly_fields = ('id',)
+    readonly_fields = ('id', 'kind')
     
     fieldsets = (
         ('Account Information', {
-            'fields': ('account_name', 'account_type', 'bank')
+            'fields': ('account_name', 'account_type', 'kind', 'bank')
         }),
         ('Financial Information', {
             'fields': ('total',)
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Account',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('account_type', models.CharField(max_length=30)),
+                ('bank', models.CharField(max_length=30)),
+                ('total', models.FloatField(default=0.0)),
+                ('account_name', models.CharField(max_length=30)),
+                ('owner', models.CharField(max_length=150)),
+                ('credit_limit', models.FloatField(blank=True, help_text='Credit limit for credit card accounts', null=True)),
+            ],
+        ),
+    ]
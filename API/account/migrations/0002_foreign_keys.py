@@ -0,0 +1,25 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='accounts', to='users.user'),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='owner',
+            field=models.CharField(help_text='Username of the owner (kept for the API; see user)', max_length=150),
+        ),
+    ]
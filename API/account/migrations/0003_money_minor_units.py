@@ -0,0 +1,48 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:28
+
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Round
+
+import MoneyManagement.money
+
+MINOR_UNITS = 100
+
+
+def scale_amounts(factor, precision):
+    """
+    Multiply the stored amounts by factor and round them to precision digits:
+    to whole cents, or back to major units when reversed.
+    """
+    def scaled(field):
+        # Rounding to 6 digits first drops float error, so 12.345 becomes 1235 cents like to_minor_units
+        return Round(Round(F(field) * factor, 6), precision)
+
+    def convert(apps, schema_editor):
+        Account = apps.get_model('account', 'Account')
+        Account.objects.update(
+            total=scaled('total'),
+            credit_limit=scaled('credit_limit'),
+        )
+    return convert
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(scale_amounts(MINOR_UNITS, 0), scale_amounts(1 / MINOR_UNITS, 2)),
+        migrations.AlterField(
+            model_name='account',
+            name='credit_limit',
+            field=MoneyManagement.money.MoneyField(blank=True, help_text='Credit limit for credit card accounts, stored in cents', null=True),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='total',
+            field=MoneyManagement.money.MoneyField(default=0, help_text='Balance, stored in cents'),
+        ),
+    ]
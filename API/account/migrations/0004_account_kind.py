@@ -0,0 +1,45 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+# Mapping of account.models.account_kind when this migration was written
+KIND_ACCOUNT_TYPES = {
+    'credit': {'Crédito', 'Credit Card', 'Credit'},
+    'loan': {'Loan'},
+    'mortgage': {'Mortgage'},
+}
+
+
+def account_kind(account_type):
+    normalized_type = (account_type or '').replace(' Account', '').strip()
+    for kind, account_types in KIND_ACCOUNT_TYPES.items():
+        if normalized_type in account_types:
+            return kind
+    return 'asset'
+
+
+def backfill_kinds(apps, schema_editor):
+    """Set the kind of existing accounts, with one UPDATE per distinct account type."""
+    Account = apps.get_model('account', 'Account')
+    for account_type in Account.objects.order_by().values_list('account_type', flat=True).distinct():
+        Account.objects.filter(account_type=account_type).update(kind=account_kind(account_type))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_money_minor_units'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='kind',
+            field=models.CharField(choices=[('asset', 'Asset'), ('credit', 'Credit card'), ('loan', 'Loan'), ('mortgage', 'Mortgage')], default='asset', editable=False, max_length=10),
+        ),
+        migrations.RunPython(backfill_kinds, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['owner', 'kind'], name='account_owner_kind_idx'),
+        ),
+    ]
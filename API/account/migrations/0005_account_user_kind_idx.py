@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_account_kind'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='account',
+            name='account_owner_kind_idx',
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='owner',
+            field=models.CharField(help_text='Username the account was created with (kept for the API; see user)', max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['user', 'kind'], name='account_user_kind_idx'),
+        ),
+    ]
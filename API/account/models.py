@@ -1,4 +1,74 @@
 from django.db import models
+from django.db.models import Case, F, Q, Sum, When
+
+from MoneyManagement.money import Money, MoneyField
+
+# Account kinds, derived from the free-form account_type (see account_kind)
+ACCOUNT_KINDS = [
+    ('asset', 'Asset'),
+    ('credit', 'Credit card'),
+    ('loan', 'Loan'),
+    ('mortgage', 'Mortgage'),
+]
+LIABILITY_KINDS = ('credit', 'loan', 'mortgage')
+
+# Normalized account types (without a trailing " Account") of each liability kind
+KIND_ACCOUNT_TYPES = {
+    'credit': {'Crédito', 'Credit Card', 'Credit'},
+    'loan': {'Loan'},
+    'mortgage': {'Mortgage'},
+}
+
+
+def account_kind(account_type: str) -> str:
+    """Kind of an account type: 'Credit Card Account' and 'Crédito' are 'credit', unknown types are 'asset'."""
+    normalized_type = (account_type or '').replace(' Account', '').strip()
+    for kind, account_types in KIND_ACCOUNT_TYPES.items():
+        if normalized_type in account_types:
+            return kind
+    return 'asset'
+
+
+class AccountQuerySet(models.QuerySet):
+    """Net worth and liability queries computed by the database from the kind column."""
+    
+    def liabilities(self):
+        return self.filter(kind__in=LIABILITY_KINDS)
+    
+    def assets(self):
+        return self.filter(kind='asset')
+    
+    def with_net_worth_value(self):
+        """
+        Annotate net_worth_amount, the same value as the Account.net_worth_value property.
+        
+        The annotation can't reuse the property's name: Django can't set it on the instances.
+        """
+        return self.annotate(net_worth_amount=Case(
+            When(Q(kind='credit') & Q(credit_limit__isnull=False) & ~Q(credit_limit=0), then=F('total') - F('credit_limit')),
+            When(kind__in=LIABILITY_KINDS, then=-F('total')),
+            default=F('total'),
+            output_field=MoneyField(),
+        ))
+    
+    def net_worth(self) -> dict:
+        """
+        Sum the accounts' contributions to net worth in one query.
+        
+        Returns:
+            Dictionary with ``assets``, ``liabilities`` (negative) and ``net_worth``
+        """
+        totals = self.with_net_worth_value().aggregate(
+            assets=Sum('net_worth_amount', filter=Q(kind='asset')),
+            liabilities=Sum('net_worth_amount', filter=Q(kind__in=LIABILITY_KINDS)),
+        )
+        assets = totals['assets'] or Money(0)
+        liabilities = totals['liabilities'] or Money(0)
+        return {
+            'assets': assets,
+            'liabilities': liabilities,
+            'net_worth': Money(assets.minor_units + liabilities.minor_units),
+        }
 
 
 class Account(models.Model):
@@ -10,27 +80,58 @@ class Account(models.Model):
     id = models.AutoField(primary_key=True)
     account_type = models.CharField(max_length=30)
     bank = models.CharField(max_length=30)
-    total = models.FloatField(default=0.0)
+    total = MoneyField(default=0, help_text="Balance, stored in cents")
     account_name = models.CharField(max_length=30)
-    owner = models.CharField(max_length=150)
+    owner = models.CharField(max_length=150, help_text="Username the account was created with (kept for the API; see user)")
+    
+    # Foreign key behind owner, filled in on save and used by every read (see transaction/references.py)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, null=True, blank=True, related_name='accounts')
     
     # Credit card specific fields
-    credit_limit = models.FloatField(null=True, blank=True, help_text="Credit limit for credit card accounts")
+    credit_limit = MoneyField(null=True, blank=True, help_text="Credit limit for credit card accounts, stored in cents")
+    
+    # Normalized account_type, set on save for SQL queries; the properties below derive it from account_type
+    kind = models.CharField(max_length=10, choices=ACCOUNT_KINDS, default='asset', editable=False)
+    
+    objects = AccountQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'kind'], name='account_user_kind_idx'),
+        ]
     
     def __str__(self):
         return f"{self.account_name} ({self.bank})"
     
+    def save(self, *args, **kwargs):
+        from transaction.references import resolve_account_references
+        
+        resolve_account_references([self])
+        self.kind = account_kind(self.account_type)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = list(set(update_fields) | {'user', 'kind'})
+        super().save(*args, **kwargs)
+    
+    @property
+    def owner_username(self):
+        """Current username of the owner (owner keeps the name the account was created with)."""
+        return self.user.username if self.user_id else self.owner
+    
+    @property
+    def current_kind(self):
+        """Kind of the current account_type, also before an unsaved account_type change reaches kind."""
+        return account_kind(self.account_type)
+    
     @property
     def is_credit_card(self):
         """Check if this is a credit card account."""
-        normalized_type = self.account_type.replace(' Account', '').strip()
-        return normalized_type in ['Crédito', 'Credit Card', 'Credit']
+        return self.current_kind == 'credit'
     
     @property
     def is_liability(self):
         """Check if this account represents a liability (debt)."""
-        normalized_type = self.account_type.replace(' Account', '').strip()
-        return normalized_type in ['Crédito', 'Credit Card', 'Credit', 'Loan', 'Mortgage']
+        return self.current_kind in LIABILITY_KINDS
     
     @property
     def net_worth_value(self):
@@ -38,10 +139,12 @@ class Account(models.Model):
         Get the value this account contributes to net worth.
         For assets: returns positive balance
         For liabilities: returns negative debt amount
+        
+        AccountQuerySet.with_net_worth_value() computes the same in SQL.
         """
         if self.is_credit_card and self.credit_limit:
             # Credit card: debt = credit_limit - available_credit
-            debt = self.credit_limit - self.total
+            debt = Money(self.credit_limit.minor_units - self.total.minor_units)
             return -debt  # Negative because it's debt
         elif self.is_liability:
             # Loans/Mortgages: subtract what you owe
@@ -61,5 +164,5 @@ class Account(models.Model):
     def used_credit(self):
         """Get used credit amount for credit cards."""
         if self.is_credit_card and self.credit_limit:
-            return self.credit_limit - self.total
+            return Money(self.credit_limit.minor_units - self.total.minor_units)
         return None
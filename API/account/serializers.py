@@ -11,6 +11,10 @@ class AccountSerializer(serializers.ModelSerializer):
         fields (tuple): The fields to include in the serialized representation.
     """
 
+    # Stored in cents (MoneyField); exposed as decimal amounts
+    total = serializers.FloatField(required=False, default=0.0)
+    credit_limit = serializers.FloatField(required=False, allow_null=True)
+
     class Meta:
         """
         Specifies the metadata for the AccountSerializer class.
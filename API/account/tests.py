@@ -1,3 +1,241 @@
-from django.test import TestCase
+import json
+import pickle
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from MoneyManagement.money import Money, MoneyField, to_minor_units
+from MoneyManagement.testing import MigrationTestCase
+from users.models import User
+
+from .models import Account, account_kind
+
+
+class ToMinorUnitsTests(SimpleTestCase):
+
+    def test_rounds_half_up(self):
+        self.assertEqual(to_minor_units(12.345), 1235)
+        self.assertEqual(to_minor_units('0.005'), 1)
+        self.assertEqual(to_minor_units(-0.005), -1)
+        self.assertEqual(to_minor_units(0.1 + 0.2), 30)
+        self.assertEqual(to_minor_units(Decimal('19.994')), 1999)
+        self.assertEqual(to_minor_units(7), 700)
+
+    def test_exponent(self):
+        self.assertEqual(to_minor_units(1.5, exponent=0), 2)
+        self.assertEqual(to_minor_units(1.2345, exponent=3), 1235)
+        self.assertEqual(to_minor_units(Money(1999), exponent=3), 19990)
+
+    def test_invalid_amounts(self):
+        self.assertIsNone(to_minor_units(None))
+        self.assertIsNone(to_minor_units(''))
+        for value in ('abc', 'nan', float('inf')):
+            with self.assertRaises(ValueError):
+                to_minor_units(value)
+
+
+class MoneyTests(SimpleTestCase):
+
+    def test_value(self):
+        money = Money(1999)
+
+        self.assertEqual(money, 19.99)
+        self.assertEqual(money.minor_units, 1999)
+        self.assertEqual(money.decimal, Decimal('19.99'))
+        self.assertEqual(Money.from_amount('0.125').minor_units, 13)
+
+    def test_serialization(self):
+        money = Money(-1050)
+
+        self.assertEqual(json.dumps({'total': money}), '{"total": -10.5}')
+        self.assertEqual(repr(money), '-10.5')
+        restored = pickle.loads(pickle.dumps(money))
+        self.assertEqual((restored, restored.minor_units), (-10.5, -1050))
+
+
+class MoneyFieldTests(TestCase):
+
+    def account(self, **fields):
+        values = {'account_name': 'Checking', 'account_type': 'Debit', 'bank': 'BBVA', 'owner': 'alice'}
+        values.update(fields)
+        return Account(**values)
+
+    def test_assignments_are_rounded_to_cents(self):
+        account = self.account(total=0.1)
+        for _ in range(9):
+            account.total += 0.1
+
+        self.assertIsInstance(account.total, Money)
+        self.assertEqual(account.total.minor_units, 100)
+        account.total = '12.345'
+        self.assertEqual(account.total, 12.35)
+
+    def test_round_trip_and_exact_sums(self):
+        for _ in range(10):
+            self.account(total=0.1).save()
+
+        self.assertEqual(Account.objects.first().total.minor_units, 10)
+        self.assertEqual(Account.objects.aggregate(total=Sum('total'))['total'], 1.0)
+        self.assertEqual(Account.objects.filter(total=0.1).count(), 10)
+
+    def test_invalid_values(self):
+        with self.assertRaises(ValidationError):
+            self.account(total='abc')
+        self.assertIsNone(self.account(credit_limit=None).credit_limit)
+
+    def test_deconstruct_keeps_a_custom_exponent(self):
+        self.assertNotIn('exponent', MoneyField().deconstruct()[3])
+        self.assertEqual(MoneyField(exponent=3).deconstruct()[3]['exponent'], 3)
+
+
+class MoneyMinorUnitsMigrationTests(MigrationTestCase):
+
+    migrate_from = [('account', '0002_foreign_keys')]
+    migrate_to = [('account', '0003_money_minor_units')]
+
+    def test_amounts_are_stored_in_cents(self):
+        Account = self.old_apps.get_model('account', 'Account')
+        Account.objects.create(account_name='A', account_type='Credit', bank='B', owner='alice', total=12.345,
+                               credit_limit=5000.1)
+        Account.objects.create(account_name='B', account_type='Debit', bank='B', owner='alice', total=-0.1)
+
+        apps = self.migrate()
+
+        accounts = apps.get_model('account', 'Account').objects.order_by('account_name')
+        self.assertEqual(
+            [(account.total.minor_units, account.credit_limit) for account in accounts],
+            [(1235, 5000.1), (-10, None)],
+        )
+
+
+class AccountKindTests(SimpleTestCase):
+
+    def test_account_types(self):
+        self.assertEqual(account_kind('Credit Card Account'), 'credit')
+        self.assertEqual(account_kind('Crédito'), 'credit')
+        self.assertEqual(account_kind(' Loan '), 'loan')
+        self.assertEqual(account_kind('Mortgage Account'), 'mortgage')
+        self.assertEqual(account_kind('Debit Card'), 'asset')
+        self.assertEqual(account_kind('credit card'), 'asset')
+        self.assertEqual(account_kind(None), 'asset')
+
+
+class NetWorthTests(TestCase):
+
+    def setUp(self):
+        def account(account_type, total, credit_limit=None, owner='alice'):
+            return Account.objects.create(
+                account_name=account_type[:30], account_type=account_type, bank='Bank', owner=owner,
+                total=total, credit_limit=credit_limit
+            )
+
+        account('Debit', 1000.10)
+        account('Savings Account', 250)
+        # Card with 1,500.00 available of 5,000.00: 3,500.00 of debt
+        account('Credit Card Account', 1500, credit_limit=5000)
+        # Card without a limit: total is the debt
+        account('Crédito', 200.05, credit_limit=0)
+        account('Loan', 3000)
+        account('Mortgage Account', 0.01)
+        account('Debit', 999, owner='bob')
+
+    def test_kind_is_set_on_save(self):
+        account = Account.objects.get(account_type='Debit', owner='alice')
+        self.assertEqual(account.kind, 'asset')
+
+        account.account_type = 'Loan Account'
+        account.save(update_fields=['account_type'])
+        account.refresh_from_db()
+        self.assertEqual(account.kind, 'loan')
+
+    def test_properties_follow_an_unsaved_account_type(self):
+        account = Account.objects.get(account_type='Debit', owner='alice')
+        account.account_type = 'Loan'
+
+        self.assertTrue(account.is_liability)
+        self.assertEqual(account.net_worth_value, -account.total)
+        self.assertTrue(Account(account_type='Crédito').is_credit_card)
+
+    def test_sql_matches_the_property(self):
+        accounts = Account.objects.filter(owner='alice')
+
+        for account in accounts.with_net_worth_value():
+            self.assertEqual(account.net_worth_amount, account.net_worth_value)
+
+    def test_net_worth(self):
+        accounts = Account.objects.filter(owner='alice')
+        totals = accounts.net_worth()
+
+        self.assertEqual(totals['assets'].minor_units, 125010)
+        self.assertEqual(totals['liabilities'].minor_units, -(350000 + 20005 + 300000 + 1))
+        self.assertEqual(totals['net_worth'].minor_units, 125010 - 670006)
+        self.assertEqual(
+            totals['net_worth'].minor_units,
+            sum(to_minor_units(account.net_worth_value) for account in accounts),
+        )
+        self.assertEqual(accounts.liabilities().count(), 4)
+        self.assertEqual(accounts.assets().count(), 2)
+
+    def test_no_accounts(self):
+        totals = Account.objects.filter(owner='nobody').net_worth()
+
+        self.assertEqual(totals, {'assets': 0, 'liabilities': 0, 'net_worth': 0})
+
+
+class AccountPatchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.account = Account.objects.create(
+            account_name='Card', account_type='Debit', bank='Bank', owner='alice', total=100
+        )
+
+    def patch(self, **data):
+        response = self.client.patch(
+            reverse('account_details', args=['alice', self.account.id]),
+            data=json.dumps(data), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.account.refresh_from_db()
+        return response.json()
+
+    def test_only_editable_fields_are_changed(self):
+        bob = User.objects.create(username='bob')
+        self.patch(bank='Other', id=999, user_id=bob.id, kind='loan')
+
+        self.assertEqual(self.account.bank, 'Other')
+        self.assertEqual(self.account.user_id, self.user.id)
+        self.assertEqual(self.account.kind, 'asset')
+        self.assertTrue(Account.objects.filter(id=self.account.id).exists())
+
+    def test_credit_limit_change_uses_the_patched_account_type(self):
+        Account.objects.filter(id=self.account.id).update(credit_limit=500)
+
+        body = self.patch(account_type='Credit Card Account', credit_limit=800)
+
+        # 400.00 of the 500.00 limit was used, and stays used under the new limit
+        self.assertEqual(self.account.total.minor_units, 40000)
+        self.assertEqual(self.account.kind, 'credit')
+        self.assertEqual(body['updated_account']['kind'], 'credit')
+
+
+class AccountKindMigrationTests(MigrationTestCase):
+
+    migrate_from = [('account', '0003_money_minor_units')]
+    migrate_to = [('account', '0004_account_kind')]
+
+    def test_kinds_are_backfilled(self):
+        Account = self.old_apps.get_model('account', 'Account')
+        for account_type in ('Credit Card Account', 'Debit', 'Loan', 'Mortgage', 'Crédito', 'Debit'):
+            Account.objects.create(account_name=account_type, account_type=account_type, bank='B', owner='alice')
+
+        apps = self.migrate()
+
+        self.assertEqual(
+            sorted(apps.get_model('account', 'Account').objects.values_list('account_type', 'kind')),
+            [('Credit Card Account', 'credit'), ('Crédito', 'credit'), ('Debit', 'asset'), ('Debit', 'asset'),
+             ('Loan', 'loan'), ('Mortgage', 'mortgage')],
+        )
@@ -13,4 +13,9 @@ urlpatterns = [
         views.AccountDelete.as_view(),
         name="account_delete",
     ),
+    path(
+        "net-worth/<str:user>/",
+        views.AccountNetWorth.as_view(),
+        name="account_net_worth",
+    ),
 ]
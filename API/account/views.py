@@ -4,6 +4,9 @@ from rest_framework import generics
 from .models import Account
 from .serializers import AccountSerializer
 
+# Fields a PATCH may change; the id, the user key and the kind are managed by the model
+PATCHABLE_FIELDS = ('account_name', 'account_type', 'bank', 'total', 'owner', 'credit_limit')
+
 
 # Create your views here.
 class AccountCreate(generics.CreateAPIView):
@@ -30,6 +33,7 @@ class AccountCreate(generics.CreateAPIView):
                 "total": account.total,
                 "owner": account.owner,
                 "credit_limit": account.credit_limit,
+                "kind": account.kind,
                 "status": "Account saved"
             }
             status = 201
@@ -51,7 +55,7 @@ class AccountOps(generics.RetrieveUpdateAPIView):
     def get(self, request: HttpRequest, user: str, id: str) -> HttpResponse:
         try:
             # Get accounts for user
-            accounts = Account.objects.filter(owner=user)
+            accounts = Account.objects.filter(user__username=user).select_related('user')
             response = []
             for account in accounts:
                 response.append({
@@ -60,8 +64,9 @@ class AccountOps(generics.RetrieveUpdateAPIView):
                     "account_type": account.account_type,
                     "bank": account.bank,
                     "total": account.total,
-                    "owner": account.owner,
-                    "credit_limit": account.credit_limit
+                    "owner": account.owner_username,
+                    "credit_limit": account.credit_limit,
+                    "kind": account.kind
                 })
         except Exception as e:
             response = {"error": "Failed to get accounts", "details": str(e)}
@@ -75,11 +80,14 @@ class AccountOps(generics.RetrieveUpdateAPIView):
     def patch(self, request: HttpRequest, user: str, id: str) -> HttpResponse:
         data = json.loads(request.body)
         try:
-            account = Account.objects.get(owner=user, id=id)
+            account = Account.objects.select_related('user').get(user__username=user, id=id)
+            data = {key: value for key, value in data.items() if key in PATCHABLE_FIELDS}
+            if 'account_type' in data:
+                account.account_type = data['account_type']
             
             # For credit cards, if credit_limit is being changed, recalculate available credit
             # to preserve the used credit amount
-            is_credit_card = account.account_type in ['Crédito', 'Credit Card', 'Credit']
+            is_credit_card = account.is_credit_card
             old_credit_limit = account.credit_limit
             new_credit_limit = data.get('credit_limit')
             
@@ -92,8 +100,10 @@ class AccountOps(generics.RetrieveUpdateAPIView):
                 data['total'] = max(0, new_available_credit)  # Ensure non-negative
             
             for key, value in data.items():
-                if hasattr(account, key):
-                    setattr(account, key, value)
+                setattr(account, key, value)
+            if 'owner' in data:
+                # Moved to another user: resolved again from the new username
+                account.user = None
             account.save()
             response = {
                 "success": "Account updated successfully",
@@ -103,8 +113,9 @@ class AccountOps(generics.RetrieveUpdateAPIView):
                     "account_type": account.account_type,
                     "bank": account.bank,
                     "total": account.total,
-                    "owner": account.owner,
-                    "credit_limit": account.credit_limit
+                    "owner": account.owner_username,
+                    "credit_limit": account.credit_limit,
+                    "kind": account.kind
                 }
             }
         except Account.DoesNotExist:
@@ -125,7 +136,7 @@ class AccountDelete(generics.DestroyAPIView):
 
     def delete(self, request: HttpRequest, user: str, id: str) -> HttpResponse:
         try:
-            account = Account.objects.get(owner=user, id=id)
+            account = Account.objects.get(user__username=user, id=id)
             account.delete()
             response = {"success": "Account deleted successfully"}
             status = 200
@@ -141,3 +152,25 @@ class AccountDelete(generics.DestroyAPIView):
             status=status,
             content_type="application/json",
         )
+
+
+class AccountNetWorth(generics.RetrieveAPIView):
+    queryset = Account.objects.all()
+    serializer_class = AccountSerializer
+
+    def get(self, request: HttpRequest, user: str) -> HttpResponse:
+        try:
+            # Summed by the database from the indexed kind column
+            accounts = Account.objects.filter(user__username=user)
+            response = accounts.net_worth()
+            response["liability_accounts"] = accounts.liabilities().count()
+            status = 200
+        except Exception as e:
+            response = {"error": "Failed to get net worth", "details": str(e)}
+            status = 400
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=status,
+            content_type="application/json",
+        )
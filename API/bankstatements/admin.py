@@ -1,5 +1,9 @@
-from django.contrib import admin
-from .models import BankStatement
+from django.contrib import admin, messages
+from .models import (
+    BankStatement, BankStatementBatch, StatementBlob, StatementFileDeletion, StatementProcessingMetrics
+)
+from .metrics import summarize_metrics
+from .reprocessing import queue_statement_reprocessing
 
 
 @admin.register(BankStatement)
@@ -33,6 +37,7 @@ class BankStatementAdmin(admin.ModelAdmin):
     
     readonly_fields = [
         'id',
+        'blob',
         'file_size',
         'upload_date',
         'file_size_display'
@@ -43,7 +48,7 @@ class BankStatementAdmin(admin.ModelAdmin):
             'fields': ('id', 'user_id', 'original_filename', 'file_size_display', 'upload_date')
         }),
         ('File Information', {
-            'fields': ('file', 'file_size')
+            'fields': ('blob', 'file', 'file_size', 'batch')
         }),
         ('Processing Status', {
             'fields': ('processed', 'processing_status', 'error_message')
@@ -52,7 +57,176 @@ class BankStatementAdmin(admin.ModelAdmin):
     
     ordering = ['-upload_date']
     
+    actions = ['reprocess_statements']
+    
     def file_size_display(self, obj):
         """Display human-readable file size."""
         return obj.get_file_size_display()
-    file_size_display.short_description = 'File Size'
\ No newline at end of file
+    file_size_display.short_description = 'File Size'
+    
+    @admin.action(description='Reprocess selected statements (smallest first, rate-limited)')
+    def reprocess_statements(self, request, queryset):
+        """Queue the selected statements for reprocessing from their stored PDFs."""
+        result = queue_statement_reprocessing(queryset)
+        skipped = result['skipped']
+        message = f"Queued {result['queued']} statement(s) for reprocessing."
+        reasons = []
+        if skipped['processing']:
+            reasons.append(f"{skipped['processing']} already processing")
+        if skipped['no_pdf']:
+            reasons.append(f"{skipped['no_pdf']} without a stored PDF")
+        if skipped['committed']:
+            reasons.append(f"{skipped['committed']} with committed transactions")
+        if reasons:
+            message += f" Skipped {', '.join(reasons)}."
+        self.message_user(request, message, messages.SUCCESS if result['queued'] else messages.WARNING)
+
+
+@admin.register(BankStatementBatch)
+class BankStatementBatchAdmin(admin.ModelAdmin):
+    """
+    Admin interface for BankStatementBatch model.
+    """
+    
+    list_display = [
+        'id',
+        'user_id',
+        'created_at',
+        'total_files'
+    ]
+    
+    list_filter = [
+        'created_at',
+        'user_id'
+    ]
+    
+    readonly_fields = [
+        'id',
+        'created_at',
+        'rejected_files'
+    ]
+    
+    ordering = ['-created_at']
+
+
+
+@admin.register(StatementBlob)
+class StatementBlobAdmin(admin.ModelAdmin):
+    """
+    Admin interface for StatementBlob model.
+    """
+    
+    list_display = [
+        'id',
+        'sha256',
+        'size',
+        'stored_size',
+        'compressed',
+        'ref_count',
+        'created_at',
+        'unreferenced_at'
+    ]
+    
+    list_filter = [
+        'compressed',
+        'created_at'
+    ]
+    
+    search_fields = [
+        'sha256'
+    ]
+    
+    readonly_fields = [
+        'id',
+        'sha256',
+        'file',
+        'size',
+        'stored_size',
+        'compressed',
+        'ref_count',
+        'created_at',
+        'unreferenced_at'
+    ]
+    
+    ordering = ['-created_at']
+
+
+@admin.register(StatementFileDeletion)
+class StatementFileDeletionAdmin(admin.ModelAdmin):
+    """
+    Admin interface for StatementFileDeletion model.
+    """
+    
+    list_display = [
+        'id',
+        'name',
+        'size',
+        'requested_at'
+    ]
+    
+    search_fields = [
+        'name'
+    ]
+    
+    readonly_fields = [
+        'id',
+        'name',
+        'size',
+        'requested_at'
+    ]
+    
+    ordering = ['requested_at']
+
+
+@admin.register(StatementProcessingMetrics)
+class StatementProcessingMetricsAdmin(admin.ModelAdmin):
+    """
+    Admin interface for StatementProcessingMetrics model.
+    
+    The changelist shows p50/p95 latency and token figures of the filtered
+    rows, grouped by model and by page count, above the list.
+    """
+    
+    list_display = [
+        'statement',
+        'backend',
+        'model_name',
+        'input_mode',
+        'page_count',
+        'succeeded',
+        'total_seconds',
+        'generation_seconds',
+        'total_tokens',
+        'created_at'
+    ]
+    
+    list_filter = [
+        'backend',
+        'model_name',
+        'input_mode',
+        'succeeded',
+        'created_at'
+    ]
+    
+    search_fields = [
+        'statement__user_id',
+        'statement__original_filename'
+    ]
+    
+    list_select_related = ['statement']
+    
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        """Add the aggregate figures of the filtered rows to the changelist."""
+        response = super().changelist_view(request, extra_context=extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            response.context_data['metrics_summary'] = summarize_metrics(changelist.queryset)
+        return response
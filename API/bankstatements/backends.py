@@ -0,0 +1,158 @@
+"""
+Pluggable extraction backends for bank statement processing.
+
+The backend used after the local parser stage is chosen with the
+BANK_STATEMENT_EXTRACTION_BACKEND setting:
+
+- 'gemini': Google AI Studio (the default). When FAKE_GEMINI_URL is set, the
+  requests go to the local fake Gemini server instead (see fake_gemini.py).
+- 'local': Rule-based parsers only; statements no template understands fail.
+- 'record': Gemini, saving every result under BANK_STATEMENT_RECORDINGS_DIR.
+- 'replay': Results previously saved by 'record', keyed by the PDF contents.
+"""
+import os
+import json
+import hashlib
+import logging
+from typing import Callable, Dict, Any, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TransactionCallback = Callable[[Dict[str, Any]], None]
+
+
+def file_sha256(file_path: str) -> str:
+    """Hash a file in chunks without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def recording_file_path(recordings_dir: str, sha256: str) -> str:
+    """Path of the recorded extraction result of the PDF with this SHA-256."""
+    return os.path.join(str(recordings_dir), f"{sha256}.json")
+
+
+def error_result(error: str) -> Dict[str, Any]:
+    """Build an extraction result that carries only an error."""
+    return {
+        'transactions': [],
+        'account_name': None,
+        'account_type': None,
+        'statement_period': None,
+        'initial_balance': None,
+        'raw_response': None,
+        'error': error
+    }
+
+
+class ExtractionBackend:
+    """
+    Interface for turning a bank statement PDF into extracted transactions.
+
+    ``extract`` returns a dictionary in the shape documented on
+    ``process_bank_statement_with_ai``. Errors are reported in the ``error``
+    key instead of being raised. Backends that can stream pass each
+    transaction to ``on_transaction`` as soon as it is extracted; others
+    ignore it.
+    """
+
+    name = 'base'
+
+    def extract(self, pdf_file_path: str, on_transaction: Optional[TransactionCallback] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class GeminiBackend(ExtractionBackend):
+    """Extract with Google AI Studio, in parallel page chunks for long statements."""
+
+    name = 'gemini'
+
+    def __init__(self, client=None):
+        self.client = client
+
+    def extract(self, pdf_file_path: str, on_transaction: Optional[TransactionCallback] = None) -> Dict[str, Any]:
+        from .services import process_bank_statement_in_chunks
+        return process_bank_statement_in_chunks(pdf_file_path, client=self.client, on_transaction=on_transaction)
+
+
+class LocalParserBackend(ExtractionBackend):
+    """Extract with the rule-based parsers only."""
+
+    name = 'local'
+
+    def extract(self, pdf_file_path: str, on_transaction: Optional[TransactionCallback] = None) -> Dict[str, Any]:
+        from .services import extract_transactions_locally
+        result = extract_transactions_locally(pdf_file_path, force=True)
+        if result is None:
+            return error_result('No local parser matched this statement with high confidence')
+        return result
+
+
+class RecordReplayBackend(ExtractionBackend):
+    """
+    Record results of another backend to disk, or replay them.
+
+    Recordings are JSON files named after the SHA-256 of the PDF, so the same
+    statement always maps to the same recording regardless of its filename.
+
+    Args:
+        recordings_dir: Directory holding the recordings
+        mode: 'record' or 'replay'
+        backend: Backend whose results are recorded (only used in record mode)
+    """
+
+    def __init__(self, recordings_dir: str, mode: str = 'replay', backend: ExtractionBackend = None):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Invalid record/replay mode: {mode}")
+        self.recordings_dir = str(recordings_dir)
+        self.mode = mode
+        self.name = mode
+        self.backend = backend or GeminiBackend()
+
+    def recording_path(self, pdf_file_path: str) -> str:
+        return recording_file_path(self.recordings_dir, file_sha256(pdf_file_path))
+
+    def extract(self, pdf_file_path: str, on_transaction: Optional[TransactionCallback] = None) -> Dict[str, Any]:
+        recording_path = self.recording_path(pdf_file_path)
+
+        if self.mode == 'replay':
+            if not os.path.exists(recording_path):
+                return error_result(f'No recording found for this statement ({os.path.basename(recording_path)})')
+            with open(recording_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        result = self.backend.extract(pdf_file_path, on_transaction=on_transaction)
+        if not result.get('error'):
+            os.makedirs(self.recordings_dir, exist_ok=True)
+            with open(recording_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            logger.info(f"Recorded extraction result to {recording_path}")
+        return result
+
+
+def get_extraction_backend() -> ExtractionBackend:
+    """Build the extraction backend selected by the BANK_STATEMENT_EXTRACTION_BACKEND setting."""
+    backend_name = getattr(settings, 'BANK_STATEMENT_EXTRACTION_BACKEND', 'gemini')
+
+    client = None
+    fake_gemini_url = getattr(settings, 'FAKE_GEMINI_URL', None)
+    if fake_gemini_url:
+        from .fake_gemini import FakeGeminiClient
+        client = FakeGeminiClient(fake_gemini_url)
+
+    if backend_name == 'gemini':
+        return GeminiBackend(client=client)
+    if backend_name == 'local':
+        return LocalParserBackend()
+    if backend_name in ('record', 'replay'):
+        recordings_dir = getattr(settings, 'BANK_STATEMENT_RECORDINGS_DIR', None)
+        if not recordings_dir:
+            raise ValueError("BANK_STATEMENT_RECORDINGS_DIR must be set to use the record/replay backend")
+        return RecordReplayBackend(recordings_dir, mode=backend_name, backend=GeminiBackend(client=client))
+
+    raise ValueError(f"Unknown bank statement extraction backend: {backend_name}")
@@ -0,0 +1,235 @@
+"""
+Statement period coverage.
+
+Once a statement's transactions are committed to an account, the statement
+records its period (``period_start``/``period_end``) and the account
+(``account_id``). ``PeriodIndex`` merges those periods, per user and account,
+into disjoint date intervals. Before a new statement is sent to the
+extraction backend, its period is read from the PDF text layer and looked up:
+
+- fully covered: extraction is skipped and the statement completes with no rows
+- partly covered: only the pages whose rows fall in uncovered dates are sent
+  to the backend, and rows dated inside covered intervals are dropped
+
+The account of a new statement is the one given at upload or, failing that,
+the account of an earlier statement with the same extracted account name.
+"""
+import bisect
+import logging
+from datetime import date, timedelta
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.dateparse import parse_date
+
+from .parsers import extract_pdf_text, scan_statement_text
+
+logger = logging.getLogger(__name__)
+
+ONE_DAY = timedelta(days=1)
+
+
+class PeriodIndex:
+    """
+    Sorted, merged set of covered date intervals (both ends inclusive).
+
+    Adjacent intervals are merged too, so January and February statements
+    cover January 1st to the end of February without a gap.
+
+    Args:
+        intervals: (start, end) date pairs in any order
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[date, date]]):
+        merged = []
+        for start, end in sorted(intervals):
+            if start > end:
+                continue
+            if merged and start <= merged[-1][1] + ONE_DAY:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.intervals = [(start, end) for start, end in merged]
+        self._starts = [start for start, _ in self.intervals]
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def contains(self, day: date) -> bool:
+        """Whether a date falls inside a covered interval."""
+        position = bisect.bisect_right(self._starts, day) - 1
+        return position >= 0 and day <= self.intervals[position][1]
+
+    def uncovered(self, start: date, end: date) -> List[Tuple[date, date]]:
+        """Sub-intervals of [start, end] that no covered interval overlaps."""
+        gaps = []
+        cursor = start
+        position = max(0, bisect.bisect_right(self._starts, start) - 1)
+        for covered_start, covered_end in self.intervals[position:]:
+            if covered_start > end:
+                break
+            if covered_end < cursor:
+                continue
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - ONE_DAY))
+            cursor = covered_end + ONE_DAY
+            if cursor > end:
+                break
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+
+def build_period_index(owner_id: int, account_id: str, exclude_statement_id: Optional[int] = None) -> PeriodIndex:
+    """
+    Build the index of periods already imported into an account.
+
+    Only statements with at least one committed transaction count as imported.
+
+    Args:
+        owner_id: Primary key of the user the statements belong to
+        account_id: Account the statements were committed to
+        exclude_statement_id: Statement to leave out (the one being checked)
+    """
+    from .models import BankStatement
+
+    statements = BankStatement.objects.filter(
+        owner_id=owner_id,
+        account_id=account_id,
+        period_start__isnull=False,
+        period_end__isnull=False,
+        staged_transactions__committed=True,
+    )
+    if exclude_statement_id is not None:
+        statements = statements.exclude(id=exclude_statement_id)
+    return PeriodIndex(statements.values_list('period_start', 'period_end').distinct())
+
+
+def resolve_statement_account(bank_statement, account_name: Optional[str]) -> Optional[str]:
+    """Account of a statement: the one given at upload, or the last one used for the same account name."""
+    from .models import BankStatement
+
+    if bank_statement.account_id:
+        return bank_statement.account_id
+    if not account_name or bank_statement.owner_id is None:
+        return None
+    return BankStatement.objects.filter(
+        owner_id=bank_statement.owner_id,
+        account_id__isnull=False,
+        extracted_summary__account_name=account_name,
+    ).exclude(id=bank_statement.id).order_by('-period_end').values_list('account_id', flat=True).first()
+
+
+def _uncovered_page_range(page_dates: List[List[str]], index: PeriodIndex) -> Optional[Tuple[int, int]]:
+    """Smallest page range holding every row dated outside the covered intervals."""
+    pages = [
+        page_number for page_number, dates in enumerate(page_dates)
+        if any(not index.contains(date.fromisoformat(row_date)) for row_date in dates)
+    ]
+    if not pages:
+        return None
+    return pages[0], pages[-1] + 1
+
+
+def check_statement_coverage(bank_statement, pdf_file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Compare a statement's period with the periods already imported into its account.
+
+    Args:
+        bank_statement: BankStatement about to be extracted
+        pdf_file_path: Path to its PDF
+
+    Returns:
+        None when the check does not apply (disabled, no text layer or period,
+        unknown account, nothing imported yet for the account). Otherwise a
+        dictionary with ``account_id``, ``statement_period``, ``account_name``,
+        ``uncovered`` (list of {'start', 'end'}), ``skipped`` (the period is
+        fully covered) and ``pages`` ([start, end) page range to extract, or
+        None for the whole PDF).
+    """
+    if not getattr(settings, 'BANK_STATEMENT_SKIP_COVERED_PERIODS', True):
+        return None
+
+    try:
+        page_texts = extract_pdf_text(pdf_file_path)
+        scan = scan_statement_text(page_texts)
+    except Exception as e:
+        logger.warning(f"Could not read the period of statement {bank_statement.id}: {str(e)}")
+        return None
+    if scan is None:
+        return None
+
+    account_id = resolve_statement_account(bank_statement, scan['account_name'])
+    if not account_id or bank_statement.owner_id is None:
+        return None
+    index = build_period_index(bank_statement.owner_id, account_id, exclude_statement_id=bank_statement.id)
+    if not index:
+        return None
+
+    start = date.fromisoformat(scan['statement_period']['start'])
+    end = date.fromisoformat(scan['statement_period']['end'])
+    uncovered = index.uncovered(start, end)
+
+    pages = None
+    if uncovered and uncovered != [(start, end)]:
+        page_range = _uncovered_page_range(scan['page_dates'], index)
+        if page_range is not None and page_range != (0, len(page_texts)):
+            pages = list(page_range)
+
+    coverage = {
+        'account_id': account_id,
+        'account_name': scan['account_name'],
+        'statement_period': scan['statement_period'],
+        'uncovered': [{'start': gap_start.isoformat(), 'end': gap_end.isoformat()} for gap_start, gap_end in uncovered],
+        'skipped': not uncovered,
+        'pages': pages,
+    }
+    logger.info(
+        f"Statement {bank_statement.id} period {start} - {end}: "
+        + ('already imported, skipping extraction' if not uncovered else f"{len(uncovered)} uncovered interval(s)")
+        + (f", extracting pages {pages[0] + 1}-{pages[1]}" if pages else '')
+    )
+    return coverage
+
+
+def covered_statement_result(coverage: Dict[str, Any]) -> Dict[str, Any]:
+    """Extraction result for a statement whose whole period was already imported."""
+    return {
+        'transactions': [],
+        'account_name': coverage['account_name'],
+        'account_type': None,
+        'statement_period': coverage['statement_period'],
+        'initial_balance': None,
+        'raw_response': None,
+        'coverage': dict(coverage, dropped_transactions=0),
+        'skipped': 'covered',
+        'error': None
+    }
+
+
+def apply_statement_coverage(extracted_data: Dict[str, Any], coverage: Optional[Dict[str, Any]]):
+    """
+    Drop extracted transactions dated inside already imported periods.
+
+    Undated transactions are kept. Records the coverage in the result and
+    fills in the statement period when the extraction did not return one.
+    """
+    if coverage is None or extracted_data.get('error'):
+        return
+
+    uncovered = [(date.fromisoformat(gap['start']), date.fromisoformat(gap['end'])) for gap in coverage['uncovered']]
+    kept = []
+    for transaction in extracted_data.get('transactions') or []:
+        try:
+            transaction_date = parse_date(str(transaction.get('date') or ''))
+        except ValueError:
+            transaction_date = None
+        if transaction_date is None or any(start <= transaction_date <= end for start, end in uncovered):
+            kept.append(transaction)
+    dropped = len(extracted_data.get('transactions') or []) - len(kept)
+    extracted_data['transactions'] = kept
+    extracted_data['coverage'] = dict(coverage, dropped_transactions=dropped)
+    if not isinstance(extracted_data.get('statement_period'), dict):
+        extracted_data['statement_period'] = coverage['statement_period']
+    if dropped:
+        logger.info(f"Dropped {dropped} extracted transactions from already imported periods")
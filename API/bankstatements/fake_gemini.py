@@ -0,0 +1,342 @@
+"""
+Local stand-in for the Gemini API, used to benchmark statement processing offline.
+
+``FakeGeminiServer`` is a small HTTP server that mimics the parts of the
+Gemini REST API used by ``bankstatements.services``: file upload, get_file,
+delete_file and generate_content (plain and streamed). Latency, file
+processing time and 429 (quota exceeded) responses are configurable. Streamed
+answers are sent as server-sent events, with the latency spread evenly over
+the chunks.
+
+``FakeGeminiClient`` talks to that server and exposes the same surface as the
+``google.generativeai`` module, so it can be passed as the ``client`` of
+``process_bank_statement_with_ai``.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+import logging
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAKE_RESPONSE = {
+    'transactions': [
+        {'date': '2024-01-05', 'title': 'OXXO SUC 1234', 'amount': 85.50,
+         'transaction_type': 'Expense', 'category': 'Food and drinks'},
+        {'date': '2024-01-15', 'title': 'DEPOSITO NOMINA', 'amount': 15000.00,
+         'transaction_type': 'Income', 'category': 'Salary'},
+        {'date': '2024-01-20', 'title': 'CFE SUMINISTRADOR', 'amount': 640.00,
+         'transaction_type': 'Expense', 'category': 'Bills and utilities'},
+    ],
+    'account_name': 'Fake Bank Checking',
+    'account_type': 'Checking Account',
+    'statement_period': {'start': '2024-01-01', 'end': '2024-01-31'},
+    'initial_balance': 1000.00,
+}
+
+
+class FakeGeminiServer:
+    """
+    Threaded HTTP server mimicking the Gemini file and generate_content endpoints.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        latency: Seconds generate_content takes to answer
+        jitter: Random extra latency, uniformly distributed in [0, jitter] seconds
+        processing_delay: Seconds an uploaded file stays in the PROCESSING state
+        error_rate: Probability (0.0 - 1.0) that generate_content answers 429
+        response_data: JSON object returned as the model output
+        stream_chunk_size: Characters of output per chunk of a streamed answer
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 2.0, jitter: float = 0.5,
+                 processing_delay: float = 1.0, error_rate: float = 0.0,
+                 response_data: Optional[Dict[str, Any]] = None, stream_chunk_size: int = 120):
+        self.latency = latency
+        self.jitter = jitter
+        self.processing_delay = processing_delay
+        self.error_rate = error_rate
+        self.response_data = response_data or DEFAULT_FAKE_RESPONSE
+        self.stream_chunk_size = stream_chunk_size
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'uploads': 0, 'generate_calls': 0, 'rate_limited': 0}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeGeminiServer':
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-gemini', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _file_resource(self, file_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            file = self.files.get(file_id)
+        if file is None:
+            return None
+        state = 'PROCESSING' if time.monotonic() < file['ready_at'] else 'ACTIVE'
+        return {'name': f'files/{file_id}', 'mimeType': file['mime_type'],
+                'sizeBytes': str(file['size']), 'state': state}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self) -> bytes:
+                length = int(self.headers.get('Content-Length', 0))
+                return self.rfile.read(length) if length else b''
+
+            def do_POST(self):
+                if self.path.startswith('/upload/v1beta/files'):
+                    body = self._read_body()
+                    file_id = uuid.uuid4().hex[:16]
+                    with server._lock:
+                        server.files[file_id] = {
+                            'size': len(body),
+                            'mime_type': self.headers.get('Content-Type', 'application/pdf'),
+                            'ready_at': time.monotonic() + server.processing_delay,
+                        }
+                        server.stats['uploads'] += 1
+                    self._send_json(200, {'file': server._file_resource(file_id)})
+                elif self.path.startswith('/v1beta/models/') and (
+                        self.path.endswith(':generateContent') or ':streamGenerateContent' in self.path
+                ):
+                    streamed = ':streamGenerateContent' in self.path
+                    request = json.loads(self._read_body() or b'{}')
+                    output_text = json.dumps(server.response_data)
+                    chunks = [
+                        output_text[start:start + server.stream_chunk_size]
+                        for start in range(0, len(output_text), server.stream_chunk_size)
+                    ] if streamed else [output_text]
+                    latency = server.latency + random.uniform(0, server.jitter)
+                    chunk_delay = latency / len(chunks)
+                    time.sleep(chunk_delay)
+                    with server._lock:
+                        server.stats['generate_calls'] += 1
+                        rate_limited = random.random() < server.error_rate
+                        if rate_limited:
+                            server.stats['rate_limited'] += 1
+                    if rate_limited:
+                        self._send_json(429, {'error': {
+                            'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                            'message': 'Resource has been exhausted (e.g. check quota).'
+                        }})
+                        return
+                    prompt_chars = sum(len(part.get('text', '')) for part in request.get('parts', []))
+                    prompt_tokens = prompt_chars // 4 + 258 * len(request.get('files', []))
+                    output_tokens = len(output_text) // 4
+                    usage = {
+                        'promptTokenCount': prompt_tokens,
+                        'candidatesTokenCount': output_tokens,
+                        'totalTokenCount': prompt_tokens + output_tokens,
+                    }
+                    if not streamed:
+                        self._send_json(200, {
+                            'candidates': [{'content': {'parts': [{'text': output_text}]}}],
+                            'usageMetadata': usage,
+                        })
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.end_headers()
+                    for index, chunk in enumerate(chunks):
+                        if index:
+                            time.sleep(chunk_delay)
+                        event = {'candidates': [{'content': {'parts': [{'text': chunk}]}}]}
+                        if index == len(chunks) - 1:
+                            event['usageMetadata'] = usage
+                        self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8'))
+                        self.wfile.flush()
+                else:
+                    self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {self.path}'}})
+
+            def do_GET(self):
+                if self.path.startswith('/v1beta/files/'):
+                    resource = server._file_resource(self.path.rsplit('/', 1)[-1])
+                    if resource is None:
+                        self._send_json(404, {'error': {'code': 404, 'message': 'File not found'}})
+                    else:
+                        self._send_json(200, resource)
+                else:
+                    self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {self.path}'}})
+
+            def do_DELETE(self):
+                if self.path.startswith('/v1beta/files/'):
+                    with server._lock:
+                        server.files.pop(self.path.rsplit('/', 1)[-1], None)
+                    self._send_json(200, {})
+                else:
+                    self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {self.path}'}})
+
+        return Handler
+
+
+class _FileState:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeFile:
+    """File resource returned by the fake client, shaped like ``genai.types.File``."""
+
+    def __init__(self, resource: Dict[str, Any]):
+        self.name = resource['name']
+        self.mime_type = resource.get('mimeType')
+        self.state = _FileState(resource.get('state', 'ACTIVE'))
+
+
+class _UsageMetadata:
+    def __init__(self, usage: Dict[str, int]):
+        self.prompt_token_count = usage.get('promptTokenCount', 0)
+        self.candidates_token_count = usage.get('candidatesTokenCount', 0)
+        self.total_token_count = usage.get('totalTokenCount', 0)
+
+
+class FakeResponse:
+    """generate_content response shaped like ``genai.types.GenerateContentResponse``."""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.text = ''.join(
+            part.get('text', '')
+            for candidate in payload.get('candidates', [])[:1]
+            for part in candidate.get('content', {}).get('parts', [])
+        )
+        self.usage_metadata = _UsageMetadata(payload.get('usageMetadata', {}))
+
+
+class FakeStreamingResponse:
+    """
+    Streamed generate_content response: iterating yields the chunks as they arrive.
+
+    Like the real streamed response, ``text`` and ``usage_metadata`` hold the
+    complete answer once iteration has finished.
+    """
+
+    def __init__(self, http_response):
+        self._http_response = http_response
+        self.text = ''
+        self.usage_metadata = _UsageMetadata({})
+
+    def __iter__(self):
+        with self._http_response as http_response:
+            for line in http_response:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                chunk = FakeResponse(json.loads(line[len('data:'):]))
+                self.text += chunk.text
+                if chunk.usage_metadata.total_token_count:
+                    self.usage_metadata = chunk.usage_metadata
+                yield chunk
+
+
+class FakeGeminiClient:
+    """
+    HTTP client for ``FakeGeminiServer`` with the ``google.generativeai`` module surface.
+
+    Args:
+        base_url: URL of a running FakeGeminiServer, e.g. "http://127.0.0.1:8765"
+        timeout: Socket timeout in seconds for each request
+    """
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None,
+                 content_type: str = 'application/json', timeout: Optional[float] = None) -> Dict[str, Any]:
+        with self._open(method, path, body, content_type, timeout) as response:
+            return json.loads(response.read() or b'{}')
+
+    def _open(self, method: str, path: str, body: Optional[bytes] = None,
+              content_type: str = 'application/json', timeout: Optional[float] = None):
+        """Send a request and return the open HTTP response; errors are raised like the real client's."""
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method, headers={'Content-Type': content_type}
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            payload = json.loads(e.read() or b'{}')
+            message = payload.get('error', {}).get('message', str(e))
+            if e.code == 429:
+                raise Exception(f"429 ResourceExhausted: {message}")
+            raise Exception(f"{e.code} {message}")
+
+    def configure(self, **kwargs):
+        """Accept the same arguments as ``genai.configure``; nothing to configure."""
+
+    def list_models(self) -> List[Any]:
+        return []
+
+    def GenerativeModel(self, model_name: str) -> 'FakeGenerativeModel':
+        return FakeGenerativeModel(self, model_name)
+
+    def upload_file(self, path: str, mime_type: str = 'application/pdf', **kwargs) -> FakeFile:
+        with open(path, 'rb') as f:
+            payload = self._request('POST', '/upload/v1beta/files', body=f.read(), content_type=mime_type)
+        return FakeFile(payload['file'])
+
+    def get_file(self, name: str) -> FakeFile:
+        return FakeFile(self._request('GET', f'/v1beta/{name}'))
+
+    def delete_file(self, name: str):
+        self._request('DELETE', f'/v1beta/{name}')
+
+
+class FakeGenerativeModel:
+    """Model handle returned by ``FakeGeminiClient.GenerativeModel``."""
+
+    def __init__(self, client: FakeGeminiClient, model_name: str):
+        self.client = client
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        if not isinstance(contents, (list, tuple)):
+            contents = [contents]
+        request = {
+            'parts': [{'text': part} for part in contents if isinstance(part, str)],
+            'files': [part.name for part in contents if isinstance(part, FakeFile)],
+        }
+        timeout = (kwargs.get('request_options') or {}).get('timeout')
+        if stream:
+            return FakeStreamingResponse(self.client._open(
+                'POST', f'/v1beta/models/{self.model_name}:streamGenerateContent?alt=sse',
+                body=json.dumps(request).encode('utf-8'), timeout=timeout
+            ))
+        payload = self.client._request(
+            'POST', f'/v1beta/models/{self.model_name}:generateContent', body=json.dumps(request).encode('utf-8'),
+            timeout=timeout
+        )
+        return FakeResponse(payload)
@@ -0,0 +1,56 @@
+"""
+Apply the bank statement retention policies and sweep unreferenced PDFs.
+
+Usage:
+    python manage.py apply_statement_retention [--pdf-days 90] [--failed-days 30] [--dry-run]
+    python manage.py apply_statement_retention --interval 3600   # keep running, once an hour
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bankstatements.retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = "Delete expired statement PDFs and failed statements, then garbage-collect unreferenced blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pdf-days', type=int, default=None,
+                            help='Delete PDFs of completed statements older than this many days '
+                                 '(default: BANK_STATEMENT_RETENTION_PDF_DAYS, 0 disables)')
+        parser.add_argument('--failed-days', type=int, default=None,
+                            help='Delete failed statements older than this many days '
+                                 '(default: BANK_STATEMENT_RETENTION_FAILED_DAYS, 0 disables)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Statements per database transaction')
+        parser.add_argument('--grace-minutes', type=int, default=None,
+                            help='Minutes a blob must stay unreferenced before it is deleted '
+                                 '(default: BANK_STATEMENT_BLOB_GRACE_MINUTES)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Run forever, applying the policies every INTERVAL seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            stats = apply_retention(
+                pdf_days=options['pdf_days'],
+                failed_days=options['failed_days'],
+                batch_size=max(1, options['batch_size']),
+                dry_run=options['dry_run'],
+                sweep_grace_minutes=options['grace_minutes']
+            )
+            prefix = '[dry run] ' if options['dry_run'] else ''
+            self.stdout.write(
+                f"{prefix}PDFs deleted: {stats['pdfs_deleted']}, failed statements deleted: {stats['failed_deleted']}, "
+                f"blobs swept: {stats['blobs_swept']}"
+            )
+            self.stdout.write(
+                f"{prefix}Bytes released: {stats['bytes_released']}, bytes reclaimed: {stats['bytes_reclaimed']} "
+                f"({time.perf_counter() - started:.2f}s)"
+            )
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
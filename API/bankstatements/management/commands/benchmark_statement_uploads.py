@@ -0,0 +1,141 @@
+"""
+Benchmark end-to-end statement processing through the upload view.
+
+Uploads the same PDF repeatedly with a configurable concurrency, and reports
+statements per minute and per-upload latency percentiles. By default a fake
+Gemini server is started in-process so no API quota is used, and the local
+text-layer parsers are off so every upload reaches the extraction backend.
+The uploads are made as a benchmark user created for the run, and the files
+are stored under a temporary MEDIA_ROOT; both are removed afterwards unless
+--keep is given.
+
+Usage:
+    python manage.py benchmark_statement_uploads path/to/statement.pdf --count 40 --concurrency 8
+    python manage.py benchmark_statement_uploads statement.pdf --latency 5 --error-rate 0.2
+    python manage.py benchmark_statement_uploads statement.pdf --real-gemini
+    python manage.py benchmark_statement_uploads statement.pdf --local-parsers
+"""
+import os
+import shutil
+import tempfile
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from bankstatements.fake_gemini import FakeGeminiServer
+from bankstatements.metrics import percentile
+from bankstatements.models import BankStatement, StatementBlob
+from users.models import User
+
+BENCHMARK_USER = 'benchmark-user'
+
+
+class Command(BaseCommand):
+    help = "Measure end-to-end statements per minute through the upload view."
+
+    def add_arguments(self, parser):
+        parser.add_argument('pdf_path', help='PDF uploaded on every request')
+        parser.add_argument('--count', type=int, default=20, help='Number of uploads (default: 20)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent uploads (default: 4)')
+        parser.add_argument('--latency', type=float, default=2.0, help='Fake generate_content latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.5, help='Fake random extra latency in seconds')
+        parser.add_argument('--processing-delay', type=float, default=1.0,
+                            help='Seconds a fake uploaded file stays in PROCESSING')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of fake 429 responses')
+        parser.add_argument('--real-gemini', action='store_true', help='Use the configured Gemini API instead')
+        parser.add_argument('--local-parsers', action='store_true',
+                            help='Let the local text-layer parsers handle the PDFs they can read')
+        parser.add_argument('--keep', action='store_true', help='Keep the uploaded statements afterwards')
+
+    def handle(self, *args, **options):
+        pdf_path = options['pdf_path']
+        if not os.path.isfile(pdf_path):
+            raise CommandError(f"File not found: {pdf_path}")
+
+        with open(pdf_path, 'rb') as f:
+            pdf_content = f.read()
+
+        user, created_user = User.objects.get_or_create(
+            username=BENCHMARK_USER, defaults={'first_name': 'Benchmark', 'last_name': 'User'}
+        )
+        existing_blob_ids = set(StatementBlob.objects.values_list('id', flat=True))
+        media_root = tempfile.mkdtemp(prefix='statement-benchmark-')
+
+        server = None
+        overrides = {
+            'MEDIA_ROOT': media_root,
+            'BANK_STATEMENT_LOCAL_PARSERS_ENABLED': options['local_parsers'],
+        }
+        if not options['real_gemini']:
+            server = FakeGeminiServer(
+                latency=options['latency'],
+                jitter=options['jitter'],
+                processing_delay=options['processing_delay'],
+                error_rate=options['error_rate'],
+            ).start()
+            overrides.update({
+                'FAKE_GEMINI_URL': server.url,
+                'GOOGLE_AI_API_KEY': 'fake-benchmark-key',
+                'BANK_STATEMENT_EXTRACTION_BACKEND': 'gemini',
+            })
+            self.stdout.write(f"Fake Gemini server on {server.url}")
+
+        upload_url = reverse('upload_bank_statement')
+
+        def upload(index):
+            client = Client(SERVER_NAME='localhost')
+            started = time.monotonic()
+            try:
+                response = client.post(upload_url, {
+                    'pdf_file': SimpleUploadedFile(f"benchmark-{index}.pdf", pdf_content, 'application/pdf'),
+                    'user_id': BENCHMARK_USER,
+                })
+                status = response.json().get('file_details', {}).get('processing_status', 'error')
+            finally:
+                connection.close()
+            return time.monotonic() - started, status
+
+        started_at = time.monotonic()
+        try:
+            with override_settings(**overrides):
+                with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as executor:
+                    results = list(executor.map(upload, range(options['count'])))
+        finally:
+            if server:
+                server.stop()
+        elapsed = time.monotonic() - started_at
+
+        latencies = [latency for latency, _ in results]
+        statuses = {}
+        for _, status in results:
+            statuses[status] = statuses.get(status, 0) + 1
+
+        self.stdout.write('')
+        self.stdout.write(f"Uploads: {len(results)} in {elapsed:.1f}s (concurrency {options['concurrency']})")
+        self.stdout.write(f"Statuses: {statuses}")
+        self.stdout.write(
+            f"Latency p50 {statistics.median(latencies):.2f}s, p95 {percentile(latencies, 0.95):.2f}s, "
+            f"max {max(latencies):.2f}s"
+        )
+        if server:
+            self.stdout.write(f"Fake Gemini stats: {server.stats}")
+        self.stdout.write(self.style.SUCCESS(f"Throughput: {len(results) / elapsed * 60:.1f} statements/minute"))
+
+        if options['keep']:
+            self.stdout.write(f"Statements kept for user {BENCHMARK_USER}, files in {media_root}")
+            return
+        with override_settings(MEDIA_ROOT=media_root):
+            for statement in BankStatement.objects.filter(owner=user):
+                statement.delete()
+            # Blobs stored by this run live under the temporary MEDIA_ROOT
+            StatementBlob.objects.filter(ref_count=0).exclude(id__in=existing_blob_ids).delete()
+        if created_user:
+            user.delete()
+        shutil.rmtree(media_root, ignore_errors=True)
+
@@ -0,0 +1,71 @@
+"""
+Compare latency and token usage of the two AI input modes on a statement.
+
+Usage:
+    python manage.py compare_ai_input_modes path/to/statement.pdf --runs 3
+"""
+import os
+import time
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bankstatements.parsers import extract_pdf_text, compact_statement_text
+from bankstatements.services import process_bank_statement_with_ai
+
+
+class Command(BaseCommand):
+    help = "Compare latency and token counts of the 'text' and 'file' AI input modes for a PDF."
+
+    def add_arguments(self, parser):
+        parser.add_argument('pdf_path', help='Path to the bank statement PDF')
+        parser.add_argument('--runs', type=int, default=1, help='Number of runs per mode (default: 1)')
+
+    def handle(self, *args, **options):
+        pdf_path = options['pdf_path']
+        runs = max(1, options['runs'])
+
+        if not os.path.isfile(pdf_path):
+            raise CommandError(f"File not found: {pdf_path}")
+
+        page_texts = extract_pdf_text(pdf_path)
+        raw_length = sum(len(text) for text in page_texts)
+        compacted_length = len(compact_statement_text(page_texts))
+        self.stdout.write(f"Pages: {len(page_texts)}")
+        self.stdout.write(f"Text layer: {raw_length} chars, compacted: {compacted_length} chars")
+
+        rows = []
+        for mode in ('file', 'text'):
+            latencies = []
+            usage = None
+            transaction_count = None
+            for run in range(runs):
+                started = time.monotonic()
+                result = process_bank_statement_with_ai(pdf_path, input_mode=mode)
+                latencies.append(time.monotonic() - started)
+
+                if result.get('error'):
+                    raise CommandError(f"{mode} mode failed: {result['error']}")
+                if result.get('input_mode') != mode:
+                    self.stdout.write(self.style.WARNING(
+                        f"{mode} mode fell back to {result.get('input_mode')} mode (no usable text layer)"
+                    ))
+                usage = result.get('usage') or {}
+                transaction_count = len(result['transactions'])
+
+            rows.append((mode, statistics.median(latencies), usage, transaction_count))
+
+        self.stdout.write('')
+        self.stdout.write(f"{'mode':<6} {'median s':>9} {'prompt tok':>11} {'output tok':>11} {'total tok':>10} {'txns':>5}")
+        for mode, latency, usage, transaction_count in rows:
+            self.stdout.write(
+                f"{mode:<6} {latency:>9.2f} {usage.get('prompt_tokens', 0):>11} "
+                f"{usage.get('output_tokens', 0):>11} {usage.get('total_tokens', 0):>10} {transaction_count:>5}"
+            )
+
+        file_row, text_row = rows
+        if file_row[2].get('total_tokens') and text_row[2].get('total_tokens'):
+            token_change = text_row[2]['total_tokens'] / file_row[2]['total_tokens'] - 1
+            self.stdout.write(self.style.SUCCESS(
+                f"Text mode vs file mode: {text_row[1] - file_row[1]:+.2f}s latency, {token_change:+.0%} tokens"
+            ))
@@ -0,0 +1,75 @@
+"""
+Reprocess stored bank statements from their PDFs, without re-uploading them.
+
+Statements are processed smallest file first, rate-limited to fit the Gemini
+quota, and reuse a cached extraction of the same PDF when there is one. The
+command waits until every queued statement has been processed.
+
+Usage:
+    python manage.py reprocess_statements                      # every failed statement
+    python manage.py reprocess_statements --user alice --rate 5
+    python manage.py reprocess_statements --ids 12 15 --status all --no-cache
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bankstatements.models import BankStatement
+from bankstatements.reprocessing import queue_statement_reprocessing
+from bankstatements.workers import get_reprocess_queue
+
+STATUS_CHOICES = ['failed', 'pending', 'completed', 'all']
+
+
+class Command(BaseCommand):
+    help = "Queue stored bank statements for reprocessing and wait for the results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', choices=STATUS_CHOICES, default='failed',
+                            help='Only statements with this processing status (default: failed)')
+        parser.add_argument('--user', help='Only statements of this username')
+        parser.add_argument('--ids', type=int, nargs='+', help='Only these statement ids')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Statements per minute sent to the extraction backend '
+                                 '(default: BANK_STATEMENT_REPROCESS_RATE_PER_MINUTE, 0 for no limit)')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Always call the extraction backend, even if a cached extraction exists')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be queued')
+
+    def handle(self, *args, **options):
+        statements = BankStatement.objects.all()
+        if options['status'] != 'all':
+            statements = statements.filter(processing_status=options['status'])
+        if options['user']:
+            statements = statements.filter(owner__username=options['user'])
+        if options['ids']:
+            statements = statements.filter(id__in=options['ids'])
+        if options['rate'] is not None and options['rate'] < 0:
+            raise CommandError('--rate must be 0 or more')
+
+        queue = get_reprocess_queue()
+        if options['rate'] is not None:
+            queue.rate_per_minute = options['rate']
+
+        # The status filter no longer matches once the statements are reset to pending
+        statement_ids = list(statements.values_list('id', flat=True))
+        result = queue_statement_reprocessing(
+            BankStatement.objects.filter(id__in=statement_ids), use_cache=not options['no_cache'],
+            dry_run=options['dry_run']
+        )
+        skipped = ', '.join(f"{reason}: {count}" for reason, count in result['skipped'].items() if count) or 'none'
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(f"{prefix}Queued {result['queued']} statements (skipped {skipped})")
+        if options['dry_run'] or not result['queued']:
+            return
+
+        started = time.perf_counter()
+        queue.wait()
+        outcome = BankStatement.objects.filter(id__in=result['statement_ids']).values_list(
+            'processing_status', flat=True
+        )
+        completed = sum(1 for status in outcome if status == 'completed')
+        failed = sum(1 for status in outcome if status == 'failed')
+        self.stdout.write(self.style.SUCCESS(
+            f"Reprocessed in {time.perf_counter() - started:.1f}s: {completed} completed, {failed} failed"
+        ))
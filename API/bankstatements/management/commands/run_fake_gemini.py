@@ -0,0 +1,55 @@
+"""
+Run the local fake Gemini server for offline load tests and benchmarks.
+
+Usage:
+    python manage.py run_fake_gemini --port 8765 --latency 2 --error-rate 0.1
+    FAKE_GEMINI_URL=http://127.0.0.1:8765 python manage.py runserver
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from bankstatements.fake_gemini import FakeGeminiServer
+
+
+class Command(BaseCommand):
+    help = "Run a local HTTP stand-in for the Gemini upload, get_file and generate_content endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=2.0, help='Seconds per generate_content call')
+        parser.add_argument('--jitter', type=float, default=0.5, help='Random extra latency in seconds')
+        parser.add_argument('--processing-delay', type=float, default=1.0,
+                            help='Seconds an uploaded file stays in PROCESSING')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Probability of answering generate_content with 429')
+        parser.add_argument('--response-file', help='JSON file with the model output to return')
+        parser.add_argument('--stream-chunk-size', type=int, default=120,
+                            help='Characters per chunk of a streamed answer')
+
+    def handle(self, *args, **options):
+        response_data = None
+        if options['response_file']:
+            with open(options['response_file'], 'r', encoding='utf-8') as f:
+                response_data = json.load(f)
+
+        server = FakeGeminiServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            processing_delay=options['processing_delay'],
+            error_rate=options['error_rate'],
+            response_data=response_data,
+            stream_chunk_size=options['stream_chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Fake Gemini server listening on {server.url}"))
+        self.stdout.write(f"Set FAKE_GEMINI_URL={server.url} to send statement processing to it.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.stdout.write(f"Stats: {server.stats}")
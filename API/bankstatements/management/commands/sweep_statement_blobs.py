@@ -0,0 +1,39 @@
+"""
+Delete stored statement PDFs that no bank statement references anymore,
+and the legacy files queued when their statements were deleted.
+
+Usage:
+    python manage.py sweep_statement_blobs [--grace-minutes 60] [--dry-run]
+    python manage.py sweep_statement_blobs --interval 3600   # keep sweeping every hour
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bankstatements.storage import sweep_unreferenced_blobs
+
+
+class Command(BaseCommand):
+    help = "Garbage-collect content-addressed statement blobs that are no longer referenced."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=None,
+                            help='Minutes a blob must stay unreferenced (default: BANK_STATEMENT_BLOB_GRACE_MINUTES)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Run forever, sweeping every INTERVAL seconds (default: sweep once)')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            result = sweep_unreferenced_blobs(options['grace_minutes'], dry_run=options['dry_run'])
+            verb = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(
+                f"{verb} {result['deleted']} blobs and {result['legacy_files']} legacy files "
+                f"({result['bytes_reclaimed']} bytes), "
+                f"corrected {result['corrected']} reference counts"
+            )
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
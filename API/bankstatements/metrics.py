@@ -0,0 +1,152 @@
+"""
+Token and latency accounting for bank statement extraction.
+
+Every processed statement gets a StatementProcessingMetrics row with the wall
+time of the extraction, the time spent in each phase (text extraction, upload,
+waiting for the uploaded file, generation, rate-limit backoff, parsing), the
+time to the first streamed transaction and the token counts reported by the
+API. ``summarize_metrics`` turns a set of
+rows into the p50/p95 figures shown in the admin, grouped by model and by
+page count.
+"""
+import logging
+import math
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Extraction result timing keys → StatementProcessingMetrics columns
+TIMING_FIELDS = {
+    'text_extraction': 'text_extraction_seconds',
+    'upload': 'upload_seconds',
+    'processing_wait': 'processing_wait_seconds',
+    'generation': 'generation_seconds',
+    'backoff': 'backoff_seconds',
+    'parse': 'parse_seconds',
+    'local_parse': 'parse_seconds',
+}
+
+# Upper bounds of the page count buckets used in the admin summary
+PAGE_BUCKETS = (2, 5, 10, 20)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of a list of numbers (None for an empty list).
+
+    The smallest value with at least ``fraction`` of the values at or below it,
+    e.g. the 19th of 20 values for p95 and the 2nd of 4 for p50.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Rounded first so that e.g. 0.1 * 30 = 3.0000000000000004 is rank 3, not 4
+    rank = math.ceil(round(fraction * len(ordered), 9))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+
+def page_bucket(page_count: Optional[int]) -> Tuple[int, str]:
+    """Sort position and label of the page count bucket a statement falls in."""
+    if not page_count:
+        return len(PAGE_BUCKETS) + 1, 'unknown'
+    lower = 1
+    for position, upper in enumerate(PAGE_BUCKETS):
+        if page_count <= upper:
+            return position, f'{lower}-{upper} pages'
+        lower = upper + 1
+    return len(PAGE_BUCKETS), f'{lower}+ pages'
+
+
+def record_processing_metrics(bank_statement, extracted_data: Optional[Dict[str, Any]],
+                              total_seconds: float, page_count: Optional[int] = None):
+    """
+    Save the metrics of an extraction run, replacing those of an earlier run.
+
+    Metrics are diagnostic data: failures are logged and never fail processing.
+
+    Args:
+        bank_statement: BankStatement that was processed
+        extracted_data: Extraction result, or None if processing raised
+        total_seconds: Wall time of the extraction
+        page_count: Number of pages in the PDF, if known
+    """
+    from .models import StatementProcessingMetrics
+
+    extracted_data = extracted_data or {}
+    backend = getattr(settings, 'BANK_STATEMENT_EXTRACTION_BACKEND', 'gemini')
+    model_name = extracted_data.get('model_name') or ''
+    if extracted_data.get('parser'):
+        backend = 'local'
+        model_name = f"local:{extracted_data['parser']}"
+    if extracted_data.get('cached'):
+        backend = 'cache'
+    if extracted_data.get('skipped'):
+        backend = 'skipped'
+
+    values = {
+        'backend': backend,
+        'model_name': model_name,
+        'input_mode': extracted_data.get('input_mode') or '',
+        'page_count': page_count or None,
+        'chunk_count': extracted_data.get('chunk_count') or 1,
+        'succeeded': bool(extracted_data) and not extracted_data.get('error'),
+        'transaction_count': len(extracted_data.get('transactions') or []),
+        'total_seconds': total_seconds,
+    }
+    for column in set(TIMING_FIELDS.values()):
+        values[column] = 0.0
+    timings = extracted_data.get('timings') or {}
+    for phase, seconds in timings.items():
+        column = TIMING_FIELDS.get(phase)
+        if column:
+            values[column] += seconds
+    values['first_transaction_seconds'] = timings.get('first_transaction')
+
+    usage = extracted_data.get('usage') or {}
+    for key in ('prompt_tokens', 'output_tokens', 'total_tokens'):
+        values[key] = usage.get(key)
+
+    try:
+        StatementProcessingMetrics.objects.update_or_create(statement=bank_statement, defaults=values)
+    except Exception as e:
+        logger.error(f"Failed to record processing metrics for statement {bank_statement.id}: {str(e)}",
+                     exc_info=True)
+
+
+SUMMARY_COLUMNS = (
+    'total_seconds', 'first_transaction_seconds', 'generation_seconds', 'processing_wait_seconds', 'total_tokens'
+)
+
+
+def _summarize_group(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {'count': len(rows), 'failed': sum(1 for row in rows if not row['succeeded'])}
+    for column in SUMMARY_COLUMNS:
+        values = [row[column] for row in rows if row[column] is not None]
+        summary[column] = {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95)}
+    return summary
+
+
+def summarize_metrics(queryset) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compute p50/p95 latency and token figures for a set of metrics rows.
+
+    Args:
+        queryset: StatementProcessingMetrics queryset (e.g. the admin's filtered changelist)
+
+    Returns:
+        Dictionary with 'by_model' and 'by_pages' lists of
+        ``{'label', 'count', 'failed', <column>: {'p50', 'p95'}}`` entries
+    """
+    by_model = defaultdict(list)
+    by_pages = defaultdict(list)
+    for row in queryset.order_by().values('model_name', 'page_count', 'succeeded', *SUMMARY_COLUMNS).iterator():
+        by_model[row['model_name'] or 'unknown'].append(row)
+        by_pages[page_bucket(row['page_count'])].append(row)
+
+    return {
+        'by_model': [dict(label=label, **_summarize_group(rows)) for label, rows in sorted(by_model.items())],
+        'by_pages': [dict(label=label, **_summarize_group(rows)) for (_, label), rows in sorted(by_pages.items())],
+    }
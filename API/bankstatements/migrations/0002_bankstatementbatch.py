@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-19 14:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankStatementBatch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('user_id', models.CharField(help_text='Username of the user who uploaded the batch', max_length=150)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date and time when the batch was uploaded')),
+                ('total_files', models.PositiveIntegerField(default=0, help_text='Number of statements created for this batch')),
+                ('rejected_files', models.JSONField(blank=True, default=list, help_text='Files skipped during upload and why')),
+            ],
+            options={
+                'verbose_name': 'Bank Statement Batch',
+                'verbose_name_plural': 'Bank Statement Batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bankstatement',
+            name='batch',
+            field=models.ForeignKey(blank=True, help_text='Batch this statement was uploaded in, if any', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statements', to='bankstatements.bankstatementbatch'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.24 on 2026-10-19 14:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0002_transaction_from_account_id_and_more'),
+        ('bankstatements', '0002_bankstatementbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankstatement',
+            name='extracted_summary',
+            field=models.JSONField(blank=True, help_text='Statement-level extraction results (account name and type, period, initial balance)', null=True),
+        ),
+        migrations.CreateModel(
+            name='StagedTransaction',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('position', models.PositiveIntegerField(help_text='Order of the transaction in the extraction result')),
+                ('date', models.DateField(blank=True, null=True)),
+                ('title', models.CharField(max_length=120)),
+                ('amount', models.FloatField(default=0.0)),
+                ('transaction_type', models.CharField(choices=[('Income', 'Income'), ('Expense', 'Expense'), ('Transfer', 'Transfer')], max_length=30)),
+                ('category', models.CharField(max_length=30)),
+                ('committed', models.BooleanField(default=False, help_text='Whether the row has been moved into Transaction')),
+                ('statement', models.ForeignKey(help_text='Bank statement the transaction was extracted from', on_delete=django.db.models.deletion.CASCADE, related_name='staged_transactions', to='bankstatements.bankstatement')),
+                ('transaction', models.ForeignKey(blank=True, help_text='Transaction created when the row was committed', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transaction.transaction')),
+            ],
+            options={
+                'verbose_name': 'Staged Transaction',
+                'verbose_name_plural': 'Staged Transactions',
+                'ordering': ['statement', 'position'],
+            },
+        ),
+    ]
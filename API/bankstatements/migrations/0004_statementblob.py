@@ -0,0 +1,45 @@
+# Generated by Django 4.2.24 on 2026-10-19 14:55
+
+import bankstatements.models
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0003_stagedtransaction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bankstatement',
+            name='file',
+            field=models.FileField(blank=True, help_text='PDF file of the bank statement (uploads made before content-addressed storage)', upload_to=bankstatements.models.bank_statement_upload_path, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf'])]),
+        ),
+        migrations.CreateModel(
+            name='StatementBlob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('sha256', models.CharField(help_text='SHA-256 of the uncompressed PDF', max_length=64, unique=True)),
+                ('file', models.FileField(max_length=255, upload_to=bankstatements.models.statement_blob_upload_path)),
+                ('size', models.BigIntegerField(help_text='Size of the PDF in bytes')),
+                ('stored_size', models.BigIntegerField(help_text='Size of the stored file in bytes')),
+                ('compressed', models.BooleanField(default=False, help_text='Whether the stored file is gzip-compressed')),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Number of bank statements using this blob')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('unreferenced_at', models.DateTimeField(blank=True, help_text='When the last statement using this blob was deleted', null=True)),
+            ],
+            options={
+                'verbose_name': 'Statement Blob',
+                'verbose_name_plural': 'Statement Blobs',
+                'indexes': [models.Index(fields=['ref_count', 'unreferenced_at'], name='statementblob_sweep_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='bankstatement',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Content-addressed PDF shared with identical uploads', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='statements', to='bankstatements.statementblob'),
+        ),
+    ]
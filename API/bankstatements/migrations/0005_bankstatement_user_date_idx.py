@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-19 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0004_statementblob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankstatement',
+            index=models.Index(fields=['user_id', 'upload_date'], name='bankstatement_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0005_bankstatement_user_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankstatement',
+            name='file_deleted_at',
+            field=models.DateTimeField(blank=True, help_text='When the PDF was deleted by the retention policy (the metadata is kept)', null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0006_bankstatement_file_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementProcessingMetrics',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('backend', models.CharField(help_text='Extraction backend that processed the statement', max_length=20)),
+                ('model_name', models.CharField(blank=True, help_text='Gemini model or local parser used', max_length=100)),
+                ('input_mode', models.CharField(blank=True, max_length=20)),
+                ('page_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('chunk_count', models.PositiveIntegerField(default=1)),
+                ('succeeded', models.BooleanField(default=False)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(help_text='Wall time of the whole extraction')),
+                ('text_extraction_seconds', models.FloatField(default=0.0)),
+                ('upload_seconds', models.FloatField(default=0.0)),
+                ('processing_wait_seconds', models.FloatField(default=0.0, help_text='Time waiting for the uploaded file to be processed')),
+                ('generation_seconds', models.FloatField(default=0.0)),
+                ('backoff_seconds', models.FloatField(default=0.0, help_text='Time spent backing off after rate limits')),
+                ('parse_seconds', models.FloatField(default=0.0, help_text='Time parsing the response (or the PDF, for local parsers)')),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('output_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('total_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('statement', models.OneToOneField(help_text='Bank statement the metrics belong to', on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='bankstatements.bankstatement')),
+            ],
+            options={
+                'verbose_name': 'Statement Processing Metrics',
+                'verbose_name_plural': 'Statement Processing Metrics',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
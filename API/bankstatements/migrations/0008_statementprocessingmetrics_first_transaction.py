@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0007_statementprocessingmetrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statementprocessingmetrics',
+            name='first_transaction_seconds',
+            field=models.FloatField(blank=True, help_text='Time from the start of generation to the first streamed transaction', null=True),
+        ),
+    ]
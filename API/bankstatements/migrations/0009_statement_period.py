@@ -0,0 +1,55 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:12
+
+import datetime
+
+from django.db import migrations, models
+
+
+def backfill_statement_periods(apps, schema_editor):
+    """Copy the period from extracted_summary and the account from committed rows."""
+    BankStatement = apps.get_model('bankstatements', 'BankStatement')
+    StagedTransaction = apps.get_model('bankstatements', 'StagedTransaction')
+
+    account_ids = dict(
+        StagedTransaction.objects.filter(committed=True, transaction__isnull=False)
+        .values_list('statement_id', 'transaction__account_id')
+    )
+    for statement in BankStatement.objects.exclude(extracted_summary__isnull=True).iterator():
+        period = (statement.extracted_summary or {}).get('statement_period') or {}
+        try:
+            statement.period_start = datetime.date.fromisoformat(str(period.get('start')))
+            statement.period_end = datetime.date.fromisoformat(str(period.get('end')))
+        except ValueError:
+            statement.period_start = statement.period_end = None
+        statement.account_id = account_ids.get(statement.id)
+        statement.save(update_fields=['period_start', 'period_end', 'account_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0008_statementprocessingmetrics_first_transaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankstatement',
+            name='account_id',
+            field=models.CharField(blank=True, help_text="ID of the Account the statement's transactions belong to (given at upload or set on commit)", max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='bankstatement',
+            name='period_end',
+            field=models.DateField(blank=True, help_text='Last day of the statement period', null=True),
+        ),
+        migrations.AddField(
+            model_name='bankstatement',
+            name='period_start',
+            field=models.DateField(blank=True, help_text='First day of the statement period', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bankstatement',
+            index=models.Index(fields=['user_id', 'account_id', 'period_start'], name='bankstatement_period_idx'),
+        ),
+        migrations.RunPython(backfill_statement_periods, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:39
+
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Round
+
+import MoneyManagement.money
+
+MINOR_UNITS = 100
+
+# Amount columns of each model
+AMOUNT_FIELDS = {
+    'StagedTransaction': ('amount',),
+}
+
+
+def scale_amounts(factor, precision):
+    """
+    Multiply the stored amounts by factor and round them to precision digits:
+    to whole cents, or back to major units when reversed.
+    """
+    def scaled(field):
+        # Rounding to 6 digits first drops float error, so 12.345 becomes 1235 cents like to_minor_units
+        return Round(Round(F(field) * factor, 6), precision)
+
+    def convert(apps, schema_editor):
+        for model_name, fields in AMOUNT_FIELDS.items():
+            model = apps.get_model('bankstatements', model_name)
+            model.objects.update(**{field: scaled(field) for field in fields})
+    return convert
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0009_statement_period'),
+    ]
+
+    operations = [
+        migrations.RunPython(scale_amounts(MINOR_UNITS, 0), scale_amounts(1 / MINOR_UNITS, 2)),
+        migrations.AlterField(
+            model_name='stagedtransaction',
+            name='amount',
+            field=MoneyManagement.money.MoneyField(default=0, help_text='Amount, stored in cents'),
+        ),
+    ]
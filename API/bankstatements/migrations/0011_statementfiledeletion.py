@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0010_money_minor_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementFileDeletion',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(help_text='Storage name of the file', max_length=255)),
+                ('size', models.BigIntegerField(default=0, help_text='Size of the file in bytes')),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Statement File Deletion',
+                'verbose_name_plural': 'Statement File Deletions',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankstatements', '0011_statementfiledeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankstatement',
+            name='reprocess_requested_at',
+            field=models.DateTimeField(blank=True, help_text='When bulk reprocessing queued the statement (cleared when processing starts)', null=True),
+        ),
+        migrations.AddField(
+            model_name='bankstatement',
+            name='reprocess_use_cache',
+            field=models.BooleanField(default=True, help_text='Whether the queued reprocessing may reuse a cached extraction'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def link_owners(apps, schema_editor):
+    """Point statements and batches at the user with their user_id username."""
+    User = apps.get_model('users', 'User')
+    for model_name in ('BankStatement', 'BankStatementBatch'):
+        model = apps.get_model('bankstatements', model_name)
+        model.objects.update(owner=Subquery(User.objects.filter(username=OuterRef('user_id')).values('id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('bankstatements', '0012_bankstatement_reprocess_requested_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bankstatement',
+            name='bankstatement_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='bankstatement',
+            name='bankstatement_period_idx',
+        ),
+        migrations.AddField(
+            model_name='bankstatement',
+            name='owner',
+            field=models.ForeignKey(blank=True, help_text='User who uploaded the statement, set from user_id on insert', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_statements', to='users.user'),
+        ),
+        migrations.AddField(
+            model_name='bankstatementbatch',
+            name='owner',
+            field=models.ForeignKey(blank=True, help_text='User who uploaded the batch, set from user_id on insert', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='statement_batches', to='users.user'),
+        ),
+        migrations.RunPython(link_owners, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bankstatement',
+            name='user_id',
+            field=models.CharField(help_text='Username the statement was uploaded with (kept for the API; see owner)', max_length=150),
+        ),
+        migrations.AlterField(
+            model_name='bankstatementbatch',
+            name='user_id',
+            field=models.CharField(help_text='Username the batch was uploaded with (kept for the API; see owner)', max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='bankstatement',
+            index=models.Index(fields=['owner', 'upload_date'], name='bankstatement_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bankstatement',
+            index=models.Index(fields=['owner', 'account_id', 'period_start'], name='bankstatement_owner_period_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.core.validators import FileExtensionValidator
-import os
+
+from MoneyManagement.money import MoneyField
 
 
 def bank_statement_upload_path(instance, filename):
@@ -11,17 +12,150 @@ def bank_statement_upload_path(instance, filename):
     return f'bank_statements/{instance.user_id}/{now.year}/{now.month:02d}/{filename}'
 
 
+def _user_pk(username):
+    """Primary key of the user with this username, or None."""
+    from users.models import User
+    return User.objects.filter(username=username).values_list('id', flat=True).first()
+
+
+def statement_blob_upload_path(instance, filename):
+    """Generate the content-addressed path of a statement blob."""
+    # Create a path like: statement_blobs/ab/abcdef....pdf (or .pdf.gz when compressed)
+    extension = '.pdf.gz' if instance.compressed else '.pdf'
+    return f'statement_blobs/{instance.sha256[:2]}/{instance.sha256}{extension}'
+
+
+class StatementBlob(models.Model):
+    """
+    Stored bytes of an uploaded statement PDF, shared by every upload with the same content.
+    """
+    
+    id = models.AutoField(primary_key=True)
+    sha256 = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the uncompressed PDF")
+    file = models.FileField(upload_to=statement_blob_upload_path, max_length=255)
+    size = models.BigIntegerField(help_text="Size of the PDF in bytes")
+    stored_size = models.BigIntegerField(help_text="Size of the stored file in bytes")
+    compressed = models.BooleanField(default=False, help_text="Whether the stored file is gzip-compressed")
+    ref_count = models.PositiveIntegerField(default=0, help_text="Number of bank statements using this blob")
+    created_at = models.DateTimeField(auto_now_add=True)
+    unreferenced_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the last statement using this blob was deleted"
+    )
+    
+    class Meta:
+        verbose_name = "Statement Blob"
+        verbose_name_plural = "Statement Blobs"
+        indexes = [
+            models.Index(fields=['ref_count', 'unreferenced_at'], name='statementblob_sweep_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
+class StatementFileDeletion(models.Model):
+    """
+    Legacy statement file (stored before blobs existed) waiting to be removed by the sweeper.
+    """
+    
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=255, help_text="Storage name of the file")
+    size = models.BigIntegerField(default=0, help_text="Size of the file in bytes")
+    requested_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Statement File Deletion"
+        verbose_name_plural = "Statement File Deletions"
+    
+    def __str__(self):
+        return f"{self.name} (requested {self.requested_at})"
+
+
+class BankStatementBatch(models.Model):
+    """
+    A group of bank statements uploaded together (several PDFs or a ZIP archive).
+    """
+    
+    id = models.AutoField(primary_key=True)
+    user_id = models.CharField(max_length=150, help_text="Username the batch was uploaded with (kept for the API; see owner)")
+    owner = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='statement_batches',
+        help_text="User who uploaded the batch, set from user_id on insert"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, help_text="Date and time when the batch was uploaded")
+    total_files = models.PositiveIntegerField(default=0, help_text="Number of statements created for this batch")
+    rejected_files = models.JSONField(default=list, blank=True, help_text="Files skipped during upload and why")
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Bank Statement Batch"
+        verbose_name_plural = "Bank Statement Batches"
+    
+    def __str__(self):
+        return f"{self.user_id} - batch {self.id} ({self.total_files} files)"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.owner_id is None:
+            self.owner_id = _user_pk(self.user_id)
+        super().save(*args, **kwargs)
+    
+    @property
+    def owner_username(self):
+        """Current username of the uploader (user_id keeps the name used at upload)."""
+        return self.owner.username if self.owner_id else self.user_id
+    
+    def get_progress(self):
+        """Return statement counts per processing status and overall completion."""
+        counts = {'pending': 0, 'processing': 0, 'completed': 0, 'failed': 0}
+        for row in self.statements.values('processing_status').annotate(count=models.Count('id')):
+            counts[row['processing_status']] = row['count']
+        
+        finished = counts['completed'] + counts['failed']
+        total = sum(counts.values())
+        return {
+            'counts': counts,
+            'finished': finished,
+            'total': total,
+            'percent': round(finished * 100 / total, 1) if total else 100.0,
+            'done': finished == total,
+        }
+
+
 class BankStatement(models.Model):
     """
     Model to store uploaded bank statement files.
     """
     
     id = models.AutoField(primary_key=True)
-    user_id = models.CharField(max_length=150, help_text="Username of the user who uploaded the statement")
+    user_id = models.CharField(max_length=150, help_text="Username the statement was uploaded with (kept for the API; see owner)")
+    # SET_NULL: deleting a user deletes their statements one by one first, so blob refcounts are released
+    owner = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='bank_statements',
+        help_text="User who uploaded the statement, set from user_id on insert"
+    )
     file = models.FileField(
         upload_to=bank_statement_upload_path,
         validators=[FileExtensionValidator(allowed_extensions=['pdf'])],
-        help_text="PDF file of the bank statement"
+        blank=True,
+        help_text="PDF file of the bank statement (uploads made before content-addressed storage)"
+    )
+    blob = models.ForeignKey(
+        StatementBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='statements',
+        help_text="Content-addressed PDF shared with identical uploads"
     )
     original_filename = models.CharField(max_length=255, help_text="Original filename of the uploaded file")
     file_size = models.BigIntegerField(help_text="Size of the file in bytes")
@@ -39,15 +173,65 @@ class BankStatement(models.Model):
         help_text="Current processing status"
     )
     error_message = models.TextField(blank=True, null=True, help_text="Error message if processing failed")
+    reprocess_requested_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When bulk reprocessing queued the statement (cleared when processing starts)"
+    )
+    reprocess_use_cache = models.BooleanField(
+        default=True,
+        help_text="Whether the queued reprocessing may reuse a cached extraction"
+    )
+    file_deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the PDF was deleted by the retention policy (the metadata is kept)"
+    )
+    extracted_summary = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Statement-level extraction results (account name and type, period, initial balance)"
+    )
+    period_start = models.DateField(null=True, blank=True, help_text="First day of the statement period")
+    period_end = models.DateField(null=True, blank=True, help_text="Last day of the statement period")
+    account_id = models.CharField(
+        max_length=20,
+        null=True,
+        blank=True,
+        help_text="ID of the Account the statement's transactions belong to (given at upload or set on commit)"
+    )
+    batch = models.ForeignKey(
+        BankStatementBatch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='statements',
+        help_text="Batch this statement was uploaded in, if any"
+    )
     
     class Meta:
         ordering = ['-upload_date']
         verbose_name = "Bank Statement"
         verbose_name_plural = "Bank Statements"
+        indexes = [
+            models.Index(fields=['owner', 'upload_date'], name='bankstatement_owner_date_idx'),
+            # Period coverage lookups (bankstatements/coverage.py)
+            models.Index(fields=['owner', 'account_id', 'period_start'], name='bankstatement_owner_period_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user_id} - {self.original_filename} ({self.upload_date.strftime('%Y-%m-%d')})"
     
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.owner_id is None:
+            self.owner_id = _user_pk(self.user_id)
+        super().save(*args, **kwargs)
+    
+    @property
+    def owner_username(self):
+        """Current username of the uploader (user_id keeps the name used at upload)."""
+        return self.owner.username if self.owner_id else self.user_id
+    
     def get_file_size_display(self):
         """Return human-readable file size."""
         size = self.file_size
@@ -58,8 +242,109 @@ class BankStatement(models.Model):
         return f"{size:.1f} TB"
     
     def delete(self, *args, **kwargs):
-        """Override delete to also remove the file from filesystem."""
-        if self.file:
-            if os.path.isfile(self.file.path):
-                os.remove(self.file.path)
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        """
+        Override delete to also release the stored file.
+        
+        Nothing is removed from disk here. Blobs are only dereferenced, and
+        files of older uploads are queued; ``sweep_statement_blobs`` removes both later.
+        """
+        from .storage import defer_file_deletion, release_statement_blob
+        
+        blob_id = self.blob_id
+        legacy_file = (self.file.name, self.file_size) if self.file else None
+        with db_transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if legacy_file:
+                defer_file_deletion(*legacy_file)
+        if blob_id:
+            release_statement_blob(blob_id)
+        return result
+
+
+class StagedTransaction(models.Model):
+    """
+    A transaction extracted from a bank statement, kept for review until it is
+    committed into the Transaction table.
+    """
+    
+    TRANSACTION_TYPES = [
+        ('Income', 'Income'),
+        ('Expense', 'Expense'),
+        ('Transfer', 'Transfer'),
+    ]
+    
+    id = models.AutoField(primary_key=True)
+    statement = models.ForeignKey(
+        BankStatement,
+        on_delete=models.CASCADE,
+        related_name='staged_transactions',
+        help_text="Bank statement the transaction was extracted from"
+    )
+    position = models.PositiveIntegerField(help_text="Order of the transaction in the extraction result")
+    date = models.DateField(null=True, blank=True)
+    title = models.CharField(max_length=120)
+    amount = MoneyField(default=0, help_text="Amount, stored in cents")
+    transaction_type = models.CharField(max_length=30, choices=TRANSACTION_TYPES)
+    category = models.CharField(max_length=30)
+    committed = models.BooleanField(default=False, help_text="Whether the row has been moved into Transaction")
+    transaction = models.ForeignKey(
+        'transaction.Transaction',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Transaction created when the row was committed"
+    )
+    
+    class Meta:
+        ordering = ['statement', 'position']
+        verbose_name = "Staged Transaction"
+        verbose_name_plural = "Staged Transactions"
+    
+    def __str__(self):
+        return f"{self.title} - ${self.amount} ({self.date})"
+
+
+class StatementProcessingMetrics(models.Model):
+    """
+    Timings and token usage of the extraction run for a bank statement.
+    """
+    
+    id = models.AutoField(primary_key=True)
+    statement = models.OneToOneField(
+        BankStatement,
+        on_delete=models.CASCADE,
+        related_name='metrics',
+        help_text="Bank statement the metrics belong to"
+    )
+    backend = models.CharField(max_length=20, help_text="Extraction backend that processed the statement")
+    model_name = models.CharField(max_length=100, blank=True, help_text="Gemini model or local parser used")
+    input_mode = models.CharField(max_length=20, blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    chunk_count = models.PositiveIntegerField(default=1)
+    succeeded = models.BooleanField(default=False)
+    transaction_count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(help_text="Wall time of the whole extraction")
+    text_extraction_seconds = models.FloatField(default=0.0)
+    upload_seconds = models.FloatField(default=0.0)
+    processing_wait_seconds = models.FloatField(default=0.0, help_text="Time waiting for the uploaded file to be processed")
+    generation_seconds = models.FloatField(default=0.0)
+    backoff_seconds = models.FloatField(default=0.0, help_text="Time spent backing off after rate limits")
+    parse_seconds = models.FloatField(default=0.0, help_text="Time parsing the response (or the PDF, for local parsers)")
+    first_transaction_seconds = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Time from the start of generation to the first streamed transaction"
+    )
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    output_tokens = models.PositiveIntegerField(null=True, blank=True)
+    total_tokens = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Statement Processing Metrics"
+        verbose_name_plural = "Statement Processing Metrics"
+    
+    def __str__(self):
+        return f"Metrics for statement {self.statement_id} ({self.model_name}, {self.total_seconds:.1f}s)"
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BankStatementCursorPagination(CursorPagination):
+    """
+    Cursor pagination for a user's statement history, newest first.
+    
+    Each page is a range scan on the (owner, upload_date) index, so it costs
+    the same no matter how deep into the history it is.
+    """
+    
+    ordering = '-upload_date'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,607 @@
+"""
+Rule-based parsers for bank statements that carry a text layer.
+
+Most bank PDFs are generated digitally, so their transactions can be read
+directly from the page text with pypdf and a per-bank template. The parsers
+in this module return results in the same shape as the AI extraction so the
+caller can use them interchangeably, together with a confidence score that
+decides whether the AI fallback is still needed.
+"""
+import re
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypdf import PdfReader
+    PDF_TEXT_EXTRACTION_AVAILABLE = True
+except ImportError:
+    PDF_TEXT_EXTRACTION_AVAILABLE = False
+    logger.warning("pypdf not available. Local bank statement parsing is disabled.")
+
+
+MONTH_ABBREVIATIONS = {
+    # Spanish
+    'ENE': 1, 'FEB': 2, 'MAR': 3, 'ABR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AGO': 8, 'SEP': 9, 'SET': 9, 'OCT': 10, 'NOV': 11, 'DIC': 12,
+    # English (only the ones that differ from Spanish)
+    'JAN': 1, 'APR': 4, 'AUG': 8, 'DEC': 12,
+}
+
+AMOUNT_REGEX = r'-?\(?\$?\s?\d{1,3}(?:,\d{3})*\.\d{2}\)?-?'
+
+# Keywords used to categorize locally parsed transactions.
+# Checked in order; the first keyword found in the upper-cased title wins.
+CATEGORY_KEYWORDS = [
+    ('Salary', ['NOMINA', 'NÓMINA', 'PAYROLL', 'SALARY', 'SUELDO']),
+    ('Balance Transfer', ['PAGO TARJETA', 'PAGO TDC', 'PAGO RECIBIDO', 'CARD PAYMENT', 'SU PAGO']),
+    ('Money Transfer', ['SPEI', 'TRANSFERENCIA', 'TRASPASO', 'TRANSFER', 'WIRE']),
+    ('Transportation', ['UBER', 'DIDI', 'CABIFY', 'GASOLINERA', 'GAS STATION', 'PEMEX', 'SHELL', 'ESTACIONAMIENTO', 'PARKING', 'CASETA']),
+    ('Food and drinks', ['OXXO', 'WALMART', 'SORIANA', 'CHEDRAUI', 'COSTCO', 'STARBUCKS', 'RESTAURANT', 'RESTAURANTE', 'RAPPI', 'UBER EATS', 'CAFE', 'GROCER']),
+    ('Bills and utilities', ['CFE', 'TELMEX', 'TELCEL', 'IZZI', 'TOTALPLAY', 'AT&T', 'AGUA', 'ELECTRIC', 'INTERNET']),
+    ('Entertainment', ['NETFLIX', 'SPOTIFY', 'DISNEY', 'HBO', 'CINEPOLIS', 'CINEMEX', 'STEAM', 'PLAYSTATION', 'XBOX']),
+    ('Shopping', ['AMAZON', 'MERCADO LIBRE', 'MERCADOPAGO', 'LIVERPOOL', 'PALACIO DE HIERRO', 'COPPEL', 'SHEIN']),
+    ('Medical', ['FARMACIA', 'PHARMACY', 'HOSPITAL', 'DOCTOR', 'MEDIC']),
+    ('Insurance', ['SEGURO', 'INSURANCE', 'GNP', 'AXA']),
+    ('Education', ['COLEGIATURA', 'UNIVERSIDAD', 'ESCUELA', 'TUITION', 'UDEMY', 'COURSERA']),
+    ('Investments', ['INVERSION', 'INVERSIÓN', 'INVESTMENT', 'GBM', 'CETES']),
+    ('Loans', ['PRESTAMO', 'PRÉSTAMO', 'CREDITO HIPOTECARIO', 'LOAN']),
+]
+
+# Keywords that identify money coming into the account when the statement
+# layout does not tell us the direction of an amount.
+INCOME_KEYWORDS = [
+    'ABONO', 'DEPOSITO', 'DEPÓSITO', 'RECIBIDO', 'NOMINA', 'NÓMINA', 'SU PAGO',
+    'PAGO RECIBIDO', 'DEVOLUCION', 'DEVOLUCIÓN', 'REEMBOLSO', 'INTERESES GANADOS',
+    'DEPOSIT', 'PAYMENT RECEIVED', 'REFUND', 'PAYROLL', 'CREDIT',
+]
+
+
+def extract_pdf_text(pdf_file_path: str, page_range: Optional[Tuple[int, int]] = None) -> List[str]:
+    """
+    Extract the text layer of a PDF, one string per page.
+
+    Args:
+        pdf_file_path: Path to the PDF file
+        page_range: Optional (start, end) zero-based, end-exclusive page range
+
+    Returns:
+        List of page texts. Pages without a text layer yield empty strings.
+    """
+    if not PDF_TEXT_EXTRACTION_AVAILABLE:
+        return []
+
+    # Open the file ourselves: given a path, PdfReader reads the whole file into memory
+    with open(pdf_file_path, 'rb') as f:
+        pages = PdfReader(f).pages
+        start, end = page_range if page_range else (0, len(pages))
+
+        page_texts = []
+        for page_number in range(start, min(end, len(pages))):
+            try:
+                page_texts.append(pages[page_number].extract_text() or '')
+            except Exception as e:
+                logger.debug(f"Could not extract text from page {page_number}: {str(e)}")
+                page_texts.append('')
+    return page_texts
+
+
+PAGE_NUMBER_PATTERN = re.compile(
+    r'^(?:P[AÁ]GINA|PAGE|HOJA|PAG\.?)?\s*\d+\s*(?:DE|OF|/)\s*\d+$', re.IGNORECASE
+)
+
+# Lines containing these (and no amounts) are legal or marketing boilerplate
+BOILERPLATE_KEYWORDS = [
+    'CONDUSEF', 'UNIDAD ESPECIALIZADA', 'AVISO DE PRIVACIDAD', 'IPAB', 'WWW.', 'HTTP',
+    'ATENCI', 'CONSULTE', 'ESTIMADO CLIENTE', 'DUDAS', 'ACLARACIONES', 'TERMS AND CONDITIONS',
+    'PRIVACY', 'CUSTOMER SERVICE', 'MEMBER FDIC',
+]
+
+
+def compact_statement_text(page_texts: List[str]) -> str:
+    """
+    Compact statement text for sending to the model.
+
+    Removes lines that repeat on most pages (headers and footers), page
+    numbers and legal boilerplate, and collapses whitespace. Transaction rows
+    are kept untouched.
+
+    Args:
+        page_texts: Text of each page, as returned by ``extract_pdf_text``
+
+    Returns:
+        The compacted text, with a marker line before each page.
+    """
+    pages = [
+        [' '.join(line.split()) for line in text.splitlines() if line.strip()]
+        for text in page_texts
+    ]
+
+    # A line that appears on at least half of the pages is a header or footer
+    repeated_lines = set()
+    if len(pages) >= 2:
+        line_counts: Dict[str, int] = {}
+        for lines in pages:
+            for line in set(lines):
+                line_counts[line] = line_counts.get(line, 0) + 1
+        threshold = max(2, len(pages) // 2)
+        repeated_lines = {line for line, count in line_counts.items() if count >= threshold}
+
+    compacted_pages = []
+    for page_number, lines in enumerate(pages, start=1):
+        kept = []
+        for line in lines:
+            if line in repeated_lines or PAGE_NUMBER_PATTERN.match(line):
+                continue
+            has_digits = any(char.isdigit() for char in line)
+            if not has_digits:
+                line_upper = line.upper()
+                if len(line) > 120 or any(keyword in line_upper for keyword in BOILERPLATE_KEYWORDS):
+                    continue
+            kept.append(line)
+        if kept:
+            compacted_pages.append(f"--- Page {page_number} ---\n" + '\n'.join(kept))
+
+    # Headers are dropped from every page, but they usually carry the bank,
+    # account and period, so keep a single copy at the top.
+    header = [line for line in (pages[0] if pages else []) if line in repeated_lines]
+    if header:
+        compacted_pages.insert(0, '\n'.join(header))
+
+    return '\n'.join(compacted_pages)
+
+
+def parse_amount(value: str) -> Optional[float]:
+    """
+    Parse an amount such as "1,234.56", "$1,234.56", "-1,234.56", "1,234.56-" or "(1,234.56)".
+
+    Returns:
+        The signed amount, or None if the value is not an amount.
+    """
+    if not value:
+        return None
+
+    value = value.strip().replace(' ', '')
+    negative = value.startswith('-') or value.endswith('-') or (value.startswith('(') and value.endswith(')'))
+    cleaned = value.strip('-()').replace('$', '').replace(',', '')
+
+    try:
+        amount = float(cleaned)
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+def parse_date(value: str, year_hint: Optional[int] = None, month_hint: Optional[int] = None) -> Optional[str]:
+    """
+    Parse the date formats commonly printed on bank statements into YYYY-MM-DD.
+
+    Supported formats: "15/01/2024", "15/01/24", "15-ENE-2024", "15/ENE/24",
+    "15 ENE 2024", "15/ENE" and "15 ENE" (the last two need ``year_hint``).
+    When the year is missing and ``month_hint`` is given, months after the hint
+    are assumed to belong to the previous year (e.g. December rows on a January
+    statement).
+    """
+    if not value:
+        return None
+
+    parts = re.split(r'[/\-\s.]+', value.strip().upper())
+    if len(parts) < 2:
+        return None
+
+    try:
+        day = int(parts[0])
+    except ValueError:
+        return None
+
+    month_token = parts[1]
+    if month_token.isdigit():
+        month = int(month_token)
+    else:
+        month = MONTH_ABBREVIATIONS.get(month_token[:3])
+    if not month:
+        return None
+
+    if len(parts) >= 3 and parts[2].isdigit():
+        year = int(parts[2])
+        if year < 100:
+            year += 2000
+    elif year_hint:
+        year = year_hint
+        if month_hint and month > month_hint:
+            year -= 1
+    else:
+        return None
+
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def guess_category(title: str) -> str:
+    """Guess a category for a transaction title using keyword rules."""
+    title_upper = (title or '').upper()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in title_upper for keyword in keywords):
+            return category
+    return 'Others'
+
+
+class StatementParser:
+    """
+    Base template for a bank statement layout.
+
+    Subclasses describe a layout with regular expressions; the parsing logic
+    is shared. ``transaction_pattern`` is matched against each text line and
+    must define the named groups ``date``, ``title`` and ``amount``, and may
+    define ``balance`` for layouts with a running balance column.
+    """
+
+    name = 'generic'
+    bank_name: Optional[str] = None
+    account_type: Optional[str] = None
+
+    # At least one of these must appear in the statement text for the parser to apply.
+    # An empty list means the parser is a candidate for every statement.
+    detect_patterns: List[str] = []
+
+    # A line starting with this pattern is considered a transaction candidate
+    date_pattern = r'\d{2}/\d{2}/\d{2,4}'
+    transaction_pattern = (
+        r'^(?P<date>\d{2}/\d{2}/\d{2,4})\s+(?P<title>.+?)\s+'
+        r'(?P<amount>' + AMOUNT_REGEX + r')(?:\s+(?P<balance>' + AMOUNT_REGEX + r'))?$'
+    )
+    period_pattern = (
+        r'(?:PERIOD|PERIODO|DEL)\D{0,20}(?P<start>\d{2}/\d{2}/\d{4})\s*(?:AL|TO|-|A)\s*(?P<end>\d{2}/\d{2}/\d{4})'
+    )
+    initial_balance_pattern = (
+        r'(?:SALDO ANTERIOR|SALDO INICIAL|OPENING BALANCE|PREVIOUS BALANCE|BEGINNING BALANCE)'
+        r'\D{0,20}(?P<amount>' + AMOUNT_REGEX + r')'
+    )
+    closing_balance_pattern = (
+        r'(?:SALDO FINAL|SALDO ACTUAL|CLOSING BALANCE|ENDING BALANCE|NEW BALANCE)'
+        r'\D{0,20}(?P<amount>' + AMOUNT_REGEX + r')'
+    )
+    account_name_pattern: Optional[str] = None
+
+    # Credit card balances grow with expenses; bank account balances shrink.
+    balance_grows_with_expenses = False
+
+    # Lines containing any of these are never treated as transactions
+    ignore_line_keywords = ['SALDO ANTERIOR', 'SALDO INICIAL', 'SALDO FINAL', 'SALDO ACTUAL']
+    # Rows whose description starts with one of these words are summaries ("TOTAL CARGOS"),
+    # matched as whole words so merchants such as TOTALPLAY are kept
+    ignore_description_words = ['TOTAL', 'TOTALES']
+
+    def matches(self, text: str) -> bool:
+        """Check whether this template applies to the statement text."""
+        if not self.detect_patterns:
+            return True
+        return any(re.search(pattern, text, re.IGNORECASE) for pattern in self.detect_patterns)
+
+    def parse(self, page_texts: List[str]) -> Dict[str, Any]:
+        """
+        Parse the statement pages.
+
+        Returns:
+            Dictionary with the extraction result fields plus ``confidence``
+            (0.0 - 1.0) and ``parser`` (the template name).
+        """
+        text = '\n'.join(page_texts)
+        statement_period = self._find_period(text)
+        initial_balance = self._find_amount(self.initial_balance_pattern, text)
+        closing_balance = self._find_amount(self.closing_balance_pattern, text)
+
+        year_hint = month_hint = None
+        if statement_period:
+            end_date = date.fromisoformat(statement_period['end'])
+            year_hint, month_hint = end_date.year, end_date.month
+
+        transactions = []
+        candidate_lines = 0
+        verified_rows = 0
+        previous_balance = initial_balance
+        line_regex = re.compile(self.transaction_pattern, re.IGNORECASE)
+        date_regex = re.compile(r'^' + self.date_pattern, re.IGNORECASE)
+        summary_regex = re.compile(
+            r'^(?:' + self.date_pattern + r'\s+)+(?:' + '|'.join(self.ignore_description_words) + r')\b',
+            re.IGNORECASE
+        )
+
+        for raw_line in text.splitlines():
+            line = ' '.join(raw_line.split())
+            if not line or not date_regex.match(line):
+                continue
+            if any(keyword in line.upper() for keyword in self.ignore_line_keywords) or summary_regex.match(line):
+                continue
+
+            candidate_lines += 1
+            match = line_regex.match(line)
+            if not match:
+                continue
+
+            transaction_date = parse_date(match.group('date'), year_hint, month_hint)
+            amount = parse_amount(match.group('amount'))
+            if transaction_date is None or amount is None:
+                continue
+
+            title = match.group('title').strip()
+            balance = parse_amount(match.groupdict().get('balance') or '')
+            transaction_type, verified = self._infer_type(title, amount, balance, previous_balance)
+            if verified:
+                verified_rows += 1
+            if balance is not None:
+                previous_balance = balance
+
+            transactions.append({
+                'date': transaction_date,
+                'title': title,
+                'amount': abs(amount),
+                'transaction_type': transaction_type,
+                'category': guess_category(title),
+            })
+
+        confidence = self._score(transactions, candidate_lines, verified_rows, initial_balance, closing_balance)
+
+        return {
+            'transactions': transactions,
+            'account_name': self._find_account_name(text),
+            'account_type': self.account_type,
+            'statement_period': statement_period,
+            'initial_balance': initial_balance,
+            'confidence': confidence,
+            'parser': self.name,
+        }
+
+    def scan(self, page_texts: List[str]) -> Dict[str, Any]:
+        """
+        Read the statement period, the account name and the date of every
+        transaction row, page by page, without parsing the rows themselves.
+
+        Returns:
+            Dictionary with ``statement_period``, ``account_name``, ``parser``
+            and ``page_dates`` (a list of YYYY-MM-DD dates for each page)
+        """
+        text = '\n'.join(page_texts)
+        statement_period = self._find_period(text)
+        year_hint = month_hint = None
+        if statement_period:
+            end_date = date.fromisoformat(statement_period['end'])
+            year_hint, month_hint = end_date.year, end_date.month
+
+        date_regex = re.compile(r'^(?P<date>' + self.date_pattern + r')', re.IGNORECASE)
+        page_dates = []
+        for page_text in page_texts:
+            dates = []
+            for raw_line in page_text.splitlines():
+                match = date_regex.match(' '.join(raw_line.split()))
+                if match:
+                    row_date = parse_date(match.group('date'), year_hint, month_hint)
+                    if row_date:
+                        dates.append(row_date)
+            page_dates.append(dates)
+
+        return {
+            'statement_period': statement_period,
+            'account_name': self._find_account_name(text),
+            'parser': self.name,
+            'page_dates': page_dates,
+        }
+
+    def _infer_type(self, title: str, amount: float, balance: Optional[float],
+                    previous_balance: Optional[float]) -> Tuple[str, bool]:
+        """
+        Decide whether a row is Income or Expense.
+
+        Returns:
+            Tuple of (transaction_type, verified) where ``verified`` is True when
+            the direction was confirmed by the running balance column.
+        """
+        if balance is not None and previous_balance is not None:
+            delta = round(balance - previous_balance, 2)
+            if abs(abs(delta) - abs(amount)) < 0.01:
+                increased = delta > 0
+                if self.balance_grows_with_expenses:
+                    return ('Expense' if increased else 'Income'), True
+                return ('Income' if increased else 'Expense'), True
+
+        if amount < 0:
+            return ('Income' if self.balance_grows_with_expenses else 'Expense'), False
+
+        title_upper = title.upper()
+        if any(keyword in title_upper for keyword in INCOME_KEYWORDS):
+            return 'Income', False
+        return 'Expense', False
+
+    def _score(self, transactions: List[Dict], candidate_lines: int, verified_rows: int,
+               initial_balance: Optional[float], closing_balance: Optional[float]) -> float:
+        """
+        Score how much the parsed result can be trusted.
+
+        Coverage (parsed rows / candidate rows) is only trusted fully when the
+        totals reconcile with the printed balances or every row was verified
+        against the running balance column.
+        """
+        if not transactions or not candidate_lines:
+            return 0.0
+
+        coverage = len(transactions) / candidate_lines
+
+        if initial_balance is not None and closing_balance is not None:
+            income = sum(t['amount'] for t in transactions if t['transaction_type'] == 'Income')
+            expenses = sum(t['amount'] for t in transactions if t['transaction_type'] == 'Expense')
+            if self.balance_grows_with_expenses:
+                expected_closing = initial_balance + expenses - income
+            else:
+                expected_closing = initial_balance + income - expenses
+            if abs(expected_closing - closing_balance) < 0.01:
+                return coverage
+            return coverage * 0.5
+
+        if verified_rows == len(transactions):
+            return coverage
+        return coverage * 0.8
+
+    def _find_period(self, text: str) -> Optional[Dict[str, str]]:
+        match = re.search(self.period_pattern, text, re.IGNORECASE)
+        if not match:
+            return None
+        start = parse_date(match.group('start'))
+        end = parse_date(match.group('end'))
+        if not start or not end:
+            return None
+        return {'start': start, 'end': end}
+
+    def _find_amount(self, pattern: Optional[str], text: str) -> Optional[float]:
+        if not pattern:
+            return None
+        match = re.search(pattern, text, re.IGNORECASE)
+        return parse_amount(match.group('amount')) if match else None
+
+    def _find_account_name(self, text: str) -> Optional[str]:
+        if self.account_name_pattern:
+            match = re.search(self.account_name_pattern, text, re.IGNORECASE)
+            if match:
+                return ' '.join(match.group('name').split())
+        return self.bank_name
+
+
+class BBVAMexicoParser(StatementParser):
+    """BBVA México debit/checking statements ("Libretón", "Cuenta Express", ...)."""
+
+    name = 'bbva_mx'
+    bank_name = 'BBVA'
+    account_type = 'Debit Card'
+    detect_patterns = [r'BBVA\s+(?:MEXICO|MÉXICO|BANCOMER)', r'BBVA\s+BANCOMER']
+    date_pattern = r'\d{2}/[A-Z]{3}'
+    # "02/ENE 02/ENE SPEI RECIBIDO BANORTE 1,500.00 12,345.67 12,345.67"
+    transaction_pattern = (
+        r'^(?P<date>\d{2}/[A-Z]{3})\s+(?:\d{2}/[A-Z]{3}\s+)?(?P<title>.+?)\s+'
+        r'(?P<amount>' + AMOUNT_REGEX + r')(?:\s+(?P<balance>' + AMOUNT_REGEX + r'))?'
+        r'(?:\s+' + AMOUNT_REGEX + r')?$'
+    )
+    initial_balance_pattern = r'SALDO (?:DE LIQUIDACI[OÓ]N )?(?:ANTERIOR|INICIAL)\D{0,20}(?P<amount>' + AMOUNT_REGEX + r')'
+    closing_balance_pattern = r'SALDO (?:DE LIQUIDACI[OÓ]N )?(?:FINAL|ACTUAL)\D{0,20}(?P<amount>' + AMOUNT_REGEX + r')'
+    account_name_pattern = r'(?P<name>(?:LIBRET[OÓ]N|CUENTA)\s+[A-ZÁÉÍÓÚ]+(?:\s+[A-ZÁÉÍÓÚ]+)?)'
+
+
+class SantanderMexicoParser(StatementParser):
+    """Santander México checking statements with a running balance column."""
+
+    name = 'santander_mx'
+    bank_name = 'Santander'
+    account_type = 'Checking'
+    detect_patterns = [r'BANCO SANTANDER', r'SANTANDER\s+M[EÉ]XICO']
+    date_pattern = r'\d{2}-[A-Z]{3}-\d{4}'
+    # "15-ENE-2024 0123456 PAGO SERVICIO CFE 850.00 10,150.25"
+    transaction_pattern = (
+        r'^(?P<date>\d{2}-[A-Z]{3}-\d{4})\s+(?:\d{5,}\s+)?(?P<title>.+?)\s+'
+        r'(?P<amount>' + AMOUNT_REGEX + r')\s+(?P<balance>' + AMOUNT_REGEX + r')$'
+    )
+    period_pattern = r'PERIODO\D{0,20}(?P<start>\d{2}-[A-Z]{3}-\d{4})\s*(?:AL|A)\s*(?P<end>\d{2}-[A-Z]{3}-\d{4})'
+
+
+class BanorteParser(StatementParser):
+    """Banorte checking statements."""
+
+    name = 'banorte'
+    bank_name = 'Banorte'
+    account_type = 'Checking'
+    detect_patterns = [r'BANORTE']
+    date_pattern = r'\d{2}-[A-Z]{3}-\d{2}'
+    # "03-ENE-24 COMPRA OXXO SUC 123 45.50 9,954.50"
+    transaction_pattern = (
+        r'^(?P<date>\d{2}-[A-Z]{3}-\d{2})\s+(?P<title>.+?)\s+'
+        r'(?P<amount>' + AMOUNT_REGEX + r')\s+(?P<balance>' + AMOUNT_REGEX + r')$'
+    )
+    period_pattern = r'PERIODO\D{0,20}(?P<start>\d{2}/\d{2}/\d{4})\s*(?:AL|A|-)\s*(?P<end>\d{2}/\d{2}/\d{4})'
+
+
+class NuMexicoCreditCardParser(StatementParser):
+    """Nu México credit card statements (payments are printed as negative amounts)."""
+
+    name = 'nu_mx_credit'
+    bank_name = 'Nu'
+    account_type = 'Credit Card'
+    detect_patterns = [r'NU M[EÉ]XICO', r'\bNUBANK\b']
+    date_pattern = r'\d{2}\s+[A-Z]{3}'
+    # "05 ENE UBER *TRIP 123.00" / "10 ENE PAGO RECIBIDO -$2,000.00"
+    transaction_pattern = (
+        r'^(?P<date>\d{2}\s+[A-Z]{3})\s+(?P<title>.+?)\s+(?P<amount>' + AMOUNT_REGEX + r')$'
+    )
+    period_pattern = r'PERIODO\D{0,20}(?P<start>\d{2}\s+[A-Z]{3}\s+\d{4})\s*(?:AL|A|-)\s*(?P<end>\d{2}\s+[A-Z]{3}\s+\d{4})'
+    initial_balance_pattern = r'(?:SALDO ANTERIOR|SALDO DEL PERIODO ANTERIOR)\D{0,20}(?P<amount>' + AMOUNT_REGEX + r')'
+    closing_balance_pattern = r'(?:SALDO AL CORTE|SALDO TOTAL|SALDO ACTUAL)\D{0,20}(?P<amount>' + AMOUNT_REGEX + r')'
+    balance_grows_with_expenses = True
+
+
+# Bank-specific templates first, generic fallback last.
+STATEMENT_PARSERS = [
+    BBVAMexicoParser(),
+    SantanderMexicoParser(),
+    BanorteParser(),
+    NuMexicoCreditCardParser(),
+    StatementParser(),
+]
+
+
+def parse_statement_text(page_texts: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Run every matching template over the statement text and keep the best result.
+
+    Args:
+        page_texts: Text of each page, as returned by ``extract_pdf_text``
+
+    Returns:
+        The highest-confidence parse result, or None if no template applies.
+    """
+    text = '\n'.join(page_texts)
+    if not text.strip():
+        return None
+
+    best_result = None
+    for parser in STATEMENT_PARSERS:
+        if not parser.matches(text):
+            continue
+        try:
+            result = parser.parse(page_texts)
+        except Exception as e:
+            logger.warning(f"Parser {parser.name} failed: {str(e)}")
+            continue
+        if best_result is None or result['confidence'] > best_result['confidence']:
+            best_result = result
+
+    return best_result
+
+
+def scan_statement_text(page_texts: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Find the statement period and the row dates of each page (see ``StatementParser.scan``).
+
+    Matching templates are tried in order and the first one that finds the
+    statement period is used.
+
+    Args:
+        page_texts: Text of each page, as returned by ``extract_pdf_text``
+
+    Returns:
+        The scan result, or None if the PDF has no text layer or no template finds the period
+    """
+    text = '\n'.join(page_texts)
+    if not text.strip():
+        return None
+
+    for parser in STATEMENT_PARSERS:
+        if not parser.matches(text):
+            continue
+        try:
+            result = parser.scan(page_texts)
+        except Exception as e:
+            logger.warning(f"Parser {parser.name} failed to scan the statement: {str(e)}")
+            continue
+        if result['statement_period']:
+            return result
+    return None
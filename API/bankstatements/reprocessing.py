@@ -0,0 +1,162 @@
+"""
+Bulk reprocessing of stored bank statements (admin action and
+``python manage.py reprocess_statements``).
+
+Statements are re-extracted from the PDF they already have in storage, so
+nothing is uploaded again. Before the extraction backend is called, a cached
+extraction of the same PDF is looked for:
+
+- a recording under BANK_STATEMENT_RECORDINGS_DIR (see the record/replay backend)
+- another completed statement that shares the same stored blob
+
+Jobs go through the rate-limited, smallest-file-first ``ReprocessQueue``.
+"""
+import os
+import json
+import logging
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .backends import recording_file_path
+from .workers import get_reprocess_queue
+
+logger = logging.getLogger(__name__)
+
+
+def _recorded_extraction(sha256: str) -> Optional[Dict[str, Any]]:
+    recordings_dir = getattr(settings, 'BANK_STATEMENT_RECORDINGS_DIR', None)
+    if not recordings_dir:
+        return None
+    path = recording_file_path(recordings_dir, sha256)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable extraction recording {path}: {str(e)}")
+        return None
+    return None if result.get('error') else result
+
+
+def _sibling_statement(bank_statement):
+    from .models import BankStatement
+
+    if bank_statement.blob_id is None:
+        return None
+    return BankStatement.objects.filter(
+        blob_id=bank_statement.blob_id,
+        processing_status='completed',
+        extracted_summary__isnull=False
+    ).exclude(id=bank_statement.id).order_by('-upload_date').first()
+
+
+def find_cached_extraction(bank_statement) -> Optional[Dict[str, Any]]:
+    """
+    Return an earlier extraction result of the statement's PDF, if there is one.
+
+    Args:
+        bank_statement: BankStatement to reprocess
+
+    Returns:
+        Extraction result dictionary with ``cached`` set to where it came from
+        ('recording' or 'statement'), or None
+    """
+    if bank_statement.blob_id is None:
+        return None
+
+    result = _recorded_extraction(bank_statement.blob.sha256)
+    if result is not None:
+        result['cached'] = 'recording'
+        return result
+
+    sibling = _sibling_statement(bank_statement)
+    if sibling is None:
+        return None
+    summary = sibling.extracted_summary or {}
+    return {
+        'transactions': [
+            {
+                'date': row.date.isoformat() if row.date else None,
+                'title': row.title,
+                'amount': row.amount,
+                'transaction_type': row.transaction_type,
+                'category': row.category,
+            }
+            for row in sibling.staged_transactions.order_by('position')
+        ],
+        'account_name': summary.get('account_name'),
+        'account_type': summary.get('account_type'),
+        'statement_period': summary.get('statement_period'),
+        'initial_balance': summary.get('initial_balance'),
+        'raw_response': None,
+        'cached': 'statement',
+        'error': None
+    }
+
+
+def has_cached_extraction(statement_id: int) -> bool:
+    """Whether reprocessing the statement can use a cached extraction instead of the backend."""
+    from .models import BankStatement
+
+    bank_statement = BankStatement.objects.select_related('blob').filter(id=statement_id).first()
+    if bank_statement is None or bank_statement.blob_id is None:
+        return False
+    recordings_dir = getattr(settings, 'BANK_STATEMENT_RECORDINGS_DIR', None)
+    if recordings_dir and os.path.exists(recording_file_path(recordings_dir, bank_statement.blob.sha256)):
+        return True
+    return _sibling_statement(bank_statement) is not None
+
+
+def queue_statement_reprocessing(queryset, use_cache: bool = True, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Queue statements for reprocessing.
+
+    Statements are skipped when they are being processed right now, when
+    their PDF was deleted by the retention policy, or when some of their
+    transactions were already committed (extracting them again would stage
+    duplicates). The queued statements are reset to 'pending' and marked with
+    ``reprocess_requested_at``.
+
+    Args:
+        queryset: BankStatement queryset to reprocess
+        use_cache: Use cached extractions of the same PDF when available
+        dry_run: Only report what would be queued
+
+    Returns:
+        Dictionary with the number of statements queued, their ids and a count per skip reason
+    """
+    from .models import BankStatement
+
+    skipped = {'processing': 0, 'no_pdf': 0, 'committed': 0}
+    jobs = []
+    candidates = queryset.filter(file_deleted_at__isnull=True).exclude(processing_status='processing')
+    skipped['processing'] = queryset.filter(processing_status='processing').count()
+    skipped['no_pdf'] = queryset.exclude(processing_status='processing').filter(file_deleted_at__isnull=False).count()
+
+    committed_ids = set(
+        candidates.filter(staged_transactions__committed=True).values_list('id', flat=True).distinct()
+    )
+    rows = candidates.values_list('id', 'file_size', 'blob_id', 'file', 'user_id')
+    for statement_id, file_size, blob_id, file_name, user_id in rows:
+        if statement_id in committed_ids:
+            skipped['committed'] += 1
+        elif blob_id is None and not file_name:
+            skipped['no_pdf'] += 1
+        else:
+            jobs.append((file_size, statement_id, user_id))
+
+    statement_ids = [job[1] for job in jobs]
+    if dry_run or not jobs:
+        return {'queued': len(jobs), 'statement_ids': statement_ids, 'skipped': skipped}
+
+    # Persisted, so a restart can queue them again (workers.recover_pending_statements)
+    BankStatement.objects.filter(id__in=statement_ids).update(
+        processing_status='pending', error_message=None,
+        reprocess_requested_at=timezone.now(), reprocess_use_cache=use_cache
+    )
+    queued = get_reprocess_queue().put(sorted(jobs), use_cache=use_cache)
+    logger.info(f"Queued {queued} bank statements for reprocessing (skipped: {skipped})")
+    return {'queued': queued, 'statement_ids': statement_ids, 'skipped': skipped}
@@ -0,0 +1,246 @@
+"""
+Failure handling for calls to the Gemini API.
+
+- ``CircuitBreaker``: after enough consecutive transient failures (429, 5xx,
+  timeouts), calls fail immediately for a cool-down period instead of every
+  worker waiting on an API that is down. One breaker is shared per process.
+- ``Deadline``: an overall time budget for one statement, passed down to every
+  call and wait so a statement can never hang a worker for longer.
+- ``backoff_delays``: exponential backoff with full jitter, used for file
+  state polling and 429 retries.
+"""
+import random
+import re
+import threading
+import time
+import logging
+from typing import Iterator, Optional
+
+from django.conf import settings
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    GOOGLE_TRANSIENT_ERRORS = (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServerError,
+        google_exceptions.RetryError,
+    )
+    GOOGLE_RATE_LIMIT_ERRORS = (google_exceptions.TooManyRequests,)
+except ImportError:
+    GOOGLE_TRANSIENT_ERRORS = ()
+    GOOGLE_RATE_LIMIT_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses that mean the service is overloaded or unhealthy
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# For errors without a status code: the message starts with the status ("503 Service
+# Unavailable", as the Gemini client and the fake server report them) or names the condition
+STATUS_PREFIX_PATTERN = re.compile(r'^\s*(\d{3})\b')
+TRANSIENT_MESSAGE_PATTERN = re.compile(
+    r'\b(?:quota|resource_?exhausted|rate limit(?:ed)?|internal error|(?:service ?)?unavailable'
+    r'|deadline exceeded|timed out|timeout|connection (?:reset|refused|aborted|error))\b',
+    re.IGNORECASE
+)
+RATE_LIMIT_MESSAGE_PATTERN = re.compile(r'\b(?:quota|resource_?exhausted|rate limit(?:ed)?)\b', re.IGNORECASE)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a statement's processing deadline has passed."""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of an API error: its ``code`` or ``status_code``, or the number its message starts with."""
+    for candidate in (error, getattr(error, 'response', None)):
+        for attribute in ('code', 'status_code'):
+            value = getattr(candidate, attribute, None)
+            if isinstance(value, int) and 100 <= value <= 599:
+                return value
+    match = STATUS_PREFIX_PATTERN.match(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an API error is a 429 / quota error."""
+    if isinstance(error, GOOGLE_RATE_LIMIT_ERRORS):
+        return True
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code == 429
+    return bool(RATE_LIMIT_MESSAGE_PATTERN.search(str(error)))
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether an API error means the service is unhealthy rather than the request being wrong."""
+    if isinstance(error, (TimeoutError, ConnectionError, DeadlineExceeded) + GOOGLE_TRANSIENT_ERRORS):
+        return True
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code in TRANSIENT_STATUS_CODES
+    return bool(TRANSIENT_MESSAGE_PATTERN.search(str(error)))
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    Closed: calls go through. After ``failure_threshold`` consecutive transient
+    failures it opens, and ``before_call`` raises CircuitOpenError for
+    ``reset_timeout`` seconds. Then it is half-open: one trial call is allowed,
+    and its outcome closes or re-opens the circuit.
+
+    Args:
+        name: Name used in log messages and errors
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds the circuit stays open before a trial call
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be made now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                retry_in = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if retry_in > 0:
+                    raise CircuitOpenError(
+                        f"{self.name} is unavailable (circuit open after repeated failures); "
+                        f"retrying in {retry_in:.0f}s"
+                    )
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                raise CircuitOpenError(f"{self.name} is being probed after repeated failures; try again shortly")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"Circuit breaker '{self.name}' opened after {self._failures} failures "
+                        f"for {self.reset_timeout:.0f}s"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_error(self, error: Exception):
+        """Count an error against the breaker if it is transient; release a half-open trial otherwise."""
+        if is_transient_error(error):
+            self.record_failure()
+        else:
+            with self._lock:
+                self._trial_in_flight = False
+
+
+class Deadline:
+    """
+    Time budget shared by every call made for one statement.
+
+    Args:
+        seconds: Total budget; None means no deadline
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        self.seconds = seconds
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None if there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, action: str = 'processing'):
+        """Raise DeadlineExceeded if the budget is used up."""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded while {action}")
+
+    def timeout(self, default: Optional[float] = None) -> Optional[float]:
+        """Timeout for a single call: the default capped to the remaining budget."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if default is None:
+            return remaining
+        return min(default, remaining)
+
+    def sleep(self, seconds: float, action: str = 'waiting'):
+        """Sleep, but raise DeadlineExceeded instead of sleeping past the deadline."""
+        remaining = self.remaining()
+        if remaining is not None and seconds >= remaining:
+            time.sleep(remaining)
+            self.check(action)
+        time.sleep(seconds)
+
+
+def backoff_delays(base: float = 0.5, cap: float = 8.0, factor: float = 2.0) -> Iterator[float]:
+    """
+    Yield exponential backoff delays with full jitter: uniform in [0, min(cap, base * factor ** n)].
+    """
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(cap, base * factor ** attempt))
+        attempt += 1
+
+
+_gemini_breaker = None
+_gemini_breaker_lock = threading.Lock()
+
+
+def get_gemini_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide circuit breaker for Gemini calls."""
+    global _gemini_breaker
+    with _gemini_breaker_lock:
+        if _gemini_breaker is None:
+            _gemini_breaker = CircuitBreaker(
+                'Gemini API',
+                failure_threshold=getattr(settings, 'GEMINI_CIRCUIT_FAILURE_THRESHOLD', 5),
+                reset_timeout=getattr(settings, 'GEMINI_CIRCUIT_RESET_SECONDS', 30),
+            )
+        return _gemini_breaker
+
+
+def new_statement_deadline() -> Deadline:
+    """Create the deadline for processing one statement (BANK_STATEMENT_AI_DEADLINE_SECONDS)."""
+    seconds = getattr(settings, 'BANK_STATEMENT_AI_DEADLINE_SECONDS', 180)
+    return Deadline(seconds if seconds and seconds > 0 else None)
@@ -0,0 +1,144 @@
+"""
+Retention policies for uploaded bank statements.
+
+- PDFs of completed statements are deleted BANK_STATEMENT_RETENTION_PDF_DAYS
+  days after upload. The BankStatement row, its staged transactions and the
+  extracted summary are kept.
+- Failed statements are deleted entirely BANK_STATEMENT_RETENTION_FAILED_DAYS
+  days after upload.
+
+A policy set to 0 days is disabled. Rows are handled in chunks, each in its
+own short database transaction, so the cleanup never holds long locks.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .storage import release_statement_blob, sweep_unreferenced_blobs
+
+logger = logging.getLogger(__name__)
+
+
+def _chunked_ids(queryset, batch_size: int):
+    """Yield lists of primary keys, walking the queryset by id so each chunk is a fresh indexed query."""
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def _total_file_size(ids) -> int:
+    from .models import BankStatement
+
+    return BankStatement.objects.filter(id__in=ids).aggregate(total=Sum('file_size'))['total'] or 0
+
+
+def _release_files(statements, stats: Dict[str, int]):
+    """Drop the blob references and legacy files of a chunk of statements (inside its transaction)."""
+    from .models import BankStatement, StatementBlob
+
+    blob_refs = Counter(statement.blob_id for statement in statements if statement.blob_id)
+    for blob_id, count in blob_refs.items():
+        if release_statement_blob(blob_id, count):
+            stats['bytes_released'] += StatementBlob.objects.filter(id=blob_id).values_list(
+                'stored_size', flat=True
+            ).first() or 0
+
+    legacy_files = [(statement.file.name, statement.file_size) for statement in statements if statement.file]
+    if legacy_files:
+        storage = BankStatement._meta.get_field('file').storage
+
+        def delete_legacy_files():
+            for name, size in legacy_files:
+                try:
+                    if storage.exists(name):
+                        storage.delete(name)
+                        stats['bytes_reclaimed'] += size
+                except OSError as e:
+                    logger.warning(f"Could not delete statement file {name}: {str(e)}")
+
+        db_transaction.on_commit(delete_legacy_files)
+
+
+def apply_retention(pdf_days: Optional[int] = None, failed_days: Optional[int] = None,
+                    batch_size: int = 500, dry_run: bool = False,
+                    sweep_grace_minutes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Apply the statement retention policies, then sweep unreferenced blobs.
+
+    Args:
+        pdf_days: Delete PDFs of completed statements older than this (default: BANK_STATEMENT_RETENTION_PDF_DAYS)
+        failed_days: Delete failed statements older than this (default: BANK_STATEMENT_RETENTION_FAILED_DAYS)
+        batch_size: Statements handled per database transaction
+        dry_run: Only count what would be removed
+        sweep_grace_minutes: Grace period passed to the blob sweeper
+
+    Returns:
+        Dictionary with the number of PDFs and failed rows removed, the bytes
+        released (blobs now unreferenced, deleted by the sweeper after its grace
+        period) and the bytes actually reclaimed from storage
+    """
+    from .models import BankStatement
+
+    if pdf_days is None:
+        pdf_days = getattr(settings, 'BANK_STATEMENT_RETENTION_PDF_DAYS', 0)
+    if failed_days is None:
+        failed_days = getattr(settings, 'BANK_STATEMENT_RETENTION_FAILED_DAYS', 0)
+    now = timezone.now()
+    stats = {'pdfs_deleted': 0, 'failed_deleted': 0, 'bytes_released': 0, 'bytes_reclaimed': 0}
+
+    if pdf_days > 0:
+        expired_pdfs = BankStatement.objects.filter(
+            processing_status='completed',
+            upload_date__lt=now - timedelta(days=pdf_days),
+            file_deleted_at__isnull=True
+        )
+        for ids in _chunked_ids(expired_pdfs, batch_size):
+            if dry_run:
+                stats['pdfs_deleted'] += len(ids)
+                stats['bytes_released'] += _total_file_size(ids)
+                continue
+            with db_transaction.atomic():
+                statements = list(
+                    expired_pdfs.select_for_update(skip_locked=True).filter(id__in=ids).only('id', 'blob', 'file', 'file_size')
+                )
+                BankStatement.objects.filter(id__in=[statement.id for statement in statements]).update(
+                    blob=None, file='', file_deleted_at=now
+                )
+                _release_files(statements, stats)
+            stats['pdfs_deleted'] += len(statements)
+
+    if failed_days > 0:
+        expired_failed = BankStatement.objects.filter(
+            processing_status='failed',
+            upload_date__lt=now - timedelta(days=failed_days)
+        )
+        for ids in _chunked_ids(expired_failed, batch_size):
+            if dry_run:
+                stats['failed_deleted'] += len(ids)
+                stats['bytes_released'] += _total_file_size(ids)
+                continue
+            with db_transaction.atomic():
+                statements = list(
+                    expired_failed.select_for_update(skip_locked=True).filter(id__in=ids).only('id', 'blob', 'file', 'file_size')
+                )
+                BankStatement.objects.filter(id__in=[statement.id for statement in statements]).delete()
+                _release_files(statements, stats)
+            stats['failed_deleted'] += len(statements)
+
+    sweep = sweep_unreferenced_blobs(sweep_grace_minutes, dry_run=dry_run)
+    stats['blobs_swept'] = sweep['deleted']
+    stats['bytes_reclaimed'] += sweep['bytes_reclaimed']
+
+    if not dry_run:
+        logger.info(f"Statement retention: {stats}")
+    return stats
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import BankStatement
+from .models import BankStatement, BankStatementBatch, StagedTransaction
 
 
 class BankStatementUploadSerializer(serializers.ModelSerializer):
@@ -58,7 +58,11 @@ class BankStatementResponseSerializer(serializers.ModelSerializer):
             'upload_date_display',
             'processed',
             'processing_status',
-            'error_message'
+            'error_message',
+            'file_deleted_at',
+            'period_start',
+            'period_end',
+            'account_id'
         ]
         read_only_fields = fields
     
@@ -69,3 +73,81 @@ class BankStatementResponseSerializer(serializers.ModelSerializer):
     def get_upload_date_display(self, obj):
         """Return formatted upload date."""
         return obj.upload_date.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class BankStatementSummarySerializer(serializers.ModelSerializer):
+    """
+    Lightweight serializer for statement listings (no error details).
+    """
+    
+    class Meta:
+        model = BankStatement
+        fields = [
+            'id',
+            'original_filename',
+            'file_size',
+            'upload_date',
+            'processing_status'
+        ]
+        read_only_fields = fields
+
+
+class BankStatementBatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for batch upload progress.
+    """
+    
+    user_id = serializers.CharField(source='owner_username', read_only=True)
+    progress = serializers.SerializerMethodField()
+    statements = BankStatementResponseSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = BankStatementBatch
+        fields = [
+            'id',
+            'user_id',
+            'created_at',
+            'total_files',
+            'rejected_files',
+            'progress',
+            'statements'
+        ]
+        read_only_fields = fields
+    
+    def get_progress(self, obj):
+        """Return per-status counts and overall completion."""
+        return obj.get_progress()
+
+
+class StagedTransactionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for extracted transactions awaiting review.
+    
+    Only the transaction fields can be edited; the statement link and commit
+    state are managed by the commit endpoint.
+    """
+    
+    # Stored in cents (MoneyField); exposed as a decimal amount. The sign comes from transaction_type
+    amount = serializers.FloatField(required=False, min_value=0)
+    
+    class Meta:
+        model = StagedTransaction
+        fields = [
+            'id',
+            'statement',
+            'position',
+            'date',
+            'title',
+            'amount',
+            'transaction_type',
+            'category',
+            'committed',
+            'transaction'
+        ]
+        read_only_fields = ['id', 'statement', 'position', 'committed', 'transaction']
+    
+    def validate(self, attrs):
+        """Committed rows are final."""
+        if self.instance is not None and self.instance.committed:
+            raise serializers.ValidationError("This transaction has already been committed.")
+        return attrs
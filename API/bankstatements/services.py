@@ -6,12 +6,37 @@ import json
 import base64
 import logging
 import time
-import io
-from typing import Dict, List, Optional, Any
+import shutil
+import tempfile
+import threading
+import contextlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.files import File
+from django.db import connection as db_connection, transaction as db_transaction
+from django.db.models import F
+from django.utils.dateparse import parse_date
 import google.generativeai as genai
 
+from .parsers import extract_pdf_text, parse_statement_text, compact_statement_text
+from .backends import get_extraction_backend
+from .storage import statement_pdf_path
+from .streaming import TransactionStreamParser
+from .metrics import record_processing_metrics
+from .reprocessing import find_cached_extraction
+from .coverage import apply_statement_coverage, check_statement_coverage, covered_statement_result
+from .resilience import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    backoff_delays,
+    get_gemini_circuit_breaker,
+    is_rate_limit_error,
+    new_statement_deadline,
+)
+from transaction.merchants import apply_merchant_categories, record_categorizations
+
 logger = logging.getLogger(__name__)
 
 # Try to import PDF libraries for password-protected PDF support
@@ -32,12 +57,175 @@ except ImportError:
         logger.warning("PDF libraries (pypdf/PyPDF2) not available. Password-protected PDFs cannot be processed.")
 
 
-def process_bank_statement_with_ai(pdf_file_path: str) -> Dict[str, Any]:
+# Exact categories available in the UI (must match BankStatementReview.vue)
+AVAILABLE_CATEGORIES = [
+    'Awards',
+    'Bills and utilities',
+    'Education',
+    'Entertainment',
+    'Food and drinks',
+    'Gifts',
+    'Insurance',
+    'Investments',
+    'Loans',
+    'Medical',
+    'Others',
+    'Salary',
+    'Shopping',
+    'Transportation',
+    'Transfer',
+    'Account Transfer',
+    'Money Transfer',
+    'Balance Transfer'
+]
+
+# Category mapping for common variations
+CATEGORY_MAPPING = {
+    'Food': 'Food and drinks',
+    'Food & Drinks': 'Food and drinks',
+    'Restaurant': 'Food and drinks',
+    'Groceries': 'Food and drinks',
+    'Transport': 'Transportation',
+    'Transportation': 'Transportation',
+    'Bills': 'Bills and utilities',
+    'Utilities': 'Bills and utilities',
+    'Other': 'Others',
+    'Misc': 'Others',
+    'Miscellaneous': 'Others',
+    'General': 'Others',
+    'Shopping': 'Shopping',
+    'Entertainment': 'Entertainment',
+    'Medical': 'Medical',
+    'Healthcare': 'Medical',
+    'Education': 'Education',
+    'Salary': 'Salary',
+    'Income': 'Salary',
+    'Wages': 'Salary',
+    'Transfer': 'Transfer',
+    'Money Transfer': 'Money Transfer',
+    'Account Transfer': 'Account Transfer',
+    'Balance Transfer': 'Balance Transfer',
+    'Gifts': 'Gifts',
+    'Insurance': 'Insurance',
+    'Loans': 'Loans',
+    'Investments': 'Investments',
+    'Awards': 'Awards'
+}
+
+# Mapping for common account type variations
+ACCOUNT_TYPE_MAPPING = {
+    'savings account': 'Savings',
+    'checking account': 'Checking',
+    'credit card': 'Credit Card',
+    'debit card': 'Debit Card',
+    'checking': 'Checking',
+    'savings': 'Savings',
+    'credit': 'Credit Card',
+    'debit': 'Débito',
+    'cash': 'Efectivo',
+    'investment': 'Investment',
+    'loan': 'Loan',
+    'mortgage': 'Mortgage',
+    'business': 'Business',
+    'other': 'Other'
+}
+
+
+# Case-insensitive lookup built once: valid categories and their mapped variations
+CATEGORY_LOOKUP = {
+    **{variation.lower(): valid_cat for variation, valid_cat in CATEGORY_MAPPING.items()},
+    **{valid_cat.lower(): valid_cat for valid_cat in AVAILABLE_CATEGORIES},
+}
+
+
+def normalize_category(category: str) -> str:
+    """Normalize category to match valid categories."""
+    if not category:
+        return 'Others'
+    
+    category = category.strip()
+    
+    # Exact or mapped match (case-insensitive)
+    category_lower = category.lower()
+    if category_lower in CATEGORY_LOOKUP:
+        return CATEGORY_LOOKUP[category_lower]
+    
+    # Try partial match
+    for valid_cat in AVAILABLE_CATEGORIES:
+        if category_lower in valid_cat.lower() or valid_cat.lower() in category_lower:
+            return valid_cat
+    
+    # Default to Others
+    logger.warning(f"Category '{category}' not found in valid categories, using 'Others'")
+    return 'Others'
+
+
+def normalize_account_type(account_type: str) -> str:
+    """Normalize account type to match UI expectations."""
+    if not account_type:
+        return 'Other'
+    
+    account_type = account_type.strip()
+    account_type_lower = account_type.lower()
+    
+    # Check exact match first
+    if account_type_lower in ACCOUNT_TYPE_MAPPING:
+        return ACCOUNT_TYPE_MAPPING[account_type_lower]
+    
+    # Check partial matches
+    for key, value in ACCOUNT_TYPE_MAPPING.items():
+        if key in account_type_lower or account_type_lower in key:
+            return value
+    
+    # If it contains "savings", normalize to "Savings"
+    if 'savings' in account_type_lower:
+        return 'Savings'
+    # If it contains "checking", normalize to "Checking"
+    if 'checking' in account_type_lower:
+        return 'Checking'
+    # If it contains "credit", normalize to "Credit Card"
+    if 'credit' in account_type_lower and 'card' in account_type_lower:
+        return 'Credit Card'
+    # If it contains "debit", normalize to "Débito"
+    if 'debit' in account_type_lower and 'card' in account_type_lower:
+        return 'Débito'
+    
+    # Return original if no match found
+    return account_type
+
+
+# Backoff (with full jitter) between polls of an uploaded file's state
+FILE_POLL_BACKOFF_BASE = 0.5
+FILE_POLL_BACKOFF_CAP = 8.0
+# Backoff (with full jitter) before trying the next model after a 429
+RATE_LIMIT_BACKOFF_BASE = 1.0
+RATE_LIMIT_BACKOFF_CAP = 16.0
+
+
+def process_bank_statement_with_ai(pdf_file_path: str, input_mode: Optional[str] = None,
+                                   page_range: Optional[Tuple[int, int]] = None, client=None,
+                                   deadline=None,
+                                   on_transaction: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
     """
     Process a bank statement PDF using Google AI Studio (Gemini API) to extract transactions.
     
+    Two input modes are supported:
+    - 'text': The PDF text layer is extracted and compacted locally and sent
+      as the prompt body. No file upload or processing wait is needed.
+    - 'file': The raw PDF is uploaded with the File API. Used for scanned
+      statements without a usable text layer.
+    
     Args:
         pdf_file_path: Path to the uploaded PDF file
+        input_mode: 'text' or 'file'. Defaults to the BANK_STATEMENT_AI_INPUT_MODE setting.
+        page_range: Optional (start, end) zero-based, end-exclusive range of pages to process
+        client: Module or object with the google.generativeai API surface. Defaults to
+            google.generativeai; the fake Gemini client is used for offline benchmarks.
+        deadline: Deadline shared by every call made for the statement. A new one of
+            BANK_STATEMENT_AI_DEADLINE_SECONDS is started when not given.
+        on_transaction: Optional callback. When given (and BANK_STATEMENT_AI_STREAM is
+            enabled), the response is streamed and the callback receives each validated
+            transaction as soon as it has been generated.
         
     Returns:
         Dictionary containing:
@@ -46,6 +234,12 @@ def process_bank_statement_with_ai(pdf_file_path: str) -> Dict[str, Any]:
         - account_type: Account type (Credit Card, Debit Card, Checking Account, Savings Account, or Other)
         - statement_period: Dictionary with start and end dates
         - raw_response: Raw AI response for debugging
+        - input_mode: The input mode that was actually used
+        - model_name: The model that produced the response
+        - usage: Token counts reported by the API (prompt, output and total)
+        - timings: Seconds spent per phase (text_extraction, upload, processing_wait,
+          generation, backoff, parse), and first_transaction (seconds from the start of
+          the successful request to the first streamed transaction) when streaming
     """
     api_key = getattr(settings, 'GOOGLE_AI_API_KEY', None)
     
@@ -61,9 +255,19 @@ def process_bank_statement_with_ai(pdf_file_path: str) -> Dict[str, Any]:
             'error': 'AI API key not configured'
         }
     
+    client = client or genai
+    deadline = deadline or new_statement_deadline()
+    breaker = get_gemini_circuit_breaker()
+    stream = on_transaction is not None and getattr(settings, 'BANK_STATEMENT_AI_STREAM', True)
+    streamed_count = 0
+    timings = {}
+    
+    def add_timing(phase: str, started: float):
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - started
+    
     try:
         # Configure the API
-        genai.configure(api_key=api_key)
+        client.configure(api_key=api_key)
         
         # Try to find an available model that supports file uploads
         # Prioritize free-tier friendly models first (Flash models have better free tier limits)
@@ -88,7 +292,7 @@ def process_bank_statement_with_ai(pdf_file_path: str) -> Dict[str, Any]:
         
         for name in model_names_to_try:
             try:
-                model = genai.GenerativeModel(name)
+                model = client.GenerativeModel(name)
                 model_name = name
                 logger.info(f"Successfully loaded model: {model_name}")
                 break
@@ -99,7 +303,7 @@ def process_bank_statement_with_ai(pdf_file_path: str) -> Dict[str, Any]:
         if model is None:
             # Last resort: try to list available models
             try:
-                available_models = genai.list_models()
+                available_models = client.list_models()
                 logger.info("Attempting to find available models...")
                 for m in available_models:
                     model_display_name = m.display_name or m.name
@@ -107,7 +311,7 @@ def process_bank_statement_with_ai(pdf_file_path: str) -> Dict[str, Any]:
                         # Extract model name (remove 'models/' prefix if present)
                         model_id = m.name.replace('models/', '')
                         try:
-                            model = genai.GenerativeModel(model_id)
+                            model = client.GenerativeModel(model_id)
                             model_name = model_id
                             logger.info(f"Found and using model: {model_name}")
                             break
@@ -123,37 +327,28 @@ def process_bank_statement_with_ai(pdf_file_path: str) -> Dict[str, Any]:
                 "Try visiting https://aistudio.google.com/ to verify your API key and available models."
             )
         
-        # Define the exact categories available in the UI (must match BankStatementReview.vue)
-        available_categories = [
-            'Awards',
-            'Bills and utilities',
-            'Education',
-            'Entertainment',
-            'Food and drinks',
-            'Gifts',
-            'Insurance',
-            'Investments',
-            'Loans',
-            'Medical',
-            'Others',
-            'Salary',
-            'Shopping',
-            'Transportation',
-            'Transfer',
-            'Account Transfer',
-            'Money Transfer',
-            'Balance Transfer'
-        ]
+        # Decide how the statement is sent to the model
+        input_mode = input_mode or getattr(settings, 'BANK_STATEMENT_AI_INPUT_MODE', 'text')
+        statement_text = None
+        if input_mode == 'text':
+            started = time.perf_counter()
+            statement_text = compact_statement_text(extract_pdf_text(pdf_file_path, page_range))
+            add_timing('text_extraction', started)
+            min_text_length = getattr(settings, 'BANK_STATEMENT_AI_MIN_TEXT_LENGTH', 200)
+            if len(statement_text) < min_text_length:
+                logger.info("PDF has no usable text layer, sending the file to the model instead")
+                input_mode = 'file'
+                statement_text = None
         
         # Create the prompt for transaction extraction
-        prompt = f"""Analyze this bank statement PDF and extract all transactions.
+        prompt = f"""Analyze this bank statement and extract all transactions.
 
 For each transaction, extract:
 - date (format: YYYY-MM-DD)
 - title/description (transaction description)
 - amount (as a positive number)
 - transaction_type (either "Income", "Expense", or "Transfer")
-- category: MUST be one of these exact categories: {', '.join(available_categories)}
+- category: MUST be one of these exact categories: {', '.join(AVAILABLE_CATEGORIES)}
 
 Also extract:
 - account_name: The name of the bank account
@@ -187,7 +382,7 @@ Return the data as a JSON object with this exact structure:
 }}
 
 CRITICAL CATEGORY RULES:
-- The category field MUST be one of these exact values (case-sensitive): {', '.join(available_categories)}
+- The category field MUST be one of these exact values (case-sensitive): {', '.join(AVAILABLE_CATEGORIES)}
 - Do NOT create new categories or use variations
 - Category mapping guide:
   * Food, groceries, restaurants, cafes → "Food and drinks"
@@ -223,45 +418,91 @@ Important:
   This should be the balance at the START of the statement period, before any transactions are applied. It is often displayed in a summary table with columns like "Saldo Anterior", "Intereses", "Saldo Actual". The "Saldo Anterior" value is the initial_balance. Extract the exact numeric value you see, even if it's a large number like 232902.12.
 """
         
-        # For PDF processing, try file upload API
+        if page_range:
+            prompt += f"""
+This is only pages {page_range[0] + 1} to {page_range[1]} of a longer statement. Extract only the transactions printed on these pages.
+If the statement summary is not on these pages, use null for initial_balance and for any field you cannot see.
+"""
+        
+        # In file mode, upload the PDF with the File API
         # If we hit quota errors, try the next model in the list
         uploaded_file = None
+        upload_path = pdf_file_path
         last_error = None
         response = None
         
         try:
+            if input_mode == 'file' and page_range:
+                upload_path = write_pdf_page_range(pdf_file_path, page_range)
+            
             # Try processing with the selected model, and if quota error, try other models
+            # after a jittered backoff. Every call is bounded by the statement deadline and
+            # skipped entirely while the circuit breaker is open.
             models_to_retry = [model_name] + [name for name in model_names_to_try if name != model_name]
+            rate_limit_delays = backoff_delays(RATE_LIMIT_BACKOFF_BASE, RATE_LIMIT_BACKOFF_CAP)
+            request_timeout = getattr(settings, 'BANK_STATEMENT_AI_REQUEST_TIMEOUT', 120)
             
             for retry_model_name in models_to_retry:
+                deadline.check('waiting for the Gemini API')
+                breaker.before_call()
                 try:
                     # Create model instance for this retry
-                    retry_model = genai.GenerativeModel(retry_model_name)
+                    retry_model = client.GenerativeModel(retry_model_name)
                     logger.info(f"Attempting to process with model: {retry_model_name}")
                     
                     # Upload the file to Gemini
-                    if uploaded_file is None:
-                        uploaded_file = genai.upload_file(path=pdf_file_path, mime_type='application/pdf')
+                    if input_mode == 'file' and uploaded_file is None:
+                        started = time.perf_counter()
+                        uploaded_file = client.upload_file(path=upload_path, mime_type='application/pdf')
+                        add_timing('upload', started)
                         
                         # Wait for file to be processed
+                        started = time.perf_counter()
+                        poll_delays = backoff_delays(FILE_POLL_BACKOFF_BASE, FILE_POLL_BACKOFF_CAP)
                         while uploaded_file.state.name == "PROCESSING":
-                            time.sleep(2)
-                            uploaded_file = genai.get_file(uploaded_file.name)
+                            deadline.sleep(next(poll_delays), 'waiting for the uploaded file to be processed')
+                            uploaded_file = client.get_file(uploaded_file.name)
+                        add_timing('processing_wait', started)
                         
                         if uploaded_file.state.name == "FAILED":
                             raise Exception(f"File upload failed: {uploaded_file.state.name}")
                     
-                    # Generate content with the uploaded file
-                    response = retry_model.generate_content([prompt, uploaded_file])
+                    # Generate content with the statement text or the uploaded file
+                    if input_mode == 'text':
+                        contents = [prompt, f"Bank statement text:\n{statement_text}"]
+                    else:
+                        contents = [prompt, uploaded_file]
+                    timeout = deadline.timeout(request_timeout)
+                    request_kwargs = {'request_options': {'timeout': timeout}} if timeout is not None else {}
+                    started = time.perf_counter()
+                    try:
+                        if stream:
+                            response = retry_model.generate_content(contents, stream=True, **request_kwargs)
+                            streamed_count = _stream_transactions(
+                                response, on_transaction, streamed_count, started, timings
+                            )
+                        else:
+                            response = retry_model.generate_content(contents, **request_kwargs)
+                    finally:
+                        add_timing('generation', started)
+                    breaker.record_success()
                     model_name = retry_model_name  # Update to the model that worked
                     break  # Success! Exit the retry loop
                     
+                except DeadlineExceeded as e:
+                    breaker.record_error(e)
+                    raise
                 except Exception as e:
+                    breaker.record_error(e)
                     error_str = str(e)
                     # Check if it's a quota/rate limit error
-                    if '429' in error_str or 'quota' in error_str.lower() or 'ResourceExhausted' in error_str:
-                        logger.warning(f"Quota exceeded for model {retry_model_name}, trying next model...")
+                    if is_rate_limit_error(e):
+                        logger.warning(f"Quota exceeded for model {retry_model_name}, backing off before the next model...")
                         last_error = e
+                        if retry_model_name != models_to_retry[-1]:
+                            started = time.perf_counter()
+                            deadline.sleep(next(rate_limit_delays), 'backing off after a rate limit')
+                            add_timing('backoff', started)
                         continue  # Try next model
                     else:
                         # For other errors, log and re-raise
@@ -273,7 +514,7 @@ Important:
                         continue
             
             # If we exhausted all models due to quota, raise a helpful error
-            if response is None and last_error and ('429' in str(last_error) or 'quota' in str(last_error).lower()):
+            if response is None and last_error and is_rate_limit_error(last_error):
                 raise Exception(
                     f"All models exceeded quota limits. Please check your Google AI Studio quota at "
                     f"https://ai.dev/usage?tab=rate-limit. "
@@ -287,11 +528,14 @@ Important:
             # Clean up the uploaded file if it was created
             if uploaded_file:
                 try:
-                    genai.delete_file(uploaded_file.name)
+                    client.delete_file(uploaded_file.name)
                 except Exception:
                     pass  # Ignore cleanup errors
+            if upload_path != pdf_file_path and os.path.exists(upload_path):
+                os.remove(upload_path)
         
         # Extract the text response
+        parse_started = time.perf_counter()
         response_text = response.text.strip()
         
         # Try to parse JSON from the response
@@ -317,124 +561,6 @@ Important:
                 'error': f'Failed to parse AI response: {str(e)}'
             }
         
-        # Use the same categories list defined earlier
-        valid_categories = available_categories
-        
-        # Category mapping for common variations
-        category_mapping = {
-            'Food': 'Food and drinks',
-            'Food & Drinks': 'Food and drinks',
-            'Restaurant': 'Food and drinks',
-            'Groceries': 'Food and drinks',
-            'Transport': 'Transportation',
-            'Transportation': 'Transportation',
-            'Bills': 'Bills and utilities',
-            'Utilities': 'Bills and utilities',
-            'Other': 'Others',
-            'Misc': 'Others',
-            'Miscellaneous': 'Others',
-            'General': 'Others',
-            'Shopping': 'Shopping',
-            'Entertainment': 'Entertainment',
-            'Medical': 'Medical',
-            'Healthcare': 'Medical',
-            'Education': 'Education',
-            'Salary': 'Salary',
-            'Income': 'Salary',
-            'Wages': 'Salary',
-            'Transfer': 'Transfer',
-            'Money Transfer': 'Money Transfer',
-            'Account Transfer': 'Account Transfer',
-            'Balance Transfer': 'Balance Transfer',
-            'Gifts': 'Gifts',
-            'Insurance': 'Insurance',
-            'Loans': 'Loans',
-            'Investments': 'Investments',
-            'Awards': 'Awards'
-        }
-        
-        def normalize_category(category: str) -> str:
-            """Normalize category to match valid categories."""
-            if not category:
-                return 'Others'
-            
-            category = category.strip()
-            
-            # Check if it's already valid
-            if category in valid_categories:
-                return category
-            
-            # Try mapping
-            if category in category_mapping:
-                return category_mapping[category]
-            
-            # Try case-insensitive match
-            category_lower = category.lower()
-            for valid_cat in valid_categories:
-                if valid_cat.lower() == category_lower:
-                    return valid_cat
-            
-            # Try partial match
-            for valid_cat in valid_categories:
-                if category_lower in valid_cat.lower() or valid_cat.lower() in category_lower:
-                    return valid_cat
-            
-            # Default to Others
-            logger.warning(f"Category '{category}' not found in valid categories, using 'Others'")
-            return 'Others'
-        
-        # Normalize account type
-        def normalize_account_type(account_type: str) -> str:
-            """Normalize account type to match UI expectations."""
-            if not account_type:
-                return 'Other'
-            
-            account_type = account_type.strip()
-            account_type_lower = account_type.lower()
-            
-            # Mapping for common variations
-            account_type_mapping = {
-                'savings account': 'Savings',
-                'checking account': 'Checking',
-                'credit card': 'Credit Card',
-                'debit card': 'Debit Card',
-                'checking': 'Checking',
-                'savings': 'Savings',
-                'credit': 'Credit Card',
-                'debit': 'Débito',
-                'cash': 'Efectivo',
-                'investment': 'Investment',
-                'loan': 'Loan',
-                'mortgage': 'Mortgage',
-                'business': 'Business',
-                'other': 'Other'
-            }
-            
-            # Check exact match first
-            if account_type_lower in account_type_mapping:
-                return account_type_mapping[account_type_lower]
-            
-            # Check partial matches
-            for key, value in account_type_mapping.items():
-                if key in account_type_lower or account_type_lower in key:
-                    return value
-            
-            # If it contains "savings", normalize to "Savings"
-            if 'savings' in account_type_lower:
-                return 'Savings'
-            # If it contains "checking", normalize to "Checking"
-            if 'checking' in account_type_lower:
-                return 'Checking'
-            # If it contains "credit", normalize to "Credit Card"
-            if 'credit' in account_type_lower and 'card' in account_type_lower:
-                return 'Credit Card'
-            # If it contains "debit", normalize to "Débito"
-            if 'debit' in account_type_lower and 'card' in account_type_lower:
-                return 'Débito'
-            
-            # Return original if no match found
-            return account_type
-        
         # Validate and normalize the response structure
         raw_account_type = extracted_data.get('account_type', 'Other')
         normalized_account_type = normalize_account_type(raw_account_type)
@@ -446,6 +572,9 @@ Important:
             'statement_period': extracted_data.get('statement_period'),
             'initial_balance': extracted_data.get('initial_balance'),  # Add this line
             'raw_response': response_text,
+            'input_mode': input_mode,
+            'model_name': model_name,
+            'usage': get_response_usage(response),
             'error': None
         }
         
@@ -460,25 +589,27 @@ Important:
         # Validate transaction structure and normalize categories
         validated_transactions = []
         for transaction in result['transactions']:
-            if all(key in transaction for key in ['date', 'title', 'amount', 'transaction_type']):
-                # Ensure amount is a float
-                try:
-                    transaction['amount'] = float(transaction['amount'])
-                    
-                    # Normalize category to match UI categories
-                    if 'category' in transaction:
-                        transaction['category'] = normalize_category(transaction['category'])
-                    else:
-                        transaction['category'] = 'Others'
-                    
-                    validated_transactions.append(transaction)
-                except (ValueError, TypeError):
-                    logger.warning(f"Invalid amount in transaction: {transaction}")
+            transaction = validate_extracted_transaction(transaction)
+            if transaction is not None:
+                validated_transactions.append(transaction)
         
         result['transactions'] = validated_transactions
+        add_timing('parse', parse_started)
+        result['timings'] = timings
         
         return result
         
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        logger.warning(f"AI processing stopped: {str(e)}")
+        return {
+            'transactions': [],
+            'account_name': None,
+            'account_type': None,
+            'statement_period': None,
+            'initial_balance': None,
+            'raw_response': None,
+            'error': f'AI processing failed: {str(e)}'
+        }
     except FileNotFoundError:
         logger.error(f"PDF file not found: {pdf_file_path}")
         return {
@@ -503,55 +634,383 @@ Important:
         }
 
 
+def _stream_transactions(response, on_transaction: Callable[[Dict[str, Any]], None],
+                         already_emitted: int, started: float, timings: Dict[str, float]) -> int:
+    """
+    Read a streamed response, passing each transaction to the callback as soon as it is complete.
+    
+    When a model fails mid-stream and the next one is tried, the transactions
+    already passed on by the failed attempt are not passed on again.
+    
+    Returns:
+        Number of transactions passed to the callback so far (over all attempts)
+    """
+    parser = TransactionStreamParser()
+    emitted = already_emitted
+    for chunk in response:
+        for transaction in parser.feed(getattr(chunk, 'text', '') or ''):
+            if parser.count <= emitted:
+                continue
+            emitted = parser.count
+            transaction = validate_extracted_transaction(transaction)
+            if transaction is None:
+                continue
+            if 'first_transaction' not in timings:
+                timings['first_transaction'] = time.perf_counter() - started
+            on_transaction(dict(transaction))
+    return emitted
+
+
+def validate_extracted_transaction(transaction: Any) -> Optional[Dict[str, Any]]:
+    """
+    Check that an extracted transaction has the required fields and normalize it.
+    
+    The amount is converted to a float and the category mapped to a UI
+    category ('Others' when missing).
+    
+    Returns:
+        The transaction (updated in place), or None if it is incomplete or invalid
+    """
+    if not isinstance(transaction, dict):
+        return None
+    if not all(key in transaction for key in ['date', 'title', 'amount', 'transaction_type']):
+        return None
+    # Ensure amount is a float
+    try:
+        transaction['amount'] = float(transaction['amount'])
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid amount in transaction: {transaction}")
+        return None
+    
+    # Normalize category to match UI categories
+    if 'category' in transaction:
+        transaction['category'] = normalize_category(transaction['category'])
+    else:
+        transaction['category'] = 'Others'
+    return transaction
+
+
+def get_response_usage(response) -> Optional[Dict[str, int]]:
+    """
+    Read token counts from a Gemini response.
+    
+    Returns:
+        Dictionary with prompt_tokens, output_tokens and total_tokens, or None
+        if the response has no usage metadata.
+    """
+    usage_metadata = getattr(response, 'usage_metadata', None)
+    if usage_metadata is None:
+        return None
+    return {
+        'prompt_tokens': getattr(usage_metadata, 'prompt_token_count', 0) or 0,
+        'output_tokens': getattr(usage_metadata, 'candidates_token_count', 0) or 0,
+        'total_tokens': getattr(usage_metadata, 'total_token_count', 0) or 0,
+    }
+
+
+def get_pdf_page_count(pdf_file_path: str) -> int:
+    """Return the number of pages in a PDF, or 0 if it cannot be read."""
+    if not PDF_LIBRARY_AVAILABLE or PYPDF2_AVAILABLE:
+        return 0
+    try:
+        with open(pdf_file_path, 'rb') as f:
+            return len(PdfReader(f).pages)
+    except Exception as e:
+        logger.warning(f"Could not count PDF pages: {str(e)}")
+        return 0
+
+
+def write_pdf_page_range(pdf_file_path: str, page_range: Tuple[int, int]) -> str:
+    """
+    Write a range of pages of a PDF to a temporary file.
+    
+    Args:
+        pdf_file_path: Path to the source PDF
+        page_range: (start, end) zero-based, end-exclusive page range
+        
+    Returns:
+        Path to the temporary PDF. The caller is responsible for removing it.
+    """
+    with open(pdf_file_path, 'rb') as f:
+        reader = PdfReader(f)
+        writer = PdfWriter()
+        for page_number in range(page_range[0], min(page_range[1], len(reader.pages))):
+            writer.add_page(reader.pages[page_number])
+        
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+            writer.write(temp_file)
+            return temp_file.name
+
+
+def _transaction_key(transaction: Dict[str, Any]) -> Tuple:
+    """Key used to recognize the same transaction extracted by two chunks."""
+    return (
+        transaction.get('date'),
+        ' '.join(str(transaction.get('title', '')).lower().split()),
+        round(float(transaction.get('amount', 0)), 2),
+        transaction.get('transaction_type'),
+    )
+
+
+def merge_chunk_results(chunk_results: List[Dict[str, Any]], page_ranges: List[Tuple[int, int]]) -> Dict[str, Any]:
+    """
+    Merge the results of page-chunked extraction into a single result.
+    
+    Transactions are concatenated in page order. A run of transactions at the
+    start of a chunk that repeats the end of the previous chunk (a row split
+    across the page boundary, or a carried-over row) is dropped, while genuine
+    repeated transactions inside a chunk are kept. The statement period spans
+    all chunks, the initial balance comes from the earliest chunk that reports
+    one, and the account name and type are decided by majority vote.
+    
+    Args:
+        chunk_results: Results of ``process_bank_statement_with_ai``, in page order
+        page_ranges: The page range each result was extracted from
+        
+    Returns:
+        Dictionary in the same shape as ``process_bank_statement_with_ai``
+    """
+    transactions: List[Dict[str, Any]] = []
+    previous_keys: List[Tuple] = []
+    for chunk in chunk_results:
+        chunk_transactions = chunk.get('transactions') or []
+        keys = [_transaction_key(t) for t in chunk_transactions]
+        
+        overlap = 0
+        for size in range(min(len(previous_keys), len(keys)), 0, -1):
+            if previous_keys[-size:] == keys[:size]:
+                overlap = size
+                break
+        if overlap:
+            logger.info(f"Dropping {overlap} transaction(s) repeated across a chunk boundary")
+        
+        transactions.extend(chunk_transactions[overlap:])
+        if keys:
+            previous_keys = keys
+    
+    periods = [chunk['statement_period'] for chunk in chunk_results
+               if isinstance(chunk.get('statement_period'), dict)]
+    starts = [period['start'] for period in periods if period.get('start')]
+    ends = [period['end'] for period in periods if period.get('end')]
+    statement_period = {'start': min(starts), 'end': max(ends)} if starts and ends else None
+    
+    initial_balance = next(
+        (chunk['initial_balance'] for chunk in chunk_results if chunk.get('initial_balance') is not None),
+        None
+    )
+    
+    def most_common(field: str) -> Optional[str]:
+        values = [chunk.get(field) for chunk in chunk_results if chunk.get(field) and chunk.get(field) != 'Other']
+        return Counter(values).most_common(1)[0][0] if values else None
+    
+    usage = {}
+    timings = {}
+    for chunk in chunk_results:
+        for key, value in (chunk.get('usage') or {}).items():
+            usage[key] = usage.get(key, 0) + value
+        # Chunks run concurrently: phase timings are summed work, not wall time
+        for phase, seconds in (chunk.get('timings') or {}).items():
+            if phase == 'first_transaction':
+                timings[phase] = min(timings.get(phase, seconds), seconds)
+            else:
+                timings[phase] = timings.get(phase, 0.0) + seconds
+    
+    errors = [
+        f"pages {page_range[0] + 1}-{page_range[1]}: {chunk['error']}"
+        for chunk, page_range in zip(chunk_results, page_ranges) if chunk.get('error')
+    ]
+    
+    return {
+        'transactions': transactions,
+        'account_name': most_common('account_name'),
+        'account_type': most_common('account_type') or 'Other',
+        'statement_period': statement_period,
+        'initial_balance': initial_balance,
+        'raw_response': '\n'.join(chunk['raw_response'] for chunk in chunk_results if chunk.get('raw_response')) or None,
+        'input_mode': next((chunk['input_mode'] for chunk in chunk_results if chunk.get('input_mode')), None),
+        'model_name': next((chunk['model_name'] for chunk in chunk_results if chunk.get('model_name')), None),
+        'usage': usage or None,
+        'timings': timings or None,
+        'chunk_count': len(chunk_results),
+        'error': f"AI processing failed for {'; '.join(errors)}" if errors else None
+    }
+
+
+def process_bank_statement_in_chunks(pdf_file_path: str, input_mode: Optional[str] = None,
+                                     client=None, deadline=None,
+                                     on_transaction: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Process a long bank statement as page ranges extracted concurrently.
+    
+    Statements up to BANK_STATEMENT_AI_CHUNK_PAGES pages are processed in a
+    single request. Longer ones are split into page ranges of that size, which
+    are sent to the model in parallel on a pool of at most
+    BANK_STATEMENT_AI_MAX_WORKERS threads, so the total time is roughly that of
+    the slowest chunk and no single response hits the output-token limit.
+    
+    Args:
+        pdf_file_path: Path to the PDF file
+        input_mode: 'text' or 'file', see ``process_bank_statement_with_ai``
+        client: Gemini client, see ``process_bank_statement_with_ai``
+        deadline: Deadline for the whole statement, shared by all chunks
+        on_transaction: Streaming callback, see ``process_bank_statement_with_ai``.
+            With several chunks it is called from the chunk threads, in arrival order.
+        
+    Returns:
+        Dictionary in the same shape as ``process_bank_statement_with_ai``
+    """
+    deadline = deadline or new_statement_deadline()
+    chunk_pages = getattr(settings, 'BANK_STATEMENT_AI_CHUNK_PAGES', 8)
+    page_count = get_pdf_page_count(pdf_file_path)
+    
+    if chunk_pages <= 0 or page_count <= chunk_pages:
+        return process_bank_statement_with_ai(
+            pdf_file_path, input_mode=input_mode, client=client, deadline=deadline, on_transaction=on_transaction
+        )
+    
+    page_ranges = [(start, min(start + chunk_pages, page_count)) for start in range(0, page_count, chunk_pages)]
+    max_workers = min(getattr(settings, 'BANK_STATEMENT_AI_MAX_WORKERS', 4), len(page_ranges))
+    logger.info(f"Processing {page_count}-page statement as {len(page_ranges)} chunks on {max_workers} workers")
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='statement-chunk') as executor:
+        futures = [
+            executor.submit(_process_chunk, pdf_file_path, input_mode, page_range, client, deadline, on_transaction)
+            for page_range in page_ranges
+        ]
+        chunk_results = [future.result() for future in futures]
+    
+    return merge_chunk_results(chunk_results, page_ranges)
+
+
+def _process_chunk(pdf_file_path: str, input_mode: Optional[str], page_range: Tuple[int, int], client,
+                   deadline, on_transaction: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+    """Process one page range on a chunk thread."""
+    try:
+        return process_bank_statement_with_ai(pdf_file_path, input_mode, page_range, client, deadline, on_transaction)
+    finally:
+        # A streaming callback may have used the database from this thread
+        if on_transaction is not None:
+            db_connection.close()
+
+
+# How much of the end of a PDF is scanned for the trailer and startxref
+PDF_TAIL_SCAN_SIZE = 16 * 1024
+# How much of the cross-reference stream object is scanned for its dictionary
+PDF_XREF_SCAN_SIZE = 4 * 1024
+
+
+@contextlib.contextmanager
+def _open_pdf_source(pdf_file):
+    """
+    Open a PDF given as a file object or a path, as a seekable binary stream.
+    
+    File objects are rewound before and after use and are not closed. Nothing
+    is read into memory here.
+    """
+    if hasattr(pdf_file, 'read'):
+        pdf_file.seek(0)
+        try:
+            yield pdf_file
+        finally:
+            pdf_file.seek(0)
+    else:
+        with open(pdf_file, 'rb') as f:
+            yield f
+
+
+def _pdf_trailer_has_encrypt(stream) -> Optional[bool]:
+    """
+    Detect encryption from the PDF trailer without parsing the document.
+    
+    Reads only the end of the file: the ``/Encrypt`` entry lives in the last
+    trailer dictionary, or in the dictionary of the cross-reference stream
+    that ``startxref`` points to (PDF 1.5+).
+    
+    Returns:
+        True or False, or None if the trailer could not be located.
+    """
+    stream.seek(0, os.SEEK_END)
+    file_size = stream.tell()
+    tail_size = min(file_size, PDF_TAIL_SCAN_SIZE)
+    stream.seek(file_size - tail_size)
+    tail = stream.read(tail_size)
+    
+    startxref_pos = tail.rfind(b'startxref')
+    if startxref_pos == -1:
+        return None
+    
+    # Classic cross-reference table: "trailer << ... >> startxref"
+    trailer_pos = tail.rfind(b'trailer', 0, startxref_pos)
+    if trailer_pos != -1:
+        return b'/Encrypt' in tail[trailer_pos:startxref_pos]
+    
+    # Cross-reference stream: the dictionary precedes the "stream" keyword
+    try:
+        xref_offset = int(tail[startxref_pos + len(b'startxref'):].split()[0])
+    except (IndexError, ValueError):
+        return None
+    if not 0 <= xref_offset < file_size:
+        return None
+    
+    stream.seek(xref_offset)
+    xref_object = stream.read(PDF_XREF_SCAN_SIZE)
+    dictionary_end = xref_object.find(b'stream')
+    if dictionary_end == -1:
+        return None
+    return b'/Encrypt' in xref_object[:dictionary_end]
+
+
 def is_pdf_password_protected(pdf_file) -> bool:
     """
     Check if a PDF file is password-protected.
     
+    Only the trailer at the end of the file is read. A full parse is used as a
+    fallback for damaged files whose trailer cannot be located.
+    
     Args:
         pdf_file: Django UploadedFile object or file path string
         
     Returns:
         bool: True if PDF is password-protected, False otherwise
     """
-    if not PDF_LIBRARY_AVAILABLE:
-        return False
-    
     try:
-        # Handle both file objects and file paths
-        if hasattr(pdf_file, 'read'):
-            # It's a file object
-            pdf_file.seek(0)
-            file_content = pdf_file.read()
-            pdf_file.seek(0)
-        else:
-            # It's a file path
-            with open(pdf_file, 'rb') as f:
-                file_content = f.read()
-        
-        if PYPDF2_AVAILABLE:
-            # Using PyPDF2
-            from PyPDF2 import PdfFileReader
-            pdf_reader = PdfFileReader(io.BytesIO(file_content))
-            return pdf_reader.isEncrypted
-        else:
+        with _open_pdf_source(pdf_file) as stream:
+            has_encrypt = _pdf_trailer_has_encrypt(stream)
+            if has_encrypt is not None:
+                return has_encrypt
+            
+            if not PDF_LIBRARY_AVAILABLE:
+                return False
+            
+            logger.info("PDF trailer not found, falling back to a full parse to check encryption")
+            stream.seek(0)
+            if PYPDF2_AVAILABLE:
+                # Using PyPDF2
+                from PyPDF2 import PdfFileReader
+                return PdfFileReader(stream).isEncrypted
             # Using pypdf (newer library)
-            pdf_reader = PdfReader(io.BytesIO(file_content))
-            return pdf_reader.is_encrypted
+            return PdfReader(stream).is_encrypted
     except Exception as e:
         logger.warning(f"Error checking PDF encryption: {str(e)}")
         return False
 
 
-def decrypt_pdf_file(pdf_file, password: str) -> ContentFile:
+def decrypt_pdf_file(pdf_file, password: str) -> File:
     """
     Decrypt a password-protected PDF file.
     
+    The source is read through a seekable stream (uploads above
+    FILE_UPLOAD_MAX_MEMORY_SIZE are already spooled to a temporary file by
+    Django) and the decrypted document is written to an anonymous temporary
+    file, so no full in-memory copy of the PDF is made. The temporary file is
+    deleted when the returned File is closed.
+    
     Args:
         pdf_file: Django UploadedFile object or file path string
         password: Password to decrypt the PDF
         
     Returns:
-        ContentFile: Decrypted PDF file as ContentFile object
+        File: Decrypted PDF backed by a temporary file
         
     Raises:
         ValueError: If password is incorrect or decryption fails
@@ -559,84 +1018,461 @@ def decrypt_pdf_file(pdf_file, password: str) -> ContentFile:
     if not PDF_LIBRARY_AVAILABLE:
         raise ValueError("PDF decryption libraries not available. Please install pypdf or PyPDF2.")
     
+    if hasattr(pdf_file, 'read'):
+        original_filename = os.path.basename(getattr(pdf_file, 'name', None) or 'decrypted.pdf')
+    else:
+        original_filename = os.path.basename(pdf_file)
+    
+    decrypted_pdf = tempfile.TemporaryFile(suffix='.pdf')
     try:
-        # Handle both file objects and file paths
-        original_filename = None
-        if hasattr(pdf_file, 'read'):
-            # It's a file object
-            pdf_file.seek(0)
-            file_content = pdf_file.read()
-            pdf_file.seek(0)
-            original_filename = getattr(pdf_file, 'name', 'decrypted.pdf')
-        else:
-            # It's a file path
-            original_filename = os.path.basename(pdf_file)
-            with open(pdf_file, 'rb') as f:
-                file_content = f.read()
-        
-        if PYPDF2_AVAILABLE:
-            # Using PyPDF2
-            from PyPDF2 import PdfFileReader, PdfFileWriter
-            pdf_reader = PdfFileReader(io.BytesIO(file_content))
-            
-            if not pdf_reader.isEncrypted:
-                # Not encrypted, return original content
-                return ContentFile(file_content, name=original_filename)
-            
-            # Try to decrypt
-            if not pdf_reader.decrypt(password):
-                raise ValueError("Incorrect password or decryption failed")
-            
-            # Create decrypted PDF
-            pdf_writer = PdfFileWriter()
-            for page_num in range(pdf_reader.numPages):
-                pdf_writer.addPage(pdf_reader.getPage(page_num))
-            
-            decrypted_pdf = io.BytesIO()
-            pdf_writer.write(decrypted_pdf)
-            decrypted_pdf.seek(0)
-            
-            return ContentFile(decrypted_pdf.read(), name=original_filename)
-        else:
-            # Using pypdf (newer library)
-            pdf_reader = PdfReader(io.BytesIO(file_content))
-            
-            if not pdf_reader.is_encrypted:
-                # Not encrypted, return original content
-                return ContentFile(file_content, name=original_filename)
-            
-            # Try to decrypt
-            if not pdf_reader.decrypt(password):
-                raise ValueError("Incorrect password or decryption failed")
-            
-            # Create decrypted PDF
-            pdf_writer = PdfWriter()
-            for page in pdf_reader.pages:
-                pdf_writer.add_page(page)
-            
-            decrypted_pdf = io.BytesIO()
-            pdf_writer.write(decrypted_pdf)
-            decrypted_pdf.seek(0)
-            
-            return ContentFile(decrypted_pdf.read(), name=original_filename)
-            
+        with _open_pdf_source(pdf_file) as stream:
+            if PYPDF2_AVAILABLE:
+                # Using PyPDF2
+                from PyPDF2 import PdfFileReader, PdfFileWriter
+                pdf_reader = PdfFileReader(stream)
+                
+                if not pdf_reader.isEncrypted:
+                    # Not encrypted, copy the original content
+                    shutil.copyfileobj(stream, decrypted_pdf)
+                else:
+                    # Try to decrypt
+                    if not pdf_reader.decrypt(password):
+                        raise ValueError("Incorrect password or decryption failed")
+                    
+                    pdf_writer = PdfFileWriter()
+                    for page_num in range(pdf_reader.numPages):
+                        pdf_writer.addPage(pdf_reader.getPage(page_num))
+                    pdf_writer.write(decrypted_pdf)
+            else:
+                # Using pypdf (newer library)
+                pdf_reader = PdfReader(stream)
+                
+                if not pdf_reader.is_encrypted:
+                    # Not encrypted, copy the original content
+                    stream.seek(0)
+                    shutil.copyfileobj(stream, decrypted_pdf)
+                else:
+                    # Try to decrypt
+                    if not pdf_reader.decrypt(password):
+                        raise ValueError("Incorrect password or decryption failed")
+                    
+                    pdf_writer = PdfWriter()
+                    for page in pdf_reader.pages:
+                        pdf_writer.add_page(page)
+                    pdf_writer.write(decrypted_pdf)
+        
+        decrypted_pdf.seek(0)
+        return File(decrypted_pdf, name=original_filename)
+    
     except ValueError:
+        decrypted_pdf.close()
         raise  # Re-raise password errors
     except Exception as e:
+        decrypted_pdf.close()
         logger.error(f"Error decrypting PDF: {str(e)}", exc_info=True)
         raise ValueError(f"Failed to decrypt PDF: {str(e)}")
 
 
-def extract_transactions_from_pdf(pdf_file_path: str) -> Dict[str, Any]:
+def extract_transactions_locally(pdf_file_path: str, force: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Extract transactions from the PDF text layer using the rule-based parsers.
+    
+    Args:
+        pdf_file_path: Path to the PDF file
+        force: Run even if BANK_STATEMENT_LOCAL_PARSERS_ENABLED is off
+        
+    Returns:
+        Dictionary in the same shape as ``process_bank_statement_with_ai``, or None
+        if the PDF has no text layer or no parser matched with high confidence.
+    """
+    if not force and not getattr(settings, 'BANK_STATEMENT_LOCAL_PARSERS_ENABLED', True):
+        return None
+    
+    min_confidence = getattr(settings, 'BANK_STATEMENT_LOCAL_PARSER_MIN_CONFIDENCE', 0.95)
+    
+    try:
+        started = time.perf_counter()
+        parsed = parse_statement_text(extract_pdf_text(pdf_file_path))
+        elapsed = time.perf_counter() - started
+    except Exception as e:
+        logger.warning(f"Local parsing failed for {pdf_file_path}: {str(e)}")
+        return None
+    
+    if parsed is None:
+        logger.info("No text layer or parser template found, falling back to AI processing")
+        return None
+    
+    if parsed['confidence'] < min_confidence:
+        logger.info(
+            f"Parser {parsed['parser']} matched with low confidence "
+            f"({parsed['confidence']:.2f} < {min_confidence}), falling back to AI processing"
+        )
+        return None
+    
+    logger.info(
+        f"Parsed {len(parsed['transactions'])} transactions locally with {parsed['parser']} "
+        f"in {elapsed:.2f}s (confidence {parsed['confidence']:.2f})"
+    )
+    
+    for transaction in parsed['transactions']:
+        transaction['category'] = normalize_category(transaction.get('category'))
+    
+    return {
+        'transactions': parsed['transactions'],
+        'account_name': parsed['account_name'],
+        'account_type': normalize_account_type(parsed['account_type']),
+        'statement_period': parsed['statement_period'],
+        'initial_balance': parsed['initial_balance'],
+        'raw_response': None,
+        'parser': parsed['parser'],
+        'timings': {'local_parse': elapsed},
+        'error': None
+    }
+
+
+def extract_transactions_from_pdf(pdf_file_path: str,
+                                  on_transaction: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                  page_range: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
     """
     Wrapper function to extract transactions from a PDF file.
     This is the main function to be called from views.
     
+    The PDF text layer is parsed locally first; the configured extraction
+    backend (Gemini by default, see backends.py) is only called when no parser
+    template matches with high confidence.
+    
     Args:
         pdf_file_path: Path to the PDF file
+        on_transaction: Optional callback receiving transactions while the
+            backend is still generating (see ``process_bank_statement_with_ai``)
+        page_range: Optional (start, end) zero-based, end-exclusive range of
+            pages to send to the backend (local parsing always reads every page)
         
     Returns:
         Dictionary with extracted transaction data
     """
-    return process_bank_statement_with_ai(pdf_file_path)
+    backend = get_extraction_backend()
+    
+    if backend.name != 'local':
+        local_result = extract_transactions_locally(pdf_file_path)
+        if local_result is not None:
+            return local_result
+    
+    if page_range is None:
+        return backend.extract(pdf_file_path, on_transaction=on_transaction)
+    
+    range_path = write_pdf_page_range(pdf_file_path, page_range)
+    try:
+        return backend.extract(range_path, on_transaction=on_transaction)
+    finally:
+        os.remove(range_path)
+
+
+class StagedTransactionStream:
+    """
+    Streaming callback that stores transactions as staged rows while extraction runs.
+    
+    The rows are a preview for clients following the statement's event
+    stream: once extraction finishes, ``stage_extracted_transactions``
+    replaces them with the final result. Safe to call from chunk threads.
+    
+    Args:
+        bank_statement: BankStatement being processed
+    """
+    
+    def __init__(self, bank_statement):
+        self.bank_statement = bank_statement
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def __call__(self, item: Dict[str, Any]):
+        from .models import StagedTransaction
+        
+        # Prefer the user's own categorization history over the extractor's guess
+        apply_merchant_categories(self.bank_statement.owner_id, [item])
+        with self._lock:
+            if self.count == 0:
+                # Drop rows left over from an earlier extraction of the statement
+                self.bank_statement.staged_transactions.filter(committed=False).delete()
+            StagedTransaction.objects.create(
+                statement=self.bank_statement, position=self.count, **staged_transaction_fields(item)
+            )
+            self.count += 1
+    
+    def discard(self):
+        """Remove the preview rows of an extraction that failed."""
+        if self.count:
+            self.bank_statement.staged_transactions.filter(committed=False).delete()
+
+
+def process_bank_statement(bank_statement, stream: bool = False, use_cache: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Extract transactions from a stored bank statement and record the outcome on it.
+    
+    The statement moves to 'processing' while extraction runs, then to
+    'completed' or 'failed' (with ``error_message`` set).
+    
+    Args:
+        bank_statement: BankStatement instance whose file is already stored
+        stream: Store transactions as staged rows as soon as the model
+            generates them, for clients following the statement's event stream
+        use_cache: Reuse an earlier extraction of the same PDF when there is one
+            (see reprocessing.find_cached_extraction)
+        
+    Returns:
+        The extraction result, or None if processing raised an unexpected error
+    """
+    started = time.perf_counter()
+    page_count = None
+    metrics_recorded = False
+    staged_stream = StagedTransactionStream(bank_statement) if stream else None
+    try:
+        # Update status to processing
+        bank_statement.processing_status = 'processing'
+        bank_statement.save()
+        
+        # Extract transactions using AI
+        extracted_data = find_cached_extraction(bank_statement) if use_cache else None
+        if extracted_data is not None:
+            logger.info(f"Reusing the cached extraction ({extracted_data['cached']}) for statement {bank_statement.id}")
+        else:
+            with statement_pdf_path(bank_statement) as pdf_file_path:
+                page_count = get_pdf_page_count(pdf_file_path)
+                # Skip or narrow the extraction when the period was already imported into the account
+                coverage = check_statement_coverage(bank_statement, pdf_file_path)
+                if coverage is not None and coverage['skipped']:
+                    extracted_data = covered_statement_result(coverage)
+                else:
+                    extracted_data = extract_transactions_from_pdf(
+                        pdf_file_path,
+                        on_transaction=staged_stream,
+                        page_range=tuple(coverage['pages']) if coverage and coverage['pages'] else None
+                    )
+                    apply_statement_coverage(extracted_data, coverage)
+        record_processing_metrics(bank_statement, extracted_data, time.perf_counter() - started, page_count)
+        metrics_recorded = True
+        
+        # Update processing status based on results
+        if extracted_data.get('error'):
+            if staged_stream is not None:
+                staged_stream.discard()
+            bank_statement.processing_status = 'failed'
+            bank_statement.error_message = extracted_data.get('error', 'Unknown error')
+            bank_statement.save()
+        else:
+            # Processing completed successfully (with or without transactions)
+            # (empty transactions list means AI successfully analyzed but found no transactions)
+            bank_statement.processing_status = 'completed'
+            bank_statement.processed = True
+            # Prefer the user's own categorization history over the extractor's guess
+            apply_merchant_categories(bank_statement.owner_id, extracted_data.get('transactions') or [])
+            stage_extracted_transactions(bank_statement, extracted_data)
+        return extracted_data
+        
+    except Exception as e:
+        logger.error(f"Error during AI processing: {str(e)}", exc_info=True)
+        if staged_stream is not None:
+            staged_stream.discard()
+        bank_statement.processing_status = 'failed'
+        bank_statement.error_message = f'AI processing error: {str(e)}'
+        bank_statement.save()
+        if not metrics_recorded:
+            record_processing_metrics(bank_statement, None, time.perf_counter() - started, page_count)
+        return None
+
 
+STAGED_SUMMARY_KEYS = ('account_name', 'account_type', 'statement_period', 'initial_balance', 'coverage')
+
+
+def staged_transaction_fields(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an extracted transaction dictionary to StagedTransaction field values."""
+    try:
+        date = parse_date(str(item.get('date') or ''))
+    except ValueError:
+        date = None
+    try:
+        amount = abs(float(item.get('amount') or 0))
+    except (TypeError, ValueError):
+        amount = 0.0
+    transaction_type = item.get('transaction_type')
+    if transaction_type not in ('Income', 'Expense', 'Transfer'):
+        transaction_type = 'Expense'
+    
+    return {
+        'date': date,
+        'title': str(item.get('title') or '')[:120],
+        'amount': amount,
+        'transaction_type': transaction_type,
+        'category': normalize_category(item.get('category', 'Other'))[:30],
+    }
+
+
+def stage_extracted_transactions(bank_statement, extracted_data: Dict[str, Any]) -> int:
+    """
+    Store an extraction result on its statement so it can be reviewed later.
+    
+    Replaces any uncommitted staged rows of the statement with the extracted
+    transactions (one bulk insert) and saves the statement-level fields in
+    ``extracted_summary``. The statement itself is saved in the same
+    database transaction.
+    
+    Args:
+        bank_statement: BankStatement the result belongs to
+        extracted_data: Extraction result as returned by extract_transactions_from_pdf
+        
+    Returns:
+        Number of staged rows created
+    """
+    from .models import StagedTransaction
+    
+    staged_rows = [
+        StagedTransaction(statement=bank_statement, position=position, **staged_transaction_fields(item))
+        for position, item in enumerate(extracted_data.get('transactions') or [])
+    ]
+    
+    bank_statement.extracted_summary = {key: extracted_data.get(key) for key in STAGED_SUMMARY_KEYS}
+    period = extracted_data.get('statement_period')
+    if isinstance(period, dict):
+        try:
+            bank_statement.period_start = parse_date(str(period.get('start') or ''))
+            bank_statement.period_end = parse_date(str(period.get('end') or ''))
+        except ValueError:
+            bank_statement.period_start = bank_statement.period_end = None
+    coverage = extracted_data.get('coverage')
+    if coverage and not bank_statement.account_id:
+        bank_statement.account_id = coverage['account_id']
+    with db_transaction.atomic():
+        bank_statement.save()
+        bank_statement.staged_transactions.filter(committed=False).delete()
+        StagedTransaction.objects.bulk_create(staged_rows, batch_size=500)
+    return len(staged_rows)
+
+
+def commit_staged_transactions(bank_statement, account_id: str, staged_ids: Optional[List[int]] = None,
+                               on_duplicate: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Move staged rows of a statement into the Transaction table.
+    
+    All rows are inserted with a single bulk insert, marked as committed and
+    the account balance is adjusted, inside one database transaction: either
+    every selected row is committed or none is.
+    
+    Rows that duplicate a stored transaction of the account (see
+    transaction/fingerprints.py) are looked up with one query. With
+    ``on_duplicate='skip'`` they are not inserted: they are marked committed
+    and linked to the existing transaction instead, and left out of the
+    balance change. With 'flag' they are inserted and reported.
+    
+    Args:
+        bank_statement: BankStatement whose staged rows are committed
+        account_id: ID of the Account the transactions belong to
+        staged_ids: IDs of the rows to commit (all uncommitted rows when None)
+        on_duplicate: 'skip' or 'flag' (defaults to TRANSACTION_DUPLICATE_POLICY)
+        
+    Returns:
+        Dictionary with the created transaction IDs, the duplicates found,
+        the transfers paired (see transaction/transfers.py), the balance
+        change and the new account total
+        
+    Raises:
+        ValueError: If the account does not exist or a selected row cannot be committed
+    """
+    from account.models import Account
+    from transaction.models import Transaction
+    from transaction.fingerprints import DUPLICATE_POLICIES, find_duplicates
+    from transaction.transfers import pair_imported_transfers
+    from transaction.legs import sync_transaction_legs
+    from transaction.references import resolve_transaction_references
+    from MoneyManagement.money import Money
+    
+    on_duplicate = on_duplicate or getattr(settings, 'TRANSACTION_DUPLICATE_POLICY', 'flag')
+    if on_duplicate not in DUPLICATE_POLICIES:
+        raise ValueError(f"on_duplicate must be one of {', '.join(DUPLICATE_POLICIES)}")
+    
+    with db_transaction.atomic():
+        try:
+            if bank_statement.owner_id is None:
+                raise Account.DoesNotExist
+            account = Account.objects.select_for_update().get(id=account_id, user_id=bank_statement.owner_id)
+        except (Account.DoesNotExist, ValueError):
+            raise ValueError(f"Account {account_id} not found for user {bank_statement.user_id}")
+        
+        staged_rows = bank_statement.staged_transactions.select_for_update().filter(committed=False)
+        if staged_ids is not None:
+            staged_rows = staged_rows.filter(id__in=staged_ids)
+        staged_rows = list(staged_rows)
+        
+        if staged_ids is not None and len(staged_rows) != len(set(staged_ids)):
+            found_ids = {row.id for row in staged_rows}
+            missing_ids = sorted(set(staged_ids) - found_ids)
+            raise ValueError(f"Staged transactions not found or already committed: {missing_ids}")
+        if not staged_rows:
+            raise ValueError("There are no staged transactions to commit")
+        
+        undated = [row.id for row in staged_rows if row.date is None]
+        if undated:
+            raise ValueError(f"Staged transactions without a date cannot be committed: {undated}")
+        
+        new_transactions = [
+            Transaction(
+                transaction_type=row.transaction_type,
+                category=row.category,
+                date=row.date,
+                title=row.title,
+                total=row.amount,
+                owner_id=bank_statement.owner_username,
+                user_id=bank_statement.owner_id,
+                account_id=str(account.id)
+            )
+            for row in staged_rows
+        ]
+        duplicates = find_duplicates([
+            {'user_id': new.user_id, 'account_id': new.account_id, 'date': new.date, 'total': new.total, 'title': new.title}
+            for new in new_transactions
+        ])
+        skipped = set(duplicates) if on_duplicate == 'skip' else set()
+        inserted_rows = [row for index, row in enumerate(staged_rows) if index not in skipped]
+        for new in new_transactions:
+            new.fingerprint = new.compute_fingerprint()
+        resolve_transaction_references(new_transactions)
+        transactions = Transaction.objects.bulk_create(
+            [new for index, new in enumerate(new_transactions) if index not in skipped], batch_size=500
+        )
+        sync_transaction_legs(transactions)
+        
+        for row, created in zip(inserted_rows, transactions):
+            row.committed = True
+            row.transaction = created
+        for index in skipped:
+            staged_rows[index].committed = True
+            staged_rows[index].transaction_id = duplicates[index]
+        bank_statement.staged_transactions.bulk_update(staged_rows, ['committed', 'transaction'], batch_size=500)
+        
+        # Transfers are left out of the balance, as in the manual import
+        balance_change = Money(sum(
+            row.amount.minor_units if row.transaction_type == 'Income' else -row.amount.minor_units
+            for row in inserted_rows if row.transaction_type != 'Transfer'
+        ))
+        Account.objects.filter(id=account.id).update(total=F('total') + balance_change.minor_units)
+        account.refresh_from_db(fields=['total'])
+        
+        # The statement's period now counts as imported into this account (see coverage.py)
+        bank_statement.account_id = str(account.id)
+        bank_statement.save(update_fields=['account_id'])
+    
+    record_categorizations(bank_statement.owner_id, added=[(row.title, row.category) for row in inserted_rows])
+    # Payments between the user's own accounts become single Transfer rows
+    transfers = pair_imported_transfers(bank_statement.owner_id, [created.id for created in transactions])
+    
+    return {
+        'transaction_ids': [created.id for created in transactions],
+        'committed_count': len(transactions),
+        'duplicates': [
+            {'staged_id': staged_rows[index].id, 'duplicate_of': duplicate_of, 'skipped': index in skipped}
+            for index, duplicate_of in sorted(duplicates.items())
+        ],
+        'skipped_count': len(skipped),
+        'transfers': transfers,
+        'balance_change': balance_change,
+        'account_total': account.total
+    }
@@ -0,0 +1,269 @@
+"""
+Content-addressed storage for uploaded bank statement PDFs.
+
+Every upload is hashed with SHA-256 and stored once as a StatementBlob under
+``statement_blobs/<first two hex digits>/<sha256>.pdf``. Re-uploading the same
+PDF only adds a reference to the existing blob. Blobs can optionally be
+gzip-compressed (BANK_STATEMENT_BLOB_COMPRESSION).
+
+Deleting a statement only decrements the blob's reference count. Blobs that
+stay unreferenced for BANK_STATEMENT_BLOB_GRACE_MINUTES are removed by
+``sweep_unreferenced_blobs`` (``python manage.py sweep_statement_blobs``).
+Files of statements uploaded before blobs existed are not removed in the
+request either: they are queued as StatementFileDeletion rows, which the same
+sweep deletes.
+"""
+import os
+import gzip
+import shutil
+import hashlib
+import logging
+import tempfile
+import contextlib
+from datetime import timedelta
+from typing import Dict, Any, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Spooled temp files stay in memory up to this size
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# Keep the gzip copy only if it is at least this much smaller than the PDF
+MIN_COMPRESSION_SAVING = 0.05
+
+
+def _file_sha256(pdf_file) -> str:
+    digest = hashlib.sha256()
+    for chunk in pdf_file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _gzip_file(pdf_file) -> tempfile.SpooledTemporaryFile:
+    compressed = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with gzip.GzipFile(fileobj=compressed, mode='wb', compresslevel=6, mtime=0) as gz:
+        for chunk in pdf_file.chunks():
+            gz.write(chunk)
+    compressed.seek(0, os.SEEK_END)
+    return compressed
+
+
+def store_statement_file(pdf_file):
+    """
+    Store an uploaded PDF and return its blob with one more reference.
+
+    If a blob with the same content already exists, no bytes are written.
+
+    Args:
+        pdf_file: Django File or UploadedFile with the PDF contents
+
+    Returns:
+        StatementBlob referenced by the caller
+    """
+    from .models import StatementBlob
+
+    sha256 = _file_sha256(pdf_file)
+
+    # Fast path: the content is already stored
+    with db_transaction.atomic():
+        updated = StatementBlob.objects.filter(sha256=sha256).update(
+            ref_count=F('ref_count') + 1, unreferenced_at=None
+        )
+    if updated:
+        return StatementBlob.objects.get(sha256=sha256)
+
+    size = pdf_file.size
+    blob = StatementBlob(sha256=sha256, size=size, ref_count=1)
+    content = pdf_file
+    compressed = None
+    if getattr(settings, 'BANK_STATEMENT_BLOB_COMPRESSION', False):
+        compressed = _gzip_file(pdf_file)
+        if compressed.tell() <= size * (1 - MIN_COMPRESSION_SAVING):
+            blob.compressed = True
+            compressed.seek(0)
+            content = File(compressed)
+
+    try:
+        blob.file.save(f'{sha256}.pdf', content, save=False)
+        blob.stored_size = blob.file.size
+        try:
+            with db_transaction.atomic():
+                blob.save()
+        except IntegrityError:
+            # Another upload stored the same content first: use that blob instead
+            blob.file.delete(save=False)
+            with db_transaction.atomic():
+                StatementBlob.objects.filter(sha256=sha256).update(
+                    ref_count=F('ref_count') + 1, unreferenced_at=None
+                )
+            blob = StatementBlob.objects.get(sha256=sha256)
+    finally:
+        if compressed is not None:
+            compressed.close()
+
+    return blob
+
+
+def release_statement_blob(blob_id: int, count: int = 1) -> bool:
+    """
+    Drop references to a blob. Its file is removed later by the sweeper.
+
+    Returns:
+        True if the blob is no longer referenced
+    """
+    from .models import StatementBlob
+
+    with db_transaction.atomic():
+        StatementBlob.objects.filter(id=blob_id, ref_count__gte=count).update(ref_count=F('ref_count') - count)
+        StatementBlob.objects.filter(id=blob_id, ref_count__lt=count).exclude(ref_count=0).update(ref_count=0)
+        return StatementBlob.objects.filter(id=blob_id, ref_count=0, unreferenced_at__isnull=True).update(
+            unreferenced_at=timezone.now()
+        ) > 0
+
+
+def defer_file_deletion(name: str, size: int = 0):
+    """Queue a legacy statement file for removal by the sweeper."""
+    from .models import StatementFileDeletion
+
+    StatementFileDeletion.objects.create(name=name, size=size or 0)
+
+
+@contextlib.contextmanager
+def statement_pdf_path(bank_statement):
+    """
+    Context manager yielding a local filesystem path to a statement's PDF.
+
+    Uncompressed files on local storage are used in place. Compressed blobs
+    (and storages without local paths) are copied to a temporary file that is
+    removed on exit.
+    """
+    if bank_statement.blob_id is None:
+        if not bank_statement.file:
+            raise FileNotFoundError(f"The PDF of bank statement {bank_statement.id} has been deleted")
+        yield bank_statement.file.path
+        return
+
+    blob = bank_statement.blob
+    if not blob.compressed:
+        # Resolved before yielding, so errors raised by the caller's block are not swallowed
+        try:
+            path = blob.file.path
+        except NotImplementedError:
+            path = None
+        if path is not None:
+            yield path
+            return
+
+    fd, temp_path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as target, blob.file.open('rb') as stored:
+            source = gzip.GzipFile(fileobj=stored, mode='rb') if blob.compressed else stored
+            shutil.copyfileobj(source, target, length=64 * 1024)
+        yield temp_path
+    finally:
+        os.remove(temp_path)
+
+
+def sweep_unreferenced_blobs(grace_minutes: int = None, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Delete blobs that no statement has referenced for the grace period.
+
+    Reference counts of blobs older than the grace period are checked against
+    the actual number of statements first, so counts left behind by bulk
+    deletes are corrected here.
+
+    Args:
+        grace_minutes: Minutes a blob must stay unreferenced before it is deleted
+        dry_run: Report what would be deleted without deleting anything
+
+    Returns:
+        Dictionary with the number of corrected counts, deleted blobs, deleted
+        legacy files and bytes reclaimed
+    """
+    from .models import StatementBlob
+
+    if grace_minutes is None:
+        grace_minutes = getattr(settings, 'BANK_STATEMENT_BLOB_GRACE_MINUTES', 60)
+    now = timezone.now()
+
+    cutoff = now - timedelta(minutes=grace_minutes)
+
+    # Reconcile stored reference counts with the statements that exist. Blobs
+    # created within the grace period are left alone: their upload may not
+    # have saved its statement yet.
+    corrected = 0
+    mismatched = StatementBlob.objects.filter(created_at__lte=cutoff).annotate(
+        actual=Count('statements')
+    ).exclude(ref_count=F('actual'))
+    for blob_id, actual in mismatched.values_list('id', 'actual'):
+        corrected += 1
+        if not dry_run:
+            StatementBlob.objects.filter(id=blob_id).update(
+                ref_count=actual, unreferenced_at=None if actual else now
+            )
+
+    candidates = StatementBlob.objects.filter(ref_count=0, unreferenced_at__lte=cutoff)
+
+    deleted, reclaimed = 0, 0
+    for blob_id in list(candidates.values_list('id', flat=True)):
+        with db_transaction.atomic():
+            blob = StatementBlob.objects.select_for_update().filter(
+                id=blob_id, ref_count=0, unreferenced_at__lte=cutoff
+            ).first()
+            if blob is None or blob.statements.exists():
+                continue
+            deleted += 1
+            reclaimed += blob.stored_size
+            if dry_run:
+                continue
+            file_name = blob.file.name
+            blob.delete()
+            db_transaction.on_commit(lambda name=file_name: _delete_stored_file(name))
+
+    legacy_files, legacy_reclaimed = _sweep_deferred_files(dry_run)
+    reclaimed += legacy_reclaimed
+
+    if (deleted or legacy_files) and not dry_run:
+        logger.info(f"Swept {deleted} statement blobs and {legacy_files} legacy files, {reclaimed} bytes reclaimed")
+    return {'corrected': corrected, 'deleted': deleted, 'legacy_files': legacy_files, 'bytes_reclaimed': reclaimed}
+
+
+def _sweep_deferred_files(dry_run: bool) -> Tuple[int, int]:
+    """Remove the queued legacy files that no statement uses anymore."""
+    from .models import BankStatement, StatementFileDeletion
+
+    storage = BankStatement._meta.get_field('file').storage
+    deleted, reclaimed = 0, 0
+    for deletion in list(StatementFileDeletion.objects.order_by('id')):
+        if BankStatement.objects.filter(file=deletion.name).exists():
+            # Still in use (e.g. a restored row): drop the request, keep the file
+            if not dry_run:
+                deletion.delete()
+            continue
+        deleted += 1
+        reclaimed += deletion.size
+        if dry_run:
+            continue
+        try:
+            storage.delete(deletion.name)
+        except OSError as e:
+            logger.warning(f"Could not delete statement file {deletion.name}: {str(e)}")
+            continue
+        deletion.delete()
+    return deleted, reclaimed
+
+
+def _delete_stored_file(name: str):
+    from .models import StatementBlob
+
+    storage = StatementBlob._meta.get_field('file').storage
+    try:
+        storage.delete(name)
+    except OSError as e:
+        logger.warning(f"Could not delete statement blob file {name}: {str(e)}")
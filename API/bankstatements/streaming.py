@@ -0,0 +1,93 @@
+"""
+Incremental parsing of streamed model output.
+
+With ``generate_content(..., stream=True)`` the model's JSON answer arrives
+in text fragments. ``TransactionStreamParser`` is fed those fragments and
+returns every element of the top-level ``"transactions"`` array as soon as
+its closing brace has arrived, long before the rest of the document (and the
+final ``json.loads``) is available.
+"""
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionStreamParser:
+    """
+    Extract complete transaction objects from a partially received JSON document.
+
+    The parser only tracks string/escape state and nesting depth, so each
+    character is looked at once. Text before the first ``{`` (such as a
+    markdown code fence) is ignored.
+
+    Args:
+        array_key: Key of the top-level array whose elements are returned
+    """
+
+    def __init__(self, array_key: str = 'transactions'):
+        self.array_key = array_key
+        self.buffer = ''
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_key = None
+        self._in_array = False
+        self._element_start = None
+        self._done = False
+        self.count = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Add a fragment of the response.
+
+        Returns:
+            Transaction dictionaries completed by this fragment, in order
+        """
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        for index in range(self._position, len(buffer)):
+            char = buffer[index]
+            if self._done:
+                break
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        # Keys and values both end here; the key before the array is the last one seen
+                        self._last_key = buffer[self._string_start + 1:index]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in '{[':
+                if char == '[' and self._depth == 1 and self._last_key == self.array_key:
+                    self._in_array = True
+                elif char == '{' and self._in_array and self._depth == 2:
+                    self._element_start = index
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._in_array and self._depth == 2 and char == '}' and self._element_start is not None:
+                    element = buffer[self._element_start:index + 1]
+                    self._element_start = None
+                    try:
+                        completed.append(json.loads(element))
+                        self.count += 1
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping unparseable streamed transaction: {element[:200]}")
+                elif self._in_array and self._depth == 1:
+                    # End of the transactions array; the rest is read from the full response
+                    self._in_array = False
+                    self._done = True
+        self._position = len(buffer)
+        return completed
@@ -1,3 +1,1339 @@
-from django.test import TestCase
+import io
+import shutil
+import struct
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from google.api_core import exceptions as google_exceptions
+from pypdf import PdfReader, PdfWriter
+
+from account.models import Account
+from MoneyManagement.testing import MigrationTestCase
+from transaction.models import Transaction
+from transaction.references import backfill_references
+from users.models import User
+
+from .coverage import PeriodIndex, _uncovered_page_range, apply_statement_coverage, build_period_index
+from .metrics import page_bucket, percentile, summarize_metrics
+from .models import (
+    BankStatement,
+    BankStatementBatch,
+    StagedTransaction,
+    StatementBlob,
+    StatementFileDeletion,
+    StatementProcessingMetrics,
+)
+from .parsers import (
+    compact_statement_text,
+    guess_category,
+    parse_amount,
+    parse_date,
+    parse_statement_text,
+    scan_statement_text,
+)
+from .resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceeded,
+    backoff_delays,
+    is_rate_limit_error,
+    is_transient_error,
+)
+from .reprocessing import find_cached_extraction, queue_statement_reprocessing
+from .retention import apply_retention
+from .serializers import StagedTransactionSerializer
+from .services import (
+    _pdf_trailer_has_encrypt,
+    commit_staged_transactions,
+    decrypt_pdf_file,
+    merge_chunk_results,
+)
+from .storage import statement_pdf_path, store_statement_file, sweep_unreferenced_blobs
+from .streaming import TransactionStreamParser
+from .views import MAX_STATEMENT_FILE_SIZE, _extract_zip_entry
+from .workers import FairShareScheduler, parse_user_weights
+
+
+BBVA_STATEMENT = [
+    "BBVA MEXICO\n"
+    "PERIODO DEL 01/01/2024 AL 31/01/2024\n"
+    "SALDO ANTERIOR 10,000.00\n"
+    "02/ENE 02/ENE SPEI RECIBIDO BANORTE 1,500.00 11,500.00 11,500.00\n"
+    "05/ENE 05/ENE OXXO SUC 123 100.00 11,400.00 11,400.00\n"
+    "SALDO FINAL 11,400.00\n"
+]
+
+NU_STATEMENT = [
+    "NU MEXICO\n"
+    "PERIODO DEL 01 DIC 2023 AL 31 ENE 2024\n"
+    "SALDO ANTERIOR 1,000.00\n"
+    "30 DIC NETFLIX 200.00\n"
+    "10 ENE PAGO RECIBIDO -$500.00\n"
+    "SALDO AL CORTE 700.00\n"
+]
+
+
+class ParseAmountTests(SimpleTestCase):
+
+    def test_formats(self):
+        self.assertEqual(parse_amount('1,234.56'), 1234.56)
+        self.assertEqual(parse_amount('$ 1,234.56'), 1234.56)
+        self.assertEqual(parse_amount('-1,234.56'), -1234.56)
+        self.assertEqual(parse_amount('1,234.56-'), -1234.56)
+        self.assertEqual(parse_amount('(1,234.56)'), -1234.56)
+
+    def test_not_an_amount(self):
+        self.assertIsNone(parse_amount(''))
+        self.assertIsNone(parse_amount('ABC'))
+
+
+class ParseDateTests(SimpleTestCase):
+
+    def test_full_dates(self):
+        self.assertEqual(parse_date('15/01/2024'), '2024-01-15')
+        self.assertEqual(parse_date('15/01/24'), '2024-01-15')
+        self.assertEqual(parse_date('15-ENE-2024'), '2024-01-15')
+        self.assertEqual(parse_date('15 DEC 2024'), '2024-12-15')
+
+    def test_year_hint(self):
+        self.assertIsNone(parse_date('15/ENE'))
+        self.assertEqual(parse_date('15/ENE', year_hint=2024), '2024-01-15')
+        # December rows on a January statement belong to the previous year
+        self.assertEqual(parse_date('30 DIC', year_hint=2024, month_hint=1), '2023-12-30')
+
+    def test_invalid(self):
+        self.assertIsNone(parse_date('31/02/2024'))
+        self.assertIsNone(parse_date('15/XYZ/2024'))
+        self.assertIsNone(parse_date('hello'))
+
+
+class GuessCategoryTests(SimpleTestCase):
+
+    def test_first_matching_keyword_wins(self):
+        self.assertEqual(guess_category('Pago nomina empresa'), 'Salary')
+        self.assertEqual(guess_category('UBER EATS pedido'), 'Transportation')
+        self.assertEqual(guess_category('Something else'), 'Others')
+        self.assertEqual(guess_category(None), 'Others')
+
+
+class ParseStatementTextTests(SimpleTestCase):
+
+    def test_bank_template_with_running_balance(self):
+        result = parse_statement_text(BBVA_STATEMENT)
+
+        self.assertEqual(result['parser'], 'bbva_mx')
+        self.assertEqual(result['statement_period'], {'start': '2024-01-01', 'end': '2024-01-31'})
+        self.assertEqual(result['initial_balance'], 10000.0)
+        self.assertEqual(result['confidence'], 1.0)
+        self.assertEqual(
+            [(t['date'], t['title'], t['amount'], t['transaction_type']) for t in result['transactions']],
+            [
+                ('2024-01-02', 'SPEI RECIBIDO BANORTE', 1500.0, 'Income'),
+                ('2024-01-05', 'OXXO SUC 123', 100.0, 'Expense'),
+            ],
+        )
+
+    def test_credit_card_template(self):
+        result = parse_statement_text(NU_STATEMENT)
+
+        self.assertEqual(result['parser'], 'nu_mx_credit')
+        self.assertEqual(result['account_type'], 'Credit Card')
+        self.assertEqual(result['confidence'], 1.0)
+        self.assertEqual(
+            [(t['date'], t['amount'], t['transaction_type']) for t in result['transactions']],
+            [('2023-12-30', 200.0, 'Expense'), ('2024-01-10', 500.0, 'Income')],
+        )
+
+    def test_summary_rows_are_skipped_but_total_merchants_are_kept(self):
+        pages = [BBVA_STATEMENT[0].replace(
+            "SALDO FINAL 11,400.00\n",
+            "10/ENE 10/ENE TOTALPLAY 599.00 10,801.00 10,801.00\n"
+            "31/ENE 31/ENE TOTAL CARGOS 699.00\n"
+            "31/ENE 31/ENE Totales 2,199.00\n"
+            "SALDO FINAL 10,801.00\n"
+        )]
+
+        result = parse_statement_text(pages)
+
+        self.assertEqual([t['title'] for t in result['transactions']], ['SPEI RECIBIDO BANORTE', 'OXXO SUC 123', 'TOTALPLAY'])
+        self.assertEqual(result['transactions'][2]['category'], 'Bills and utilities')
+        self.assertEqual(result['confidence'], 1.0)
+
+    def test_unreconciled_totals_lower_the_confidence(self):
+        pages = [BBVA_STATEMENT[0].replace('SALDO FINAL 11,400.00', 'SALDO FINAL 9,000.00')]
+
+        self.assertEqual(parse_statement_text(pages)['confidence'], 0.5)
+
+    def test_unparsed_rows_lower_the_confidence(self):
+        pages = [BBVA_STATEMENT[0] + "07/ENE 07/ENE ROW WITHOUT AMOUNT\n"]
+
+        self.assertLess(parse_statement_text(pages)['confidence'], 1.0)
+
+    def test_no_text_layer(self):
+        self.assertIsNone(parse_statement_text([]))
+        self.assertIsNone(parse_statement_text(['', '   ']))
+
+
+class CompactStatementTextTests(SimpleTestCase):
+
+    def test_repeated_headers_are_kept_once(self):
+        pages = [
+            "BANCO X\nCuenta 123\nPagina 1 de 2\n02/01 COMPRA A 1.00",
+            "BANCO X\nCuenta 123\nPagina 2 de 2\n03/01   COMPRA    B    2.00",
+        ]
+
+        self.assertEqual(
+            compact_statement_text(pages),
+            "BANCO X\nCuenta 123\n"
+            "--- Page 1 ---\n02/01 COMPRA A 1.00\n"
+            "--- Page 2 ---\n03/01 COMPRA B 2.00",
+        )
+
+    def test_boilerplate_without_amounts_is_dropped(self):
+        pages = ["AVISO DE PRIVACIDAD consulte www.banco.mx\nCONDUSEF 55 5340 0999\n02/01 COMPRA A 1.00"]
+
+        # Lines with digits are kept even when they contain a boilerplate keyword
+        self.assertEqual(
+            compact_statement_text(pages),
+            "--- Page 1 ---\nCONDUSEF 55 5340 0999\n02/01 COMPRA A 1.00",
+        )
+
+    def test_empty_pages(self):
+        self.assertEqual(compact_statement_text([]), '')
+        self.assertEqual(compact_statement_text(['', '  \n ']), '')
+
+
+PDF_BYTES = b'%PDF-1.4\n' + b'0' * 4096 + b'\n%%EOF'
+
+
+class MergeChunkResultsTests(SimpleTestCase):
+
+    def row(self, day, title, amount, transaction_type='Expense'):
+        return {'date': f'2024-01-{day:02d}', 'title': title, 'amount': amount, 'transaction_type': transaction_type}
+
+    def merge(self, *chunks):
+        return merge_chunk_results(list(chunks), [(index * 5, index * 5 + 5) for index in range(len(chunks))])
+
+    def test_rows_repeated_across_a_page_boundary_are_dropped(self):
+        merged = self.merge(
+            {'transactions': [self.row(1, 'OXXO', 50), self.row(2, 'UBER TRIP', 80.5)]},
+            # The model re-read the last row of the previous pages, with other spacing and case
+            {'transactions': [self.row(2, 'Uber  trip', '80.50'), self.row(3, 'NETFLIX', 200)]},
+        )
+
+        self.assertEqual([row['title'] for row in merged['transactions']], ['OXXO', 'UBER TRIP', 'NETFLIX'])
+
+    def test_repeats_inside_a_chunk_are_kept(self):
+        merged = self.merge(
+            {'transactions': [self.row(1, 'OXXO', 50)]},
+            {'transactions': [self.row(2, 'OXXO', 50), self.row(2, 'OXXO', 50)]},
+            {'transactions': [self.row(2, 'OXXO', 50), self.row(3, 'OXXO', 50)]},
+        )
+
+        # Only the run that repeats the end of the previous chunk is dropped
+        self.assertEqual([row['date'] for row in merged['transactions']],
+                         ['2024-01-01', '2024-01-02', '2024-01-02', '2024-01-03'])
+
+    def test_overlap_is_checked_across_an_empty_chunk(self):
+        merged = self.merge(
+            {'transactions': [self.row(1, 'OXXO', 50)]},
+            {'transactions': []},
+            {'transactions': [self.row(1, 'OXXO', 50), self.row(4, 'SPEI RECIBIDO', 1000, 'Income')]},
+        )
+
+        self.assertEqual(len(merged['transactions']), 2)
+
+    def test_statement_details(self):
+        merged = self.merge(
+            {'transactions': [], 'statement_period': {'start': '2024-01-01', 'end': '2024-01-15'},
+             'account_name': 'Nu', 'account_type': 'Credit Card', 'usage': {'input_tokens': 10}},
+            {'transactions': [], 'statement_period': {'start': '2024-01-16', 'end': '2024-01-31'},
+             'initial_balance': 500, 'account_name': 'Nu', 'account_type': 'Other', 'usage': {'input_tokens': 5}},
+            {'transactions': [], 'initial_balance': 900, 'account_name': 'NU MEXICO', 'error': 'timeout'},
+        )
+
+        self.assertEqual(merged['statement_period'], {'start': '2024-01-01', 'end': '2024-01-31'})
+        self.assertEqual(merged['initial_balance'], 500)
+        self.assertEqual((merged['account_name'], merged['account_type']), ('Nu', 'Credit Card'))
+        self.assertEqual(merged['usage'], {'input_tokens': 15})
+        self.assertEqual((merged['chunk_count'], merged['error']), (3, 'AI processing failed for pages 11-15: timeout'))
+
+
+def make_pdf(password=None, algorithm='RC4-128'):
+    """One-page PDF, encrypted with the given algorithm when a password is set."""
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    if password:
+        writer.encrypt(password, algorithm=algorithm)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def make_xref_stream_pdf(encrypted):
+    """PDF 1.5 whose trailer is only the dictionary of a cross-reference stream."""
+    body = b'%PDF-1.5\n1 0 obj\n<< /Type /Catalog >>\nendobj\n'
+    encrypt = b' /Encrypt 2 0 R' if encrypted else b''
+    xref_object = (
+        b'3 0 obj\n<< /Type /XRef /Size 4 /Root 1 0 R' + encrypt + b' /W [1 2 1] /Length 0 >>\n'
+        b'stream\n\nendstream\nendobj\n'
+    )
+    return body + xref_object + b'startxref\n' + str(len(body)).encode() + b'\n%%EOF\n'
+
+
+def aes_available():
+    try:
+        import cryptography  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PdfEncryptionTests(SimpleTestCase):
+
+    def has_encrypt(self, content):
+        return _pdf_trailer_has_encrypt(io.BytesIO(content))
+
+    def test_trailer(self):
+        self.assertFalse(self.has_encrypt(make_pdf()))
+        self.assertTrue(self.has_encrypt(make_pdf('secret', 'RC4-128')))
+        self.assertIsNone(self.has_encrypt(b'%PDF-1.4\nno trailer here'))
+
+    @skipUnless(aes_available(), 'AES needs the cryptography package')
+    def test_trailer_of_aes_pdfs(self):
+        self.assertTrue(self.has_encrypt(make_pdf('secret', 'AES-128')))
+        self.assertTrue(self.has_encrypt(make_pdf('secret', 'AES-256')))
+
+    def test_cross_reference_stream(self):
+        self.assertTrue(self.has_encrypt(make_xref_stream_pdf(encrypted=True)))
+        self.assertFalse(self.has_encrypt(make_xref_stream_pdf(encrypted=False)))
+        # Only the xref stream dictionary counts, not /Encrypt further on in the file
+        content = make_xref_stream_pdf(encrypted=False).replace(b'endstream', b'endstream /Encrypt')
+        self.assertFalse(self.has_encrypt(content))
+
+    def decrypt(self, content, password):
+        decrypted = decrypt_pdf_file(SimpleUploadedFile('statement.pdf', content), password)
+        self.addCleanup(decrypted.close)
+        decrypted.seek(0)
+        return decrypted.read()
+
+    def assert_decrypts(self, content):
+        decrypted = self.decrypt(content, 'secret')
+
+        reader = PdfReader(io.BytesIO(decrypted))
+        self.assertFalse(reader.is_encrypted)
+        self.assertEqual(len(reader.pages), 1)
+        with self.assertRaisesMessage(ValueError, 'Incorrect password'):
+            self.decrypt(content, 'wrong')
+
+    def test_decrypt_rc4(self):
+        self.assert_decrypts(make_pdf('secret', 'RC4-128'))
+
+    @skipUnless(aes_available(), 'AES needs the cryptography package')
+    def test_decrypt_aes(self):
+        self.assert_decrypts(make_pdf('secret', 'AES-128'))
+        self.assert_decrypts(make_pdf('secret', 'AES-256'))
+
+    def test_plain_pdf_is_copied(self):
+        content = make_pdf()
+
+        self.assertEqual(self.decrypt(content, 'anything'), content)
+
+
+class StatementStorageTestCase(TestCase):
+    """Runs against a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_statement(self, content=PDF_BYTES, **fields):
+        blob = store_statement_file(ContentFile(content, name='statement.pdf'))
+        return BankStatement.objects.create(
+            user_id='alice', blob=blob, original_filename='statement.pdf', file_size=len(content), **fields
+        )
+
+
+class StatementBlobTests(StatementStorageTestCase):
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.create_statement()
+        second = self.create_statement()
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(StatementBlob.objects.get().ref_count, 2)
+
+    def test_deleting_a_statement_only_releases_its_reference(self):
+        first = self.create_statement()
+        second = self.create_statement()
+
+        first.delete()
+        blob = StatementBlob.objects.get()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertIsNone(blob.unreferenced_at)
+
+        second.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertIsNotNone(blob.unreferenced_at)
+        self.assertTrue(blob.file.storage.exists(blob.file.name))
+
+    def test_sweep_waits_for_the_grace_period(self):
+        self.create_statement().delete()
+        blob = StatementBlob.objects.get()
+
+        self.assertEqual(sweep_unreferenced_blobs(grace_minutes=60)['deleted'], 0)
+
+        StatementBlob.objects.update(unreferenced_at=timezone.now() - timedelta(minutes=61))
+        with self.captureOnCommitCallbacks(execute=True):
+            result = sweep_unreferenced_blobs(grace_minutes=60)
+        self.assertEqual(result['deleted'], 1)
+        self.assertEqual(result['bytes_reclaimed'], len(PDF_BYTES))
+        self.assertFalse(StatementBlob.objects.exists())
+        self.assertFalse(blob.file.storage.exists(blob.file.name))
+
+    def test_sweep_dry_run_keeps_the_blob(self):
+        self.create_statement().delete()
+
+        result = sweep_unreferenced_blobs(grace_minutes=0, dry_run=True)
+        self.assertEqual(result['deleted'], 1)
+        self.assertTrue(StatementBlob.objects.exists())
+
+    def test_sweep_corrects_reference_counts(self):
+        statement = self.create_statement()
+        # A bulk delete skips BankStatement.delete(), leaving the count behind
+        StatementBlob.objects.update(ref_count=3)
+        self.assertEqual(sweep_unreferenced_blobs(grace_minutes=0)['corrected'], 1)
+        self.assertEqual(StatementBlob.objects.get().ref_count, 1)
+
+        BankStatement.objects.filter(id=statement.id).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = sweep_unreferenced_blobs(grace_minutes=0)
+        self.assertEqual((result['corrected'], result['deleted']), (1, 1))
+
+    def test_sweep_leaves_counts_of_new_blobs_alone(self):
+        # Stored, but the upload has not created its statement yet
+        blob = store_statement_file(ContentFile(PDF_BYTES, name='statement.pdf'))
+
+        self.assertEqual(sweep_unreferenced_blobs(grace_minutes=60)['corrected'], 0)
+        blob.refresh_from_db()
+        self.assertEqual((blob.ref_count, blob.unreferenced_at), (1, None))
+
+        StatementBlob.objects.update(created_at=timezone.now() - timedelta(minutes=61))
+        self.assertEqual(sweep_unreferenced_blobs(grace_minutes=60)['corrected'], 1)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+
+    def test_legacy_files_are_queued_for_the_sweeper(self):
+        statement = BankStatement(user_id='alice', original_filename='old.pdf', file_size=len(PDF_BYTES))
+        statement.file.save('old.pdf', ContentFile(PDF_BYTES))
+        name = statement.file.name
+
+        statement.delete()
+        self.assertTrue(statement.file.storage.exists(name))
+        self.assertTrue(StatementFileDeletion.objects.filter(name=name).exists())
+
+        self.assertEqual(sweep_unreferenced_blobs(grace_minutes=0)['legacy_files'], 1)
+        self.assertFalse(statement.file.storage.exists(name))
+        self.assertFalse(StatementFileDeletion.objects.exists())
+
+    @override_settings(BANK_STATEMENT_BLOB_COMPRESSION=True)
+    def test_compressed_blob_is_read_back_uncompressed(self):
+        statement = self.create_statement()
+
+        self.assertTrue(statement.blob.compressed)
+        self.assertLess(statement.blob.stored_size, len(PDF_BYTES))
+        with statement_pdf_path(statement) as path:
+            with open(path, 'rb') as pdf:
+                self.assertEqual(pdf.read(), PDF_BYTES)
+
+    def test_errors_inside_the_pdf_path_block_are_not_swallowed(self):
+        statement = self.create_statement()
+
+        with self.assertRaises(NotImplementedError):
+            with statement_pdf_path(statement) as path:
+                self.assertEqual(path, statement.blob.file.path)
+                raise NotImplementedError('raised by the caller')
+
+
+class PercentileTests(SimpleTestCase):
+
+    def test_nearest_rank(self):
+        values = list(range(1, 21))
+
+        self.assertEqual(percentile(values, 0.95), 19)
+        self.assertEqual(percentile(values, 0.5), 10)
+        self.assertEqual(percentile(list(range(1, 11)), 0.95), 10)
+        self.assertEqual(percentile(list(range(1, 31)), 0.1), 3)
+
+    def test_order_and_edges(self):
+        self.assertEqual(percentile([4, 1, 3, 2], 0.5), 2)
+        self.assertEqual(percentile([3, 1, 2], 0.5), 2)
+        self.assertEqual(percentile([1, 2], 0.5), 1)
+        self.assertEqual(percentile([7.5], 0.95), 7.5)
+        self.assertEqual(percentile([5, 9], 0), 5)
+        self.assertEqual(percentile([5, 9], 1), 9)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_page_buckets(self):
+        self.assertEqual(
+            [page_bucket(pages)[1] for pages in (1, 2, 3, 10, 21, None)],
+            ['1-2 pages', '1-2 pages', '3-5 pages', '6-10 pages', '21+ pages', 'unknown'],
+        )
+
+
+class SummarizeMetricsTests(StatementStorageTestCase):
+
+    def record(self, model_name, page_count, total_seconds, succeeded=True, total_tokens=None):
+        StatementProcessingMetrics.objects.create(
+            statement=self.create_statement(), backend='gemini', model_name=model_name, page_count=page_count,
+            succeeded=succeeded, total_seconds=total_seconds, total_tokens=total_tokens
+        )
+
+    def test_groups_by_model_and_pages(self):
+        for seconds in range(1, 11):
+            self.record('flash', 1, seconds, total_tokens=seconds * 100)
+        self.record('pro', 12, 40.0, succeeded=False)
+        self.record('', None, 3.0)
+
+        summary = summarize_metrics(StatementProcessingMetrics.objects.all())
+
+        by_model = {group['label']: group for group in summary['by_model']}
+        self.assertEqual(list(by_model), ['flash', 'pro', 'unknown'])
+        self.assertEqual(by_model['flash']['count'], 10)
+        self.assertEqual(by_model['flash']['total_seconds'], {'p50': 5.0, 'p95': 10.0})
+        self.assertEqual(by_model['flash']['total_tokens'], {'p50': 500, 'p95': 1000})
+        self.assertEqual(by_model['pro']['failed'], 1)
+        # Columns without values have no percentiles
+        self.assertEqual(by_model['pro']['first_transaction_seconds'], {'p50': None, 'p95': None})
+        self.assertEqual(
+            [(group['label'], group['count']) for group in summary['by_pages']],
+            [('1-2 pages', 10), ('11-20 pages', 1), ('unknown', 1)],
+        )
+
+
+class RetentionTests(StatementStorageTestCase):
+
+    def create_statement(self, status, age_days, content=PDF_BYTES):
+        statement = super().create_statement(content=content, processing_status=status)
+        BankStatement.objects.filter(id=statement.id).update(upload_date=timezone.now() - timedelta(days=age_days))
+        return statement
+
+    def test_old_completed_statements_lose_only_their_pdf(self):
+        old = self.create_statement('completed', 40)
+        recent = self.create_statement('completed', 5, content=PDF_BYTES + b'recent')
+
+        result = apply_retention(pdf_days=30, failed_days=0, sweep_grace_minutes=60)
+
+        self.assertEqual(result['pdfs_deleted'], 1)
+        self.assertEqual(result['bytes_released'], len(PDF_BYTES))
+        old.refresh_from_db()
+        self.assertIsNone(old.blob_id)
+        self.assertIsNotNone(old.file_deleted_at)
+        recent.refresh_from_db()
+        self.assertIsNotNone(recent.blob_id)
+        # Released blobs are removed by the sweeper once the grace period is over
+        self.assertEqual(StatementBlob.objects.get(ref_count=0).stored_size, len(PDF_BYTES))
+
+    def test_shared_blob_is_kept_while_referenced(self):
+        self.create_statement('completed', 40)
+        self.create_statement('completed', 5)
+
+        result = apply_retention(pdf_days=30, failed_days=0, sweep_grace_minutes=0)
+
+        self.assertEqual(result['bytes_released'], 0)
+        self.assertEqual(StatementBlob.objects.get().ref_count, 1)
+
+    def test_old_failed_statements_are_deleted(self):
+        self.create_statement('failed', 10)
+        kept = self.create_statement('pending', 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = apply_retention(pdf_days=0, failed_days=7, sweep_grace_minutes=0)
+
+        self.assertEqual(result['failed_deleted'], 1)
+        # The pending statement still uses the same blob
+        self.assertEqual(result['blobs_swept'], 0)
+        self.assertEqual(list(BankStatement.objects.values_list('id', flat=True)), [kept.id])
+
+    def test_dry_run_changes_nothing(self):
+        self.create_statement('completed', 40)
+        self.create_statement('failed', 40, content=PDF_BYTES + b'failed')
+
+        result = apply_retention(pdf_days=30, failed_days=30, dry_run=True)
+
+        self.assertEqual((result['pdfs_deleted'], result['failed_deleted']), (1, 1))
+        self.assertEqual(BankStatement.objects.filter(blob__isnull=False).count(), 2)
+
+    def test_zero_days_disables_a_policy(self):
+        self.create_statement('completed', 400)
+        self.create_statement('failed', 400, content=PDF_BYTES + b'failed')
+
+        result = apply_retention(pdf_days=0, failed_days=0)
+
+        self.assertEqual((result['pdfs_deleted'], result['failed_deleted']), (0, 0))
+        self.assertEqual(BankStatement.objects.count(), 2)
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep in bankstatements.resilience."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ResilienceTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('bankstatements.resilience.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class CircuitBreakerTests(ResilienceTestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        self.clock.now += 30
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.before_call()
+
+    def test_failed_trial_reopens_the_circuit(self):
+        breaker = CircuitBreaker('test', failure_threshold=5, reset_timeout=30)
+        for _ in range(5):
+            breaker.record_failure()
+        self.clock.now += 30
+        breaker.before_call()
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.clock.now += 29
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_only_transient_errors_count(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+        breaker.record_error(ValueError('Invalid JSON in response'))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record_error(Exception('503 Service Unavailable'))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_transient_error_classification(self):
+        self.assertTrue(is_transient_error(Exception('429 Resource has been exhausted (quota)')))
+        self.assertTrue(is_transient_error(TimeoutError()))
+        self.assertTrue(is_transient_error(DeadlineExceeded('late')))
+        self.assertFalse(is_transient_error(Exception('400 API key not valid')))
+
+    def test_status_codes_are_not_matched_inside_messages(self):
+        self.assertFalse(is_transient_error(ValueError('Expected 15000 transactions, got 1500')))
+        self.assertFalse(is_transient_error(Exception('400 Invalid value at contents[0] (code 503)')))
+        self.assertFalse(is_transient_error(Exception('Model returned an invalid reconnection id')))
+        self.assertTrue(is_transient_error(Exception('503 Service Unavailable')))
+        self.assertTrue(is_transient_error(Exception('The service is currently unavailable')))
+
+    def test_status_code_and_exception_type(self):
+        self.assertTrue(is_transient_error(google_exceptions.ServiceUnavailable('model overloaded')))
+        self.assertTrue(is_transient_error(google_exceptions.InternalServerError('')))
+        self.assertTrue(is_rate_limit_error(google_exceptions.ResourceExhausted('')))
+        self.assertFalse(is_transient_error(google_exceptions.InvalidArgument('quota field is invalid')))
+
+        error = Exception('Upload failed')
+        error.response = mock.Mock(status_code=502)
+        self.assertTrue(is_transient_error(error))
+        self.assertFalse(is_rate_limit_error(error))
+
+
+class DeadlineTests(ResilienceTestCase):
+
+    def test_timeout_is_capped_by_the_remaining_budget(self):
+        deadline = Deadline(60)
+        self.assertEqual(deadline.timeout(30), 30)
+
+        self.clock.now += 45
+        self.assertEqual(deadline.timeout(30), 15)
+        self.assertEqual(deadline.timeout(), 15)
+
+    def test_sleep_never_passes_the_deadline(self):
+        deadline = Deadline(10)
+        deadline.sleep(4)
+
+        with self.assertRaises(DeadlineExceeded):
+            deadline.sleep(20)
+        self.assertEqual(self.clock.now, 1010.0)
+
+    def test_check(self):
+        deadline = Deadline(10)
+        deadline.check()
+
+        self.clock.now += 10
+        self.assertTrue(deadline.expired())
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check('uploading')
+
+    def test_no_deadline(self):
+        deadline = Deadline(None)
+        self.clock.now += 10 ** 6
+
+        self.assertFalse(deadline.expired())
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(deadline.timeout(30), 30)
+
+
+class BackoffDelaysTests(SimpleTestCase):
+
+    def test_delays_are_jittered_below_the_exponential_cap(self):
+        with mock.patch('bankstatements.resilience.random.uniform', side_effect=lambda low, high: high):
+            delays = backoff_delays(base=0.5, cap=4.0)
+            self.assertEqual([next(delays) for _ in range(6)], [0.5, 1.0, 2.0, 4.0, 4.0, 4.0])
+
+
+STREAMED_RESPONSE = (
+    '```json\n{"account_name": "Nu {credit}", "summary": "transactions",\n'
+    '"transactions": [\n'
+    '  {"date": "2024-01-05", "title": "UBER \\"TRIP\\" }", "amount": 123.0, "tags": {"a": [1, 2]}},\n'
+    '  {"date": "2024-01-10", "title": "PAGO [RECIBIDO]", "amount": 500.0}\n'
+    '],\n"initial_balance": 1000.0, "extra": [{"ignored": true}]}\n```'
+)
+
+
+class TransactionStreamParserTests(SimpleTestCase):
+
+    expected = [
+        {'date': '2024-01-05', 'title': 'UBER "TRIP" }', 'amount': 123.0, 'tags': {'a': [1, 2]}},
+        {'date': '2024-01-10', 'title': 'PAGO [RECIBIDO]', 'amount': 500.0},
+    ]
+
+    def test_whole_response(self):
+        parser = TransactionStreamParser()
+
+        self.assertEqual(parser.feed(STREAMED_RESPONSE), self.expected)
+        self.assertEqual(parser.count, 2)
+
+    def test_fragments_of_any_size(self):
+        for size in (1, 2, 7, 64):
+            parser = TransactionStreamParser()
+            received = []
+            for start in range(0, len(STREAMED_RESPONSE), size):
+                received.extend(parser.feed(STREAMED_RESPONSE[start:start + size]))
+            self.assertEqual(received, self.expected, f"fragment size {size}")
+
+    def test_elements_are_returned_as_soon_as_they_close(self):
+        parser = TransactionStreamParser()
+        first_end = STREAMED_RESPONSE.index('}},') + 2
+
+        self.assertEqual(parser.feed(STREAMED_RESPONSE[:first_end - 1]), [])
+        self.assertEqual(parser.feed(STREAMED_RESPONSE[first_end - 1:first_end]), self.expected[:1])
+
+    def test_other_arrays_are_ignored(self):
+        parser = TransactionStreamParser(array_key='missing')
+
+        self.assertEqual(parser.feed(STREAMED_RESPONSE), [])
+
+
+class ManualExecutor:
+    """Executor that runs submitted jobs only when the test says so."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append((fn, args))
+
+    def run_next(self):
+        fn, args = self.jobs.pop(0)
+        fn(*args)
+
+    def run_all(self):
+        while self.jobs:
+            self.run_next()
+
+
+class FairShareSchedulerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.executor = ManualExecutor()
+        self.order = []
+
+    def submit(self, scheduler, user_id, count):
+        for _ in range(count):
+            scheduler.submit(user_id, self.order.append, user_id)
+
+    def test_late_user_is_not_queued_behind_a_backlog(self):
+        scheduler = FairShareScheduler(max_concurrent=1, executor=self.executor)
+        self.submit(scheduler, 'alice', 4)
+        self.submit(scheduler, 'bob', 2)
+
+        self.executor.run_all()
+
+        self.assertEqual(self.order, ['alice', 'bob', 'alice', 'bob', 'alice', 'alice'])
+
+    def test_weights_give_proportional_turns(self):
+        scheduler = FairShareScheduler(max_concurrent=1, executor=self.executor, weights={'heavy': 2})
+        self.submit(scheduler, 'light', 4)
+        self.submit(scheduler, 'heavy', 4)
+
+        self.executor.run_all()
+
+        self.assertEqual(self.order, ['light', 'heavy', 'heavy', 'heavy', 'light', 'heavy', 'light', 'light'])
+
+    def test_per_user_cap(self):
+        scheduler = FairShareScheduler(max_concurrent=2, per_user_max_concurrent=1, executor=self.executor)
+        self.submit(scheduler, 'alice', 3)
+
+        stats = scheduler.stats()
+        self.assertEqual((stats['running'], stats['queued']), (1, 2))
+
+        # A free worker goes to another user right away
+        self.submit(scheduler, 'bob', 1)
+        self.assertEqual(scheduler.stats()['running'], 2)
+
+        self.executor.run_all()
+        stats = scheduler.stats()
+        self.assertEqual((stats['running'], stats['queued']), (0, 0))
+        self.assertEqual({user['user_id']: user['dispatched'] for user in stats['users']}, {'alice': 3, 'bob': 1})
+
+    def test_job_result_and_errors_reach_the_future(self):
+        scheduler = FairShareScheduler(max_concurrent=1, executor=self.executor)
+        succeeded = scheduler.submit('alice', lambda: 42)
+        failed = scheduler.submit('alice', lambda: 1 / 0)
+
+        self.executor.run_all()
+
+        self.assertEqual(succeeded.result(timeout=0), 42)
+        self.assertIsInstance(failed.exception(timeout=0), ZeroDivisionError)
+        self.assertEqual(scheduler.stats()['running'], 0)
+
+    def test_parse_user_weights(self):
+        self.assertEqual(parse_user_weights('alice:2, bob:0.5,,'), {'alice': 2.0, 'bob': 0.5})
+        self.assertEqual(parse_user_weights('user:with:colon:3'), {'user:with:colon': 3.0})
+        self.assertEqual(parse_user_weights('alice, bob:x, :3'), {})
+        self.assertEqual(parse_user_weights(''), {})
+
+
+class PeriodIndexTests(SimpleTestCase):
+
+    def test_overlapping_and_adjacent_periods_are_merged(self):
+        index = PeriodIndex([
+            (date(2024, 2, 1), date(2024, 2, 29)),
+            (date(2024, 1, 1), date(2024, 1, 31)),
+            (date(2024, 1, 15), date(2024, 1, 20)),
+            (date(2024, 4, 1), date(2024, 4, 30)),
+            (date(2024, 6, 1), date(2024, 5, 1)),
+        ])
+
+        self.assertEqual(index.intervals, [
+            (date(2024, 1, 1), date(2024, 2, 29)),
+            (date(2024, 4, 1), date(2024, 4, 30)),
+        ])
+
+    def test_contains(self):
+        index = PeriodIndex([(date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 3, 1), date(2024, 3, 31))])
+
+        self.assertTrue(index.contains(date(2024, 1, 1)))
+        self.assertTrue(index.contains(date(2024, 3, 31)))
+        self.assertFalse(index.contains(date(2023, 12, 31)))
+        self.assertFalse(index.contains(date(2024, 2, 15)))
+        self.assertFalse(index.contains(date(2024, 4, 1)))
+
+    def test_uncovered(self):
+        index = PeriodIndex([(date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 3, 1), date(2024, 3, 31))])
+
+        # Fully covered
+        self.assertEqual(index.uncovered(date(2024, 1, 10), date(2024, 1, 20)), [])
+        # Gap between two covered periods
+        self.assertEqual(
+            index.uncovered(date(2024, 1, 15), date(2024, 3, 15)),
+            [(date(2024, 2, 1), date(2024, 2, 29))],
+        )
+        # Uncovered on both sides
+        self.assertEqual(
+            index.uncovered(date(2023, 12, 20), date(2024, 4, 10)),
+            [
+                (date(2023, 12, 20), date(2023, 12, 31)),
+                (date(2024, 2, 1), date(2024, 2, 29)),
+                (date(2024, 4, 1), date(2024, 4, 10)),
+            ],
+        )
+        # Not covered at all
+        self.assertEqual(
+            index.uncovered(date(2024, 5, 1), date(2024, 5, 31)),
+            [(date(2024, 5, 1), date(2024, 5, 31))],
+        )
+        self.assertEqual(
+            PeriodIndex([]).uncovered(date(2024, 5, 1), date(2024, 5, 31)),
+            [(date(2024, 5, 1), date(2024, 5, 31))],
+        )
+
+
+class StatementCoverageTests(TestCase):
+
+    def test_scan_reads_the_row_dates_of_each_page(self):
+        scan = scan_statement_text([
+            "BBVA MEXICO PERIODO DEL 01/01/2024 AL 31/01/2024\n02/ENE 02/ENE OXXO 1.00",
+            "05/ENE 05/ENE UBER 2.00\n20/ENE 20/ENE CFE 3.00",
+        ])
+
+        self.assertEqual(scan['parser'], 'bbva_mx')
+        self.assertEqual(scan['statement_period'], {'start': '2024-01-01', 'end': '2024-01-31'})
+        self.assertEqual(scan['page_dates'], [['2024-01-02'], ['2024-01-05', '2024-01-20']])
+        self.assertIsNone(scan_statement_text(["No period here\n02/ENE OXXO 1.00"]))
+
+    def test_uncovered_page_range(self):
+        index = PeriodIndex([(date(2024, 1, 1), date(2024, 1, 15))])
+        page_dates = [['2024-01-02'], ['2024-01-10', '2024-01-16'], ['2024-01-20'], []]
+
+        self.assertEqual(_uncovered_page_range(page_dates, index), (1, 3))
+        self.assertIsNone(_uncovered_page_range([['2024-01-02'], []], index))
+
+    def test_rows_in_covered_periods_are_dropped(self):
+        coverage = {
+            'account_id': '1',
+            'account_name': 'BBVA',
+            'statement_period': {'start': '2024-01-01', 'end': '2024-01-31'},
+            'uncovered': [{'start': '2024-01-16', 'end': '2024-01-31'}],
+            'skipped': False,
+            'pages': None,
+        }
+        extracted = {
+            'transactions': [
+                {'date': '2024-01-10', 'title': 'Covered'},
+                {'date': '2024-01-20', 'title': 'New'},
+                {'date': None, 'title': 'Undated'},
+            ],
+            'statement_period': None,
+            'error': None,
+        }
+
+        apply_statement_coverage(extracted, coverage)
+
+        self.assertEqual([row['title'] for row in extracted['transactions']], ['New', 'Undated'])
+        self.assertEqual(extracted['coverage']['dropped_transactions'], 1)
+        self.assertEqual(extracted['statement_period'], coverage['statement_period'])
+
+    def test_only_committed_statements_count_as_imported(self):
+        user = User.objects.create(username='alice')
+
+        def statement(start, end, committed, username='alice'):
+            bank_statement = BankStatement.objects.create(
+                user_id=username, original_filename='s.pdf', file_size=1, account_id='7',
+                period_start=start, period_end=end
+            )
+            StagedTransaction.objects.create(
+                statement=bank_statement, position=0, title='Row', transaction_type='Expense',
+                category='Others', committed=committed
+            )
+            return bank_statement
+
+        january = statement(date(2024, 1, 1), date(2024, 1, 31), committed=True)
+        statement(date(2024, 2, 1), date(2024, 2, 29), committed=False)
+        User.objects.create(username='bob')
+        statement(date(2024, 3, 1), date(2024, 3, 31), committed=True, username='bob')
+
+        self.assertEqual(build_period_index(user.id, '7').intervals, [(date(2024, 1, 1), date(2024, 1, 31))])
+        self.assertEqual(len(build_period_index(user.id, '7', exclude_statement_id=january.id)), 0)
+        self.assertEqual(len(build_period_index(user.id, '8')), 0)
+
+
+def make_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def corrupt_zip_entry(content, name, data):
+    """Overwrite the stored (compressed) bytes of one entry, keeping the directory intact."""
+    entry = zipfile.ZipFile(io.BytesIO(content)).getinfo(name)
+    name_length, extra_length = struct.unpack('<HH', content[entry.header_offset + 26:entry.header_offset + 30])
+    start = entry.header_offset + 30 + name_length + extra_length
+    data = (data * entry.compress_size)[:entry.compress_size]
+    return content[:start] + data + content[start + entry.compress_size:]
+
+
+@mock.patch('bankstatements.views.enqueue_statement')
+class BatchUploadTests(StatementStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create(username='alice')
+
+    def upload_zip(self, content):
+        response = self.client.post(reverse('upload_bank_statement_batch'), {
+            'zip_file': SimpleUploadedFile('statements.zip', content, 'application/zip'),
+            'user_id': 'alice',
+        })
+        return response
+
+    def rejections(self, response):
+        self.assertEqual(response.status_code, 202)
+        return {row['filename']: row['reason'] for row in response.json()['batch']['rejected_files']}
+
+    def test_declared_size_is_checked_before_extracting(self, enqueue):
+        content = make_zip([('big.pdf', b'%PDF' + b'0' * MAX_STATEMENT_FILE_SIZE), ('ok.pdf', make_pdf())])
+
+        with mock.patch('bankstatements.views._extract_zip_entry', wraps=_extract_zip_entry) as extract:
+            response = self.upload_zip(content)
+
+        self.assertEqual(self.rejections(response), {'big.pdf': 'File size must be less than 10MB'})
+        self.assertEqual([call.args[2] for call in extract.call_args_list], ['ok.pdf'])
+        self.assertEqual(enqueue.call_count, 1)
+
+    @override_settings(BANK_STATEMENT_BATCH_MAX_FILES=2)
+    def test_files_over_the_cap_are_rejected(self, enqueue):
+        content = make_zip([(f'{index}.pdf', make_pdf()) for index in range(3)] + [('__MACOSX/._0.pdf', b'x')])
+
+        response = self.upload_zip(content)
+
+        self.assertEqual(self.rejections(response), {'2.pdf': 'A batch can contain at most 2 files'})
+        self.assertEqual(BankStatement.objects.count(), 2)
+
+    def test_corrupt_entries_only_reject_that_file(self, enqueue):
+        stored = make_zip([('crc.pdf', make_pdf()), ('ok.pdf', make_pdf())], compression=zipfile.ZIP_STORED)
+        deflated = make_zip([('deflate.pdf', make_pdf()), ('ok.pdf', make_pdf())])
+        reason = 'The file could not be extracted from the ZIP archive'
+
+        # A stored entry with changed bytes fails its CRC check (BadZipFile)
+        response = self.upload_zip(corrupt_zip_entry(stored, 'crc.pdf', b'%PDF-9.9'))
+        self.assertEqual(self.rejections(response), {'crc.pdf': reason})
+        # 0xFF starts a deflate block of an invalid type (zlib.error)
+        response = self.upload_zip(corrupt_zip_entry(deflated, 'deflate.pdf', b'\xff'))
+        self.assertEqual(self.rejections(response), {'deflate.pdf': reason})
+        self.assertEqual(BankStatement.objects.count(), 2)
+
+    def test_unreadable_archive(self, enqueue):
+        response = self.upload_zip(b'not a zip file')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BankStatementBatch.objects.exists())
+
+
+class CommitStagedTransactionsTests(StatementStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='alice')
+        self.account = Account.objects.create(
+            account_name='Checking', account_type='Debit', bank='BBVA', total=1000, owner='alice'
+        )
+        self.statement = self.create_statement()
+        for position, (transaction_type, amount) in enumerate(
+            [('Income', 100), ('Expense', 30.25), ('Transfer', 50)]
+        ):
+            StagedTransaction.objects.create(
+                statement=self.statement, position=position, date=date(2024, 1, position + 1),
+                title=f'ROW {position}', amount=amount, transaction_type=transaction_type, category='Other'
+            )
+
+    def test_balance_changes_by_incomes_minus_expenses(self):
+        result = commit_staged_transactions(self.statement, str(self.account.id))
+
+        self.assertEqual(result['committed_count'], 3)
+        self.assertEqual(result['balance_change'].minor_units, 10000 - 3025)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.total.minor_units, 100000 + 6975)
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('id', flat=True)),
+            sorted(self.statement.staged_transactions.values_list('transaction', flat=True)),
+        )
+        self.assertFalse(self.statement.staged_transactions.filter(committed=False).exists())
+
+    def test_failure_rolls_everything_back(self):
+        with mock.patch('transaction.legs.sync_transaction_legs', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                commit_staged_transactions(self.statement, str(self.account.id))
+
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(self.statement.staged_transactions.filter(committed=True).exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.total.minor_units, 100000)
+
+    def test_rows_are_committed_once(self):
+        staged_ids = list(self.statement.staged_transactions.values_list('id', flat=True))
+        commit_staged_transactions(self.statement, str(self.account.id), staged_ids=staged_ids[:1])
+
+        with self.assertRaisesMessage(ValueError, 'already committed'):
+            commit_staged_transactions(self.statement, str(self.account.id), staged_ids=staged_ids)
+        commit_staged_transactions(self.statement, str(self.account.id))
+        with self.assertRaisesMessage(ValueError, 'no staged transactions'):
+            commit_staged_transactions(self.statement, str(self.account.id))
+
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.total.minor_units, 100000 + 6975)
+
+    def test_negative_amounts_are_rejected(self):
+        row = self.statement.staged_transactions.first()
+        serializer = StagedTransactionSerializer(row, data={'amount': -5}, partial=True)
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('amount', serializer.errors)
+
+
+class UserStatementListTests(StatementStorageTestCase):
+
+    def list_statements(self, username):
+        response = self.client.get(reverse('get_user_bank_statements', args=[username]))
+        self.assertEqual(response.status_code, 200)
+        return [statement['id'] for statement in response.json()['statements']]
+
+    def test_statements_follow_a_renamed_user(self):
+        user = User.objects.create(username='alice')
+        statement = self.create_statement()
+        user.username = 'alicia'
+        user.save()
+
+        self.assertEqual(self.list_statements('alicia'), [statement.id])
+        self.assertEqual(self.list_statements('alice'), [])
+
+    def test_backfill_links_statements_uploaded_before_the_user_existed(self):
+        statement = self.create_statement()
+        self.assertIsNone(statement.owner_id)
+        self.assertEqual(backfill_references()['unowned_statements'], 1)
+
+        User.objects.create(username='alice')
+        self.assertEqual(self.list_statements('alice'), [])
+        stats = backfill_references()
+
+        self.assertEqual((stats['statements'], stats['unowned_statements']), (1, 0))
+        self.assertEqual(self.list_statements('alice'), [statement.id])
+
+
+class StatementPaginationTests(StatementStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create(username='alice')
+        statuses = ['completed', 'failed', 'pending', 'completed', 'failed']
+        now = timezone.now()
+        # Newest first: ids in the order the listing returns them
+        self.ids = []
+        for age, processing_status in enumerate(statuses):
+            statement = self.create_statement(processing_status=processing_status)
+            BankStatement.objects.filter(id=statement.id).update(upload_date=now - timedelta(hours=age))
+            self.ids.append(statement.id)
+        self.statuses = dict(zip(self.ids, statuses))
+
+    def get(self, url=None, **params):
+        response = self.client.get(url or reverse('get_user_bank_statements', args=['alice']), params)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(set(body), {'message', 'next', 'previous', 'statements'})
+        return body
+
+    def test_pages_follow_the_next_and_previous_links(self):
+        first = self.get(page_size=2)
+        self.assertEqual([row['id'] for row in first['statements']], self.ids[:2])
+        self.assertIsNone(first['previous'])
+
+        second = self.get(first['next'])
+        self.assertEqual([row['id'] for row in second['statements']], self.ids[2:4])
+        self.assertIn('page_size=2', second['next'])
+
+        last = self.get(second['next'])
+        self.assertEqual([row['id'] for row in last['statements']], self.ids[4:])
+        self.assertIsNone(last['next'])
+
+        back = self.get(last['previous'])
+        self.assertEqual([row['id'] for row in back['statements']], self.ids[2:4])
+
+    def test_status_filter_is_kept_across_pages(self):
+        first = self.get(page_size=1, status='failed, completed')
+        self.assertIn('status=', first['next'])
+
+        seen = [row['id'] for row in first['statements']]
+        url = first['next']
+        while url:
+            page = self.get(url)
+            seen += [row['id'] for row in page['statements']]
+            url = page['next']
+
+        self.assertEqual(seen, [statement_id for statement_id in self.ids if self.statuses[statement_id] != 'pending'])
+
+    def test_summary_and_invalid_filters(self):
+        body = self.get(summary='true', status='pending')
+        self.assertEqual(
+            body['statements'],
+            [{'id': self.ids[2], 'original_filename': 'statement.pdf', 'file_size': len(PDF_BYTES),
+              'upload_date': body['statements'][0]['upload_date'], 'processing_status': 'pending'}],
+        )
+
+        response = self.client.get(reverse('get_user_bank_statements', args=['alice']), {'status': 'done'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_history(self):
+        body = self.get(reverse('get_user_bank_statements', args=['nobody']))
+
+        self.assertEqual((body['statements'], body['next'], body['previous']), ([], None, None))
+        self.assertEqual(body['message'], 'No bank statements found for this user')
+
+
+class ReprocessStatementsTests(StatementStorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('bankstatements.reprocessing.get_reprocess_queue')
+        self.queue = patcher.start().return_value
+        self.queue.put.side_effect = lambda jobs, use_cache: len(jobs)
+        self.addCleanup(patcher.stop)
+
+    def queued_jobs(self):
+        self.assertEqual(self.queue.put.call_count, 1)
+        return self.queue.put.call_args.args[0]
+
+    def test_failed_statements_are_reset_and_queued_smallest_first(self):
+        large = self.create_statement(
+            content=PDF_BYTES + b'%large', processing_status='failed', error_message='timeout'
+        )
+        small = self.create_statement(processing_status='failed', error_message='timeout')
+
+        result = queue_statement_reprocessing(BankStatement.objects.all(), use_cache=False)
+
+        self.assertEqual(result['queued'], 2)
+        self.assertEqual([job[1] for job in self.queued_jobs()], [small.id, large.id])
+        self.assertFalse(self.queue.put.call_args.kwargs['use_cache'])
+        for statement in (small, large):
+            statement.refresh_from_db()
+            self.assertEqual(statement.processing_status, 'pending')
+            self.assertIsNone(statement.error_message)
+            self.assertIsNotNone(statement.reprocess_requested_at)
+            self.assertFalse(statement.reprocess_use_cache)
+
+    def test_statements_that_cannot_be_reprocessed_are_skipped(self):
+        failed = self.create_statement(processing_status='failed')
+        self.create_statement(processing_status='processing')
+        self.create_statement(processing_status='failed', file_deleted_at=timezone.now())
+        BankStatement.objects.create(user_id='alice', original_filename='lost.pdf', file_size=1,
+                                     processing_status='failed')
+        committed = self.create_statement(processing_status='failed')
+        StagedTransaction.objects.create(
+            statement=committed, position=0, date=date(2024, 1, 1), title='OXXO', amount=10,
+            transaction_type='Expense', category='Other', committed=True
+        )
+
+        result = queue_statement_reprocessing(BankStatement.objects.all())
+
+        self.assertEqual(result['statement_ids'], [failed.id])
+        self.assertEqual(result['skipped'], {'processing': 1, 'no_pdf': 2, 'committed': 1})
+        committed.refresh_from_db()
+        self.assertEqual(committed.processing_status, 'failed')
+
+    def test_dry_run_changes_nothing(self):
+        statement = self.create_statement(processing_status='failed', error_message='timeout')
+
+        result = queue_statement_reprocessing(BankStatement.objects.all(), dry_run=True)
+
+        self.assertEqual((result['queued'], result['statement_ids']), (1, [statement.id]))
+        self.queue.put.assert_not_called()
+        statement.refresh_from_db()
+        self.assertEqual((statement.processing_status, statement.error_message), ('failed', 'timeout'))
+        self.assertIsNone(statement.reprocess_requested_at)
+
+    def test_cached_extraction_comes_from_a_completed_statement_of_the_same_pdf(self):
+        completed = self.create_statement(
+            processing_status='completed', extracted_summary={'account_name': 'BBVA', 'initial_balance': 10}
+        )
+        StagedTransaction.objects.create(
+            statement=completed, position=0, date=date(2024, 1, 2), title='OXXO', amount=10,
+            transaction_type='Expense', category='Food'
+        )
+        failed = self.create_statement(processing_status='failed')
+
+        result = find_cached_extraction(failed)
+
+        self.assertEqual(result['cached'], 'statement')
+        self.assertEqual(result['account_name'], 'BBVA')
+        self.assertEqual(
+            [(row['date'], row['title']) for row in result['transactions']], [('2024-01-02', 'OXXO')]
+        )
+        self.assertIsNone(find_cached_extraction(self.create_statement(content=PDF_BYTES + b'%other')))
+
+    def test_command_filters_by_status_and_user(self):
+        User.objects.create(username='alice')
+        User.objects.create(username='bob')
+        self.create_statement(processing_status='failed')
+        self.create_statement(processing_status='completed')
+        bob_statement = self.create_statement(processing_status='failed')
+        bob_statement.owner = User.objects.get(username='bob')
+        bob_statement.save()
+        stdout = io.StringIO()
+
+        call_command('reprocess_statements', '--user', 'alice', '--dry-run', stdout=stdout)
+        call_command('reprocess_statements', '--dry-run', stdout=stdout)
+
+        self.assertEqual(
+            stdout.getvalue().splitlines(),
+            ['[dry run] Queued 1 statements (skipped none)', '[dry run] Queued 2 statements (skipped none)'],
+        )
+        self.queue.put.assert_not_called()
+
+
+class StatementOwnerMigrationTests(MigrationTestCase):
+
+    migrate_from = [('users', '0001_initial'), ('bankstatements', '0012_bankstatement_reprocess_requested_at')]
+    migrate_to = [('users', '0001_initial'), ('bankstatements', '0013_statement_owner')]
+
+    def test_statements_are_linked_to_their_uploader(self):
+        User = self.old_apps.get_model('users', 'User')
+        BankStatement = self.old_apps.get_model('bankstatements', 'BankStatement')
+        BankStatementBatch = self.old_apps.get_model('bankstatements', 'BankStatementBatch')
+        user = User.objects.create(username='alice')
+        batch = BankStatementBatch.objects.create(user_id='alice')
+        BankStatement.objects.create(user_id='alice', original_filename='a.pdf', file_size=1, batch=batch)
+        BankStatement.objects.create(user_id='ghost', original_filename='b.pdf', file_size=1)
+
+        apps = self.migrate()
+
+        statements = apps.get_model('bankstatements', 'BankStatement').objects
+        self.assertEqual(
+            sorted(statements.values_list('user_id', 'owner_id')), [('alice', user.id), ('ghost', None)]
+        )
+        self.assertEqual(apps.get_model('bankstatements', 'BankStatementBatch').objects.get().owner_id, user.id)
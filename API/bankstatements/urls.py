@@ -3,7 +3,14 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.upload_bank_statement, name='upload_bank_statement'),
+    path('upload/batch/', views.upload_bank_statement_batch, name='upload_bank_statement_batch'),
+    path('batch/<int:batch_id>/', views.get_bank_statement_batch, name='get_bank_statement_batch'),
+    path('queue/', views.get_processing_queue, name='get_processing_queue'),
     path('user/<str:user_id>/', views.get_user_bank_statements, name='get_user_bank_statements'),
     path('details/<int:statement_id>/', views.get_bank_statement_details, name='get_bank_statement_details'),
+    path('staged/<int:statement_id>/', views.get_staged_transactions, name='get_staged_transactions'),
+    path('staged/<int:statement_id>/stream/', views.stream_bank_statement_transactions, name='stream_bank_statement_transactions'),
+    path('staged/<int:statement_id>/commit/', views.commit_bank_statement_transactions, name='commit_bank_statement_transactions'),
+    path('staged/transaction/<int:staged_id>/', views.update_staged_transaction, name='update_staged_transaction'),
     path('delete/<int:statement_id>/', views.delete_bank_statement, name='delete_bank_statement'),
 ]
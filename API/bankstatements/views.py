@@ -2,15 +2,45 @@ from rest_framework import status
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 from django.core.files.storage import default_storage
 import os
+import shutil
+import tempfile
+import zipfile
+import zlib
 import mimetypes
+import json
+import time
 import logging
+from contextlib import contextmanager, nullcontext
+from functools import partial
 
-from .models import BankStatement
-from .serializers import BankStatementUploadSerializer, BankStatementResponseSerializer
-from .services import extract_transactions_from_pdf, is_pdf_password_protected, decrypt_pdf_file
+from django.conf import settings
+from django.core.files import File
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+
+from users.models import User
+
+from .models import BankStatement, BankStatementBatch, StagedTransaction
+from .serializers import (
+    BankStatementUploadSerializer,
+    BankStatementResponseSerializer,
+    BankStatementSummarySerializer,
+    BankStatementBatchSerializer,
+    StagedTransactionSerializer,
+)
+from .pagination import BankStatementCursorPagination
+from .workers import enqueue_statement, get_scheduler
+from .storage import store_statement_file
+from .services import (
+    process_bank_statement,
+    is_pdf_password_protected,
+    decrypt_pdf_file,
+    commit_staged_transactions,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +55,13 @@ def upload_bank_statement(request):
     - pdf_file: The PDF file
     - user_id: The username of the user uploading the file
     - pdf_password: (Optional) Password for password-protected PDFs
+    - account_id: (Optional) Account the statement belongs to; periods already
+      imported into it are not extracted again
+    - stream: (Optional) "true" to process the statement in the background and
+      follow the extracted transactions on the returned stream_url as they are generated
     
     Returns:
-    - 200: Success with file details
+    - 200: Success with file details (and the extracted data, unless streaming)
     - 400: Bad request (invalid file or missing data, or password required/incorrect)
     - 500: Server error
     """
@@ -51,6 +85,10 @@ def upload_bank_statement(request):
         user_id = request.data['user_id']
         pdf_password = request.data.get('pdf_password', None)  # Optional password
         
+        account_id, error_response = _get_upload_account_id(request, user_id)
+        if error_response:
+            return error_response
+        
         # Validate file type
         if not pdf_file.name.lower().endswith('.pdf'):
             return Response({
@@ -124,51 +162,46 @@ def upload_bank_statement(request):
         if hasattr(pdf_file, 'size'):
             file_size = pdf_file.size
         else:
-            # For ContentFile, we need to read to get size
+            # For other file objects, seek to the end to get the size
             pdf_file.seek(0, 2)  # Seek to end
             file_size = pdf_file.tell()
             pdf_file.seek(0)  # Reset to beginning
         
-        bank_statement = BankStatement.objects.create(
-            user_id=user_id,
-            file=pdf_file,
-            original_filename=original_filename,
-            file_size=file_size,
-            processing_status='pending'
-        )
+        try:
+            bank_statement = BankStatement.objects.create(
+                user_id=user_id,
+                blob=store_statement_file(pdf_file),
+                original_filename=original_filename,
+                file_size=file_size,
+                processing_status='pending',
+                account_id=account_id
+            )
+        finally:
+            # A decrypted PDF lives in a temporary file that is removed on close
+            if pdf_file is not request.FILES['pdf_file']:
+                pdf_file.close()
+        
+        # Streaming clients get the transactions over server-sent events while a worker extracts them
+        if str(request.data.get('stream', 'false')).lower() == 'true':
+            enqueue_statement(bank_statement.id, user_id)
+            return Response({
+                'message': 'Bank statement uploaded, processing started',
+                'file_details': {
+                    'id': bank_statement.id,
+                    'filename': bank_statement.original_filename,
+                    'file_size': bank_statement.file_size,
+                    'file_size_display': bank_statement.get_file_size_display(),
+                    'upload_date': bank_statement.upload_date.isoformat(),
+                    'processing_status': bank_statement.processing_status
+                },
+                'stream_url': request.build_absolute_uri(
+                    reverse('stream_bank_statement_transactions', args=[bank_statement.id])
+                ),
+                'status': 'success'
+            }, status=status.HTTP_200_OK)
         
         # Process the PDF with AI to extract transactions
-        extracted_data = None
-        try:
-            # Update status to processing
-            bank_statement.processing_status = 'processing'
-            bank_statement.save()
-            
-            # Get the full path to the saved file
-            pdf_file_path = bank_statement.file.path
-            
-            # Extract transactions using AI
-            extracted_data = extract_transactions_from_pdf(pdf_file_path)
-            
-            # Update processing status based on results
-            if extracted_data.get('error'):
-                bank_statement.processing_status = 'failed'
-                bank_statement.error_message = extracted_data.get('error', 'Unknown error')
-                bank_statement.save()
-            else:
-                # Processing completed successfully (with or without transactions)
-                bank_statement.processing_status = 'completed'
-                # Mark as processed if we have transactions, or if processing completed without errors
-                # (empty transactions list means AI successfully analyzed but found no transactions)
-                bank_statement.processed = True
-                bank_statement.save()
-                
-        except Exception as e:
-            logger.error(f"Error during AI processing: {str(e)}", exc_info=True)
-            bank_statement.processing_status = 'failed'
-            bank_statement.error_message = f'AI processing error: {str(e)}'
-            bank_statement.save()
-            # Continue with response even if AI processing fails
+        extracted_data = process_bank_statement(bank_statement)
         
         # Prepare response data
         response_data = {
@@ -204,29 +237,340 @@ def upload_bank_statement(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+MAX_STATEMENT_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+
+
+def _get_upload_account_id(request, user_id):
+    """
+    Read the optional account_id of an upload and check that the user owns the account.
+    
+    Returns:
+        Tuple of (account_id or None, error Response or None)
+    """
+    from account.models import Account
+    
+    account_id = request.data.get('account_id')
+    if not account_id:
+        return None, None
+    try:
+        exists = Account.objects.filter(id=int(account_id), user__username=user_id).exists()
+    except (TypeError, ValueError):
+        exists = False
+    if not exists:
+        return None, Response({
+            'error': 'Account not found',
+            'message': f'No account with ID {account_id} found for user {user_id}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return str(account_id), None
+
+
+def _prepare_batch_pdf(pdf_file, pdf_password):
+    """
+    Validate one PDF of a batch upload and decrypt it if needed.
+    
+    Returns:
+        Tuple of (file to store, error message). The file is None when the
+        PDF is rejected.
+    """
+    if pdf_file.size > MAX_STATEMENT_FILE_SIZE:
+        return None, 'File size must be less than 10MB'
+    
+    pdf_file.seek(0)
+    header = pdf_file.read(4)
+    pdf_file.seek(0)
+    if not header.startswith(b'%PDF'):
+        return None, 'File does not appear to be a valid PDF'
+    
+    if is_pdf_password_protected(pdf_file):
+        if not pdf_password:
+            return None, 'This PDF is password-protected. Please provide the password.'
+        try:
+            return decrypt_pdf_file(pdf_file, pdf_password), None
+        except ValueError as e:
+            return None, str(e)
+    
+    return pdf_file, None
+
+
+@contextmanager
+def _extract_zip_entry(archive, entry, filename):
+    """Copy one archive entry into a temporary file, which is removed when the context exits."""
+    with archive.open(entry) as source, tempfile.TemporaryFile(suffix='.pdf') as spooled:
+        shutil.copyfileobj(source, spooled, length=64 * 1024)
+        spooled.seek(0)
+        yield File(spooled, name=filename)
+
+
+def _iter_batch_files(pdf_uploads, archive):
+    """
+    Yield (filename, open_file, rejection reason) for every file in a batch upload.
+    
+    ``open_file`` is None when the entry is rejected from its name or declared
+    size. Otherwise calling it returns a context manager giving the file: PDFs
+    sent directly as ``pdf_files`` as-is, and entries of the ZIP ``archive``
+    copied into a temporary file. Nothing is decompressed until the caller
+    opens an entry, so entries it rejects are never extracted.
+    """
+    for uploaded_file in pdf_uploads:
+        filename = os.path.basename(uploaded_file.name)
+        if not filename.lower().endswith('.pdf'):
+            yield filename, None, 'Only PDF files are allowed'
+        else:
+            yield filename, partial(nullcontext, uploaded_file), None
+    
+    if archive is None:
+        return
+    
+    for entry in archive.infolist():
+        filename = os.path.basename(entry.filename)
+        if entry.is_dir() or not filename or filename.startswith('.') or entry.filename.startswith('__MACOSX/'):
+            continue
+        if not filename.lower().endswith('.pdf'):
+            yield filename, None, 'Only PDF files are allowed'
+            continue
+        # Check the declared size before extracting anything
+        if entry.file_size > MAX_STATEMENT_FILE_SIZE:
+            yield filename, None, 'File size must be less than 10MB'
+            continue
+        yield filename, partial(_extract_zip_entry, archive, entry, filename), None
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+def upload_bank_statement_batch(request):
+    """
+    Upload several bank statement PDFs at once, or a ZIP archive of PDFs.
+    
+    One BankStatement is created per PDF and queued for processing on the
+    background worker pool. Use ``get_bank_statement_batch`` to follow progress.
+    
+    Expected form data:
+    - pdf_files: One or more PDF files (repeat the field), and/or
+    - zip_file: A ZIP archive containing PDF files
+    - user_id: The username of the user uploading the files
+    - pdf_password: (Optional) Password used for any password-protected PDFs
+    - account_id: (Optional) Account the statements belong to
+    
+    Returns:
+    - 202: Batch accepted, with the created statements and any rejected files
+    - 400: Bad request (no files, missing user_id, invalid archive or too many files)
+    - 500: Server error
+    """
+    
+    try:
+        if 'pdf_files' not in request.FILES and 'zip_file' not in request.FILES:
+            return Response({
+                'error': 'No files provided',
+                'message': 'Please provide PDF files in "pdf_files" or a ZIP archive in "zip_file"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if 'user_id' not in request.data:
+            return Response({
+                'error': 'No user_id provided',
+                'message': 'Please provide a user_id in the request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        user_id = request.data['user_id']
+        pdf_password = request.data.get('pdf_password', None)
+        max_files = getattr(settings, 'BANK_STATEMENT_BATCH_MAX_FILES', 24)
+        
+        account_id, error_response = _get_upload_account_id(request, user_id)
+        if error_response:
+            return error_response
+        
+        # Read the archive's directory before creating anything
+        zip_upload = request.FILES.get('zip_file')
+        try:
+            archive = zipfile.ZipFile(zip_upload) if zip_upload is not None else None
+        except zipfile.BadZipFile:
+            return Response({
+                'error': 'Invalid ZIP file',
+                'message': 'The uploaded archive could not be read as a ZIP file'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        batch = BankStatementBatch.objects.create(user_id=user_id)
+        statement_ids = []
+        rejected_files = []
+        
+        try:
+            for filename, open_file, reason in _iter_batch_files(request.FILES.getlist('pdf_files'), archive):
+                if reason:
+                    rejected_files.append({'filename': filename, 'reason': reason})
+                    continue
+                # Checked before opening, so entries over the cap are never extracted
+                if len(statement_ids) >= max_files:
+                    rejected_files.append({'filename': filename, 'reason': f'A batch can contain at most {max_files} files'})
+                    continue
+                
+                try:
+                    with open_file() as pdf_file:
+                        stored_file, error = _prepare_batch_pdf(pdf_file, pdf_password)
+                        if error:
+                            rejected_files.append({'filename': filename, 'reason': error})
+                            continue
+                        
+                        try:
+                            bank_statement = BankStatement.objects.create(
+                                user_id=user_id,
+                                owner_id=batch.owner_id,
+                                blob=store_statement_file(stored_file),
+                                original_filename=filename,
+                                file_size=stored_file.size,
+                                processing_status='pending',
+                                batch=batch,
+                                account_id=account_id
+                            )
+                        finally:
+                            if stored_file is not pdf_file:
+                                stored_file.close()
+                except (zipfile.BadZipFile, zlib.error, EOFError):
+                    # A corrupt entry (e.g. a CRC error) only rejects that file
+                    rejected_files.append({'filename': filename, 'reason': 'The file could not be extracted from the ZIP archive'})
+                    continue
+                statement_ids.append(bank_statement.id)
+        except Exception:
+            # Nothing was queued yet: remove the batch's statements and release their blobs
+            for bank_statement in BankStatement.objects.filter(id__in=statement_ids):
+                bank_statement.delete()
+            batch.delete()
+            raise
+        finally:
+            if archive is not None:
+                archive.close()
+        
+        batch.total_files = len(statement_ids)
+        batch.rejected_files = rejected_files
+        batch.save()
+        
+        # Fan processing out over the worker pool
+        for statement_id in statement_ids:
+            enqueue_statement(statement_id, user_id)
+        
+        serializer = BankStatementBatchSerializer(batch)
+        return Response({
+            'message': f'{len(statement_ids)} bank statement(s) queued for processing',
+            'batch': serializer.data,
+            'status': 'success'
+        }, status=status.HTTP_202_ACCEPTED)
+        
+    except Exception as e:
+        logger.error(f"Batch upload failed: {str(e)}", exc_info=True)
+        return Response({
+            'error': 'Upload failed',
+            'message': f'An error occurred while uploading the files: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def get_bank_statement_batch(request, batch_id):
+    """
+    Get the progress of a batch upload.
+    
+    Returns:
+    - 200: Batch progress with per-status counts and the batch's statements
+    - 404: Batch not found
+    """
+    
+    try:
+        batch = BankStatementBatch.objects.select_related('owner').get(id=batch_id)
+        serializer = BankStatementBatchSerializer(batch)
+        
+        return Response({
+            'message': 'Batch progress retrieved successfully',
+            'batch': serializer.data
+        }, status=status.HTTP_200_OK)
+        
+    except BankStatementBatch.DoesNotExist:
+        return Response({
+            'error': 'Batch not found',
+            'message': f'No batch found with ID {batch_id}'
+        }, status=status.HTTP_404_NOT_FOUND)
+        
+    except Exception as e:
+        return Response({
+            'error': 'Failed to retrieve batch',
+            'message': f'An error occurred: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def get_processing_queue(request):
+    """
+    Get the depth of the statement processing queue and the wait times, per user.
+    
+    Query parameters:
+    - user_id: Only report this user's queue (optional)
+    
+    Returns:
+    - 200: Overall queued/running counts, concurrency caps and per-user queue statistics
+    """
+    
+    try:
+        return Response({
+            'message': 'Processing queue retrieved successfully',
+            'queue': get_scheduler().stats(request.query_params.get('user_id'))
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'error': 'Failed to retrieve processing queue',
+            'message': f'An error occurred: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 def get_user_bank_statements(request, user_id):
     """
-    Get all bank statements for a specific user.
+    Get the bank statements of a specific user, newest first, one page at a time.
+    
+    Query parameters:
+    - cursor: Opaque cursor from the previous response's "next"/"previous" link
+    - page_size: Statements per page (default 50, at most 200)
+    - status: Only statements with this processing status; several can be given comma-separated
+    - summary: "true" to return only id, filename, size, upload date and status
     
     Returns:
-    - 200: List of bank statements
-    - 404: User not found or no statements
+    - 200: One page of bank statements with links to the next and previous pages
+    - 400: Invalid status filter
     """
     
     try:
-        bank_statements = BankStatement.objects.filter(user_id=user_id).order_by('-upload_date')
+        owner_pk = User.objects.filter(username=user_id).values_list('id', flat=True).first()
+        bank_statements = BankStatement.objects.filter(owner_id=owner_pk) if owner_pk else BankStatement.objects.none()
         
-        if not bank_statements.exists():
-            return Response({
-                'message': 'No bank statements found for this user',
-                'statements': []
-            }, status=status.HTTP_200_OK)
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            statuses = [value.strip() for value in status_filter.split(',') if value.strip()]
+            valid_statuses = {choice for choice, _ in BankStatement._meta.get_field('processing_status').choices}
+            invalid_statuses = [value for value in statuses if value not in valid_statuses]
+            if invalid_statuses:
+                return Response({
+                    'error': 'Invalid status filter',
+                    'message': f'Unknown status(es): {", ".join(invalid_statuses)}. '
+                               f'Valid values are: {", ".join(sorted(valid_statuses))}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            bank_statements = bank_statements.filter(processing_status__in=statuses)
+        
+        if request.query_params.get('summary', 'false').lower() == 'true':
+            bank_statements = bank_statements.only(*BankStatementSummarySerializer.Meta.fields)
+            serializer_class = BankStatementSummarySerializer
+        else:
+            bank_statements = bank_statements.defer('extracted_summary')
+            serializer_class = BankStatementResponseSerializer
+        
+        paginator = BankStatementCursorPagination()
+        page = paginator.paginate_queryset(bank_statements, request)
+        serializer = serializer_class(page, many=True)
         
-        serializer = BankStatementResponseSerializer(bank_statements, many=True)
+        if not page and not request.query_params.get('cursor'):
+            message = 'No bank statements found for this user'
+        else:
+            message = f'Found {len(page)} bank statement(s)'
         
         return Response({
-            'message': f'Found {bank_statements.count()} bank statement(s)',
+            'message': message,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
             'statements': serializer.data
         }, status=status.HTTP_200_OK)
         
@@ -269,6 +613,298 @@ def get_bank_statement_details(request, statement_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+def get_staged_transactions(request, statement_id):
+    """
+    Page through the extracted transactions of a bank statement.
+    
+    Query parameters:
+    - page: Page number (default 1)
+    - page_size: Rows per page (default 50, at most 500)
+    - include_committed: "true" to also list rows that were already committed
+    
+    Returns:
+    - 200: Statement-level extraction data and one page of staged transactions
+    - 404: Statement not found
+    """
+    
+    try:
+        bank_statement = BankStatement.objects.get(id=statement_id)
+        
+        staged_rows = bank_statement.staged_transactions.all()
+        if request.query_params.get('include_committed', 'false').lower() != 'true':
+            staged_rows = staged_rows.filter(committed=False)
+        
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', 50)), 1), 500)
+        except ValueError:
+            page_size = 50
+        paginator = Paginator(staged_rows, page_size)
+        try:
+            page = paginator.page(request.query_params.get('page', 1))
+        except PageNotAnInteger:
+            page = paginator.page(1)
+        except EmptyPage:
+            page = paginator.page(paginator.num_pages)
+        
+        serializer = StagedTransactionSerializer(page.object_list, many=True)
+        return Response({
+            'message': 'Staged transactions retrieved successfully',
+            'statement_id': bank_statement.id,
+            'processing_status': bank_statement.processing_status,
+            'extracted_summary': bank_statement.extracted_summary,
+            'count': paginator.count,
+            'page': page.number,
+            'num_pages': paginator.num_pages,
+            'transactions': serializer.data
+        }, status=status.HTTP_200_OK)
+        
+    except BankStatement.DoesNotExist:
+        return Response({
+            'error': 'Bank statement not found',
+            'message': f'No bank statement found with ID {statement_id}'
+        }, status=status.HTTP_404_NOT_FOUND)
+        
+    except Exception as e:
+        return Response({
+            'error': 'Failed to retrieve staged transactions',
+            'message': f'An error occurred: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _sse_event(event: str, data, event_id=None) -> str:
+    """Format one server-sent event."""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _staged_transaction_events(statement_id: int, last_position: int):
+    """
+    Yield server-sent events for a statement until its processing has finished.
+    
+    New staged rows are sent as 'transaction' events (with their position as
+    the event id), status changes as 'status' events, and a final 'complete'
+    event carries the outcome and the final list of staged transactions.
+    """
+    poll_interval = getattr(settings, 'BANK_STATEMENT_STREAM_POLL_SECONDS', 0.5)
+    max_seconds = getattr(settings, 'BANK_STATEMENT_AI_DEADLINE_SECONDS', 180) + 60
+    keepalive_interval = 15
+    started = last_sent = time.monotonic()
+    last_status = None
+    
+    yield f'retry: {int(poll_interval * 2000)}\n\n'
+    while True:
+        bank_statement = BankStatement.objects.filter(id=statement_id).only(
+            'id', 'processing_status', 'error_message', 'extracted_summary'
+        ).first()
+        if bank_statement is None:
+            yield _sse_event('complete', {'processing_status': 'deleted', 'error_message': 'Bank statement was deleted'})
+            return
+        
+        if bank_statement.processing_status in ('completed', 'failed'):
+            final_rows = StagedTransaction.objects.filter(statement_id=statement_id, committed=False)
+            yield _sse_event('complete', {
+                'processing_status': bank_statement.processing_status,
+                'error_message': bank_statement.error_message,
+                'extracted_summary': bank_statement.extracted_summary,
+                'transactions': StagedTransactionSerializer(final_rows, many=True).data,
+            })
+            return
+        
+        if bank_statement.processing_status != last_status:
+            last_status = bank_statement.processing_status
+            yield _sse_event('status', {'processing_status': last_status})
+            last_sent = time.monotonic()
+        
+        new_rows = list(StagedTransaction.objects.filter(
+            statement_id=statement_id, committed=False, position__gt=last_position
+        ).order_by('position'))
+        for row in new_rows:
+            yield _sse_event('transaction', StagedTransactionSerializer(row).data, event_id=row.position)
+            last_position = row.position
+            last_sent = time.monotonic()
+        
+        now = time.monotonic()
+        if now - started > max_seconds:
+            yield _sse_event('timeout', {'processing_status': last_status})
+            return
+        if now - last_sent > keepalive_interval:
+            yield ': keep-alive\n\n'
+            last_sent = now
+        time.sleep(poll_interval)
+
+
+@require_GET
+def stream_bank_statement_transactions(request, statement_id):
+    """
+    Follow the extraction of a bank statement as server-sent events (text/event-stream).
+    
+    Transactions are sent as soon as the model has generated them, so the
+    review page can fill in while a long statement is still being processed.
+    Reconnecting clients send Last-Event-ID (or ?last_position=) to skip the
+    transactions they already have.
+    
+    Events:
+    - status: {"processing_status": ...} when the status changes
+    - transaction: one staged transaction, in the staged transaction format
+    - complete: {"processing_status", "error_message", "extracted_summary", "transactions"};
+      the transactions list is final and replaces the streamed ones
+    - timeout: processing did not finish in time; reconnect or poll the statement
+    
+    Returns:
+    - 200: The event stream
+    - 404: Statement not found
+    """
+    if not BankStatement.objects.filter(id=statement_id).exists():
+        return JsonResponse({
+            'error': 'Bank statement not found',
+            'message': f'No bank statement found with ID {statement_id}'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        last_position = int(request.headers.get('Last-Event-ID') or request.GET.get('last_position', -1))
+    except ValueError:
+        last_position = -1
+    
+    response = StreamingHttpResponse(
+        _staged_transaction_events(statement_id, last_position), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['PATCH', 'DELETE'])
+def update_staged_transaction(request, staged_id):
+    """
+    Edit or discard one staged transaction before it is committed.
+    
+    PATCH accepts any of: date, title, amount, transaction_type, category.
+    
+    Returns:
+    - 200: Updated (or deleted) staged transaction
+    - 400: Invalid data or the row was already committed
+    - 404: Staged transaction not found
+    """
+    
+    try:
+        staged_transaction = StagedTransaction.objects.get(id=staged_id)
+        
+        if request.method == 'DELETE':
+            if staged_transaction.committed:
+                return Response({
+                    'error': 'Transaction already committed',
+                    'message': 'Committed transactions cannot be discarded'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            staged_transaction.delete()
+            return Response({
+                'message': 'Staged transaction discarded successfully',
+                'staged_id': staged_id
+            }, status=status.HTTP_200_OK)
+        
+        serializer = StagedTransactionSerializer(staged_transaction, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response({
+                'error': 'Invalid data',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        
+        return Response({
+            'message': 'Staged transaction updated successfully',
+            'transaction': serializer.data
+        }, status=status.HTTP_200_OK)
+        
+    except StagedTransaction.DoesNotExist:
+        return Response({
+            'error': 'Staged transaction not found',
+            'message': f'No staged transaction found with ID {staged_id}'
+        }, status=status.HTTP_404_NOT_FOUND)
+        
+    except Exception as e:
+        return Response({
+            'error': 'Failed to update staged transaction',
+            'message': f'An error occurred: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+def commit_bank_statement_transactions(request, statement_id):
+    """
+    Commit staged transactions of a bank statement into the Transaction table.
+    
+    The selected rows are inserted in one atomic bulk insert and the account
+    balance is adjusted in the same database transaction.
+    
+    Expected data:
+    - account_id: ID of the account the transactions belong to
+    - staged_ids: (Optional) IDs of the staged rows to commit; all uncommitted rows if omitted
+    - on_duplicate: (Optional) "skip" to leave out rows that duplicate stored
+      transactions, or "flag" to commit them and report them
+    
+    Returns:
+    - 200: Created transaction IDs, the duplicates found and the new account balance
+    - 400: Missing account_id or rows that cannot be committed
+    - 404: Statement not found
+    """
+    
+    try:
+        bank_statement = BankStatement.objects.get(id=statement_id)
+        
+        account_id = request.data.get('account_id')
+        if not account_id:
+            return Response({
+                'error': 'No account_id provided',
+                'message': 'Please provide the account_id the transactions belong to'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        staged_ids = request.data.get('staged_ids')
+        if staged_ids is not None:
+            if not isinstance(staged_ids, list):
+                return Response({
+                    'error': 'Invalid staged_ids',
+                    'message': 'staged_ids must be a list of staged transaction IDs'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                staged_ids = [int(staged_id) for staged_id in staged_ids]
+            except (TypeError, ValueError):
+                return Response({
+                    'error': 'Invalid staged_ids',
+                    'message': 'staged_ids must be a list of staged transaction IDs'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = commit_staged_transactions(
+                bank_statement, account_id, staged_ids, on_duplicate=request.data.get('on_duplicate')
+            )
+        except ValueError as e:
+            return Response({
+                'error': 'Commit failed',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': f"{result['committed_count']} transaction(s) committed successfully",
+            **result
+        }, status=status.HTTP_200_OK)
+        
+    except BankStatement.DoesNotExist:
+        return Response({
+            'error': 'Bank statement not found',
+            'message': f'No bank statement found with ID {statement_id}'
+        }, status=status.HTTP_404_NOT_FOUND)
+        
+    except Exception as e:
+        logger.error(f"Commit of staged transactions failed: {str(e)}", exc_info=True)
+        return Response({
+            'error': 'Commit failed',
+            'message': f'An error occurred: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['DELETE'])
 def delete_bank_statement(request, statement_id):
     """
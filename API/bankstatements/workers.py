@@ -0,0 +1,454 @@
+"""
+Background worker pool for bank statement processing.
+
+Statements uploaded in a batch are processed off the request thread on a
+bounded thread pool (the work is dominated by waiting on the Gemini API, so
+threads are enough). The pool size is set with BANK_STATEMENT_WORKERS.
+
+Jobs reach the pool through ``FairShareScheduler`` so that one user uploading
+many statements cannot hold every worker (and the Gemini quota) while others
+wait. Each user has their own queue; users are served by weighted fair
+queuing, which is plain round-robin when every weight is 1. A user never has
+more than BANK_STATEMENT_USER_MAX_CONCURRENT statements processing at once.
+
+Bulk reprocessing goes through ``ReprocessQueue`` first: it hands statements
+to the pool smallest file first, at most BANK_STATEMENT_REPROCESS_RATE_PER_MINUTE
+per minute, so a large retry does not use up the Gemini quota that new
+uploads need.
+
+These queues only live in memory. The database is what survives a restart:
+queued statements are 'pending' (reprocessing ones also have
+``reprocess_requested_at`` set), and a job claims its statement by moving it
+from 'pending' to 'processing' before it runs. When the server starts,
+``recover_pending_statements`` queues again what the previous run left pending.
+"""
+import heapq
+import itertools
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, Future, wait as wait_for_futures
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Seconds after startup before pending statements are queued again
+RECOVERY_DELAY_SECONDS = 5
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide statement worker pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = getattr(settings, 'BANK_STATEMENT_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='statement-worker')
+            logger.info(f"Started bank statement worker pool with {max_workers} workers")
+        return _executor
+
+
+def process_statement_job(statement_id: int, use_cache: bool = False):
+    """Process one stored bank statement by id. Runs on a worker thread."""
+    from .models import BankStatement
+    from .services import process_bank_statement
+
+    close_old_connections()
+    try:
+        # Claim the statement, so a job queued twice (e.g. also by recovery in another process) runs once
+        claimed = BankStatement.objects.filter(id=statement_id, processing_status='pending').update(
+            processing_status='processing', reprocess_requested_at=None
+        )
+        if not claimed:
+            if BankStatement.objects.filter(id=statement_id).exists():
+                logger.info(f"Bank statement {statement_id} is no longer pending, skipping it")
+            else:
+                logger.warning(f"Bank statement {statement_id} was deleted before it could be processed")
+            return
+        bank_statement = BankStatement.objects.get(id=statement_id)
+        process_bank_statement(bank_statement, stream=True, use_cache=use_cache)
+    except BankStatement.DoesNotExist:
+        logger.warning(f"Bank statement {statement_id} was deleted before it could be processed")
+    except Exception as e:
+        logger.error(f"Worker failed to process bank statement {statement_id}: {str(e)}", exc_info=True)
+    finally:
+        close_old_connections()
+
+
+def parse_user_weights(value: str) -> Dict[str, float]:
+    """Parse a ``user:weight,user:weight`` string (BANK_STATEMENT_USER_WEIGHTS)."""
+    weights = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        user_id, _, weight = item.rpartition(':')
+        try:
+            if not user_id:
+                raise ValueError(item)
+            weights[user_id] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring invalid statement scheduler weight '{item}'")
+    return weights
+
+
+class _UserQueue:
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.jobs = deque()
+        self.running = 0
+        self.last_finish = 0.0
+        self.dispatched = 0
+        self.recent_waits = deque(maxlen=100)
+
+
+class FairShareScheduler:
+    """
+    Per-user fair queuing in front of the worker pool.
+
+    Every job gets a virtual finish tag when it is queued:
+    ``max(virtual time, user's last tag) + 1 / weight``. Whenever a worker is
+    free, the queued job with the smallest tag whose user is below the
+    per-user cap is started, and the virtual time moves to that job's start
+    tag. A user who queues 50 statements therefore gets tags 1..50 while a
+    user arriving later starts at the current virtual time and is served
+    next; with weight 2 a user gets two turns for every turn of a weight-1 user.
+
+    Jobs are dispatched when they are queued and when a running job finishes,
+    so no dispatcher thread is needed.
+
+    Args:
+        max_concurrent: Jobs running at once across all users (the pool size)
+        per_user_max_concurrent: Jobs running at once for one user
+        weights: Per-user weights (users not listed get ``default_weight``)
+        executor: Pool to run the jobs on (defaults to the statement worker pool)
+    """
+
+    def __init__(self, max_concurrent: int = 2, per_user_max_concurrent: int = 1,
+                 weights: Optional[Dict[str, float]] = None, default_weight: float = 1.0,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.per_user_max_concurrent = max(1, per_user_max_concurrent)
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self._executor = executor
+        self._users: Dict[str, _UserQueue] = {}
+        self._running = 0
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _user_queue(self, user_id: str) -> _UserQueue:
+        queue = self._users.get(user_id)
+        if queue is None:
+            weight = self.weights.get(user_id, self.default_weight)
+            queue = self._users[user_id] = _UserQueue(weight if weight > 0 else self.default_weight)
+        return queue
+
+    def submit(self, user_id: str, fn: Callable, *args) -> Future:
+        """
+        Queue ``fn(*args)`` on behalf of a user.
+
+        Returns:
+            Future that completes when the job has run
+        """
+        future = Future()
+        with self._lock:
+            queue = self._user_queue(str(user_id))
+            start = max(self._virtual_time, queue.last_finish)
+            queue.last_finish = start + 1.0 / queue.weight
+            queue.jobs.append((queue.last_finish, next(self._sequence), start, time.monotonic(), fn, args, future))
+            ready = self._take_ready_jobs()
+        self._start(ready)
+        return future
+
+    def _take_ready_jobs(self):
+        ready = []
+        while self._running < self.max_concurrent:
+            best_user, best_key = None, None
+            for user_id, queue in self._users.items():
+                if queue.jobs and queue.running < self.per_user_max_concurrent:
+                    key = queue.jobs[0][:2]
+                    if best_key is None or key < best_key:
+                        best_user, best_key = user_id, key
+            if best_user is None:
+                break
+            queue = self._users[best_user]
+            _, _, start, queued_at, fn, args, future = queue.jobs.popleft()
+            self._virtual_time = max(self._virtual_time, start)
+            queue.running += 1
+            queue.dispatched += 1
+            queue.recent_waits.append(time.monotonic() - queued_at)
+            self._running += 1
+            ready.append((best_user, fn, args, future))
+        return ready
+
+    def _start(self, ready):
+        executor = self._executor or get_executor()
+        for user_id, fn, args, future in ready:
+            executor.submit(self._run, user_id, fn, args, future)
+
+    def _run(self, user_id: str, fn: Callable, args: tuple, future: Future):
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+        with self._lock:
+            self._users[user_id].running -= 1
+            self._running -= 1
+            ready = self._take_ready_jobs()
+        self._start(ready)
+
+    def stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue depth and wait times, overall and per user.
+
+        Args:
+            user_id: Only include this user in ``users``
+
+        Returns:
+            Dictionary with 'queued', 'running', the caps and a 'users' list of
+            ``{'user_id', 'weight', 'queued', 'running', 'dispatched',
+            'oldest_wait_seconds', 'wait_p50_seconds', 'wait_p95_seconds'}``
+        """
+        from .metrics import percentile
+
+        now = time.monotonic()
+        with self._lock:
+            users = []
+            for queued_user, queue in sorted(self._users.items()):
+                if user_id is not None and queued_user != str(user_id):
+                    continue
+                waits = [round(wait, 3) for wait in queue.recent_waits]
+                users.append({
+                    'user_id': queued_user,
+                    'weight': queue.weight,
+                    'queued': len(queue.jobs),
+                    'running': queue.running,
+                    'dispatched': queue.dispatched,
+                    'oldest_wait_seconds': round(now - queue.jobs[0][3], 3) if queue.jobs else 0.0,
+                    'wait_p50_seconds': percentile(waits, 0.5),
+                    'wait_p95_seconds': percentile(waits, 0.95),
+                })
+            return {
+                'queued': sum(len(queue.jobs) for queue in self._users.values()),
+                'running': self._running,
+                'max_concurrent': self.max_concurrent,
+                'per_user_max_concurrent': self.per_user_max_concurrent,
+                'users': users,
+            }
+
+
+_scheduler = None
+
+
+def get_scheduler() -> FairShareScheduler:
+    """Return the process-wide fair-share scheduler, creating it on first use."""
+    global _scheduler
+    with _executor_lock:
+        if _scheduler is None:
+            _scheduler = FairShareScheduler(
+                max_concurrent=getattr(settings, 'BANK_STATEMENT_WORKERS', 2),
+                per_user_max_concurrent=getattr(settings, 'BANK_STATEMENT_USER_MAX_CONCURRENT', 1),
+                weights=parse_user_weights(getattr(settings, 'BANK_STATEMENT_USER_WEIGHTS', '')),
+            )
+        return _scheduler
+
+
+def enqueue_statement(statement_id: int, user_id: str, use_cache: bool = False) -> Future:
+    """Queue a stored bank statement for processing, in its user's fair-share queue."""
+    return get_scheduler().submit(user_id, process_statement_job, statement_id, use_cache)
+
+
+class ReprocessQueue:
+    """
+    Priority queue that feeds statements to the scheduler at a limited rate.
+
+    Statements are dispatched smallest file first (then oldest id). Each
+    dispatch that needs the extraction backend waits for the rate limit;
+    statements that ``is_cached`` reports as having a cached extraction are
+    dispatched immediately. One daemon thread does the dispatching.
+
+    Args:
+        rate_per_minute: Statements handed to the backend per minute (0 for no limit)
+        is_cached: Optional callable(statement_id) telling whether a cached extraction exists
+    """
+
+    def __init__(self, rate_per_minute: float = 10, is_cached: Optional[Callable[[int], bool]] = None):
+        self.rate_per_minute = rate_per_minute
+        self.is_cached = is_cached
+        self._heap = []
+        self._queued = set()
+        self._futures = []
+        self._next_dispatch = 0.0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self._heap)
+
+    def put(self, jobs: Iterable[Tuple[int, int, str]], use_cache: bool = True) -> int:
+        """
+        Queue (file_size, statement_id, user_id) tuples.
+
+        Returns:
+            Number of statements queued (statements already waiting are not queued twice)
+        """
+        added = 0
+        with self._condition:
+            for file_size, statement_id, user_id in jobs:
+                if statement_id in self._queued:
+                    continue
+                heapq.heappush(self._heap, (file_size, statement_id, user_id, use_cache))
+                self._queued.add(statement_id)
+                added += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='statement-reprocess', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        return added
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                file_size, statement_id, user_id, use_cache = heapq.heappop(self._heap)
+
+            cached = False
+            if use_cache and self.is_cached is not None:
+                try:
+                    cached = self.is_cached(statement_id)
+                except Exception as e:
+                    logger.warning(f"Could not check the extraction cache for statement {statement_id}: {str(e)}")
+                finally:
+                    close_old_connections()
+
+            if not cached and self.rate_per_minute and self.rate_per_minute > 0:
+                now = time.monotonic()
+                if self._next_dispatch > now:
+                    time.sleep(self._next_dispatch - now)
+                self._next_dispatch = max(now, self._next_dispatch) + 60.0 / self.rate_per_minute
+
+            future = enqueue_statement(statement_id, user_id, use_cache)
+            with self._condition:
+                self._futures = [pending for pending in self._futures if not pending.done()]
+                self._futures.append(future)
+                self._queued.discard(statement_id)
+                self._condition.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued statement has been dispatched and processed.
+
+        Returns:
+            False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                pending = [future for future in self._futures if not future.done()]
+                if not self._heap and not self._queued and not pending:
+                    return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            poll = 1.0 if remaining is None else min(1.0, remaining)
+            if pending:
+                wait_for_futures(pending, timeout=poll, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(min(0.1, poll))
+
+
+_reprocess_queue = None
+
+
+def get_reprocess_queue() -> ReprocessQueue:
+    """Return the process-wide reprocessing queue, creating it on first use."""
+    from .reprocessing import has_cached_extraction
+
+    global _reprocess_queue
+    with _executor_lock:
+        if _reprocess_queue is None:
+            _reprocess_queue = ReprocessQueue(
+                rate_per_minute=getattr(settings, 'BANK_STATEMENT_REPROCESS_RATE_PER_MINUTE', 10),
+                is_cached=has_cached_extraction,
+            )
+        return _reprocess_queue
+
+
+def recover_pending_statements(started_before=None) -> Dict[str, int]:
+    """
+    Queue the statements that a previous run of the server left pending.
+
+    Uploads go back to the fair-share scheduler and reprocessing requests to
+    the rate-limited reprocess queue. Statements queued by a live process are
+    not run twice: the job that claims a statement first processes it.
+
+    Args:
+        started_before: Only recover statements queued before this time
+            (the start of this process), defaults to now
+
+    Returns:
+        Dictionary with the number of uploads and reprocessing requests queued
+    """
+    from django.db.models import Q
+    from .models import BankStatement
+
+    started_before = started_before or timezone.now()
+    pending = BankStatement.objects.filter(processing_status='pending').filter(
+        Q(reprocess_requested_at__lt=started_before) |
+        Q(reprocess_requested_at__isnull=True, upload_date__lt=started_before)
+    ).order_by('upload_date', 'id')
+
+    uploads = 0
+    reprocess_jobs: Dict[bool, List[Tuple[int, int, str]]] = {True: [], False: []}
+    rows = pending.values_list('id', 'user_id', 'file_size', 'reprocess_requested_at', 'reprocess_use_cache')
+    for statement_id, user_id, file_size, requested_at, use_cache in rows:
+        if requested_at is None:
+            enqueue_statement(statement_id, user_id)
+            uploads += 1
+        else:
+            reprocess_jobs[use_cache].append((file_size, statement_id, user_id))
+
+    reprocess = 0
+    for use_cache, jobs in reprocess_jobs.items():
+        if jobs:
+            reprocess += get_reprocess_queue().put(sorted(jobs), use_cache=use_cache)
+    if uploads or reprocess:
+        logger.info(f"Recovered {uploads} pending uploads and {reprocess} pending reprocessing requests")
+    return {'uploads': uploads, 'reprocess': reprocess}
+
+
+def schedule_pending_recovery(delay: float = RECOVERY_DELAY_SECONDS) -> Optional[threading.Timer]:
+    """
+    Run ``recover_pending_statements`` on a background thread shortly after startup.
+
+    Disabled with BANK_STATEMENT_RECOVER_PENDING=false.
+    """
+    if not getattr(settings, 'BANK_STATEMENT_RECOVER_PENDING', True):
+        return None
+    started_before = timezone.now()
+
+    def recover():
+        close_old_connections()
+        try:
+            recover_pending_statements(started_before)
+        except Exception as e:
+            logger.error(f"Could not recover pending bank statements: {str(e)}", exc_info=True)
+        finally:
+            close_old_connections()
+
+    timer = threading.Timer(delay, recover)
+    timer.daemon = True
+    timer.start()
+    return timer
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Transaction
+from .models import Transaction, MerchantCategory, RecurringSeries, RecurringScan, RecurringRule, ScheduledTransaction, TransferPairing
 
 
 @admin.register(Transaction)
@@ -22,3 +22,55 @@ class TransactionAdmin(admin.ModelAdmin):
             'fields': ('owner_id', 'account_id')
         }),
     )
+
+
+
+@admin.register(MerchantCategory)
+class MerchantCategoryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'merchant_key', 'category', 'category_count', 'total')
+    list_filter = ('category', 'user')
+    search_fields = ('merchant_key', 'user__username')
+    ordering = ('user__username', 'merchant_key')
+    readonly_fields = ('id',)
+
+
+@admin.register(RecurringSeries)
+class RecurringSeriesAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'merchant_key', 'period', 'amount', 'occurrences', 'last_date', 'next_date', 'confidence')
+    list_filter = ('period', 'transaction_type', 'user')
+    search_fields = ('merchant_key', 'user__username')
+    ordering = ('user__username', 'next_date')
+    readonly_fields = ('id', 'updated_at')
+
+
+@admin.register(RecurringScan)
+class RecurringScanAdmin(admin.ModelAdmin):
+    list_display = ('user', 'last_transaction_id', 'scanned_at')
+    search_fields = ('user__username',)
+    ordering = ('user__username',)
+
+
+@admin.register(RecurringRule)
+class RecurringRuleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'title', 'transaction_type', 'total', 'period', 'interval', 'start_date', 'end_date', 'is_active', 'materialized_until')
+    list_filter = ('period', 'transaction_type', 'is_active', 'user')
+    search_fields = ('title', 'user__username')
+    ordering = ('user__username', 'title')
+    readonly_fields = ('id', 'materialized_until', 'created_at', 'updated_at')
+
+
+@admin.register(ScheduledTransaction)
+class ScheduledTransactionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'rule', 'user', 'date', 'title', 'transaction_type', 'total')
+    list_filter = ('transaction_type', 'user')
+    search_fields = ('title', 'user__username')
+    ordering = ('date',)
+    date_hierarchy = 'date'
+
+
+@admin.register(TransferPairing)
+class TransferPairingAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'transfer', 'expense_category', 'paired_at')
+    search_fields = ('user__username',)
+    ordering = ('-paired_at',)
+    readonly_fields = ('id', 'transfer', 'removed_transaction', 'paired_at')
@@ -0,0 +1,131 @@
+"""
+Duplicate detection for imported transactions.
+
+Every transaction stores a fingerprint: a hash of its owner (the user's
+primary key, so renaming a user keeps the fingerprints valid), account,
+amount (in cents) and normalized title. The date is deliberately left out of the
+hash and indexed next to it instead, so one ``(fingerprint, date)`` range
+query per batch finds both exact duplicates and the same transaction posted
+a day or two apart (statements often show the authorization date on one
+statement and the posting date on the next).
+
+``find_duplicates`` matches a whole batch of incoming rows with that single
+query, and each existing transaction is matched at most once, so two genuine
+identical purchases on the same day are only flagged if both already exist.
+"""
+import hashlib
+import re
+import unicodedata
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional
+
+from django.conf import settings
+from django.utils.dateparse import parse_date
+
+from MoneyManagement.money import to_minor_units
+
+NON_ALPHANUMERIC = re.compile(r'[^A-Z0-9]+')
+
+# How incoming duplicates are handled: stored anyway and reported, or not stored
+DUPLICATE_POLICIES = ('flag', 'skip')
+
+
+def normalize_title(title: str) -> str:
+    """Upper-case a title and drop accents, punctuation and repeated whitespace."""
+    text = unicodedata.normalize('NFKD', str(title or '')).encode('ascii', 'ignore').decode('ascii').upper()
+    return NON_ALPHANUMERIC.sub(' ', text).strip()
+
+
+def transaction_fingerprint(owner, account_id: Optional[str], total, title: str) -> str:
+    """
+    Fingerprint of a transaction (without its date).
+
+    Args:
+        owner: Primary key of the owning user (the username when it matches no user)
+        account_id: Account of the transaction (the source account for transfers)
+        total: Amount; the sign is ignored and it is compared in cents, rounded like MoneyField
+        title: Transaction title
+
+    Returns:
+        32-character hex digest
+    """
+    try:
+        cents = abs(to_minor_units(total or 0))
+    except (TypeError, ValueError):
+        cents = 0
+    key = '|'.join((str(owner or ''), str(account_id or ''), str(cents), normalize_title(title)))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def duplicate_window_days() -> int:
+    """Days two transactions may be apart and still count as duplicates (TRANSACTION_DUPLICATE_WINDOW_DAYS)."""
+    return max(0, getattr(settings, 'TRANSACTION_DUPLICATE_WINDOW_DAYS', 2))
+
+
+def _as_date(value) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    try:
+        return parse_date(str(value or ''))
+    except ValueError:
+        return None
+
+
+def find_duplicates(rows: List[Dict[str, Any]], window_days: Optional[int] = None,
+                    exclude_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    """
+    Find stored transactions that duplicate incoming rows, with one query.
+
+    Args:
+        rows: Incoming transactions as dictionaries with ``user_id`` (or the
+            ``owner_id`` username), ``account_id``, ``date``, ``total`` and ``title``
+        window_days: Maximum distance in days between duplicates
+            (defaults to TRANSACTION_DUPLICATE_WINDOW_DAYS)
+        exclude_ids: Stored transactions that must not be matched
+
+    Returns:
+        Mapping of row index → ID of the stored transaction it duplicates
+    """
+    from .models import Transaction
+    from .references import user_ids_by_username
+
+    window = duplicate_window_days() if window_days is None else window_days
+    user_ids = user_ids_by_username(row.get('owner_id') for row in rows if not row.get('user_id'))
+    incoming = []
+    for index, row in enumerate(rows):
+        row_date = _as_date(row.get('date'))
+        if row_date is None:
+            continue
+        owner = row.get('user_id') or user_ids.get(row.get('owner_id')) or row.get('owner_id')
+        fingerprint = transaction_fingerprint(owner, row.get('account_id'), row.get('total'), row.get('title'))
+        incoming.append((index, fingerprint, row_date))
+    if not incoming:
+        return {}
+
+    first = min(row_date for _, _, row_date in incoming) - timedelta(days=window)
+    last = max(row_date for _, _, row_date in incoming) + timedelta(days=window)
+    candidates = Transaction.objects.filter(
+        fingerprint__in={fingerprint for _, fingerprint, _ in incoming},
+        date__range=(first, last),
+    )
+    if exclude_ids:
+        candidates = candidates.exclude(id__in=exclude_ids)
+
+    stored = {}
+    for transaction_id, fingerprint, stored_date in candidates.values_list('id', 'fingerprint', 'date'):
+        stored.setdefault(fingerprint, []).append((stored_date, transaction_id))
+
+    # Exact dates are matched before near ones, so a near match never takes an exact one's partner
+    duplicates = {}
+    used = set()
+    pairs = []
+    for index, fingerprint, row_date in incoming:
+        for stored_date, transaction_id in stored.get(fingerprint, []):
+            distance = abs((stored_date - row_date).days)
+            if distance <= window:
+                pairs.append((distance, index, transaction_id))
+    for distance, index, transaction_id in sorted(pairs):
+        if index not in duplicates and transaction_id not in used:
+            duplicates[index] = transaction_id
+            used.add(transaction_id)
+    return duplicates
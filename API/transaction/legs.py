@@ -0,0 +1,101 @@
+"""
+Account legs of transactions.
+
+An Income or Expense touches one account (``account_ref``); a Transfer touches
+two (``from_account_ref`` and ``to_account_ref``). ``TransactionLeg`` stores
+one row per touched account, with the amount signed from that account's side
+(money in positive, money out negative) and a copy of the transaction date,
+indexed on ``(account, date)``. Per-account listings and balances then use
+that one integer index instead of OR-ing three unindexed columns of Transaction.
+Accounts are taken from the foreign keys (see references.py), so a
+transaction whose account columns match no account has no legs.
+
+``Transaction.save()`` rebuilds the legs of the saved row. Bulk inserts and
+updates skip save(), so they call ``sync_transaction_legs`` with their rows.
+Legs are deleted together with their transaction.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction as db_transaction
+from django.db.models import Sum
+
+
+def transaction_legs(transaction_type: str, total, account_id: Optional[int],
+                     from_account_id: Optional[int], to_account_id: Optional[int]) -> Dict[int, float]:
+    """
+    Signed amount per account touched by a transaction.
+
+    A transfer between the same account nets to a single zero leg.
+
+    Returns:
+        Mapping of account ID → signed amount
+    """
+    amount = float(total or 0)
+    legs = defaultdict(float)
+    if transaction_type == 'Transfer':
+        if from_account_id:
+            legs[from_account_id] -= amount
+        if to_account_id:
+            legs[to_account_id] += amount
+    elif account_id:
+        legs[account_id] += amount if transaction_type == 'Income' else -amount
+    return dict(legs)
+
+
+def sync_transaction_legs(transactions: Iterable) -> int:
+    """
+    Replace the legs of saved transactions with ones built from their current fields.
+
+    Args:
+        transactions: Transaction instances (rows without a primary key are ignored)
+
+    Returns:
+        Number of legs stored
+    """
+    from .models import TransactionLeg
+
+    transactions = [transaction for transaction in transactions if transaction.pk is not None]
+    if not transactions:
+        return 0
+    legs = [
+        TransactionLeg(transaction_id=transaction.pk, account_id=account_id, date=transaction.date, signed_amount=amount)
+        for transaction in transactions
+        for account_id, amount in transaction_legs(
+            transaction.transaction_type, transaction.total, transaction.account_ref_id,
+            transaction.from_account_ref_id, transaction.to_account_ref_id
+        ).items()
+    ]
+    with db_transaction.atomic():
+        TransactionLeg.objects.filter(transaction_id__in=[transaction.pk for transaction in transactions]).delete()
+        TransactionLeg.objects.bulk_create(legs, batch_size=1000)
+    return len(legs)
+
+
+def account_balances(account_ids: Iterable[int], start: Optional[date] = None,
+                     end: Optional[date] = None) -> Dict[int, float]:
+    """
+    Net signed amount of the transactions of each account, optionally between two dates.
+
+    Args:
+        account_ids: Accounts to sum
+        start: First date (inclusive)
+        end: Last date (inclusive)
+
+    Returns:
+        Mapping of account ID → net amount (accounts without transactions are 0.0)
+    """
+    from .models import TransactionLeg
+
+    account_ids = [int(account_id) for account_id in account_ids]
+    legs = TransactionLeg.objects.filter(account_id__in=account_ids)
+    if start is not None:
+        legs = legs.filter(date__gte=start)
+    if end is not None:
+        legs = legs.filter(date__lte=end)
+    balances = dict.fromkeys(account_ids, 0.0)
+    # Summed as integer cents in the database, so the result is exact
+    for row in legs.values('account_id').annotate(net=Sum('signed_amount')).order_by():
+        balances[row['account_id']] = row['net'] or 0.0
+    return balances
@@ -0,0 +1,36 @@
+"""
+Fill in the user and account foreign keys of accounts and transactions saved
+before those keys existed, and the owner of bank statements and batches
+uploaded under a username that had no user yet.
+
+Usage:
+    python manage.py backfill_foreign_keys [--chunk-size 1000] [--pause 0.1]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from transaction.references import backfill_references
+
+
+class Command(BaseCommand):
+    help = "Backfill user/account foreign keys from the username and account ID columns, in small chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows read and written at a time')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks, to go easy on a busy database')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = backfill_references(chunk_size=max(1, options['chunk_size']), pause=max(0.0, options['pause']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {stats['accounts']} accounts, {stats['transactions']} transactions, "
+            f"{stats['statements']} statements and {stats['batches']} statement batches "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
+        if stats['unowned_statements']:
+            self.stdout.write(self.style.WARNING(
+                f"{stats['unowned_statements']} bank statements have a user_id that matches no user; "
+                f"they are not listed for anyone until that user exists and the backfill runs again"
+            ))
@@ -0,0 +1,44 @@
+"""
+Detect recurring transaction series (subscriptions, bills, salaries).
+
+Usage:
+    python manage.py detect_recurring_transactions [--user USERNAME] [--full]
+    python manage.py detect_recurring_transactions --interval 86400   # keep running, once a day
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from transaction.recurring import detect_all_recurring_series
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Detect recurring transaction series in the transactions added since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None, help='Only analyze the transactions of this username')
+        parser.add_argument('--full', action='store_true',
+                            help='Re-analyze every transaction instead of only the new ones')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Run forever, detecting every INTERVAL seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['user']:
+            user_ids = list(User.objects.filter(username=options['user']).values_list('id', flat=True))
+            if not user_ids:
+                raise CommandError(f"No user named {options['user']}")
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            stats = detect_all_recurring_series(user_ids, full=options['full'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Users updated: {stats['users']}, new transactions: {stats['new_transactions']}, "
+                f"groups analyzed: {stats['groups']}, series stored: {stats['series']} "
+                f"({time.perf_counter() - started:.2f}s)"
+            ))
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
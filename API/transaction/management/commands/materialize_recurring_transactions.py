@@ -0,0 +1,43 @@
+"""
+Store the upcoming instances of recurring rules for the projection endpoint.
+
+Usage:
+    python manage.py materialize_recurring_transactions [--user USERNAME] [--horizon DAYS]
+    python manage.py materialize_recurring_transactions --interval 86400   # keep running, once a day
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from transaction.scheduling import materialize_rules
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Materialize scheduled transactions of every active recurring rule over a rolling horizon."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None, help='Only materialize the rules of this username')
+        parser.add_argument('--horizon', type=int, default=None,
+                            help='Days ahead of today (default: RECURRING_PROJECTION_HORIZON_DAYS)')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Run forever, materializing every INTERVAL seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['user']:
+            user_ids = list(User.objects.filter(username=options['user']).values_list('id', flat=True))
+            if not user_ids:
+                raise CommandError(f"No user named {options['user']}")
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            stats = materialize_rules(user_ids, horizon_days=options['horizon'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Rules expanded: {stats['rules']}, scheduled transactions created: {stats['created']}, "
+                f"past ones removed: {stats['deleted']} ({time.perf_counter() - started:.2f}s)"
+            ))
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
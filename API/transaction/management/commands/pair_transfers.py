@@ -0,0 +1,66 @@
+"""
+Turn expense/income pairs between a user's accounts into Transfer rows.
+
+Only pairs where one side has a transfer title or category (e.g. "PAGO TDC",
+"SPEI") are merged unless --without-signal is given. --undo splits transfers
+made by this command back into their expense and income.
+
+Usage:
+    python manage.py pair_transfers [--user USERNAME] [--window DAYS] [--dry-run] [--without-signal]
+    python manage.py pair_transfers --undo TRANSFER_ID [TRANSFER_ID ...]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transaction.models import Transaction, TransferPairing
+from transaction.transfers import pair_transfers, unpair_transfer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Pair opposite transactions of equal amount across each user's accounts into transfers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None, help='Only pair the transactions of this username')
+        parser.add_argument('--window', type=int, default=None,
+                            help='Maximum days between the two sides (default: TRANSFER_PAIRING_WINDOW_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the pairs that would be converted')
+        parser.add_argument('--without-signal', action='store_true',
+                            help='Also pair transactions without a transfer title or category')
+        parser.add_argument('--undo', type=int, nargs='+', default=None, metavar='TRANSFER_ID',
+                            help='Split these paired transfers back into an expense and an income')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['undo']:
+            for transfer_id in options['undo']:
+                try:
+                    income = unpair_transfer(transfer_id)
+                except TransferPairing.DoesNotExist:
+                    raise CommandError(f"Transaction {transfer_id} is not a paired transfer")
+                self.stdout.write(f"Split transfer {transfer_id}: income {income.id} restored")
+            return
+        if options['user']:
+            users = User.objects.filter(username=options['user'])
+            if not users:
+                raise CommandError(f"No user named {options['user']}")
+        else:
+            users = User.objects.filter(id__in=Transaction.objects.values('user_id'))
+
+        paired = 0
+        for user_id, username in users.values_list('id', 'username'):
+            results = pair_transfers(
+                user_id, window_days=options['window'], dry_run=options['dry_run'],
+                require_signal=not options['without_signal']
+            )
+            for result in results:
+                self.stdout.write(
+                    f"{username}: {result['date']} {result['total']:.2f} from account {result['from_account_id']} "
+                    f"to account {result['to_account_id']} (transactions {result['transfer_id']} + {result['removed_id']})"
+                )
+            paired += len(results)
+
+        elapsed = time.perf_counter() - started
+        action = 'Would pair' if options['dry_run'] else 'Paired'
+        self.stdout.write(self.style.SUCCESS(f"{action} {paired} transfers in {elapsed:.2f}s"))
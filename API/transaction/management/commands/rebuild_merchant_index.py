@@ -0,0 +1,31 @@
+"""
+Rebuild the merchant → category index from existing transactions.
+
+Usage:
+    python manage.py rebuild_merchant_index [--user USERNAME]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transaction.merchants import rebuild_merchant_index
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user merchant category index from the Transaction table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None, help='Only rebuild the index of this username')
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user_id = User.objects.filter(username=options['user']).values_list('id', flat=True).first()
+            if user_id is None:
+                raise CommandError(f"No user named {options['user']}")
+        started = time.perf_counter()
+        keys = rebuild_merchant_index(user_id)
+        elapsed = time.perf_counter() - started
+        scope = f"user {options['user']}" if options['user'] else 'all users'
+        self.stdout.write(self.style.SUCCESS(f"Wrote {keys} merchant keys for {scope} in {elapsed:.2f}s"))
@@ -0,0 +1,276 @@
+"""
+Per-user merchant → category index learned from transaction history.
+
+Transaction titles are reduced to normalized merchant tokens ("OXXO SUC 1234"
+→ ["OXXO"], "UBER *TRIP 8XK2" → ["UBER", "TRIP"]). Every prefix of those
+tokens is stored as a MerchantCategory row with the number of transactions per
+category, so a lookup is at most MERCHANT_KEY_TOKENS dictionary hits (longest
+prefix first) regardless of how much history a user has.
+
+The index is kept up to date incrementally whenever transactions are created,
+re-categorized or deleted, and can be rebuilt from scratch with
+``python manage.py rebuild_merchant_index``. Placeholder categories such as
+'Others' are never learned, so they cannot replace a real category.
+"""
+import re
+import unicodedata
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of merchant tokens in a key
+MERCHANT_KEY_TOKENS = 3
+
+# Tokens that say nothing about the merchant (legal suffixes, card/terminal noise)
+NOISE_TOKENS = {
+    'SA', 'DE', 'CV', 'RL', 'SAPI', 'SC', 'SUC', 'MX', 'MEX', 'CDMX', 'GDL', 'MTY',
+    'COMPRA', 'PAGO', 'CARGO', 'ABONO', 'REF', 'POS', 'TDC', 'TDD', 'TPV', 'WWW', 'COM',
+    'EL', 'LA', 'LOS', 'LAS', 'DEL', 'THE', 'INC', 'LLC',
+}
+
+TOKEN_PATTERN = re.compile(r'[A-Z0-9]+')
+
+# Categories that mean "not categorized yet": never learned, and the index may fill them in
+UNCATEGORIZED = {'', 'Other', 'Others'}
+
+
+def merchant_tokens(title: str) -> List[str]:
+    """
+    Reduce a transaction title to its normalized merchant tokens.
+
+    Accents and punctuation are dropped, and so are tokens containing digits
+    (store numbers, references), single letters and NOISE_TOKENS. At most MERCHANT_KEY_TOKENS tokens are kept.
+    """
+    if not title:
+        return []
+    text = unicodedata.normalize('NFKD', str(title)).encode('ascii', 'ignore').decode('ascii').upper()
+    tokens = [
+        token for token in TOKEN_PATTERN.findall(text)
+        if len(token) > 1 and token.isalpha() and token not in NOISE_TOKENS
+    ]
+    return tokens[:MERCHANT_KEY_TOKENS]
+
+
+def merchant_prefixes(title: str) -> List[str]:
+    """Return the merchant keys of a title, longest prefix first."""
+    tokens = merchant_tokens(title)
+    return [' '.join(tokens[:length]) for length in range(len(tokens), 0, -1)]
+
+
+class MerchantIndex:
+    """
+    In-memory view of a user's MerchantCategory rows.
+
+    Args:
+        entries: Mapping of merchant key to (category, category_count, total)
+        min_share: Minimum share of a key's transactions its top category must
+            have to be used (keeps ambiguous short prefixes from matching)
+    """
+
+    def __init__(self, entries: Dict[str, Tuple[str, int, int]], min_share: Optional[float] = None):
+        self.entries = entries
+        if min_share is None:
+            min_share = getattr(settings, 'MERCHANT_INDEX_MIN_SHARE', 0.6)
+        self.min_share = min_share
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, title: str) -> Optional[str]:
+        """Return the learned category for a title, or None if the merchant is unknown or ambiguous."""
+        for key in merchant_prefixes(title):
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            category, category_count, total = entry
+            if category in UNCATEGORIZED:
+                # Learned before placeholders were skipped; rebuild_merchant_index drops it
+                return None
+            if total and category_count / total >= self.min_share:
+                return category
+            # A longer key that is ambiguous is not made more certain by a shorter one
+            return None
+        return None
+
+
+def load_merchant_index(user_id: Optional[int], titles: Optional[Iterable[str]] = None) -> MerchantIndex:
+    """
+    Load a user's merchant index.
+
+    Args:
+        user_id: Primary key of the user the index belongs to
+        titles: When given, only the keys these titles can match are loaded
+
+    Returns:
+        MerchantIndex for the user
+    """
+    from .models import MerchantCategory
+
+    rows = MerchantCategory.objects.filter(user_id=user_id)
+    if titles is not None:
+        keys = {key for title in titles for key in merchant_prefixes(title)}
+        if not keys:
+            return MerchantIndex({})
+        rows = rows.filter(merchant_key__in=keys)
+
+    return MerchantIndex({
+        merchant_key: (category, category_count, total)
+        for merchant_key, category, category_count, total in rows.values_list(
+            'merchant_key', 'category', 'category_count', 'total'
+        )
+    })
+
+
+def apply_merchant_categories(user_id: Optional[int], transactions: List[Dict]) -> int:
+    """
+    Replace the category of extracted transactions with the user's learned one.
+
+    Args:
+        user_id: Primary key of the user whose history is used
+        transactions: Extracted transaction dictionaries (``title`` and ``category`` keys), updated in place
+
+    Returns:
+        Number of transactions whose category came from the index
+    """
+    if not transactions:
+        return 0
+
+    index = load_merchant_index(user_id, (item.get('title') for item in transactions))
+    applied = 0
+    for item in transactions:
+        category = index.lookup(item.get('title'))
+        if category:
+            item['category'] = category
+            applied += 1
+    return applied
+
+
+def _summarize(counts: Counter) -> Tuple[str, int, int]:
+    category, category_count = counts.most_common(1)[0]
+    return category, category_count, sum(counts.values())
+
+
+def update_merchant_index(user_id: Optional[int], added: Iterable[Tuple[str, str]] = (),
+                          removed: Iterable[Tuple[str, str]] = ()):
+    """
+    Apply transaction changes to a user's merchant index.
+
+    Args:
+        user_id: Primary key of the user the transactions belong to (nothing
+            is learned for transactions whose owner matches no user)
+        added: (title, category) pairs of new or re-categorized transactions
+        removed: (title, category) pairs of deleted transactions or the old
+            values of re-categorized ones
+    """
+    from .models import MerchantCategory
+
+    deltas = defaultdict(Counter)
+    for title, category in added:
+        if category and category not in UNCATEGORIZED:
+            for key in merchant_prefixes(title):
+                deltas[key][category] += 1
+    for title, category in removed:
+        if category and category not in UNCATEGORIZED:
+            for key in merchant_prefixes(title):
+                deltas[key][category] -= 1
+    if user_id is None or not deltas:
+        return
+
+    with db_transaction.atomic():
+        existing = {
+            entry.merchant_key: entry
+            for entry in MerchantCategory.objects.select_for_update().filter(
+                user_id=user_id, merchant_key__in=deltas.keys()
+            )
+        }
+
+        to_create, to_update, to_delete = [], [], []
+        for key, delta in deltas.items():
+            entry = existing.get(key)
+            counts = Counter(entry.counts if entry else {})
+            counts.update(delta)
+            counts = Counter({category: count for category, count in counts.items() if count > 0})
+
+            if not counts:
+                if entry:
+                    to_delete.append(entry.id)
+                continue
+
+            category, category_count, total = _summarize(counts)
+            if entry is None:
+                to_create.append(MerchantCategory(
+                    user_id=user_id, merchant_key=key, counts=dict(counts),
+                    category=category, category_count=category_count, total=total
+                ))
+            else:
+                entry.counts = dict(counts)
+                entry.category, entry.category_count, entry.total = category, category_count, total
+                to_update.append(entry)
+
+        if to_delete:
+            MerchantCategory.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            MerchantCategory.objects.bulk_update(to_update, ['counts', 'category', 'category_count', 'total'])
+        if to_create:
+            # A concurrent request may have created the same key; its counts win
+            # and the next rebuild_merchant_index evens things out.
+            MerchantCategory.objects.bulk_create(to_create, ignore_conflicts=True)
+
+
+def record_categorizations(user_id: Optional[int], added: Iterable[Tuple[str, str]] = (),
+                           removed: Iterable[Tuple[str, str]] = ()):
+    """
+    Update the merchant index after transactions change, without failing the caller.
+
+    The index is derived data: if updating it fails, the error is logged and
+    the next rebuild_merchant_index restores it.
+    """
+    try:
+        update_merchant_index(user_id, added=list(added), removed=list(removed))
+    except Exception as e:
+        logger.error(f"Failed to update merchant index for user {user_id}: {str(e)}", exc_info=True)
+
+
+def rebuild_merchant_index(user_id: Optional[int] = None) -> int:
+    """
+    Rebuild the merchant index from the Transaction table.
+
+    Args:
+        user_id: Only rebuild this user's index (all users when None)
+
+    Returns:
+        Number of merchant keys written
+    """
+    from .models import MerchantCategory, Transaction
+
+    history = Transaction.objects.exclude(category__in=UNCATEGORIZED).filter(user__isnull=False)
+    if user_id is not None:
+        history = history.filter(user_id=user_id)
+
+    counts = defaultdict(Counter)
+    for owner, title, category in history.values_list('user_id', 'title', 'category').iterator(chunk_size=2000):
+        for key in merchant_prefixes(title):
+            counts[(owner, key)][category] += 1
+
+    entries = []
+    for (owner, key), key_counts in counts.items():
+        category, category_count, total = _summarize(key_counts)
+        entries.append(MerchantCategory(
+            user_id=owner, merchant_key=key, counts=dict(key_counts),
+            category=category, category_count=category_count, total=total
+        ))
+
+    with db_transaction.atomic():
+        stale = MerchantCategory.objects.all()
+        if user_id is not None:
+            stale = stale.filter(user_id=user_id)
+        stale.delete()
+        MerchantCategory.objects.bulk_create(entries, batch_size=1000)
+
+    logger.info(f"Rebuilt merchant index with {len(entries)} keys")
+    return len(entries)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-19 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0002_transaction_from_account_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerchantCategory',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('owner_id', models.CharField(max_length=150)),
+                ('merchant_key', models.CharField(help_text="Normalized merchant tokens, e.g. 'UBER TRIP'", max_length=120)),
+                ('counts', models.JSONField(default=dict, help_text='Number of transactions per category')),
+                ('category', models.CharField(help_text='Most frequent category', max_length=30)),
+                ('category_count', models.PositiveIntegerField(default=0, help_text='Transactions in the most frequent category')),
+                ('total', models.PositiveIntegerField(default=0, help_text='Transactions with this merchant key')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='merchantcategory',
+            constraint=models.UniqueConstraint(fields=('owner_id', 'merchant_key'), name='unique_owner_merchant_key'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:15
+
+from django.db import migrations, models
+
+from transaction.fingerprints import transaction_fingerprint
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Transaction = apps.get_model('transaction', 'Transaction')
+
+    batch = []
+    for transaction in Transaction.objects.only('id', 'owner_id', 'account_id', 'from_account_id', 'total', 'title').iterator():
+        transaction.fingerprint = transaction_fingerprint(
+            transaction.owner_id, transaction.account_id or transaction.from_account_id, transaction.total, transaction.title
+        )
+        batch.append(transaction)
+        if len(batch) >= 1000:
+            Transaction.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0003_merchantcategory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['fingerprint', 'date'], name='transaction_fingerprint_idx'),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0004_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner_id', models.CharField(max_length=150, unique=True)),
+                ('last_transaction_id', models.IntegerField(default=0)),
+                ('scanned_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurringSeries',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('owner_id', models.CharField(max_length=150)),
+                ('merchant_key', models.CharField(help_text='Normalized merchant tokens of the titles', max_length=120)),
+                ('account_id', models.CharField(blank=True, default='', max_length=20)),
+                ('transaction_type', models.CharField(choices=[('Income', 'Income'), ('Expense', 'Expense'), ('Transfer', 'Transfer')], max_length=30)),
+                ('category', models.CharField(blank=True, default='', max_length=30)),
+                ('period', models.CharField(choices=[('weekly', 'Weekly'), ('biweekly', 'Every two weeks'), ('monthly', 'Monthly'), ('quarterly', 'Quarterly'), ('yearly', 'Yearly')], max_length=20)),
+                ('interval_days', models.FloatField(help_text='Median number of days between occurrences')),
+                ('interval_spread', models.FloatField(help_text='Median absolute deviation of the days between occurrences')),
+                ('confidence', models.FloatField(help_text='Share of the intervals that match the period')),
+                ('amount', models.FloatField(help_text='Median amount')),
+                ('amount_min', models.FloatField()),
+                ('amount_max', models.FloatField()),
+                ('occurrences', models.PositiveIntegerField()),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('next_date', models.DateField(help_text='Expected date of the next occurrence')),
+                ('last_transaction_id', models.IntegerField(help_text='Newest transaction of the series')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Recurring series',
+                'indexes': [models.Index(fields=['owner_id', 'next_date'], name='recurringseries_owner_next_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0005_recurringseries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringRule',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('owner_id', models.CharField(max_length=150)),
+                ('title', models.CharField(max_length=120)),
+                ('transaction_type', models.CharField(choices=[('Income', 'Income'), ('Expense', 'Expense'), ('Transfer', 'Transfer')], max_length=30)),
+                ('category', models.CharField(blank=True, default='', max_length=30)),
+                ('total', models.FloatField(default=0.0)),
+                ('account_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('from_account_id', models.CharField(blank=True, help_text='Source account (for transfers)', max_length=20, null=True)),
+                ('to_account_id', models.CharField(blank=True, help_text='Destination account (for transfers)', max_length=20, null=True)),
+                ('period', models.CharField(choices=[('weekly', 'Weekly'), ('biweekly', 'Every two weeks'), ('monthly', 'Monthly'), ('quarterly', 'Quarterly'), ('yearly', 'Yearly')], max_length=20)),
+                ('interval', models.PositiveIntegerField(default=1, help_text='Repeat every this many periods')),
+                ('start_date', models.DateField(help_text='Date of the first occurrence')),
+                ('end_date', models.DateField(blank=True, help_text='No occurrences after this date', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateField(blank=True, editable=False, help_text='Occurrences up to this date are stored as scheduled transactions', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScheduledTransaction',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('owner_id', models.CharField(max_length=150)),
+                ('date', models.DateField()),
+                ('title', models.CharField(max_length=120)),
+                ('transaction_type', models.CharField(choices=[('Income', 'Income'), ('Expense', 'Expense'), ('Transfer', 'Transfer')], max_length=30)),
+                ('category', models.CharField(blank=True, default='', max_length=30)),
+                ('total', models.FloatField(default=0.0)),
+                ('account_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('from_account_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('to_account_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_transactions', to='transaction.recurringrule')),
+            ],
+            options={
+                'ordering': ['date', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recurringrule',
+            index=models.Index(fields=['is_active', 'materialized_until'], name='recurringrule_materialize_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledtransaction',
+            index=models.Index(fields=['owner_id', 'date'], name='scheduled_owner_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduledtransaction',
+            constraint=models.UniqueConstraint(fields=('rule', 'date'), name='scheduledtransaction_rule_date_uniq'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:23
+
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def transaction_legs(transaction_type, total, account_id, from_account_id, to_account_id):
+    """Signed amount per account ID string (a copy of transaction.legs at the time of this migration)."""
+    amount = float(total or 0)
+    legs = defaultdict(float)
+    if transaction_type == 'Transfer':
+        if from_account_id:
+            legs[str(from_account_id)] -= amount
+        if to_account_id:
+            legs[str(to_account_id)] += amount
+    elif account_id:
+        legs[str(account_id)] += amount if transaction_type == 'Income' else -amount
+    return dict(legs)
+
+
+def backfill_legs(apps, schema_editor):
+    Transaction = apps.get_model('transaction', 'Transaction')
+    TransactionLeg = apps.get_model('transaction', 'TransactionLeg')
+
+    fields = ('id', 'date', 'transaction_type', 'total', 'account_id', 'from_account_id', 'to_account_id')
+    batch = []
+    for row in Transaction.objects.values(*fields).iterator(chunk_size=2000):
+        legs = transaction_legs(
+            row['transaction_type'], row['total'], row['account_id'], row['from_account_id'], row['to_account_id']
+        )
+        for account_id, amount in legs.items():
+            batch.append(TransactionLeg(transaction_id=row['id'], account_id=account_id, date=row['date'], signed_amount=amount))
+        if len(batch) >= 1000:
+            TransactionLeg.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TransactionLeg.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0006_recurringrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionLeg',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('account_id', models.CharField(max_length=20)),
+                ('date', models.DateField(help_text='Copy of the transaction date, for per-account date ranges')),
+                ('signed_amount', models.FloatField()),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legs', to='transaction.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account_id', 'date'], name='leg_account_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='transactionleg',
+            constraint=models.UniqueConstraint(fields=('transaction', 'account_id'), name='transactionleg_transaction_account_uniq'),
+        ),
+        migrations.RunPython(backfill_legs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_foreign_keys'),
+        ('users', '0001_initial'),
+        ('transaction', '0007_transactionleg'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='account_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='account.account'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='from_account_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outgoing_transfers', to='account.account'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='to_account_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incoming_transfers', to='account.account'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='users.user'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date'], name='transaction_user_date_idx'),
+        ),
+    ]
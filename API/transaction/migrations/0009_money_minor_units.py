@@ -0,0 +1,47 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:28
+
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Round
+
+import MoneyManagement.money
+
+MINOR_UNITS = 100
+
+
+def scale_amounts(factor, precision):
+    """
+    Multiply the stored amounts by factor and round them to precision digits:
+    to whole cents, or back to major units when reversed.
+    """
+    def scaled(field):
+        # Rounding to 6 digits first drops float error, so 12.345 becomes 1235 cents like to_minor_units
+        return Round(Round(F(field) * factor, 6), precision)
+
+    def convert(apps, schema_editor):
+        Transaction = apps.get_model('transaction', 'Transaction')
+        TransactionLeg = apps.get_model('transaction', 'TransactionLeg')
+        Transaction.objects.update(total=scaled('total'))
+        TransactionLeg.objects.update(signed_amount=scaled('signed_amount'))
+    return convert
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0008_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(scale_amounts(MINOR_UNITS, 0), scale_amounts(1 / MINOR_UNITS, 2)),
+        migrations.AlterField(
+            model_name='transaction',
+            name='total',
+            field=MoneyManagement.money.MoneyField(default=0, help_text='Amount, stored in cents'),
+        ),
+        migrations.AlterField(
+            model_name='transactionleg',
+            name='signed_amount',
+            field=MoneyManagement.money.MoneyField(help_text='Amount for this account, stored in cents'),
+        ),
+    ]
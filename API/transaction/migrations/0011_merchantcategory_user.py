@@ -0,0 +1,60 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def link_users(apps, schema_editor):
+    """Point every learned category at the user with its owner_id; rows of unknown usernames are dropped."""
+    User = apps.get_model('users', 'User')
+    MerchantCategory = apps.get_model('transaction', 'MerchantCategory')
+    MerchantCategory.objects.update(user=Subquery(User.objects.filter(username=OuterRef('owner_id')).values('id')[:1]))
+    # Derived data: rebuild_merchant_index can recreate it
+    MerchantCategory.objects.filter(user__isnull=True).delete()
+
+
+def unlink_users(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    MerchantCategory = apps.get_model('transaction', 'MerchantCategory')
+    MerchantCategory.objects.update(owner_id=Subquery(User.objects.filter(id=OuterRef('user_id')).values('username')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('transaction', '0010_money_minor_units'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='merchantcategory',
+            name='unique_owner_merchant_key',
+        ),
+        migrations.AddField(
+            model_name='merchantcategory',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='merchant_categories', to='users.user'),
+        ),
+        # Nullable while both columns exist, so the reverse can add owner_id back before filling it
+        migrations.AlterField(
+            model_name='merchantcategory',
+            name='owner_id',
+            field=models.CharField(max_length=150, null=True),
+        ),
+        migrations.RunPython(link_users, unlink_users),
+        migrations.AlterField(
+            model_name='merchantcategory',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merchant_categories', to='users.user'),
+        ),
+        migrations.RemoveField(
+            model_name='merchantcategory',
+            name='owner_id',
+        ),
+        migrations.AddConstraint(
+            model_name='merchantcategory',
+            constraint=models.UniqueConstraint(fields=('user', 'merchant_key'), name='unique_user_merchant_key'),
+        ),
+    ]
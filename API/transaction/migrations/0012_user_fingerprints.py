@@ -0,0 +1,51 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:15
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations
+
+NON_ALPHANUMERIC = re.compile(r'[^A-Z0-9]+')
+
+
+def fingerprint(owner, account_id, total, title):
+    """Copy of transaction.fingerprints.transaction_fingerprint at the time of this migration."""
+    text = unicodedata.normalize('NFKD', str(title or '')).encode('ascii', 'ignore').decode('ascii').upper()
+    try:
+        cents = round(abs(float(total or 0)) * 100)
+    except (TypeError, ValueError):
+        cents = 0
+    key = '|'.join((str(owner or ''), str(account_id or ''), str(cents), NON_ALPHANUMERIC.sub(' ', text).strip()))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def refingerprint(use_user):
+    """Recompute the fingerprints of transactions with a user, keyed on the user's primary key or username."""
+    def convert(apps, schema_editor):
+        Transaction = apps.get_model('transaction', 'Transaction')
+        rows = Transaction.objects.filter(user__isnull=False).select_related('user').only(
+            'id', 'owner_id', 'account_id', 'from_account_id', 'total', 'title', 'fingerprint', 'user__username'
+        ).order_by('id')
+        last_id = 0
+        while True:
+            chunk = list(rows.filter(id__gt=last_id)[:1000])
+            if not chunk:
+                return
+            for row in chunk:
+                owner = row.user_id if use_user else row.user.username
+                row.fingerprint = fingerprint(owner, row.account_id or row.from_account_id, row.total, row.title)
+            Transaction.objects.bulk_update(chunk, ['fingerprint'])
+            last_id = chunk[-1].id
+    return convert
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0011_merchantcategory_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(refingerprint(True), refingerprint(False)),
+    ]
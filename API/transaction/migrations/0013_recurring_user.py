@@ -0,0 +1,84 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+# Detection results keyed on the owner's username until now
+OWNED_MODELS = ('RecurringSeries', 'RecurringScan')
+
+
+def link_users(apps, schema_editor):
+    """Point every row at the user with its owner_id; rows of unknown usernames are dropped."""
+    User = apps.get_model('users', 'User')
+    for model_name in OWNED_MODELS:
+        model = apps.get_model('transaction', model_name)
+        model.objects.update(user=Subquery(User.objects.filter(username=OuterRef('owner_id')).values('id')[:1]))
+        # Derived data: the next detection run recreates it
+        model.objects.filter(user__isnull=True).delete()
+
+
+def unlink_users(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    for model_name in OWNED_MODELS:
+        model = apps.get_model('transaction', model_name)
+        model.objects.update(owner_id=Subquery(User.objects.filter(id=OuterRef('user_id')).values('username')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('transaction', '0012_user_fingerprints'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recurringseries',
+            name='recurringseries_owner_next_idx',
+        ),
+        migrations.AddField(
+            model_name='recurringseries',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recurring_series', to='users.user'),
+        ),
+        migrations.AddField(
+            model_name='recurringscan',
+            name='user',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recurring_scan', to='users.user'),
+        ),
+        # Nullable while both columns exist, so the reverse can add owner_id back before filling it
+        migrations.AlterField(
+            model_name='recurringseries',
+            name='owner_id',
+            field=models.CharField(max_length=150, null=True),
+        ),
+        migrations.AlterField(
+            model_name='recurringscan',
+            name='owner_id',
+            field=models.CharField(max_length=150, null=True, unique=True),
+        ),
+        migrations.RunPython(link_users, unlink_users),
+        migrations.AlterField(
+            model_name='recurringseries',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_series', to='users.user'),
+        ),
+        migrations.AlterField(
+            model_name='recurringscan',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_scan', to='users.user'),
+        ),
+        migrations.RemoveField(
+            model_name='recurringseries',
+            name='owner_id',
+        ),
+        migrations.RemoveField(
+            model_name='recurringscan',
+            name='owner_id',
+        ),
+        migrations.AddIndex(
+            model_name='recurringseries',
+            index=models.Index(fields=['user', 'next_date'], name='recurringseries_user_next_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+# Rules and their instances, keyed on the owner's username until now
+OWNED_MODELS = ('RecurringRule', 'ScheduledTransaction')
+
+
+def link_users(apps, schema_editor):
+    """Point every row at the user with its owner_id; rows of unknown usernames are dropped."""
+    User = apps.get_model('users', 'User')
+    for model_name in OWNED_MODELS:
+        model = apps.get_model('transaction', model_name)
+        model.objects.update(user=Subquery(User.objects.filter(username=OuterRef('owner_id')).values('id')[:1]))
+        # Rules of deleted users, and their instances
+        model.objects.filter(user__isnull=True).delete()
+
+
+def unlink_users(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    for model_name in OWNED_MODELS:
+        model = apps.get_model('transaction', model_name)
+        model.objects.update(owner_id=Subquery(User.objects.filter(id=OuterRef('user_id')).values('username')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('transaction', '0013_recurring_user'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='scheduledtransaction',
+            name='scheduled_owner_date_idx',
+        ),
+        migrations.AddField(
+            model_name='recurringrule',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recurring_rules', to='users.user'),
+        ),
+        migrations.AddField(
+            model_name='scheduledtransaction',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_transactions', to='users.user'),
+        ),
+        # Nullable while both columns exist, so the reverse can add owner_id back before filling it
+        migrations.AlterField(
+            model_name='recurringrule',
+            name='owner_id',
+            field=models.CharField(max_length=150, null=True),
+        ),
+        migrations.AlterField(
+            model_name='scheduledtransaction',
+            name='owner_id',
+            field=models.CharField(max_length=150, null=True),
+        ),
+        migrations.RunPython(link_users, unlink_users),
+        migrations.AlterField(
+            model_name='recurringrule',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_rules', to='users.user'),
+        ),
+        migrations.AlterField(
+            model_name='scheduledtransaction',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_transactions', to='users.user'),
+        ),
+        migrations.RemoveField(
+            model_name='recurringrule',
+            name='owner_id',
+        ),
+        migrations.RemoveField(
+            model_name='scheduledtransaction',
+            name='owner_id',
+        ),
+        migrations.AddIndex(
+            model_name='scheduledtransaction',
+            index=models.Index(fields=['user', 'date'], name='scheduled_user_date_idx'),
+        ),
+    ]
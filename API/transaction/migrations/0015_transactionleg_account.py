@@ -0,0 +1,77 @@
+# Generated by Django 4.2.24 on 2026-10-19 17:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_accounts(apps, schema_editor):
+    """Point every leg at the account of its ID string; legs of missing accounts are dropped."""
+    Account = apps.get_model('account', 'Account')
+    TransactionLeg = apps.get_model('transaction', 'TransactionLeg')
+
+    existing = set(Account.objects.values_list('id', flat=True))
+    # One UPDATE per distinct account string, so the legs are never loaded into memory
+    for value in list(TransactionLeg.objects.order_by().values_list('legacy_account_id', flat=True).distinct()):
+        value = (value or '').strip()
+        if value.isdigit() and int(value) in existing:
+            TransactionLeg.objects.filter(legacy_account_id=value).update(account_id=int(value))
+    TransactionLeg.objects.filter(account__isnull=True).delete()
+
+
+def unlink_accounts(apps, schema_editor):
+    TransactionLeg = apps.get_model('transaction', 'TransactionLeg')
+    for account_id in list(TransactionLeg.objects.order_by().values_list('account_id', flat=True).distinct()):
+        TransactionLeg.objects.filter(account_id=account_id).update(legacy_account_id=str(account_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_account_kind'),
+        ('transaction', '0014_recurringrule_user'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='transactionleg',
+            name='transactionleg_transaction_account_uniq',
+        ),
+        migrations.RemoveIndex(
+            model_name='transactionleg',
+            name='leg_account_date_idx',
+        ),
+        # Frees the account_id column name for the foreign key
+        migrations.RenameField(
+            model_name='transactionleg',
+            old_name='account_id',
+            new_name='legacy_account_id',
+        ),
+        migrations.AlterField(
+            model_name='transactionleg',
+            name='legacy_account_id',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionleg',
+            name='account',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='legs', to='account.account'),
+        ),
+        migrations.RunPython(link_accounts, unlink_accounts),
+        migrations.AlterField(
+            model_name='transactionleg',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legs', to='account.account'),
+        ),
+        migrations.RemoveField(
+            model_name='transactionleg',
+            name='legacy_account_id',
+        ),
+        migrations.AddConstraint(
+            model_name='transactionleg',
+            constraint=models.UniqueConstraint(fields=('transaction', 'account'), name='transactionleg_transaction_account_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionleg',
+            index=models.Index(fields=['account', 'date'], name='leg_account_date_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-19 16:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('transaction', '0015_transactionleg_account'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferPairing',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('expense_category', models.CharField(help_text='Category of the expense before it became the transfer', max_length=30)),
+                ('removed_transaction', models.JSONField(help_text='Fields of the deleted income, amount in cents')),
+                ('paired_at', models.DateTimeField(auto_now_add=True)),
+                ('transfer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pairing', to='transaction.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfer_pairings', to='users.user')),
+            ],
+        ),
+    ]
@@ -1,5 +1,13 @@
+from datetime import date, timedelta
+
 from django.db import models
 
+from MoneyManagement.money import MoneyField
+
+from .fingerprints import transaction_fingerprint
+from .legs import sync_transaction_legs
+from .references import REFERENCE_FIELDS, resolve_transaction_references
+
 
 class Transaction(models.Model):
     """
@@ -18,7 +26,7 @@ class Transaction(models.Model):
     category = models.CharField(max_length=30)
     date = models.DateField(editable=True)
     title = models.CharField(max_length=120)
-    total = models.FloatField(default=0.0)
+    total = MoneyField(default=0, help_text="Amount, stored in cents")
     owner_id = models.CharField(max_length=20)
     
     # Account fields - for transfers, from_account is source, to_account is destination
@@ -27,12 +35,50 @@ class Transaction(models.Model):
     
     # Legacy field for backward compatibility
     account_id = models.CharField(max_length=20, null=True, blank=True, help_text="Legacy: single account for income/expense")
+    
+    # Hash of user, account, amount and normalized title, for duplicate detection (see fingerprints.py)
+    fingerprint = models.CharField(max_length=32, blank=True, default='', editable=False)
+    
+    # Foreign keys behind owner_id and the account columns, filled in on save and used by every read (see references.py)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, null=True, blank=True, related_name='transactions')
+    account_ref = models.ForeignKey('account.Account', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='transactions')
+    from_account_ref = models.ForeignKey('account.Account', on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='outgoing_transfers')
+    to_account_ref = models.ForeignKey('account.Account', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='incoming_transfers')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['fingerprint', 'date'], name='transaction_fingerprint_idx'),
+            models.Index(fields=['user', 'date'], name='transaction_user_date_idx'),
+        ]
 
     def __str__(self):
         if self.transaction_type == 'Transfer':
             return f"Transfer: {self.title} - ${self.total} ({self.date})"
         return f"{self.title} - ${self.total} ({self.date})"
     
+    @property
+    def owner_username(self):
+        """Current username of the owner (owner_id keeps the name the row was created with)."""
+        return self.user.username if self.user_id else self.owner_id
+    
+    def compute_fingerprint(self) -> str:
+        """Fingerprint of this transaction; transfers use their source account."""
+        return transaction_fingerprint(
+            self.user_id or self.owner_id, self.account_id or self.from_account_id, self.total, self.title
+        )
+    
+    def save(self, *args, **kwargs):
+        resolve_transaction_references([self])
+        self.fingerprint = self.compute_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = list(set(update_fields) | {'fingerprint'} | set(REFERENCE_FIELDS))
+        super().save(*args, **kwargs)
+        sync_transaction_legs([self])
+    
     @property
     def is_transfer(self):
         """Check if this is a transfer transaction."""
@@ -50,4 +96,197 @@ class Transaction(models.Model):
         """Get the destination account for transfers."""
         if self.is_transfer:
             return self.to_account_id
-        return None
\ No newline at end of file
+        return None
+
+
+class TransactionLeg(models.Model):
+    """
+    One account touched by a transaction, with the amount signed for that
+    account (money in positive, money out negative). See transaction/legs.py.
+    """
+    
+    id = models.AutoField(primary_key=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='legs')
+    account = models.ForeignKey('account.Account', on_delete=models.CASCADE, related_name='legs')
+    date = models.DateField(help_text="Copy of the transaction date, for per-account date ranges")
+    signed_amount = MoneyField(help_text="Amount for this account, stored in cents")
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'account'], name='transactionleg_transaction_account_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['account', 'date'], name='leg_account_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Account {self.account_id}: {self.signed_amount:+} ({self.date})"
+
+
+class MerchantCategory(models.Model):
+    """
+    Learned category for a normalized merchant key of one user.
+    See transaction/merchants.py for how keys are built and looked up.
+    """
+    
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='merchant_categories')
+    merchant_key = models.CharField(max_length=120, help_text="Normalized merchant tokens, e.g. 'UBER TRIP'")
+    counts = models.JSONField(default=dict, help_text="Number of transactions per category")
+    category = models.CharField(max_length=30, help_text="Most frequent category")
+    category_count = models.PositiveIntegerField(default=0, help_text="Transactions in the most frequent category")
+    total = models.PositiveIntegerField(default=0, help_text="Transactions with this merchant key")
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'merchant_key'], name='unique_user_merchant_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.merchant_key} -> {self.category} ({self.category_count}/{self.total})"
+
+
+class RecurringSeries(models.Model):
+    """
+    Recurring transaction (subscription, bill, salary) detected in a user's history.
+    See transaction/recurring.py for how series are detected.
+    """
+    
+    PERIODS = [
+        ('weekly', 'Weekly'),
+        ('biweekly', 'Every two weeks'),
+        ('monthly', 'Monthly'),
+        ('quarterly', 'Quarterly'),
+        ('yearly', 'Yearly'),
+    ]
+    
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='recurring_series')
+    merchant_key = models.CharField(max_length=120, help_text="Normalized merchant tokens of the titles")
+    account_id = models.CharField(max_length=20, blank=True, default='')
+    transaction_type = models.CharField(max_length=30, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=30, blank=True, default='')
+    period = models.CharField(max_length=20, choices=PERIODS)
+    interval_days = models.FloatField(help_text="Median number of days between occurrences")
+    interval_spread = models.FloatField(help_text="Median absolute deviation of the days between occurrences")
+    confidence = models.FloatField(help_text="Share of the intervals that match the period")
+    amount = MoneyField(help_text="Median amount, stored in cents")
+    amount_min = MoneyField(help_text="Stored in cents")
+    amount_max = MoneyField(help_text="Stored in cents")
+    occurrences = models.PositiveIntegerField()
+    first_date = models.DateField()
+    last_date = models.DateField()
+    next_date = models.DateField(help_text="Expected date of the next occurrence")
+    last_transaction_id = models.IntegerField(help_text="Newest transaction of the series")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Recurring series"
+        indexes = [
+            models.Index(fields=['user', 'next_date'], name='recurringseries_user_next_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.merchant_key} {self.amount} {self.period}"
+    
+    @property
+    def is_active(self):
+        """Whether the next occurrence is not overdue by more than one period."""
+        return self.next_date + timedelta(days=round(self.interval_days)) >= date.today()
+
+
+class RecurringScan(models.Model):
+    """
+    Progress of recurring series detection for one user: the newest transaction already analyzed.
+    """
+    
+    user = models.OneToOneField('users.User', on_delete=models.CASCADE, related_name='recurring_scan')
+    last_transaction_id = models.IntegerField(default=0)
+    scanned_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user_id}: up to transaction {self.last_transaction_id}"
+
+
+class RecurringRule(models.Model):
+    """
+    Transaction that repeats on a schedule (rent, payroll), entered by the user
+    or confirmed from a detected RecurringSeries. Its upcoming instances are
+    materialized as ScheduledTransaction rows (see scheduling.py).
+    """
+    
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='recurring_rules')
+    title = models.CharField(max_length=120)
+    transaction_type = models.CharField(max_length=30, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=30, blank=True, default='')
+    total = MoneyField(default=0, help_text="Amount, stored in cents")
+    account_id = models.CharField(max_length=20, null=True, blank=True)
+    from_account_id = models.CharField(max_length=20, null=True, blank=True, help_text="Source account (for transfers)")
+    to_account_id = models.CharField(max_length=20, null=True, blank=True, help_text="Destination account (for transfers)")
+    period = models.CharField(max_length=20, choices=RecurringSeries.PERIODS)
+    interval = models.PositiveIntegerField(default=1, help_text="Repeat every this many periods")
+    start_date = models.DateField(help_text="Date of the first occurrence")
+    end_date = models.DateField(null=True, blank=True, help_text="No occurrences after this date")
+    is_active = models.BooleanField(default=True)
+    materialized_until = models.DateField(null=True, blank=True, editable=False,
+                                          help_text="Occurrences up to this date are stored as scheduled transactions")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'materialized_until'], name='recurringrule_materialize_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.title} {self.total} {self.period}"
+
+
+class ScheduledTransaction(models.Model):
+    """
+    Upcoming instance of a RecurringRule, read by the projection endpoint.
+    One row per rule and date, so materializing twice stores nothing new.
+    """
+    
+    id = models.AutoField(primary_key=True)
+    rule = models.ForeignKey(RecurringRule, on_delete=models.CASCADE, related_name='scheduled_transactions')
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='scheduled_transactions')
+    date = models.DateField()
+    title = models.CharField(max_length=120)
+    transaction_type = models.CharField(max_length=30, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=30, blank=True, default='')
+    total = MoneyField(default=0, help_text="Amount, stored in cents")
+    account_id = models.CharField(max_length=20, null=True, blank=True)
+    from_account_id = models.CharField(max_length=20, null=True, blank=True)
+    to_account_id = models.CharField(max_length=20, null=True, blank=True)
+    
+    class Meta:
+        ordering = ['date', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'date'], name='scheduledtransaction_rule_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='scheduled_user_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} - ${self.total} ({self.date}, scheduled)"
+
+
+class TransferPairing(models.Model):
+    """
+    Expense/income pair merged into one Transfer by transfers.pair_transfers.
+    Keeps the deleted income and the expense's category so unpair_transfer
+    can split the transfer again.
+    """
+    
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='transfer_pairings')
+    transfer = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='pairing')
+    expense_category = models.CharField(max_length=30, help_text="Category of the expense before it became the transfer")
+    removed_transaction = models.JSONField(help_text="Fields of the deleted income, amount in cents")
+    paired_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Transfer {self.transfer_id} (income {self.removed_transaction.get('id')} removed)"
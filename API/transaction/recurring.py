@@ -0,0 +1,239 @@
+"""
+Recurring transaction (subscription and fixed bill) detection.
+
+A user's Income and Expense rows are grouped by merchant (the normalized
+title keys of merchants.py), account and type. Inside a group, amounts are
+split into bands: sorted amounts are cut wherever one is more than
+AMOUNT_BAND_RATIO above the previous one, so a 199.00 subscription that
+becomes 219.00 stays one band while a 15.00 coffee and a 450.00 purchase at
+the same merchant do not.
+
+For each band with enough rows, the day gaps between consecutive dates are
+computed once and summarized by their median and spread. The median is
+compared with the known periods (weekly to yearly), and the band becomes a
+RecurringSeries when most gaps fall inside that period's tolerance.
+
+Detection is incremental. ``RecurringScan`` stores, per user, the highest
+transaction ID already analyzed. A run skips users with no newer
+transactions and re-analyzes only the groups touched by the new rows.
+``--full`` rebuilds everything, e.g. after transactions were edited.
+"""
+import calendar
+import logging
+import statistics
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.db import transaction as db_transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .fingerprints import normalize_title
+from .merchants import merchant_tokens
+
+logger = logging.getLogger(__name__)
+
+# name, typical gap in days, accepted gap range (inclusive), minimum occurrences
+PERIODS = (
+    ('weekly', 7, (6, 8), 4),
+    ('biweekly', 14, (12, 16), 3),
+    ('monthly', 30, (26, 35), 3),
+    ('quarterly', 91, (84, 98), 3),
+    ('yearly', 365, (350, 380), 2),
+)
+
+# Consecutive sorted amounts further apart than this ratio start a new band
+AMOUNT_BAND_RATIO = 1.25
+
+# Share of gaps that must fit the period
+MIN_REGULAR_SHARE = 0.75
+
+
+def series_merchant_key(title: str) -> str:
+    """Grouping key of a title: its merchant tokens, or the normalized title when it has none."""
+    return ' '.join(merchant_tokens(title)) or normalize_title(title)[:120]
+
+
+def split_amount_bands(amounts: List[float]) -> List[Tuple[float, float]]:
+    """(low, high) bounds of the amount bands in a list of amounts."""
+    ordered = sorted(abs(amount) for amount in amounts)
+    bands = []
+    low = previous = ordered[0]
+    for amount in ordered[1:]:
+        if previous > 0 and amount / previous > AMOUNT_BAND_RATIO:
+            bands.append((low, previous))
+            low = amount
+        previous = amount
+    bands.append((low, previous))
+    return bands
+
+
+def add_months(day: date, months: int) -> date:
+    """Same day of the month, ``months`` later (clamped to the end of shorter months)."""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(last_date: date, period: str, interval_days: float) -> date:
+    if period == 'monthly':
+        return add_months(last_date, 1)
+    if period == 'quarterly':
+        return add_months(last_date, 3)
+    if period == 'yearly':
+        return add_months(last_date, 12)
+    return last_date + timedelta(days=round(interval_days))
+
+
+def detect_period(dates: List[date]) -> Optional[Dict[str, Any]]:
+    """
+    Detect the period of a sorted list of dates.
+
+    Several rows on the same day count once.
+
+    Returns:
+        Dictionary with ``period``, ``interval_days`` (median gap),
+        ``interval_spread`` (median absolute deviation of the gaps) and
+        ``confidence`` (share of gaps that fit the period), or None
+    """
+    ordinals = sorted({day.toordinal() for day in dates})
+    if len(ordinals) < 2:
+        return None
+    gaps = [later - earlier for earlier, later in zip(ordinals, ordinals[1:])]
+    median_gap = statistics.median(gaps)
+
+    for period, _, (shortest, longest), min_occurrences in PERIODS:
+        if not shortest <= median_gap <= longest:
+            continue
+        if len(ordinals) < min_occurrences:
+            return None
+        regular = sum(1 for gap in gaps if shortest <= gap <= longest)
+        confidence = regular / len(gaps)
+        if confidence < MIN_REGULAR_SHARE:
+            return None
+        return {
+            'period': period,
+            'interval_days': float(median_gap),
+            'interval_spread': float(statistics.median(abs(gap - median_gap) for gap in gaps)),
+            'confidence': round(confidence, 3),
+        }
+    return None
+
+
+def analyze_group(rows: List[Tuple[int, date, float, str]]) -> List[Dict[str, Any]]:
+    """
+    Detect the recurring series in one (merchant, account, type) group.
+
+    Args:
+        rows: (id, date, total, category) tuples of the group
+
+    Returns:
+        Series field dictionaries (without the group key)
+    """
+    series = []
+    for low, high in split_amount_bands([total for _, _, total, _ in rows]):
+        band = sorted((row for row in rows if low <= abs(row[2]) <= high), key=lambda row: (row[1], row[0]))
+        detected = detect_period([row[1] for row in band])
+        if detected is None:
+            continue
+        amounts = [abs(row[2]) for row in band]
+        categories = [row[3] for row in band if row[3]]
+        last_date = band[-1][1]
+        series.append(dict(
+            detected,
+            amount=round(statistics.median(amounts), 2),
+            amount_min=min(amounts),
+            amount_max=max(amounts),
+            category=max(set(categories), key=categories.count) if categories else '',
+            occurrences=len(band),
+            first_date=band[0][1],
+            last_date=last_date,
+            next_date=next_occurrence(last_date, detected['period'], detected['interval_days']),
+            last_transaction_id=max(row[0] for row in band),
+        ))
+    return series
+
+
+def _group_key(row: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (series_merchant_key(row['title']), row['account_id'] or row['from_account_id'] or '', row['transaction_type'])
+
+
+def detect_recurring_series(user_id: int, full: bool = False) -> Dict[str, int]:
+    """
+    Detect a user's recurring series, analyzing only what changed since the last run.
+
+    Args:
+        user_id: Primary key of the user to analyze
+        full: Re-analyze every group instead of only those with new transactions
+
+    Returns:
+        Dictionary with the counts of new transactions, groups analyzed and series stored
+    """
+    from .models import RecurringScan, RecurringSeries, Transaction
+
+    scan, _ = RecurringScan.objects.get_or_create(user_id=user_id)
+    history = Transaction.objects.filter(user_id=user_id, transaction_type__in=['Income', 'Expense'])
+    newest_id = history.aggregate(newest=Max('id'))['newest'] or 0
+    if not full and newest_id <= scan.last_transaction_id:
+        return {'new_transactions': 0, 'groups': 0, 'series': 0}
+
+    fields = ('id', 'title', 'account_id', 'from_account_id', 'transaction_type', 'date', 'total', 'category')
+    groups = defaultdict(list)
+    changed = set()
+    new_transactions = 0
+    for row in history.values(*fields).iterator(chunk_size=2000):
+        key = _group_key(row)
+        groups[key].append((row['id'], row['date'], row['total'], row['category']))
+        if row['id'] > scan.last_transaction_id:
+            changed.add(key)
+            new_transactions += 1
+    if full:
+        changed = set(groups)
+
+    stored = []
+    for key in changed:
+        merchant_key, account_id, transaction_type = key
+        for fields_ in analyze_group(groups[key]):
+            stored.append(RecurringSeries(
+                user_id=user_id, merchant_key=merchant_key, account_id=account_id,
+                transaction_type=transaction_type, **fields_
+            ))
+
+    with db_transaction.atomic():
+        existing = RecurringSeries.objects.filter(user_id=user_id)
+        if not full:
+            stale_ids = [
+                series_id for series_id, merchant_key, account_id, transaction_type
+                in existing.values_list('id', 'merchant_key', 'account_id', 'transaction_type')
+                if (merchant_key, account_id, transaction_type) in changed
+            ]
+            existing = RecurringSeries.objects.filter(id__in=stale_ids)
+        existing.delete()
+        RecurringSeries.objects.bulk_create(stored, batch_size=500)
+        scan.last_transaction_id = newest_id
+        scan.scanned_at = timezone.now()
+        scan.save()
+
+    return {'new_transactions': new_transactions, 'groups': len(changed), 'series': len(stored)}
+
+
+def detect_all_recurring_series(user_ids: Optional[Iterable[int]] = None, full: bool = False) -> Dict[str, int]:
+    """
+    Run ``detect_recurring_series`` for every user with transactions (or the given users).
+
+    Returns:
+        Totals over all users, plus the number of users that had new transactions
+    """
+    from .models import Transaction
+
+    if user_ids is None:
+        user_ids = Transaction.objects.filter(user__isnull=False).order_by().values_list('user_id', flat=True).distinct()
+    totals = {'users': 0, 'new_transactions': 0, 'groups': 0, 'series': 0}
+    for user_id in user_ids:
+        stats = detect_recurring_series(user_id, full=full)
+        if stats['groups']:
+            totals['users'] += 1
+        for key in ('new_transactions', 'groups', 'series'):
+            totals[key] += stats[key]
+    return totals
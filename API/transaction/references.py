@@ -0,0 +1,179 @@
+"""
+Foreign keys behind the username and account ID columns.
+
+``Transaction.owner_id`` and ``Account.owner`` hold usernames, and
+``Transaction.account_id``/``from_account_id``/``to_account_id`` hold account
+IDs as strings. The API still accepts them, but each row also carries integer
+foreign keys: ``user`` on both models, and ``account_ref``,
+``from_account_ref`` and ``to_account_ref`` on transactions. Reads filter and
+join on the keys, so a username change only touches the ``users_user`` row;
+the username columns keep the name the row was written with.
+
+The keys are filled in from the legacy columns on write: ``save()`` on both
+models, and the bulk paths call ``resolve_transaction_references`` before
+inserting. The user is only looked up while the key is empty (an old username
+must not move a row away from its renamed owner); the account keys follow the
+account columns on every write. A value that matches no user or account leaves
+the key empty.
+Rows written before the keys existed are filled by
+``python manage.py backfill_foreign_keys``, which walks each table in primary
+key chunks so it can run while the app is serving requests. It also links
+bank statements and batches whose ``owner`` is empty (uploaded under a
+username that had no user yet) and reports the ones still left without one.
+"""
+import logging
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Foreign key fields of Transaction kept in sync with the legacy columns
+REFERENCE_FIELDS = ('user', 'account_ref', 'from_account_ref', 'to_account_ref')
+
+# (foreign key attribute, legacy account column) of Transaction
+ACCOUNT_REFERENCES = (
+    ('account_ref_id', 'account_id'),
+    ('from_account_ref_id', 'from_account_id'),
+    ('to_account_ref_id', 'to_account_id'),
+)
+
+
+def _account_pk(value) -> Optional[int]:
+    value = str(value or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def user_ids_by_username(usernames: Iterable[str]) -> Dict[str, int]:
+    """Primary keys of the users with these usernames, with one query."""
+    from users.models import User
+
+    usernames = {username for username in usernames if username}
+    if not usernames:
+        return {}
+    return dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+
+def resolve_transaction_references(transactions: Iterable) -> None:
+    """
+    Set the foreign keys of transactions from their owner and account columns.
+
+    Uses one query for the users and one for the accounts of the whole batch.
+    """
+    from account.models import Account
+
+    transactions = list(transactions)
+    user_ids = user_ids_by_username(
+        transaction.owner_id for transaction in transactions if transaction.user_id is None
+    )
+    account_pks = {
+        _account_pk(getattr(transaction, column))
+        for transaction in transactions for _, column in ACCOUNT_REFERENCES
+    } - {None}
+    existing = set(Account.objects.filter(id__in=account_pks).values_list('id', flat=True)) if account_pks else set()
+
+    for transaction in transactions:
+        if transaction.user_id is None:
+            transaction.user_id = user_ids.get(transaction.owner_id)
+        for attribute, column in ACCOUNT_REFERENCES:
+            pk = _account_pk(getattr(transaction, column))
+            setattr(transaction, attribute, pk if pk in existing else None)
+
+
+def resolve_account_references(accounts: Iterable) -> None:
+    """Set the empty ``user`` foreign key of accounts from their owner username."""
+    accounts = [account for account in accounts if account.user_id is None]
+    user_ids = user_ids_by_username(account.owner for account in accounts)
+    for account in accounts:
+        account.user_id = user_ids.get(account.owner)
+
+
+def resolve_owner_references(rows: Iterable) -> None:
+    """Set the empty ``owner`` foreign key of statements or batches from their ``user_id`` username."""
+    rows = [row for row in rows if row.owner_id is None]
+    user_ids = user_ids_by_username(row.user_id for row in rows)
+    for row in rows:
+        row.owner_id = user_ids.get(row.user_id)
+
+
+def _resolve_transactions_and_fingerprints(transactions) -> None:
+    # Fingerprints are keyed on the user's primary key once it is known (see fingerprints.py)
+    resolve_transaction_references(transactions)
+    for transaction in transactions:
+        transaction.fingerprint = transaction.compute_fingerprint()
+
+
+def _backfill_table(queryset, resolve: Callable, fields, chunk_size: int, pause: float,
+                    extra_fields=()) -> int:
+    model = queryset.model
+    last_id = 0
+    updated = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not chunk:
+            return updated
+        before = [tuple(getattr(row, f'{field}_id') for field in fields) for row in chunk]
+        resolve(chunk)
+        changed = [
+            row for row, previous in zip(chunk, before)
+            if tuple(getattr(row, f'{field}_id') for field in fields) != previous
+        ]
+        if changed:
+            # bulk_update skips save(), so legs are left alone
+            model.objects.bulk_update(changed, list(fields) + list(extra_fields))
+            updated += len(changed)
+        last_id = chunk[-1].id
+        if pause:
+            time.sleep(pause)
+
+
+def backfill_references(chunk_size: int = 1000, pause: float = 0.0) -> Dict[str, int]:
+    """
+    Fill in the foreign keys of existing accounts and transactions.
+
+    Each chunk is read and written in its own short transaction, so the
+    tables stay usable while the backfill runs, and running it again only
+    writes rows whose keys changed.
+
+    Args:
+        chunk_size: Rows per chunk
+        pause: Seconds to sleep between chunks, to leave room for other queries
+
+    Returns:
+        Dictionary with the number of accounts, transactions, statements and
+        batches updated, and of statements still without an owner
+    """
+    from account.models import Account
+    from bankstatements.models import BankStatement, BankStatementBatch
+    from .models import Transaction
+
+    accounts = _backfill_table(
+        Account.objects.only('id', 'owner', 'user'), resolve_account_references, ('user',), chunk_size, pause
+    )
+    transactions = _backfill_table(
+        Transaction.objects.only(
+            'id', 'owner_id', 'account_id', 'from_account_id', 'to_account_id', 'total', 'title', *REFERENCE_FIELDS
+        ),
+        _resolve_transactions_and_fingerprints, REFERENCE_FIELDS, chunk_size, pause, extra_fields=('fingerprint',)
+    )
+    statements = _backfill_table(
+        BankStatement.objects.filter(owner__isnull=True).only('id', 'user_id', 'owner'),
+        resolve_owner_references, ('owner',), chunk_size, pause
+    )
+    batches = _backfill_table(
+        BankStatementBatch.objects.filter(owner__isnull=True).only('id', 'user_id', 'owner'),
+        resolve_owner_references, ('owner',), chunk_size, pause
+    )
+    unowned_statements = BankStatement.objects.filter(owner__isnull=True).count()
+    logger.info(
+        f"Backfilled foreign keys of {accounts} accounts, {transactions} transactions, "
+        f"{statements} statements and {batches} statement batches"
+    )
+    if unowned_statements:
+        logger.warning(f"{unowned_statements} bank statements have a user_id that matches no user")
+    return {
+        'accounts': accounts,
+        'transactions': transactions,
+        'statements': statements,
+        'batches': batches,
+        'unowned_statements': unowned_statements,
+    }
@@ -0,0 +1,224 @@
+"""
+Scheduled (recurring) transactions and cash-flow projections.
+
+A ``RecurringRule`` describes a transaction that repeats: rent on the 1st of
+every month, payroll every two weeks. ``materialize_rules`` expands the
+active rules into ``ScheduledTransaction`` rows over a rolling horizon
+(RECURRING_PROJECTION_HORIZON_DAYS from today) for all users at once:
+
+- only rules whose stored horizon ends before the new one are expanded, and
+  only for the dates after what they already stored
+- rows are bulk-inserted with one row per (rule, date) enforced by a unique
+  constraint, so an interrupted or repeated run never stores an instance twice
+- instances dated before today are removed; the real transactions replace them
+
+The projection endpoint then reads these rows with one indexed
+``(user, date)`` range query instead of expanding every rule per request.
+Editing a rule re-materializes only that rule.
+"""
+import logging
+from datetime import date, timedelta
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from MoneyManagement.money import Money
+
+from .recurring import add_months
+
+logger = logging.getLogger(__name__)
+
+# Step of each period: (months, days)
+PERIOD_STEPS = {
+    'weekly': (0, 7),
+    'biweekly': (0, 14),
+    'monthly': (1, 0),
+    'quarterly': (3, 0),
+    'yearly': (12, 0),
+}
+
+# Rule fields copied to each scheduled instance
+INSTANCE_FIELDS = (
+    'user_id', 'title', 'transaction_type', 'category', 'total',
+    'account_id', 'from_account_id', 'to_account_id',
+)
+
+
+def projection_horizon_days() -> int:
+    """Days ahead of today that rules are materialized (RECURRING_PROJECTION_HORIZON_DAYS)."""
+    return max(1, getattr(settings, 'RECURRING_PROJECTION_HORIZON_DAYS', 90))
+
+
+def rule_occurrences(rule, start: date, end: date) -> Iterator[date]:
+    """
+    Dates of a rule's occurrences between ``start`` and ``end`` (inclusive).
+
+    Occurrences are always counted from the rule's start date, so a rule
+    starting on January 31st falls on the last day of shorter months and
+    returns to the 31st afterwards.
+    """
+    months, days = PERIOD_STEPS[rule.period]
+    interval = max(1, rule.interval)
+    if rule.end_date is not None:
+        end = min(end, rule.end_date)
+    start = max(start, rule.start_date)
+    if start > end:
+        return
+
+    if days:
+        step = days * interval
+        number = -(-(start - rule.start_date).days // step)
+        occurrence = rule.start_date + timedelta(days=number * step)
+        while occurrence <= end:
+            yield occurrence
+            occurrence += timedelta(days=step)
+        return
+
+    step = months * interval
+    elapsed = (start.year - rule.start_date.year) * 12 + start.month - rule.start_date.month
+    number = max(0, elapsed // step - 1)
+    while True:
+        occurrence = add_months(rule.start_date, number * step)
+        if occurrence > end:
+            return
+        if occurrence >= start:
+            yield occurrence
+        number += 1
+
+
+def _instances(rule, start: date, end: date) -> List[Any]:
+    from .models import ScheduledTransaction
+
+    values = {field: getattr(rule, field) for field in INSTANCE_FIELDS}
+    return [
+        ScheduledTransaction(rule_id=rule.id, date=occurrence, **values)
+        for occurrence in rule_occurrences(rule, start, end)
+    ]
+
+
+def materialize_rules(user_ids: Optional[Iterable[int]] = None, horizon_days: Optional[int] = None,
+                      today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Store the upcoming instances of every active rule, in bulk.
+
+    Safe to run as often as wanted: rules already materialized up to the
+    horizon are not loaded, and the (rule, date) unique constraint drops any
+    instance that is already stored.
+
+    Args:
+        user_ids: Only materialize the rules of these users (all users when None)
+        horizon_days: Days ahead of today (defaults to RECURRING_PROJECTION_HORIZON_DAYS)
+        today: First date of the horizon (defaults to the current date)
+
+    Returns:
+        Dictionary with the number of rules expanded, instances created and past instances removed
+    """
+    from .models import RecurringRule, ScheduledTransaction
+
+    today = today or date.today()
+    until = today + timedelta(days=projection_horizon_days() if horizon_days is None else horizon_days)
+
+    past = ScheduledTransaction.objects.filter(date__lt=today)
+    rules = RecurringRule.objects.filter(is_active=True).exclude(materialized_until__gte=until)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        past = past.filter(user_id__in=user_ids)
+        rules = rules.filter(user_id__in=user_ids)
+
+    expanded = []
+    instances = []
+    for rule in rules.iterator(chunk_size=1000):
+        start = today
+        if rule.materialized_until is not None:
+            start = max(start, rule.materialized_until + timedelta(days=1))
+        instances += _instances(rule, start, until)
+        rule.materialized_until = until
+        expanded.append(rule)
+
+    with db_transaction.atomic():
+        deleted, _ = past.delete()
+        ScheduledTransaction.objects.bulk_create(instances, batch_size=1000, ignore_conflicts=True)
+        RecurringRule.objects.bulk_update(expanded, ['materialized_until'], batch_size=1000)
+
+    if expanded or deleted:
+        logger.info(f"Materialized {len(instances)} scheduled transactions from {len(expanded)} rules, removed {deleted} past ones")
+    return {'rules': len(expanded), 'created': len(instances), 'deleted': deleted}
+
+
+def rematerialize_rule(rule, today: Optional[date] = None) -> int:
+    """
+    Replace the upcoming instances of one rule after it was created or edited.
+
+    Returns:
+        Number of instances stored
+    """
+    from .models import ScheduledTransaction
+
+    today = today or date.today()
+    until = today + timedelta(days=projection_horizon_days())
+    instances = _instances(rule, today, until) if rule.is_active else []
+    with db_transaction.atomic():
+        ScheduledTransaction.objects.filter(rule_id=rule.id).delete()
+        ScheduledTransaction.objects.bulk_create(instances, batch_size=1000)
+        rule.materialized_until = until if rule.is_active else None
+        rule.save(update_fields=['materialized_until'])
+    return len(instances)
+
+
+def rule_from_series(series) -> Dict[str, Any]:
+    """Rule fields for a detected recurring series, continuing from its next expected date."""
+    from .models import Transaction
+
+    last = Transaction.objects.filter(id=series.last_transaction_id).values('title').first() or {}
+    return {
+        'user_id': series.user_id,
+        'title': last.get('title') or series.merchant_key.title(),
+        'transaction_type': series.transaction_type,
+        'category': series.category,
+        'total': series.amount,
+        'account_id': series.account_id or None,
+        'period': series.period,
+        'interval': 1,
+        'start_date': series.next_date,
+    }
+
+
+def project_transactions(user_id: int, start: date, end: date, account_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Scheduled transactions of a user between two dates, with totals.
+
+    Args:
+        user_id: Primary key of the user
+        start: First date (inclusive)
+        end: Last date (inclusive)
+        account_id: Only instances that touch this account
+
+    Returns:
+        Dictionary with ``transactions``, ``income``, ``expense``, ``net`` and
+        ``materialized_until`` (the earliest stored horizon of the user's active
+        rules, None when one was never materialized; later dates may be missing instances)
+    """
+    from django.db.models import Count, Min, Q
+    from .models import RecurringRule, ScheduledTransaction
+
+    scheduled = ScheduledTransaction.objects.filter(user_id=user_id, date__range=(start, end))
+    if account_id:
+        scheduled = scheduled.filter(
+            Q(account_id=account_id) | Q(from_account_id=account_id) | Q(to_account_id=account_id)
+        )
+    transactions = list(scheduled.values('rule_id', 'date', *INSTANCE_FIELDS[1:]))
+    # Totals are Money values; summing their cents keeps the result exact
+    income = Money(sum(abs(row['total'].minor_units) for row in transactions if row['transaction_type'] == 'Income'))
+    expense = Money(sum(abs(row['total'].minor_units) for row in transactions if row['transaction_type'] == 'Expense'))
+    coverage = RecurringRule.objects.filter(user_id=user_id, is_active=True).aggregate(
+        until=Min('materialized_until'),
+        pending=Count('id', filter=Q(materialized_until__isnull=True)),
+    )
+    return {
+        'transactions': transactions,
+        'income': income,
+        'expense': expense,
+        'net': Money(income.minor_units - expense.minor_units),
+        'materialized_until': None if coverage['pending'] else coverage['until'],
+    }
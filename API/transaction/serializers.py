@@ -15,6 +15,10 @@ class TransactionSerializer(serializers.ModelSerializer):
         owner_id (str): The ID of the owner of the transaction.
         account_id (str): The ID of the account associated with the transaction.
     """
+
+    # Stored in cents (MoneyField); exposed as a decimal amount
+    total = serializers.FloatField(required=False, default=0.0)
+
     class Meta:
         """
         Meta class for the TransactionSerializer.
@@ -1,3 +1,747 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from account.models import Account
+from MoneyManagement.money import Money
+from MoneyManagement.testing import MigrationTestCase
+from users.models import User
+
+from .fingerprints import find_duplicates, normalize_title, transaction_fingerprint
+from .legs import account_balances, sync_transaction_legs, transaction_legs
+from .merchants import (
+    MerchantIndex,
+    apply_merchant_categories,
+    merchant_prefixes,
+    merchant_tokens,
+    rebuild_merchant_index,
+    update_merchant_index,
+)
+from .models import (
+    MerchantCategory,
+    RecurringRule,
+    RecurringSeries,
+    ScheduledTransaction,
+    Transaction,
+    TransactionLeg,
+    TransferPairing,
+)
+from .recurring import add_months, detect_period, detect_recurring_series, split_amount_bands
+from .scheduling import materialize_rules, project_transactions, rematerialize_rule, rule_occurrences
+from .transfers import find_transfer_pairs, pair_imported_transfers, pair_transfers, unpair_transfer
+
+
+class LedgerTestCase(TestCase):
+    """Creates a user with one account; ``transaction`` adds expenses to it."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.account = Account.objects.create(
+            account_name='Checking', account_type='Debit', bank='BBVA', total=1000, owner='alice'
+        )
+
+    def transaction(self, day, total, title='OXXO', **fields):
+        values = {
+            'transaction_type': 'Expense',
+            'category': 'Food and drinks',
+            'date': day,
+            'title': title,
+            'total': total,
+            'owner_id': 'alice',
+            'account_id': str(self.account.id),
+        }
+        values.update(fields)
+        return Transaction.objects.create(**values)
+
+
+class FingerprintTests(SimpleTestCase):
+
+    def test_normalize_title(self):
+        self.assertEqual(normalize_title('  Café, "Ñandú"  #12 '), 'CAFE NANDU 12')
+        self.assertEqual(normalize_title(None), '')
+
+    def test_sign_case_and_punctuation_are_ignored(self):
+        self.assertEqual(
+            transaction_fingerprint(1, '7', -12.5, 'Uber *Trip'),
+            transaction_fingerprint(1, '7', '12.50', 'UBER TRIP'),
+        )
+
+    def test_owner_account_and_amount_are_part_of_the_key(self):
+        fingerprint = transaction_fingerprint(1, '7', 12.5, 'UBER')
+
+        self.assertNotEqual(fingerprint, transaction_fingerprint(2, '7', 12.5, 'UBER'))
+        self.assertNotEqual(fingerprint, transaction_fingerprint(1, '8', 12.5, 'UBER'))
+        self.assertNotEqual(fingerprint, transaction_fingerprint(1, '7', 12.51, 'UBER'))
+
+    def test_amounts_are_rounded_like_stored_money(self):
+        # 0.125 and 1.005 are stored as 13 and 101 cents; a float round gives 12 and 100
+        self.assertEqual(transaction_fingerprint(1, '7', 0.125, 'UBER'), transaction_fingerprint(1, '7', Money(13), 'UBER'))
+        self.assertEqual(transaction_fingerprint(1, '7', 1.005, 'UBER'), transaction_fingerprint(1, '7', '1.01', 'UBER'))
+        self.assertEqual(transaction_fingerprint(1, '7', 'n/a', 'UBER'), transaction_fingerprint(1, '7', 0, 'UBER'))
+
+
+class FindDuplicatesTests(LedgerTestCase):
+
+    def row(self, day, total=100, title='oxxo', **fields):
+        values = {'user_id': self.user.id, 'account_id': str(self.account.id), 'date': day, 'total': total, 'title': title}
+        values.update(fields)
+        return values
+
+    def test_exact_and_near_dates_match(self):
+        stored = self.transaction(date(2024, 1, 10), 100)
+
+        self.assertEqual(find_duplicates([self.row('2024-01-10')], window_days=2), {0: stored.id})
+        self.assertEqual(find_duplicates([self.row('2024-01-12')], window_days=2), {0: stored.id})
+        self.assertEqual(find_duplicates([self.row('2024-01-13')], window_days=2), {})
+
+    def test_other_amounts_accounts_and_users_do_not_match(self):
+        self.transaction(date(2024, 1, 10), 100)
+        other_user = User.objects.create(username='bob')
+
+        self.assertEqual(find_duplicates([
+            self.row('2024-01-10', total=101),
+            self.row('2024-01-10', account_id='999'),
+            self.row('2024-01-10', user_id=other_user.id),
+        ], window_days=2), {})
+
+    def test_rows_can_name_the_user(self):
+        stored = self.transaction(date(2024, 1, 10), 100)
+        row = self.row('2024-01-10')
+        del row['user_id']
+        row['owner_id'] = 'alice'
+
+        self.assertEqual(find_duplicates([row], window_days=0), {0: stored.id})
+
+    def test_each_stored_transaction_matches_once(self):
+        stored = self.transaction(date(2024, 1, 10), 100)
+
+        # Two identical purchases: only one of them is already stored
+        self.assertEqual(
+            find_duplicates([self.row('2024-01-10'), self.row('2024-01-10')], window_days=2),
+            {0: stored.id},
+        )
+
+    def test_exact_dates_are_matched_first(self):
+        near = self.transaction(date(2024, 1, 10), 100)
+        exact = self.transaction(date(2024, 1, 11), 100)
+
+        # Both rows are within a day of both stored transactions; each takes its exact-date partner
+        duplicates = find_duplicates([self.row('2024-01-11'), self.row('2024-01-10')], window_days=1)
+
+        self.assertEqual(duplicates, {0: exact.id, 1: near.id})
+
+    def test_excluded_and_undated_rows(self):
+        stored = self.transaction(date(2024, 1, 10), 100)
+
+        self.assertEqual(find_duplicates([self.row('2024-01-10')], window_days=0, exclude_ids=[stored.id]), {})
+        self.assertEqual(find_duplicates([self.row(None), self.row('not a date')]), {})
+        self.assertEqual(find_duplicates([]), {})
+
+
+class MerchantIndexTests(SimpleTestCase):
+
+    def test_merchant_keys(self):
+        self.assertEqual(merchant_tokens('OXXO SUC 1234'), ['OXXO'])
+        self.assertEqual(merchant_prefixes('Uber *Trip 8XK2 Help.Uber.com'), ['UBER TRIP HELP', 'UBER TRIP', 'UBER'])
+
+    def test_longest_known_prefix_wins(self):
+        index = MerchantIndex({'UBER': ('Transport', 9, 10), 'UBER EATS': ('Food and drinks', 5, 5)}, min_share=0.6)
+
+        self.assertEqual(index.lookup('UBER EATS PENDING'), 'Food and drinks')
+        self.assertEqual(index.lookup('UBER TRIP'), 'Transport')
+        self.assertIsNone(index.lookup('NETFLIX'))
+        self.assertIsNone(index.lookup(''))
+
+    def test_ambiguous_keys_do_not_match(self):
+        index = MerchantIndex({'AMAZON': ('Shopping', 9, 10), 'AMAZON PRIME': ('Subscriptions', 1, 2)}, min_share=0.6)
+
+        self.assertIsNone(index.lookup('AMAZON PRIME VIDEO'))
+        self.assertEqual(index.lookup('AMAZON'), 'Shopping')
+
+    def test_placeholder_categories_are_never_returned(self):
+        index = MerchantIndex({'OXXO': ('Others', 3, 3)}, min_share=0.6)
+
+        self.assertIsNone(index.lookup('OXXO'))
+
+
+class UpdateMerchantIndexTests(LedgerTestCase):
+
+    def entries(self):
+        return {
+            entry.merchant_key: (entry.category, entry.counts)
+            for entry in MerchantCategory.objects.filter(user=self.user)
+        }
+
+    def test_added_removed_and_recategorized(self):
+        update_merchant_index(self.user.id, added=[('UBER TRIP', 'Transport'), ('UBER EATS', 'Food and drinks')])
+        self.assertEqual(self.entries()['UBER'], ('Transport', {'Transport': 1, 'Food and drinks': 1}))
+
+        update_merchant_index(self.user.id, added=[('UBER TRIP', 'Food and drinks')], removed=[('UBER TRIP', 'Transport')])
+        self.assertEqual(self.entries(), {
+            'UBER': ('Food and drinks', {'Food and drinks': 2}),
+            'UBER TRIP': ('Food and drinks', {'Food and drinks': 1}),
+            'UBER EATS': ('Food and drinks', {'Food and drinks': 1}),
+        })
+
+        update_merchant_index(self.user.id, removed=[('UBER TRIP', 'Food and drinks'), ('UBER EATS', 'Food and drinks')])
+        self.assertEqual(self.entries(), {})
+
+    def test_placeholders_are_not_learned(self):
+        update_merchant_index(self.user.id, added=[('OXXO', 'Others'), ('OXXO', 'Other'), ('OXXO', ''), ('OXXO', None)])
+        self.assertEqual(self.entries(), {})
+
+        update_merchant_index(self.user.id, added=[('OXXO', 'Food and drinks')], removed=[('OXXO', 'Others')])
+        self.assertEqual(self.entries(), {'OXXO': ('Food and drinks', {'Food and drinks': 1})})
+
+    def test_learned_placeholder_does_not_override_the_extracted_category(self):
+        MerchantCategory.objects.create(
+            user=self.user, merchant_key='OXXO', counts={'Others': 4}, category='Others', category_count=4, total=4
+        )
+        extracted = [{'title': 'OXXO SUC 12', 'category': 'Food and drinks'}]
+
+        self.assertEqual(apply_merchant_categories(self.user.id, extracted), 0)
+        self.assertEqual(extracted[0]['category'], 'Food and drinks')
+
+    def test_rebuild_skips_placeholders(self):
+        self.transaction(date(2024, 1, 1), 10, category='Others')
+        self.transaction(date(2024, 1, 2), 10, category='Food and drinks')
+        self.transaction(date(2024, 1, 3), 10, title='NETFLIX', category='Other')
+
+        rebuild_merchant_index(self.user.id)
+
+        self.assertEqual(self.entries(), {'OXXO': ('Food and drinks', {'Food and drinks': 1})})
+
+
+class FindTransferPairsTests(SimpleTestCase):
+
+    def row(self, id, account_id, day, transaction_type, total, title=''):
+        return {
+            'id': id, 'account_id': account_id, 'date': date(2024, 1, 1) + timedelta(days=day),
+            'transaction_type': transaction_type, 'total': total, 'title': title, 'category': '',
+        }
+
+    def test_opposite_sides_in_other_accounts(self):
+        rows = [
+            self.row(1, '1', 0, 'Expense', 500),
+            self.row(2, '2', 1, 'Income', 500),
+            # Same account, other amount, outside the window
+            self.row(3, '1', 0, 'Income', 500),
+            self.row(4, '2', 0, 'Income', 499.99),
+            self.row(5, '3', 0, 'Expense', 70),
+            self.row(6, '4', 4, 'Income', 70),
+        ]
+
+        self.assertEqual(find_transfer_pairs(rows, window_days=3), [(1, 2)])
+
+    def test_closest_dates_are_paired_first(self):
+        rows = [
+            self.row(1, '1', 0, 'Expense', 100),
+            self.row(2, '1', 2, 'Expense', 100),
+            self.row(3, '2', 2, 'Income', 100),
+            self.row(4, '2', 3, 'Income', 100),
+        ]
+
+        self.assertEqual(sorted(find_transfer_pairs(rows, window_days=3)), [(1, 4), (2, 3)])
+
+    def test_each_transaction_is_used_once(self):
+        rows = [
+            self.row(1, '1', 0, 'Expense', 100),
+            self.row(2, '2', 0, 'Income', 100),
+            self.row(3, '3', 1, 'Income', 100),
+        ]
+
+        self.assertEqual(find_transfer_pairs(rows, window_days=3), [(1, 2)])
+
+    def test_matches_at_the_same_distance_are_not_paired(self):
+        rows = [
+            self.row(1, '1', 0, 'Expense', 100),
+            self.row(2, '2', 1, 'Income', 100),
+            self.row(3, '3', 1, 'Income', 100),
+            # Farther match of the ambiguous expense
+            self.row(4, '4', 3, 'Income', 100),
+        ]
+
+        self.assertEqual(find_transfer_pairs(rows, window_days=3), [])
+
+    def test_signal(self):
+        rows = [
+            self.row(1, '1', 0, 'Expense', 100, title='AMAZON'),
+            self.row(2, '2', 0, 'Income', 100, title='AMAZON REFUND'),
+            self.row(3, '1', 10, 'Expense', 200, title='OXXO'),
+            self.row(4, '2', 10, 'Income', 200, title='SPEI RECIBIDO'),
+            self.row(5, '1', 20, 'Expense', 300, title='SPEIDY TACOS'),
+            self.row(6, '2', 20, 'Income', 300, title='CASHBACK'),
+        ]
+
+        self.assertEqual(find_transfer_pairs(rows, window_days=3, require_signal=True), [(3, 4)])
+        self.assertEqual(len(find_transfer_pairs(rows, window_days=3)), 3)
+
+    def test_required_ids(self):
+        rows = [
+            self.row(1, '1', 0, 'Expense', 100),
+            self.row(2, '2', 0, 'Income', 100),
+            self.row(3, '1', 10, 'Expense', 200),
+            self.row(4, '2', 10, 'Income', 200),
+        ]
+
+        self.assertEqual(find_transfer_pairs(rows, window_days=3, required_ids=[4]), [(3, 4)])
+        self.assertEqual(find_transfer_pairs(rows, window_days=3, required_ids=[]), [])
+
+    def test_zero_amounts_and_transfers_are_skipped(self):
+        rows = [
+            self.row(1, '1', 0, 'Expense', 0),
+            self.row(2, '2', 0, 'Income', 0),
+            self.row(3, '1', 0, 'Transfer', 100),
+            self.row(4, '2', 0, 'Income', 100),
+        ]
+
+        self.assertEqual(find_transfer_pairs(rows, window_days=3), [])
+
+
+class PairTransfersTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.card = Account.objects.create(
+            account_name='Card', account_type='Credit Card', bank='Nu', total=2000, owner='alice', credit_limit=5000
+        )
+
+    def test_pair_becomes_one_transfer(self):
+        expense = self.transaction(date(2024, 1, 10), 300, title='PAGO TDC')
+        income = self.transaction(
+            date(2024, 1, 11), 300, title='PAGO RECIBIDO', transaction_type='Income', account_id=str(self.card.id)
+        )
+
+        results = pair_transfers(self.user.id, window_days=3)
+
+        self.assertEqual(
+            [(result['transfer_id'], result['removed_id']) for result in results], [(expense.id, income.id)]
+        )
+        transfer = Transaction.objects.get()
+        self.assertEqual(transfer.transaction_type, 'Transfer')
+        self.assertEqual(transfer.category, 'Balance Transfer')
+        self.assertEqual((transfer.from_account_ref_id, transfer.to_account_ref_id), (self.account.id, self.card.id))
+        self.assertIsNone(transfer.account_id)
+        self.assertEqual(
+            sorted(TransactionLeg.objects.values_list('account_id', 'signed_amount')),
+            sorted([(self.account.id, -300), (self.card.id, 300)]),
+        )
+
+    def test_dry_run_and_other_users(self):
+        self.transaction(date(2024, 1, 10), 300, title='PAGO TDC')
+        self.transaction(date(2024, 1, 10), 300, transaction_type='Income', account_id=str(self.card.id))
+        other_user = User.objects.create(username='bob')
+
+        self.assertEqual(len(pair_transfers(self.user.id, window_days=3, dry_run=True)), 1)
+        self.assertEqual(pair_transfers(other_user.id, window_days=3), [])
+        self.assertEqual(Transaction.objects.filter(transaction_type='Transfer').count(), 0)
+
+    def test_pairs_without_a_signal_are_left_alone(self):
+        self.transaction(date(2024, 1, 10), 300, title='AMAZON')
+        self.transaction(
+            date(2024, 1, 10), 300, title='AMAZON', transaction_type='Income', account_id=str(self.card.id)
+        )
+
+        self.assertEqual(pair_transfers(self.user.id, window_days=3), [])
+        self.assertEqual(len(pair_transfers(self.user.id, window_days=3, dry_run=True, require_signal=False)), 1)
+
+    def test_unpair_restores_both_transactions(self):
+        expense = self.transaction(date(2024, 1, 10), 300.05, title='PAGO TDC')
+        income = self.transaction(
+            date(2024, 1, 11), 300.05, title='PAGO RECIBIDO', category='Payment',
+            transaction_type='Income', account_id=str(self.card.id)
+        )
+        pair_transfers(self.user.id, window_days=3)
+        self.assertEqual(TransferPairing.objects.get().transfer_id, expense.id)
+
+        restored = unpair_transfer(expense.id)
+
+        self.assertEqual(restored.id, income.id)
+        self.assertFalse(TransferPairing.objects.exists())
+        rows = Transaction.objects.order_by('id').values_list(
+            'id', 'transaction_type', 'category', 'date', 'total', 'account_ref', 'from_account_id', 'user'
+        )
+        self.assertEqual(list(rows), [
+            (expense.id, 'Expense', 'Food and drinks', date(2024, 1, 10), 300.05, self.account.id, None, self.user.id),
+            (income.id, 'Income', 'Payment', date(2024, 1, 11), 300.05, self.card.id, None, self.user.id),
+        ])
+        self.assertEqual(
+            sorted(TransactionLeg.objects.values_list('transaction_id', 'signed_amount')),
+            [(expense.id, -300.05), (income.id, 300.05)],
+        )
+
+    def test_pairing_on_import_is_off_by_default(self):
+        expense = self.transaction(date(2024, 1, 10), 300, title='PAGO TDC')
+        self.transaction(date(2024, 1, 10), 300, transaction_type='Income', account_id=str(self.card.id))
+
+        self.assertEqual(pair_imported_transfers(self.user.id, [expense.id]), [])
+        with override_settings(TRANSFER_PAIRING_ON_IMPORT=True):
+            self.assertEqual(len(pair_imported_transfers(self.user.id, [expense.id])), 1)
+
+
+class SplitAmountBandsTests(SimpleTestCase):
+
+    def test_price_changes_stay_in_one_band(self):
+        self.assertEqual(split_amount_bands([199, 219, 199, -219]), [(199, 219)])
+
+    def test_distant_amounts_are_split(self):
+        self.assertEqual(split_amount_bands([15, 450, 16, 18, 460]), [(15, 18), (450, 460)])
+
+    def test_ratio_is_measured_between_neighbours(self):
+        # 100 -> 120 -> 144 -> 172.8 never jumps by more than 25%
+        self.assertEqual(split_amount_bands([100, 120, 144, 172.8]), [(100, 172.8)])
+        self.assertEqual(split_amount_bands([0, 5]), [(0, 5)])
+
+
+class DetectPeriodTests(SimpleTestCase):
+
+    def dates(self, *offsets, start=date(2024, 1, 1)):
+        return [start + timedelta(days=offset) for offset in offsets]
+
+    def test_monthly(self):
+        detected = detect_period([date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+
+        self.assertEqual(detected['period'], 'monthly')
+        self.assertEqual(detected['interval_days'], 30.0)
+        self.assertEqual(detected['interval_spread'], 1.0)
+        self.assertEqual(detected['confidence'], 1.0)
+
+    def test_weekly_and_yearly(self):
+        self.assertEqual(detect_period(self.dates(0, 7, 14, 22))['period'], 'weekly')
+        self.assertEqual(detect_period(self.dates(0, 366))['period'], 'yearly')
+
+    def test_minimum_occurrences(self):
+        self.assertIsNone(detect_period(self.dates(0, 7, 14)))
+        self.assertIsNone(detect_period(self.dates(0, 30)))
+        self.assertIsNone(detect_period(self.dates(0)))
+
+    def test_same_day_rows_count_once(self):
+        self.assertEqual(detect_period(self.dates(0, 0, 30, 30, 60))['period'], 'monthly')
+
+    def test_irregular_gaps(self):
+        # Median gap is monthly, but only half of the gaps fit
+        self.assertIsNone(detect_period(self.dates(0, 30, 60, 70, 110)))
+        # Median gap matches no period
+        self.assertIsNone(detect_period(self.dates(0, 50, 100, 150)))
+
+    def test_add_months_clamps_to_the_end_of_the_month(self):
+        self.assertEqual(add_months(date(2024, 1, 31), 1), date(2024, 2, 29))
+        self.assertEqual(add_months(date(2023, 11, 30), 3), date(2024, 2, 29))
+        self.assertEqual(add_months(date(2024, 12, 15), 12), date(2025, 12, 15))
+
+
+class DetectRecurringSeriesTests(LedgerTestCase):
+
+    def test_detection_is_incremental(self):
+        for month in (1, 2, 3):
+            self.transaction(date(2024, month, 5), 199, title='NETFLIX.COM 12345')
+            self.transaction(date(2024, month, 5 + month * 3), 15 * month, title='OXXO')
+
+        stats = detect_recurring_series(self.user.id)
+        self.assertEqual(stats, {'new_transactions': 6, 'groups': 2, 'series': 1})
+        series = RecurringSeries.objects.get()
+        self.assertEqual((series.period, series.occurrences), ('monthly', 3))
+        self.assertEqual(series.next_date, date(2024, 4, 5))
+
+        # Nothing new: the user is skipped
+        self.assertEqual(detect_recurring_series(self.user.id)['groups'], 0)
+
+        # Only the group of the new row is analyzed again
+        self.transaction(date(2024, 4, 5), 219, title='NETFLIX.COM 67890')
+        self.assertEqual(detect_recurring_series(self.user.id), {'new_transactions': 1, 'groups': 1, 'series': 1})
+        series = RecurringSeries.objects.get()
+        self.assertEqual((series.occurrences, series.amount_max), (4, 219))
+
+    def test_full_rebuild(self):
+        for month in (1, 2, 3):
+            self.transaction(date(2024, month, 5), 199, title='NETFLIX')
+        detect_recurring_series(self.user.id)
+        Transaction.objects.filter(date=date(2024, 2, 5)).delete()
+
+        self.assertEqual(detect_recurring_series(self.user.id)['groups'], 0)
+        self.assertEqual(detect_recurring_series(self.user.id, full=True)['series'], 0)
+        self.assertFalse(RecurringSeries.objects.exists())
+
+
+class RuleOccurrencesTests(SimpleTestCase):
+
+    def occurrences(self, start, end, **fields):
+        values = {'period': 'monthly', 'interval': 1, 'start_date': date(2024, 1, 31), 'end_date': None}
+        values.update(fields)
+        return list(rule_occurrences(RecurringRule(**values), start, end))
+
+    def test_month_ends_are_clamped_and_restored(self):
+        self.assertEqual(self.occurrences(date(2024, 1, 1), date(2024, 6, 30)), [
+            date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31),
+            date(2024, 4, 30), date(2024, 5, 31), date(2024, 6, 30),
+        ])
+
+    def test_window_in_the_middle_of_the_rule(self):
+        self.assertEqual(
+            self.occurrences(date(2024, 4, 1), date(2024, 5, 31)),
+            [date(2024, 4, 30), date(2024, 5, 31)],
+        )
+        self.assertEqual(
+            self.occurrences(date(2025, 2, 1), date(2025, 3, 1), period='yearly', start_date=date(2024, 2, 29)),
+            [date(2025, 2, 28)],
+        )
+
+    def test_intervals(self):
+        self.assertEqual(
+            self.occurrences(date(2024, 1, 1), date(2024, 12, 31), period='quarterly', interval=2),
+            [date(2024, 1, 31), date(2024, 7, 31)],
+        )
+        self.assertEqual(
+            self.occurrences(date(2024, 1, 10), date(2024, 2, 10), period='weekly', interval=2,
+                             start_date=date(2024, 1, 1)),
+            [date(2024, 1, 15), date(2024, 1, 29)],
+        )
+
+    def test_rule_bounds(self):
+        self.assertEqual(
+            self.occurrences(date(2024, 1, 1), date(2024, 12, 31), end_date=date(2024, 3, 30)),
+            [date(2024, 1, 31), date(2024, 2, 29)],
+        )
+        self.assertEqual(self.occurrences(date(2023, 1, 1), date(2023, 12, 31)), [])
+        self.assertEqual(self.occurrences(date(2024, 3, 1), date(2024, 2, 1)), [])
+
+
+class MaterializeRulesTests(LedgerTestCase):
+
+    def rule(self, **fields):
+        values = {
+            'user': self.user, 'title': 'Rent', 'transaction_type': 'Expense', 'total': 800,
+            'account_id': str(self.account.id), 'period': 'monthly', 'start_date': date(2024, 1, 1),
+        }
+        values.update(fields)
+        return RecurringRule.objects.create(**values)
+
+    def test_rolling_horizon(self):
+        rule = self.rule()
+
+        self.assertEqual(
+            materialize_rules(horizon_days=60, today=date(2024, 1, 15)),
+            {'rules': 1, 'created': 2, 'deleted': 0},
+        )
+        # Already materialized up to the horizon
+        self.assertEqual(materialize_rules(horizon_days=60, today=date(2024, 1, 15))['rules'], 0)
+
+        # A month later: February's instance is past, April's is new
+        self.assertEqual(
+            materialize_rules(horizon_days=60, today=date(2024, 2, 15)),
+            {'rules': 1, 'created': 1, 'deleted': 1},
+        )
+        self.assertEqual(
+            list(ScheduledTransaction.objects.filter(rule=rule).values_list('date', flat=True).order_by('date')),
+            [date(2024, 3, 1), date(2024, 4, 1)],
+        )
+
+    def test_projection(self):
+        self.rule()
+        self.rule(title='Payroll', transaction_type='Income', total=1500.5, period='biweekly')
+        self.rule(title='Old', is_active=False)
+        materialize_rules(horizon_days=30, today=date(2024, 1, 1))
+
+        projection = project_transactions(self.user.id, date(2024, 1, 1), date(2024, 1, 31))
+
+        self.assertEqual(len(projection['transactions']), 4)
+        # Payroll on January 1st, 15th and 29th
+        self.assertEqual(projection['income'], 4501.5)
+        self.assertEqual(projection['expense'], 800)
+        self.assertEqual(projection['net'], 3701.5)
+        self.assertEqual(projection['materialized_until'], date(2024, 1, 31))
+
+        other_account = project_transactions(self.user.id, date(2024, 1, 1), date(2024, 1, 31), account_id='999')
+        self.assertEqual(other_account['transactions'], [])
+
+    def test_unmaterialized_rules_leave_the_horizon_unknown(self):
+        self.rule()
+        materialize_rules(horizon_days=30, today=date(2024, 1, 1))
+        self.rule(title='New')
+
+        self.assertIsNone(project_transactions(self.user.id, date(2024, 1, 1), date(2024, 1, 31))['materialized_until'])
+
+    def test_editing_a_rule_replaces_its_instances(self):
+        rule = self.rule()
+        materialize_rules(horizon_days=90, today=date(2024, 1, 1))
+
+        rule.total = 900
+        rule.save()
+        rematerialize_rule(rule, today=date(2024, 1, 1))
+
+        self.assertEqual(set(ScheduledTransaction.objects.values_list('total', flat=True)), {900})
+
+        rule.is_active = False
+        self.assertEqual(rematerialize_rule(rule, today=date(2024, 1, 1)), 0)
+        self.assertFalse(ScheduledTransaction.objects.exists())
+
+
+class TransactionLegsTests(SimpleTestCase):
+
+    def test_income_and_expense(self):
+        self.assertEqual(transaction_legs('Income', 100, 1, None, None), {1: 100.0})
+        self.assertEqual(transaction_legs('Expense', 100, 1, None, None), {1: -100.0})
+        self.assertEqual(transaction_legs('Expense', 100, None, None, None), {})
+
+    def test_transfers(self):
+        self.assertEqual(transaction_legs('Transfer', 100, None, 1, 2), {1: -100.0, 2: 100.0})
+        self.assertEqual(transaction_legs('Transfer', 100, None, 1, 1), {1: 0.0})
+        self.assertEqual(transaction_legs('Transfer', 100, None, None, 2), {2: 100.0})
+
+
+class SyncTransactionLegsTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.savings = Account.objects.create(
+            account_name='Savings', account_type='Debit', bank='BBVA', total=0, owner='alice'
+        )
+
+    def legs(self):
+        return sorted(TransactionLeg.objects.values_list('account_id', 'date', 'signed_amount'))
+
+    def test_save_keeps_the_legs_in_sync(self):
+        transaction = self.transaction(date(2024, 1, 10), 100)
+        self.assertEqual(self.legs(), [(self.account.id, date(2024, 1, 10), -100)])
+
+        transaction.transaction_type = 'Transfer'
+        transaction.account_id = None
+        transaction.from_account_id = str(self.account.id)
+        transaction.to_account_id = str(self.savings.id)
+        transaction.date = date(2024, 1, 11)
+        transaction.save()
+        self.assertEqual(self.legs(), sorted([
+            (self.account.id, date(2024, 1, 11), -100), (self.savings.id, date(2024, 1, 11), 100),
+        ]))
+
+        transaction.delete()
+        self.assertEqual(self.legs(), [])
+
+    def test_bulk_updates_are_synced_explicitly(self):
+        transaction = self.transaction(date(2024, 1, 10), 100)
+        Transaction.objects.filter(id=transaction.id).update(total=250)
+        transaction.refresh_from_db()
+
+        self.assertEqual(sync_transaction_legs([transaction, Transaction(total=1)]), 1)
+        self.assertEqual(self.legs(), [(self.account.id, date(2024, 1, 10), -250)])
+
+    def test_unknown_accounts_have_no_legs(self):
+        self.transaction(date(2024, 1, 10), 100, account_id='999')
+
+        self.assertEqual(self.legs(), [])
+
+    def test_account_balances(self):
+        self.transaction(date(2024, 1, 10), 100.1)
+        self.transaction(date(2024, 2, 10), 200.2, transaction_type='Income')
+        self.transaction(
+            date(2024, 2, 11), 50, transaction_type='Transfer', account_id=None,
+            from_account_id=str(self.account.id), to_account_id=str(self.savings.id)
+        )
+
+        self.assertEqual(
+            account_balances([self.account.id, str(self.savings.id), 999]),
+            {self.account.id: 50.1, self.savings.id: 50, 999: 0.0},
+        )
+        self.assertEqual(
+            account_balances([self.account.id], start=date(2024, 2, 1), end=date(2024, 2, 10)),
+            {self.account.id: 200.2},
+        )
+
+
+class TransactionLegMigrationTests(MigrationTestCase):
+
+    migrate_from = [('transaction', '0006_recurringrule')]
+    migrate_to = [('transaction', '0007_transactionleg')]
+
+    def test_legs_are_backfilled(self):
+        Transaction = self.old_apps.get_model('transaction', 'Transaction')
+        rows = dict(category='Others', date=date(2024, 1, 10), owner_id='alice')
+        expense = Transaction.objects.create(transaction_type='Expense', title='A', total=10.5, account_id='1', **rows)
+        transfer = Transaction.objects.create(
+            transaction_type='Transfer', title='B', total=20, from_account_id='1', to_account_id='2', **rows
+        )
+        Transaction.objects.create(transaction_type='Expense', title='C', total=30, **rows)
+
+        apps = self.migrate()
+
+        TransactionLeg = apps.get_model('transaction', 'TransactionLeg')
+        self.assertEqual(sorted(TransactionLeg.objects.values_list('transaction_id', 'account_id', 'signed_amount')), [
+            (expense.id, '1', -10.5), (transfer.id, '1', -20.0), (transfer.id, '2', 20.0),
+        ])
+
+
+class MoneyMinorUnitsMigrationTests(MigrationTestCase):
+
+    migrate_from = [('transaction', '0008_foreign_keys')]
+    migrate_to = [('transaction', '0010_money_minor_units')]
+
+    def test_amounts_are_stored_in_cents(self):
+        Transaction = self.old_apps.get_model('transaction', 'Transaction')
+        TransactionLeg = self.old_apps.get_model('transaction', 'TransactionLeg')
+        RecurringRule = self.old_apps.get_model('transaction', 'RecurringRule')
+        transaction = Transaction.objects.create(
+            transaction_type='Expense', category='Others', date=date(2024, 1, 10), title='A', total=19.995,
+            owner_id='alice', account_id='1'
+        )
+        TransactionLeg.objects.create(transaction=transaction, account_id='1', date=transaction.date,
+                                      signed_amount=-19.995)
+        RecurringRule.objects.create(owner_id='alice', title='Rent', transaction_type='Expense', total=0.1 + 0.2,
+                                     period='monthly', start_date=date(2024, 1, 1))
+
+        apps = self.migrate()
+
+        # 19.995 is stored as 19.99499999...; it rounds half up like to_minor_units
+        self.assertEqual(apps.get_model('transaction', 'Transaction').objects.get().total.minor_units, 2000)
+        self.assertEqual(apps.get_model('transaction', 'TransactionLeg').objects.get().signed_amount.minor_units, -2000)
+        self.assertEqual(apps.get_model('transaction', 'RecurringRule').objects.get().total.minor_units, 30)
+
+
+class UserForeignKeyMigrationTests(MigrationTestCase):
+
+    migrate_from = [('account', '0005_account_user_kind_idx'), ('transaction', '0010_money_minor_units')]
+    migrate_to = [('account', '0005_account_user_kind_idx'), ('transaction', '0015_transactionleg_account')]
+
+    def test_rows_are_linked_to_users_and_accounts(self):
+        User = self.old_apps.get_model('users', 'User')
+        Account = self.old_apps.get_model('account', 'Account')
+        Transaction = self.old_apps.get_model('transaction', 'Transaction')
+        TransactionLeg = self.old_apps.get_model('transaction', 'TransactionLeg')
+        MerchantCategory = self.old_apps.get_model('transaction', 'MerchantCategory')
+        RecurringRule = self.old_apps.get_model('transaction', 'RecurringRule')
+
+        user = User.objects.create(username='alice')
+        account = Account.objects.create(
+            account_name='Checking', account_type='Debit', bank='BBVA', total=0, owner='alice', user=user,
+            kind='asset'
+        )
+        transaction = Transaction.objects.create(
+            transaction_type='Expense', category='Others', date=date(2024, 1, 10), title='Oxxo', total=12.5,
+            owner_id='alice', account_id=str(account.id), user=user, account_ref=account, fingerprint='old'
+        )
+        TransactionLeg.objects.create(transaction=transaction, account_id=str(account.id), date=transaction.date,
+                                      signed_amount=-12.5)
+        TransactionLeg.objects.create(transaction=transaction, account_id='999', date=transaction.date,
+                                      signed_amount=-12.5)
+        MerchantCategory.objects.create(owner_id='alice', merchant_key='OXXO', category='Others')
+        MerchantCategory.objects.create(owner_id='ghost', merchant_key='OXXO', category='Others')
+        RecurringRule.objects.create(owner_id='alice', title='Rent', transaction_type='Expense', total=800,
+                                     period='monthly', start_date=date(2024, 1, 1))
+
+        apps = self.migrate()
+
+        self.assertEqual(
+            list(apps.get_model('transaction', 'MerchantCategory').objects.values_list('user_id', flat=True)),
+            [user.id],
+        )
+        self.assertEqual(
+            list(apps.get_model('transaction', 'RecurringRule').objects.values_list('user_id', flat=True)),
+            [user.id],
+        )
+        self.assertEqual(
+            list(apps.get_model('transaction', 'TransactionLeg').objects.values_list('account_id', flat=True)),
+            [account.id],
+        )
+        self.assertEqual(
+            apps.get_model('transaction', 'Transaction').objects.get().fingerprint,
+            transaction_fingerprint(user.id, str(account.id), 12.5, 'Oxxo'),
+        )
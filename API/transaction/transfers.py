@@ -0,0 +1,315 @@
+"""
+Transfer pairing across a user's accounts.
+
+Paying a credit card from a checking account shows up twice once both
+statements are imported: an Expense on checking and an Income on the card.
+``find_transfer_pairs`` finds such opposite pairs (same amount in cents,
+different accounts, dated at most TRANSFER_PAIRING_WINDOW_DAYS apart) and
+``pair_transfers`` turns each pair into one Transfer row, so the payment is
+no longer counted as both spending and income.
+
+Candidates are hash-joined on the amount and then swept in date order, so
+the work is O(n log n) plus the number of candidate pairs inside the date
+window, instead of comparing every expense with every income. The closest
+pairs (by date) are matched first and every transaction is used at most once.
+When a transaction has several matches at the same distance (two incomes of
+the same amount on the same day, say) none of them is paired. By default a
+pair also needs a transfer signal: a title such as "PAGO TDC" or "SPEI", or
+a transfer category, on at least one side, so that an unrelated purchase and
+refund of the same amount are left alone.
+
+Converting a pair keeps the expense row as the Transfer (from its account to
+the income's account) and deletes the income row. A TransferPairing row keeps
+the income's fields and the expense's category, so ``unpair_transfer`` can
+split the transfer again. Account totals are not touched: the expense and the
+income already moved both balances the same way the transfer does.
+
+Pairing on import is off unless TRANSFER_PAIRING_ON_IMPORT is set;
+``python manage.py pair_transfers --dry-run`` lists the pairs it would make.
+"""
+import logging
+import re
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from MoneyManagement.money import Money, to_minor_units
+
+from .legs import sync_transaction_legs
+from .merchants import record_categorizations
+from .references import REFERENCE_FIELDS, resolve_transaction_references
+
+logger = logging.getLogger(__name__)
+
+# Titles and categories that mark a transaction as one side of a transfer
+TRANSFER_TITLE_PATTERN = re.compile(
+    r'\b(PAGO|PAYMENT|SPEI|TRANSFER|TRANSFERENCIA|TRASPASO|WIRE)\b', re.IGNORECASE
+)
+TRANSFER_CATEGORIES = {'Transfer', 'Account Transfer', 'Money Transfer', 'Balance Transfer'}
+
+# Fields of the removed income kept by TransferPairing to restore it
+REMOVED_FIELDS = ('id', 'transaction_type', 'category', 'title', 'owner_id', 'user_id', 'account_id')
+
+
+def pairing_window_days() -> int:
+    """Days the two sides of a transfer may be apart (TRANSFER_PAIRING_WINDOW_DAYS)."""
+    return max(0, getattr(settings, 'TRANSFER_PAIRING_WINDOW_DAYS', 3))
+
+
+def has_transfer_signal(row: Dict[str, Any]) -> bool:
+    """Whether the title or category of a transaction row says it moves money between accounts."""
+    return bool(
+        row.get('category') in TRANSFER_CATEGORIES or TRANSFER_TITLE_PATTERN.search(row.get('title') or '')
+    )
+
+
+def find_transfer_pairs(transactions: Iterable[Dict[str, Any]], window_days: Optional[int] = None,
+                        required_ids: Optional[Iterable[int]] = None,
+                        require_signal: bool = False) -> List[Tuple[int, int]]:
+    """
+    Match expenses with incomes of the same amount in other accounts.
+
+    Args:
+        transactions: Dictionaries with ``id``, ``account_id``, ``date``,
+            ``transaction_type`` ('Income' or 'Expense') and ``total``, and
+            ``title`` and ``category`` when require_signal is set
+        window_days: Maximum distance in days (defaults to TRANSFER_PAIRING_WINDOW_DAYS)
+        required_ids: Only return pairs with at least one of these transactions
+        require_signal: Only return pairs where at least one side has a transfer signal
+
+    Returns:
+        List of (expense_id, income_id) pairs
+    """
+    window = timedelta(days=pairing_window_days() if window_days is None else window_days)
+    required = set(required_ids) if required_ids is not None else None
+    signals = set()
+
+    # Hash join on the amount
+    buckets = defaultdict(lambda: ([], []))
+    for row in transactions:
+        if row['transaction_type'] not in ('Income', 'Expense') or not row['account_id'] or row['date'] is None:
+            continue
+        cents = abs(to_minor_units(row['total'] or 0))
+        if cents == 0:
+            continue
+        if require_signal and has_transfer_signal(row):
+            signals.add(row['id'])
+        side = 0 if row['transaction_type'] == 'Expense' else 1
+        buckets[cents][side].append((row['date'], row['id'], str(row['account_id'])))
+
+    candidates = []
+    for expenses, incomes in buckets.values():
+        if not expenses or not incomes:
+            continue
+        expenses.sort()
+        incomes.sort()
+        # Sweep: incomes[low:] are the ones not yet too early for the current expense
+        low = 0
+        for expense_date, expense_id, expense_account in expenses:
+            while low < len(incomes) and incomes[low][0] < expense_date - window:
+                low += 1
+            position = low
+            while position < len(incomes) and incomes[position][0] <= expense_date + window:
+                income_date, income_id, income_account = incomes[position]
+                position += 1
+                if income_account == expense_account:
+                    continue
+                if required is not None and expense_id not in required and income_id not in required:
+                    continue
+                if require_signal and expense_id not in signals and income_id not in signals:
+                    continue
+                candidates.append((abs((income_date - expense_date).days), expense_date, expense_id, income_id))
+
+    pairs = []
+    used = set()
+    for _, group in groupby(sorted(candidates), key=lambda candidate: candidate[0]):
+        group = [(expense_id, income_id) for _, _, expense_id, income_id in group
+                 if expense_id not in used and income_id not in used]
+        matches = Counter(expense_id for expense_id, _ in group) + Counter(income_id for _, income_id in group)
+        for expense_id, income_id in group:
+            used.update((expense_id, income_id))
+            # Several matches at the same distance: there is no telling which one is the transfer
+            if matches[expense_id] == 1 and matches[income_id] == 1:
+                pairs.append((expense_id, income_id))
+    return pairs
+
+
+def _transfer_category(to_account_id: str, accounts: Dict[str, Any]) -> str:
+    account = accounts.get(str(to_account_id))
+    return 'Balance Transfer' if account is not None and account.is_credit_card else 'Money Transfer'
+
+
+def pair_transfers(user_id: int, transaction_ids: Optional[Iterable[int]] = None,
+                   window_days: Optional[int] = None, dry_run: bool = False,
+                   require_signal: bool = True) -> List[Dict[str, Any]]:
+    """
+    Find and convert transfer pairs among a user's transactions.
+
+    Args:
+        user_id: Primary key of the user whose transactions are paired
+        transaction_ids: Only pair these (newly imported) transactions with the
+            rest of the user's history; all of the history when None
+        window_days: Maximum distance in days (defaults to TRANSFER_PAIRING_WINDOW_DAYS)
+        dry_run: Only report the pairs
+        require_signal: Only pair when one side has a transfer title or category
+
+    Returns:
+        List of ``{'transfer_id', 'removed_id', 'from_account_id', 'to_account_id', 'total', 'date'}``
+    """
+    from account.models import Account
+    from .models import Transaction, TransferPairing
+
+    window = pairing_window_days() if window_days is None else window_days
+    candidates = Transaction.objects.filter(
+        user_id=user_id, transaction_type__in=['Income', 'Expense'], account_ref__isnull=False
+    )
+    if transaction_ids is not None:
+        transaction_ids = list(transaction_ids)
+        dates = list(Transaction.objects.filter(id__in=transaction_ids).values_list('date', flat=True))
+        if not dates:
+            return []
+        candidates = candidates.filter(
+            date__range=(min(dates) - timedelta(days=window), max(dates) + timedelta(days=window))
+        )
+
+    rows = {
+        row['id']: row
+        for row in candidates.values('id', 'account_id', 'date', 'transaction_type', 'total', 'title', 'category')
+    }
+    pairs = find_transfer_pairs(
+        rows.values(), window_days=window, required_ids=transaction_ids, require_signal=require_signal
+    )
+    if not pairs:
+        return []
+
+    accounts = {str(account.id): account for account in Account.objects.filter(user_id=user_id)}
+    results = []
+    for expense_id, income_id in pairs:
+        expense, income = rows[expense_id], rows[income_id]
+        results.append({
+            'transfer_id': expense_id,
+            'removed_id': income_id,
+            'from_account_id': str(expense['account_id']),
+            'to_account_id': str(income['account_id']),
+            'total': expense['total'],
+            'date': expense['date'],
+        })
+    if dry_run:
+        return results
+
+    with db_transaction.atomic():
+        transfers = Transaction.objects.select_for_update().in_bulk([result['transfer_id'] for result in results])
+        removed = Transaction.objects.select_for_update().in_bulk([result['removed_id'] for result in results])
+        previous = []
+        pairings = []
+        for result in results:
+            transfer = transfers[result['transfer_id']]
+            income = removed[result['removed_id']]
+            previous.append((transfer.title, transfer.category))
+            previous.append((income.title, income.category))
+            pairings.append(TransferPairing(
+                user_id=user_id,
+                transfer=transfer,
+                expense_category=transfer.category,
+                removed_transaction=_removed_fields(income),
+            ))
+            transfer.transaction_type = 'Transfer'
+            transfer.category = _transfer_category(result['to_account_id'], accounts)
+            transfer.from_account_id = result['from_account_id']
+            transfer.to_account_id = result['to_account_id']
+            transfer.account_id = None
+            transfer.fingerprint = transfer.compute_fingerprint()
+        resolve_transaction_references(transfers.values())
+        Transaction.objects.bulk_update(
+            list(transfers.values()),
+            ['transaction_type', 'category', 'from_account_id', 'to_account_id', 'account_id', 'fingerprint',
+             *REFERENCE_FIELDS],
+            batch_size=500
+        )
+        sync_transaction_legs(transfers.values())
+        Transaction.objects.filter(id__in=list(removed)).delete()
+        TransferPairing.objects.bulk_create(pairings)
+
+    record_categorizations(
+        user_id,
+        added=[(transfer.title, transfer.category) for transfer in transfers.values()],
+        removed=previous
+    )
+    logger.info(f"Paired {len(results)} transfers for user {user_id}")
+    return results
+
+
+def _removed_fields(income) -> Dict[str, Any]:
+    fields = {field: getattr(income, field) for field in REMOVED_FIELDS}
+    fields['date'] = income.date.isoformat()
+    fields['total'] = to_minor_units(income.total)
+    return fields
+
+
+def unpair_transfer(transfer_id: int):
+    """
+    Split a transfer made by pair_transfers back into its expense and income.
+
+    The transfer row becomes the expense again and the income is recreated
+    with its original id.
+
+    Args:
+        transfer_id: ID of the Transfer transaction
+
+    Returns:
+        The restored income transaction
+
+    Raises:
+        TransferPairing.DoesNotExist: When the transfer was not made by pair_transfers
+    """
+    from .models import Transaction, TransferPairing
+
+    with db_transaction.atomic():
+        pairing = TransferPairing.objects.select_for_update().select_related('transfer').get(transfer_id=transfer_id)
+        transfer = pairing.transfer
+        transfer_category = transfer.category
+        fields = dict(pairing.removed_transaction)
+
+        transfer.transaction_type = 'Expense'
+        transfer.category = pairing.expense_category
+        transfer.account_id = transfer.from_account_id
+        transfer.from_account_id = None
+        transfer.to_account_id = None
+        transfer.save()
+
+        income = Transaction(
+            **{field: fields[field] for field in REMOVED_FIELDS},
+            date=date.fromisoformat(fields['date']),
+            total=Money(fields['total']),
+        )
+        income.save(force_insert=True)
+        pairing.delete()
+
+    record_categorizations(
+        transfer.user_id,
+        added=[(transfer.title, transfer.category), (income.title, income.category)],
+        removed=[(transfer.title, transfer_category)]
+    )
+    logger.info(f"Split transfer {transfer_id} back into transactions {transfer.id} and {income.id}")
+    return income
+
+
+def pair_imported_transfers(user_id: Optional[int], transaction_ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    Pair newly imported transactions, if TRANSFER_PAIRING_ON_IMPORT is on (off by default).
+
+    Only pairs with a transfer signal are merged. Pairing is a cleanup step:
+    failures are logged and never fail the import.
+    """
+    transaction_ids = list(transaction_ids)
+    if user_id is None or not transaction_ids or not getattr(settings, 'TRANSFER_PAIRING_ON_IMPORT', False):
+        return []
+    try:
+        return pair_transfers(user_id, transaction_ids)
+    except Exception as e:
+        logger.error(f"Transfer pairing failed for user {user_id}: {str(e)}", exc_info=True)
+        return []
@@ -1,13 +1,21 @@
 from django.urls import path
 from .views import (
     TransactionCreate,
+    TransactionBulkCreate,
     TransactionRetrieve,
     TransactionUpdate,
     TransactionDelete,
+    RecurringSeriesRetrieve,
+    RecurringRuleCreate,
+    RecurringRuleRetrieve,
+    RecurringRuleUpdate,
+    RecurringRuleDelete,
+    TransactionProjection,
 )
 
 urlpatterns = [
     path("create/", TransactionCreate.as_view(), name="transaction_create"),
+    path("bulk-create/", TransactionBulkCreate.as_view(), name="transaction_bulk_create"),
     path(
         "retrieve/<str:user>/<str:account_id>/<int:month>/<int:year>/",
         TransactionRetrieve.as_view(),
@@ -23,4 +31,22 @@ urlpatterns = [
         TransactionDelete.as_view(),
         name="transaction_delete",
     ),
+    path("recurring/series/<str:user>/", RecurringSeriesRetrieve.as_view(), name="recurring_series_retrieve"),
+    path("recurring/rules/create/", RecurringRuleCreate.as_view(), name="recurring_rule_create"),
+    path("recurring/rules/<str:user>/", RecurringRuleRetrieve.as_view(), name="recurring_rule_retrieve"),
+    path(
+        "recurring/rules/update/<str:rule_id>/",
+        RecurringRuleUpdate.as_view(),
+        name="recurring_rule_update",
+    ),
+    path(
+        "recurring/rules/delete/<str:rule_id>/",
+        RecurringRuleDelete.as_view(),
+        name="recurring_rule_delete",
+    ),
+    path(
+        "projections/<str:user>/<str:account_id>/",
+        TransactionProjection.as_view(),
+        name="transaction_projection",
+    ),
 ]
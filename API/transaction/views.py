@@ -1,10 +1,59 @@
 import json
+from django.conf import settings
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
-from django.db import models
+from django.db import transaction as db_transaction
 from rest_framework import generics
-from .models import Transaction
+from datetime import date, timedelta
+from .models import Transaction, RecurringSeries, RecurringRule
 from .serializers import TransactionSerializer
+from .merchants import UNCATEGORIZED, load_merchant_index, record_categorizations
+from .fingerprints import DUPLICATE_POLICIES, find_duplicates
+from .transfers import pair_imported_transfers
+from .legs import sync_transaction_legs
+from .references import resolve_transaction_references, user_ids_by_username
+from .scheduling import project_transactions, rematerialize_rule, rule_from_series
+from users.models import User
+
+TRANSACTION_FIELDS = (
+    'transaction_type', 'category', 'date', 'title', 'total', 'owner_id',
+    'account_id', 'from_account_id', 'to_account_id',
+)
+
+RULE_FIELDS = (
+    'transaction_type', 'category', 'title', 'total', 'account_id', 'from_account_id',
+    'to_account_id', 'period', 'interval', 'start_date', 'end_date', 'is_active',
+)
+
+
+def _duplicate_policy(data) -> str:
+    """on_duplicate of a request ('flag' or 'skip'), defaulting to TRANSACTION_DUPLICATE_POLICY."""
+    policy = data.get('on_duplicate') or getattr(settings, 'TRANSACTION_DUPLICATE_POLICY', 'flag')
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"on_duplicate must be one of {', '.join(DUPLICATE_POLICIES)}")
+    return policy
+
+
+def _update_transfer_balances(transaction):
+    """Update account balances for transfer transactions."""
+    from account.models import Account
+    
+    try:
+        # Update source account (subtract amount)
+        if transaction.from_account_ref_id:
+            from_account = Account.objects.get(id=transaction.from_account_ref_id)
+            from_account.total -= transaction.total
+            from_account.save()
+        
+        # Update destination account (add amount)
+        if transaction.to_account_ref_id:
+            to_account = Account.objects.get(id=transaction.to_account_ref_id)
+            to_account.total += transaction.total
+            to_account.save()
+            
+    except Account.DoesNotExist:
+        # Handle case where account doesn't exist
+        pass
 
 
 class TransactionCreate(generics.CreateAPIView):
@@ -27,11 +76,29 @@ class TransactionCreate(generics.CreateAPIView):
                 'to_account_id': data.get('to_account_id')
             }
             
-            transaction = Transaction.objects.create(**transaction_data)
+            # Importing the same statement row twice must not create a second transaction
+            on_duplicate = _duplicate_policy(data)
+            duplicate_of = find_duplicates([transaction_data]).get(0)
+            if duplicate_of is not None and on_duplicate == 'skip':
+                return HttpResponse(
+                    json.dumps({"status": "duplicate skipped", "duplicate_of": duplicate_of}),
+                    status=200,
+                    content_type="application/json",
+                )
+            
+            # Fill in the category from the user's history when none was chosen
+            user_id = user_ids_by_username([transaction_data['owner_id']]).get(transaction_data['owner_id'])
+            if (transaction_data['category'] or '') in UNCATEGORIZED and user_id is not None:
+                learned = load_merchant_index(user_id, [transaction_data['title']]).lookup(transaction_data['title'])
+                if learned:
+                    transaction_data['category'] = learned
+            
+            transaction = Transaction.objects.create(user_id=user_id, **transaction_data)
+            record_categorizations(transaction.user_id, added=[(transaction.title, transaction.category)])
             
             # Update account balances for transfers
             if transaction.transaction_type == 'Transfer':
-                self._update_transfer_balances(transaction)
+                _update_transfer_balances(transaction)
             response = {
                 "id": transaction.id,
                 "transaction_type": transaction.transaction_type,
@@ -43,6 +110,7 @@ class TransactionCreate(generics.CreateAPIView):
                 "account_id": transaction.account_id,
                 "from_account_id": transaction.from_account_id,
                 "to_account_id": transaction.to_account_id,
+                "duplicate_of": duplicate_of,
                 "status": "transaction saved"
             }
             status = 201
@@ -55,27 +123,98 @@ class TransactionCreate(generics.CreateAPIView):
             status=status,
             content_type="application/json",
         )
+
+
+
+class TransactionBulkCreate(generics.CreateAPIView):
+    """
+    Create many transactions in one request, e.g. when importing a statement.
     
-    def _update_transfer_balances(self, transaction):
-        """Update account balances for transfer transactions."""
-        from account.models import Account
-        
+    Duplicates of stored transactions (same owner, account, amount and title,
+    dated at most TRANSACTION_DUPLICATE_WINDOW_DAYS apart) are found with one
+    lookup for the whole batch, then flagged or skipped according to
+    ``on_duplicate``. The rows are inserted with one bulk insert, then
+    expense/income pairs between the user's accounts are turned into
+    transfers (see transfers.py).
+    """
+    
+    def post(self, request: HttpRequest) -> HttpResponse:
         try:
-            # Update source account (subtract amount)
-            if transaction.from_account_id:
-                from_account = Account.objects.get(id=transaction.from_account_id)
-                from_account.total -= transaction.total
-                from_account.save()
+            data = json.loads(request.body)
+            on_duplicate = _duplicate_policy(data)
+            rows = [
+                {field: row.get(field) for field in TRANSACTION_FIELDS}
+                for row in data.get('transactions') or []
+            ]
+            if not rows:
+                raise ValueError("Provide the transactions to create in 'transactions'")
+            for row in rows:
+                row['total'] = row['total'] if row['total'] is not None else 0.0
+            
+            duplicates = find_duplicates(rows)
+            to_create = [
+                index for index in range(len(rows))
+                if not (on_duplicate == 'skip' and index in duplicates)
+            ]
+            
+            # Fill in categories from the users' history when none was chosen
+            user_ids = user_ids_by_username(rows[index]['owner_id'] for index in to_create)
+            for owner_id, user_id in user_ids.items():
+                uncategorized = [
+                    rows[index] for index in to_create
+                    if rows[index]['owner_id'] == owner_id and (rows[index]['category'] or '') in UNCATEGORIZED
+                ]
+                if uncategorized:
+                    merchant_index = load_merchant_index(user_id, [row['title'] for row in uncategorized])
+                    for row in uncategorized:
+                        row['category'] = merchant_index.lookup(row['title']) or row['category']
+            
+            objects = [Transaction(user_id=user_ids.get(rows[index]['owner_id']), **rows[index]) for index in to_create]
+            resolve_transaction_references(objects)
+            for transaction in objects:
+                transaction.fingerprint = transaction.compute_fingerprint()
+            with db_transaction.atomic():
+                created = Transaction.objects.bulk_create(objects, batch_size=500)
+                sync_transaction_legs(created)
+                for transaction in created:
+                    if transaction.transaction_type == 'Transfer':
+                        _update_transfer_balances(transaction)
+            for user_id in {transaction.user_id for transaction in created if transaction.user_id}:
+                record_categorizations(user_id, added=[
+                    (transaction.title, transaction.category) for transaction in created if transaction.user_id == user_id
+                ])
+            
+            transfers = []
+            for user_id in {transaction.user_id for transaction in created if transaction.user_id}:
+                transfers += pair_imported_transfers(
+                    user_id, [transaction.id for transaction in created if transaction.user_id == user_id]
+                )
             
-            # Update destination account (add amount)
-            if transaction.to_account_id:
-                to_account = Account.objects.get(id=transaction.to_account_id)
-                to_account.total += transaction.total
-                to_account.save()
-                
-        except Account.DoesNotExist:
-            # Handle case where account doesn't exist
-            pass
+            created_ids = dict(zip(to_create, [transaction.id for transaction in created]))
+            response = {
+                "created": [
+                    {"index": index, "id": created_ids[index], "duplicate_of": duplicates.get(index)}
+                    for index in to_create
+                ],
+                "created_count": len(created),
+                "duplicates": [
+                    {"index": index, "duplicate_of": duplicate_of, "skipped": on_duplicate == 'skip'}
+                    for index, duplicate_of in sorted(duplicates.items())
+                ],
+                "skipped_count": len(rows) - len(created),
+                "transfers": transfers,
+                "status": "transactions saved"
+            }
+            status = 201
+        except Exception as e:
+            response = {"error": "Failed to create transactions", "details": str(e)}
+            status = 400
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=status,
+            content_type="application/json",
+        )
 
 
 class TransactionRetrieve(generics.RetrieveAPIView):
@@ -87,15 +226,11 @@ class TransactionRetrieve(generics.RetrieveAPIView):
     ) -> HttpResponse:
         try:
             # Get transactions with filters
-            base_query = Transaction.objects.filter(owner_id=user)
+            base_query = Transaction.objects.filter(user__username=user).select_related('user')
             
             if account_id != "0":
-                # For transfers, include transactions where this account is either source or destination
-                base_query = base_query.filter(
-                    models.Q(account_id=account_id) |  # Regular income/expense
-                    models.Q(from_account_id=account_id) |  # Transfer from this account
-                    models.Q(to_account_id=account_id)  # Transfer to this account
-                )
+                # Income/expense of this account and transfers from or to it, through the indexed account legs
+                base_query = base_query.filter(legs__account_id=account_id)
             
             if month != 0 and year != 0:
                 base_query = base_query.filter(date__month=month, date__year=year)
@@ -113,7 +248,7 @@ class TransactionRetrieve(generics.RetrieveAPIView):
                     "date": transaction.date,
                     "title": transaction.title,
                     "total": transaction.total,
-                    "owner_id": transaction.owner_id,
+                    "owner_id": transaction.owner_username,
                     "account_id": transaction.account_id,
                     "from_account_id": transaction.from_account_id,
                     "to_account_id": transaction.to_account_id
@@ -132,11 +267,20 @@ class TransactionUpdate(generics.UpdateAPIView):
     def patch(self, request: HttpRequest, transaction_id: str) -> HttpResponse:
         data = json.loads(request.body)
         try:
-            transaction = Transaction.objects.get(id=transaction_id)
+            transaction = Transaction.objects.select_related('user').get(id=transaction_id)
+            previous = (transaction.user_id, transaction.title, transaction.category)
             for key, value in data.items():
                 if hasattr(transaction, key):
                     setattr(transaction, key, value)
+            if 'owner_id' in data:
+                # Moved to another user: resolved again from the new username
+                transaction.user = None
             transaction.save()
+            
+            # Learn from re-categorizations (and renames)
+            if previous != (transaction.user_id, transaction.title, transaction.category):
+                record_categorizations(previous[0], removed=[previous[1:]])
+                record_categorizations(transaction.user_id, added=[(transaction.title, transaction.category)])
             response = {
                 "success": "Transaction updated successfully",
                 "updated_transaction": {
@@ -146,7 +290,7 @@ class TransactionUpdate(generics.UpdateAPIView):
                     "date": transaction.date,
                     "title": transaction.title,
                     "total": transaction.total,
-                    "owner_id": transaction.owner_id,
+                    "owner_id": transaction.owner_username,
                     "account_id": transaction.account_id
                 }
             }
@@ -167,6 +311,7 @@ class TransactionDelete(generics.DestroyAPIView):
         try:
             transaction = Transaction.objects.get(id=transaction_id)
             transaction.delete()
+            record_categorizations(transaction.user_id, removed=[(transaction.title, transaction.category)])
             response = {"status": "transaction deleted"}
             status = 200
         except Transaction.DoesNotExist:
@@ -181,3 +326,191 @@ class TransactionDelete(generics.DestroyAPIView):
             status=status,
             content_type="application/json",
         )
+
+
+def _rule_response(rule) -> dict:
+    response = {field: getattr(rule, field) for field in ('id',) + RULE_FIELDS}
+    response['owner_id'] = rule.user.username
+    response['materialized_until'] = rule.materialized_until
+    return response
+
+
+class RecurringSeriesRetrieve(generics.RetrieveAPIView):
+    """Recurring series detected in a user's transactions (python manage.py detect_recurring_transactions)."""
+    
+    def get(self, request: HttpRequest, user: str) -> HttpResponse:
+        response = []
+        for series in RecurringSeries.objects.filter(user__username=user).order_by('next_date'):
+            response.append({
+                "id": series.id,
+                "merchant_key": series.merchant_key,
+                "account_id": series.account_id,
+                "transaction_type": series.transaction_type,
+                "category": series.category,
+                "period": series.period,
+                "interval_days": series.interval_days,
+                "confidence": series.confidence,
+                "amount": series.amount,
+                "amount_min": series.amount_min,
+                "amount_max": series.amount_max,
+                "occurrences": series.occurrences,
+                "last_date": series.last_date,
+                "next_date": series.next_date,
+                "is_active": series.is_active,
+            })
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=200,
+            content_type="application/json",
+        )
+
+
+class RecurringRuleCreate(generics.CreateAPIView):
+    """
+    Create a recurring rule, either from its fields or from a detected series
+    (``series_id``, any other given field overrides the series). Its upcoming
+    instances are materialized right away.
+    """
+    
+    def post(self, request: HttpRequest) -> HttpResponse:
+        try:
+            data = json.loads(request.body)
+            rule_data = {}
+            if data.get('series_id'):
+                rule_data = rule_from_series(RecurringSeries.objects.get(id=data['series_id']))
+            if data.get('owner_id'):
+                rule_data['user_id'] = User.objects.get(username=data['owner_id']).id
+            rule_data.update({field: data[field] for field in RULE_FIELDS if field in data})
+            
+            missing_args = [
+                field for field in ('transaction_type', 'title', 'total', 'period', 'start_date')
+                if rule_data.get(field) in (None, '')
+            ]
+            if rule_data.get('user_id') is None:
+                missing_args.insert(3, 'owner_id')
+            if missing_args:
+                response = {"error": "data incomplete", "missing_args": missing_args}
+                status = 400
+            else:
+                rule = RecurringRule(**rule_data)
+                rule.full_clean()
+                rule.save()
+                rule.refresh_from_db()
+                scheduled = rematerialize_rule(rule)
+                response = dict(_rule_response(rule), scheduled_count=scheduled, status="recurring rule saved")
+                status = 201
+        except RecurringSeries.DoesNotExist:
+            response = {"error": "Recurring series not found"}
+            status = 400
+        except User.DoesNotExist:
+            response = {"error": "User not found"}
+            status = 400
+        except Exception as e:
+            response = {"error": "Failed to create recurring rule", "details": str(e)}
+            status = 400
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=status,
+            content_type="application/json",
+        )
+
+
+class RecurringRuleRetrieve(generics.RetrieveAPIView):
+    def get(self, request: HttpRequest, user: str) -> HttpResponse:
+        rules = RecurringRule.objects.filter(user__username=user).select_related('user').order_by('title')
+        response = [_rule_response(rule) for rule in rules]
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=200,
+            content_type="application/json",
+        )
+
+
+class RecurringRuleUpdate(generics.UpdateAPIView):
+    """Update a recurring rule and replace its upcoming instances."""
+    
+    def patch(self, request: HttpRequest, rule_id: str) -> HttpResponse:
+        try:
+            data = json.loads(request.body)
+            rule = RecurringRule.objects.get(id=rule_id)
+            for field in RULE_FIELDS:
+                if field in data:
+                    setattr(rule, field, data[field])
+            if data.get('owner_id'):
+                rule.user = User.objects.get(username=data['owner_id'])
+            rule.full_clean()
+            rule.save()
+            rule.refresh_from_db()
+            scheduled = rematerialize_rule(rule)
+            response = {
+                "success": "Recurring rule updated successfully",
+                "updated_rule": dict(_rule_response(rule), scheduled_count=scheduled)
+            }
+            status = 200
+        except RecurringRule.DoesNotExist:
+            response = {"error": "Recurring rule not found"}
+            status = 400
+        except User.DoesNotExist:
+            response = {"error": "User not found"}
+            status = 400
+        except Exception as e:
+            response = {"error": "Failed to update recurring rule", "details": str(e)}
+            status = 400
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=status,
+            content_type="application/json",
+        )
+
+
+class RecurringRuleDelete(generics.DestroyAPIView):
+    def delete(self, request, rule_id: str) -> HttpResponse:
+        try:
+            RecurringRule.objects.get(id=rule_id).delete()
+            response = {"status": "recurring rule deleted"}
+            status = 200
+        except RecurringRule.DoesNotExist:
+            response = {"error": "recurring rule not found"}
+            status = 400
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=status,
+            content_type="application/json",
+        )
+
+
+class TransactionProjection(generics.RetrieveAPIView):
+    """
+    Upcoming scheduled transactions of a user, read from the rows stored by
+    python manage.py materialize_recurring_transactions.
+    
+    Query parameters ``start`` and ``end`` (YYYY-MM-DD) default to today and
+    RECURRING_PROJECTION_HORIZON_DAYS ahead. Account "0" means all accounts.
+    """
+    
+    def get(self, request: HttpRequest, user: str, account_id: str) -> HttpResponse:
+        try:
+            start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else date.today()
+            end = (
+                date.fromisoformat(request.GET['end']) if request.GET.get('end')
+                else date.today() + timedelta(days=getattr(settings, 'RECURRING_PROJECTION_HORIZON_DAYS', 90))
+            )
+            if end < start:
+                raise ValueError("end must not be before start")
+            user_id = User.objects.filter(username=user).values_list('id', flat=True).first()
+            response = project_transactions(user_id, start, end, account_id=None if account_id == "0" else account_id)
+            status = 200
+        except ValueError as e:
+            response = {"error": "Invalid projection range", "details": str(e)}
+            status = 400
+        
+        return HttpResponse(
+            json.dumps(response, default=str),
+            status=status,
+            content_type="application/json",
+        )
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.admin.utils import get_deleted_objects
+from django.db.models import Q
 from django.contrib.admin import helpers
 from django.utils.html import format_html
 from django.urls import reverse
@@ -36,9 +37,9 @@ class UserAdmin(admin.ModelAdmin):
         from transaction.models import Transaction
         from bankstatements.models import BankStatement
         
-        accounts_count = Account.objects.filter(owner=obj.username).count()
-        transactions_count = Transaction.objects.filter(owner_id=str(obj.id)).count()
-        statements_count = BankStatement.objects.filter(user_id=obj.username).count()
+        accounts_count = Account.objects.filter(Q(user=obj) | Q(owner=obj.username, user__isnull=True)).count()
+        transactions_count = Transaction.objects.filter(Q(user=obj) | Q(owner_id=obj.username, user__isnull=True)).count()
+        statements_count = BankStatement.objects.filter(Q(owner=obj) | Q(user_id=obj.username, owner__isnull=True)).count()
         
         return format_html(
             '<strong>Accounts:</strong> {}<br/>'
@@ -59,10 +60,10 @@ class UserAdmin(admin.ModelAdmin):
             objs, request, self.admin_site
         )
         
-        # Add related objects manually since we're using CharField instead of ForeignKey
+        # Add related objects whose user foreign key is not filled in yet (only the username matches)
         for obj in objs:
             # Get related accounts
-            accounts = list(Account.objects.filter(owner=obj.username))
+            accounts = list(Account.objects.filter(owner=obj.username, user__isnull=True))
             if accounts:
                 if 'account' not in model_count:
                     model_count['account'] = 0
@@ -71,7 +72,7 @@ class UserAdmin(admin.ModelAdmin):
                 deleted_objects.append(('account', 'Account', accounts))
             
             # Get related transactions
-            transactions = list(Transaction.objects.filter(owner_id=str(obj.id)))
+            transactions = list(Transaction.objects.filter(owner_id=obj.username, user__isnull=True))
             if transactions:
                 if 'transaction' not in model_count:
                     model_count['transaction'] = 0
@@ -79,7 +80,7 @@ class UserAdmin(admin.ModelAdmin):
                 deleted_objects.append(('transaction', 'Transaction', transactions))
             
             # Get related bank statements
-            statements = list(BankStatement.objects.filter(user_id=obj.username))
+            statements = list(BankStatement.objects.filter(Q(owner=obj) | Q(user_id=obj.username, owner__isnull=True)))
             if statements:
                 if 'bankstatements' not in model_count:
                     model_count['bankstatements'] = 0
@@ -95,18 +96,17 @@ class UserAdmin(admin.ModelAdmin):
         from bankstatements.models import BankStatement
         
         username = obj.username
-        user_id = str(obj.id)
         
         # Delete related bank statements (and their files)
-        statements = BankStatement.objects.filter(user_id=username)
+        statements = BankStatement.objects.filter(Q(owner=obj) | Q(user_id=username, owner__isnull=True))
         for statement in statements:
             statement.delete()  # This will also delete the file
         
         # Delete related transactions
-        Transaction.objects.filter(owner_id=user_id).delete()
+        Transaction.objects.filter(Q(user=obj) | Q(owner_id=username, user__isnull=True)).delete()
         
         # Delete related accounts
-        Account.objects.filter(owner=username).delete()
+        Account.objects.filter(Q(user=obj) | Q(owner=username, user__isnull=True)).delete()
         
         # Finally, delete the user
         obj.delete()
@@ -8,6 +8,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.db.models import Q
 from .models import User
 
 
@@ -172,19 +173,19 @@ class UserService:
                 from transaction.models import Transaction
                 from bankstatements.models import BankStatement
                 
-                user_id = str(user.id)
-                
                 # Delete related bank statements (and their files)
-                statements = BankStatement.objects.filter(user_id=username)
+                statements = BankStatement.objects.filter(Q(owner=user) | Q(user_id=username, owner__isnull=True))
                 statements_count = statements.count()
                 for statement in statements:
                     statement.delete()  # This will also delete the file
                 
                 # Delete related transactions
-                transactions_count = Transaction.objects.filter(owner_id=user_id).delete()[0]
+                transactions_count = Transaction.objects.filter(
+                    Q(user=user) | Q(owner_id=username, user__isnull=True)
+                ).delete()[1].get('transaction.Transaction', 0)
                 
                 # Delete related accounts
-                accounts_count = Account.objects.filter(owner=username).delete()[0]
+                accounts_count = Account.objects.filter(Q(user=user) | Q(owner=username, user__isnull=True)).delete()[0]
                 
                 # Finally, delete the user
                 user.delete()
@@ -1,3 +1,100 @@
-from django.test import TestCase
+import json
+from datetime import date
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from account.models import Account
+from bankstatements.models import BankStatement
+from transaction.models import MerchantCategory, RecurringRule, Transaction
+
+from .models import User
+from .services import UserService
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserDataTestCase(TestCase):
+    """Creates a user with an account, a transaction, a learned category, a rule and a statement."""
+
+    def setUp(self):
+        self.user = User(username='alice', first_name='Alice', last_name='Doe')
+        self.user.set_password('secret')
+        self.user.save()
+        self.account = Account.objects.create(
+            account_name='Checking', account_type='Debit', bank='BBVA', total=1000, owner='alice'
+        )
+        Transaction.objects.create(
+            transaction_type='Expense', category='Others', date=date(2024, 1, 10), title='OXXO', total=100,
+            owner_id='alice', account_id=str(self.account.id)
+        )
+        MerchantCategory.objects.create(user=self.user, merchant_key='OXXO', category='Others')
+        RecurringRule.objects.create(
+            user=self.user, title='Rent', transaction_type='Expense', total=800, period='monthly',
+            start_date=date(2024, 1, 1)
+        )
+        BankStatement.objects.create(user_id='alice', original_filename='jan.pdf', file_size=1)
+
+    def rename(self, username, new_username):
+        return self.client.put(
+            '/user/update-info/', json.dumps({'username': username, 'new_username': new_username}),
+            content_type='application/json'
+        )
+
+
+class RenameUserTests(UserDataTestCase):
+
+    def test_rename_only_updates_the_user(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.rename('alice', 'alice2')
+
+        self.assertEqual(response.status_code, 200)
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"users_user"', writes[0])
+
+    def test_data_follows_the_new_username(self):
+        self.rename('alice', 'alice2')
+
+        transactions = self.client.get('/transactions/retrieve/alice2/0/0/0/').json()
+        self.assertEqual([row['owner_id'] for row in transactions], ['alice2'])
+        accounts = self.client.get(f'/accounts/details/alice2/{self.account.id}/').json()
+        self.assertEqual([row['owner'] for row in accounts], ['alice2'])
+        rules = self.client.get('/transactions/recurring/rules/alice2/').json()
+        self.assertEqual([rule['owner_id'] for rule in rules], ['alice2'])
+        statements = self.client.get('/bank-statements/user/alice2/').json()
+        self.assertEqual(len(statements['statements']), 1)
+
+        self.assertEqual(self.client.get('/transactions/retrieve/alice/0/0/0/').json(), [])
+
+    def test_taken_username(self):
+        User.objects.create(username='bob')
+
+        self.assertEqual(self.rename('alice', 'bob').status_code, 400)
+
+
+class DeleteUserTests(UserDataTestCase):
+
+    def test_delete_removes_the_users_data(self):
+        result = UserService.delete_user('alice', 'secret')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['deleted_counts'], {'accounts': 1, 'transactions': 1, 'bank_statements': 1})
+        self.assertFalse(MerchantCategory.objects.exists())
+        self.assertFalse(RecurringRule.objects.exists())
+
+    def test_new_user_with_an_old_username_owns_nothing(self):
+        self.rename('alice', 'alice2')
+        newcomer = User(username='alice', first_name='New', last_name='User')
+        newcomer.set_password('other')
+        newcomer.save()
+
+        self.assertEqual(self.client.get('/transactions/retrieve/alice/0/0/0/').json(), [])
+        result = UserService.delete_user('alice', 'other')
+
+        self.assertEqual(result['deleted_counts'], {'accounts': 0, 'transactions': 0, 'bank_statements': 0})
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_wrong_password(self):
+        self.assertEqual(UserService.delete_user('alice', 'wrong')['error'], 'Invalid password')
+        self.assertTrue(User.objects.filter(username='alice').exists())
@@ -251,7 +251,7 @@ def update_user_info(request):
                     'message': f'Username "{new_username}" is already taken'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update the user
+        # Update the user; their data references the user by primary key, so nothing else changes
         user.username = new_username
         user.first_name = first_name
         user.last_name = last_name
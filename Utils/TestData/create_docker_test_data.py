@@ -100,7 +100,7 @@ def create_test_data():
             else:
                 current_balance -= transaction.total
         
-        account.total = round(current_balance, 2)
+        account.total = current_balance  # Rounded to cents by the field
         account.save()
         print(f'💰 Updated {account.account_name}: ${account.total}')
     
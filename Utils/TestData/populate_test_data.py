@@ -356,7 +356,7 @@ class TestDataGenerator:
                         current_balance += transaction.total
             
             # Update the account balance
-            account.total = round(current_balance, 2)
+            account.total = current_balance  # Rounded to cents by the field
             account.save()
             
             print(f"  ✅ {account.account_name}: ${account.total:,.2f}")